@@ -0,0 +1,124 @@
+# Batch multi-timeframe agreement vs. one symbol at a time
+# Validation step: --symbols candidates with indicator frames on four timeframes (synthetic candles,
+# random directions) are checked the way count_agreement used to (scalar comparisons on df.iloc[-1] per
+# timeframe) and with one verdict_masks / agreement_counts pass over the stacked latest-bar arrays (also
+# timed alone).
+# Cycle: the same candidates on the simulated exchange (--latency-ms, cold candle and verdict caches) through awaited
+# check_multi_timeframe_agreement calls and one check_multi_timeframe_agreement_batch call. Reports
+# milliseconds per step and whether the agreeing sets are identical
+# Usage: python -m benchmarks.agreement [--symbols 200] [--repeat 5] [--latency-ms 20] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import warnings
+import numpy as np
+from benchmarks.harness import fixed_exchange, sim_session
+from benchmarks.synthetic import synthetic_frame
+from utils import logger as logger_module
+from utils.logger import logger
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+
+def scalar_agreeing(candidates: dict, frames: dict, threshold: int) -> set:
+    # count_agreement's original per-timeframe check, verbatim
+    agreeing = set()
+    for symbol, direction in candidates.items():
+        count = 0
+        for df in frames[symbol]:
+            latest = df.iloc[-1]
+            is_bullish = (
+                latest['rsi'] < 30 or
+                (latest['macd'] > latest['macd_signal'] and latest['macd'] > 0) or
+                latest['adx'] > 25
+            )
+            is_bearish = (
+                latest['rsi'] > 70 or
+                (latest['macd'] < latest['macd_signal'] and latest['macd'] < 0) or
+                latest['adx'] > 25
+            )
+            if (direction == "LONG" and is_bullish) or (direction == "SHORT" and is_bearish):
+                count += 1
+        if count >= threshold:
+            agreeing.add(symbol)
+    return agreeing
+
+def batch_agreeing(candidates: dict, frames: dict, threshold: int) -> set:
+    # Stack every candidate's latest bars into (symbols, timeframes) arrays, then one pass
+    from core.multi_timeframe import agreement_counts, latest_verdict_inputs, verdict_inputs, verdict_masks
+    symbols = list(candidates)
+    stacked = np.array([[latest_verdict_inputs(df) for df in frames[symbol]] for symbol in symbols])
+    bullish, bearish = verdict_masks(verdict_inputs(stacked))
+    counts = agreement_counts(bullish, bearish, [candidates[symbol] for symbol in symbols])
+    return {symbol for symbol, count in zip(symbols, counts) if count >= threshold}
+
+def _time(fn, repeat: int) -> tuple:
+    result = fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat, result
+
+def validation(symbol_count: int, repeat: int) -> dict:
+    from core.indicators import calculate_indicators
+    from core.multi_timeframe import AGREEMENT_THRESHOLD
+    rng = np.random.default_rng(48)
+    symbols = [f"SYM{i}/USDT" for i in range(symbol_count)]
+    candidates = {symbol: ('LONG' if rng.random() < 0.5 else 'SHORT') for symbol in symbols}
+    frames = {symbol: [calculate_indicators(synthetic_frame(symbol, tf, 100)) for tf in TIMEFRAMES] for symbol in symbols}
+    scalar_s, scalar = _time(lambda: scalar_agreeing(candidates, frames, AGREEMENT_THRESHOLD), repeat)
+    batch_s, batch = _time(lambda: batch_agreeing(candidates, frames, AGREEMENT_THRESHOLD), repeat)
+    # The array pass alone, on already stacked latest bars
+    from core.multi_timeframe import agreement_counts, latest_verdict_inputs, verdict_inputs, verdict_masks
+    stacked = verdict_inputs(np.array([[latest_verdict_inputs(df) for df in frames[symbol]] for symbol in symbols]))
+    directions = list(candidates.values())
+    pass_s, _ = _time(lambda: agreement_counts(*verdict_masks(stacked), directions) >= AGREEMENT_THRESHOLD, repeat)
+    return {'scalar_ms': round(scalar_s * 1e3, 3), 'batch_ms': round(batch_s * 1e3, 3), 'array_pass_ms': round(pass_s * 1e3, 3),
+            'agreeing': len(scalar), 'identical': scalar == batch}
+
+async def _cycle(symbol_count: int, latency_ms: float, batched: bool) -> tuple:
+    from core.multi_timeframe import VerdictCache, check_multi_timeframe_agreement_batch
+    exchange = fixed_exchange(symbol_count, latency_ms=latency_ms)
+    rng = np.random.default_rng(48)
+    candidates = {symbol: ('LONG' if rng.random() < 0.5 else 'SHORT') for symbol in exchange.symbols}
+    cache = VerdictCache(clock=exchange.clock)
+    started = time.perf_counter()
+    with sim_session(exchange):
+        if batched:
+            agreeing = await check_multi_timeframe_agreement_batch(candidates, TIMEFRAMES, cache)
+        else:
+            agreeing = set()
+            for symbol, direction in candidates.items():
+                agreeing |= await check_multi_timeframe_agreement_batch({symbol: direction}, TIMEFRAMES, cache)
+    return time.perf_counter() - started, agreeing
+
+def cycle(symbol_count: int, latency_ms: float) -> dict:
+    single_s, single = asyncio.run(_cycle(symbol_count, latency_ms, False))
+    batch_s, batch = asyncio.run(_cycle(symbol_count, latency_ms, True))
+    return {'per_symbol_ms': round(single_s * 1e3, 1), 'batch_ms': round(batch_s * 1e3, 1),
+            'agreeing': len(single), 'identical': single == batch}
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch multi-timeframe agreement vs. one symbol at a time')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=20, help='simulated exchange latency per request (cycle)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = {'symbols': args.symbols, 'validation': validation(args.symbols, args.repeat), 'cycle': cycle(args.symbols, args.latency_ms)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    v, c = report['validation'], report['cycle']
+    print(f"{report['symbols']} candidates x {len(TIMEFRAMES)} timeframes")
+    print(f"validation: scalar {v['scalar_ms']} ms, batch {v['batch_ms']} ms (array pass {v['array_pass_ms']} ms); {v['agreeing']} agree, identical: {v['identical']}")
+    print(f"     cycle: per symbol {c['per_symbol_ms']} ms, batch {c['batch_ms']} ms; {c['agreeing']} agree, identical: {c['identical']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# Interval scanning vs. bar-close evaluation on a simulated clock
+# Runs main.process_symbol for --symbols pairs of the simulated exchange over --hours of simulated time
+# (a --tick second loop, candle cache cleared every tick as the 60s TTL would), once with the priority
+# scheduler's intervals and once with EVALUATION_MODE=bar_close. Reports full evaluations (symbols
+# through the features step), compute time, reused predictions and trigger re-checks, the (symbol,
+# candle) pairs that produced a signal in each mode and how long after the candle opened each signal
+# was sent. --cooldown (simulated seconds, default 0) keeps a symbol quiet after a signal; with 0 every
+# evaluation counts
+# Usage: python -m benchmarks.bar_close [--symbols 20] [--hours 4] [--tick 30] [--cooldown 0] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import warnings
+import numpy as np
+from benchmarks.harness import FIXED_CLOCK, fixed_exchange, no_dispatch, sim_session
+from utils import logger as logger_module
+from utils.logger import logger
+
+BAR_SECONDS = 900
+
+async def _simulate(mode: str, symbol_count: int, hours: float, tick: float, cooldown: float) -> dict:
+    import main
+    from core.bar_close import BarCloseEvaluator
+    from core.scheduler import SymbolScheduler
+    from data import collector
+    # Start just after a 15m boundary so both modes see the same candles
+    now = [FIXED_CLOCK - FIXED_CLOCK % BAR_SECONDS + 1]
+    exchange = fixed_exchange(symbol_count, clock=lambda: now[0])
+    symbols = exchange.symbols
+    main.scheduler = SymbolScheduler(main.MIN_SCAN_INTERVAL, main.MAX_SCAN_INTERVAL)
+    main.scheduler.sync_universe(symbols, now=now[0])
+    evaluator = BarCloseEvaluator(clock=lambda: now[0]) if mode == 'bar_close' else None
+    main.bar_evaluator = evaluator
+    if evaluator is not None:
+        collector.on_candle_close(evaluator.on_candle_close)
+
+    compute = main.get_compute()
+    steps = {name: getattr(compute, name) for name in ('features', 'predict', 'agreement')}
+    calls = {'evaluations': 0, 'seconds': 0.0}
+
+    def timed(name):
+        async def step(items, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await steps[name](items, *args, **kwargs)
+            finally:
+                # Every evaluation starts with the features step (one item per symbol)
+                if name == 'features':
+                    calls['evaluations'] += len(items)
+                calls['seconds'] += time.perf_counter() - started
+        return step
+
+    for name in steps:
+        setattr(compute, name, timed(name))
+    signals, delays, cooldown_until = set(), [], {}
+    end = now[0] + hours * 3600
+    try:
+        with sim_session(exchange), no_dispatch():
+            while now[0] < end:
+                collector.candle_cache.clear()
+                for symbol in main.scheduler.pop_due(len(symbols), now=now[0]):
+                    signaled = False
+                    if cooldown_until.get(symbol, 0) <= now[0]:
+                        # Cooldown on the simulated clock (main's own cooldown uses wall time)
+                        main.last_signal_time.clear()
+                        if await main.process_symbol(exchange, symbol):
+                            signaled = True
+                            bar = int(now[0] // BAR_SECONDS)
+                            signals.add((symbol, bar))
+                            delays.append(now[0] - bar * BAR_SECONDS)
+                            cooldown_until[symbol] = now[0] + cooldown
+                    interval = main.scheduler.interval(symbol, now[0])
+                    due = evaluator.next_due(symbol, interval, now[0]) if evaluator is not None else None
+                    main.scheduler.reschedule(symbol, signaled=signaled, now=now[0], due=due)
+                now[0] += tick
+    finally:
+        for name, step in steps.items():
+            setattr(compute, name, step)
+        main.bar_evaluator = None
+        if evaluator is not None:
+            collector._close_listeners.remove(evaluator.on_candle_close)
+    return {
+        'evaluations': calls['evaluations'],
+        'compute_s': round(calls['seconds'], 2),
+        'reused': evaluator.stats['reused'] if evaluator is not None else 0,
+        'rechecks': evaluator.stats['rechecks'] if evaluator is not None else 0,
+        'signals': sorted(signals),
+        'signal_delay_s': {
+            'median': round(float(np.median(delays)), 1) if delays else None,
+            'max': round(float(np.max(delays)), 1) if delays else None
+        }
+    }
+
+def run(symbol_count: int, hours: float, tick: float, cooldown: float = 0) -> dict:
+    import main
+    main.get_compute().start()
+    modes = {}
+    for mode in ('interval', 'bar_close'):
+        modes[mode] = asyncio.run(_simulate(mode, symbol_count, hours, tick, cooldown))
+    interval, bar = set(map(tuple, modes['interval']['signals'])), set(map(tuple, modes['bar_close']['signals']))
+    for result in modes.values():
+        result['signals'] = len(result['signals'])
+    return {
+        'symbols': symbol_count,
+        'hours': hours,
+        'bars': int(hours * 3600 // BAR_SECONDS),
+        'modes': modes,
+        'evaluation_reduction': round(1 - modes['bar_close']['evaluations'] / max(modes['interval']['evaluations'], 1), 3),
+        'signals_only_interval': len(interval - bar),
+        'signals_only_bar_close': len(bar - interval)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Interval scanning vs. bar-close evaluation')
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--hours', type=float, default=4)
+    parser.add_argument('--tick', type=float, default=30, help='simulated seconds per loop iteration')
+    parser.add_argument('--cooldown', type=float, default=0, help='simulated seconds a symbol stays quiet after a signal')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    # Inline compute so the timing covers every evaluation in this process
+    os.environ['COMPUTE_WORKERS'] = '0'
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.symbols, args.hours, args.tick, args.cooldown)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['symbols']} symbols, {report['hours']}h simulated ({report['bars']} 15m candles)")
+    for mode, r in report['modes'].items():
+        delay = r['signal_delay_s']
+        print(f"{mode:>9}: {r['evaluations']} evaluations ({r['compute_s']}s compute), {r['reused']} reused, "
+              f"{r['rechecks']} re-checks, {r['signals']} (symbol, candle) signals, delay after candle open median {delay['median']}s max {delay['max']}s")
+    print(f"evaluations cut by {report['evaluation_reduction']:.0%}; signals only in interval mode: "
+          f"{report['signals_only_interval']}, only in bar-close mode: {report['signals_only_bar_close']}")
+
+if __name__ == '__main__':
+    main()
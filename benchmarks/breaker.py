@@ -0,0 +1,162 @@
+# Exchange circuit breakers under a rate-limit squeeze and an outage, on a simulated clock
+# A scripted exchange charges Binance-style request weight per rolling minute (--weight-limit) and answers
+# 429 with a "retry after" hint once it is used up; requests that keep coming while limited escalate to a
+# 418 IP ban (2 minutes, doubling). Between --outage-start and --outage-end every request fails with a
+# network error. The scan loop runs --batch symbols (ticker + 4 OHLCV requests each) every 5 simulated
+# seconds, once calling the exchange directly and once through data.breaker with the scan loop pausing
+# while the breakers are open. Reports requests sent, 429/418/outage errors, seconds spent IP-banned,
+# completed symbol scans and how long after the outage the first scan completed again
+# Usage: python -m benchmarks.breaker [--minutes 30] [--batch 20] [--weight-limit 1200] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from collections import deque
+from ccxt.base.errors import DDoSProtection, ExchangeNotAvailable, RateLimitExceeded
+from data.breaker import ExchangeGuard, GuardedExchange, RetryBudget
+from utils import logger as logger_module
+from utils.logger import logger
+
+TICK = 5
+WINDOW = 60
+WEIGHTS = {'fetch_ticker': 2, 'fetch_ohlcv': 2}
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+# 429s tolerated while limited before the 418 ban
+BAN_AFTER = 20
+BAN_SECONDS = 120
+
+class ScriptedExchange:
+    def __init__(self, now: list, weight_limit: int, outage: tuple):
+        self.now = now
+        self.weight_limit = weight_limit
+        self.outage = outage
+        self.weights = deque()
+        self.used = 0
+        self.banned_until = 0.0
+        self.ban_seconds = BAN_SECONDS
+        self.violations = 0
+        self.stats = {'requests': 0, '429': 0, '418': 0, 'outage': 0, 'banned_s': 0.0}
+
+    def _request(self, endpoint: str):
+        now = self.now[0]
+        self.stats['requests'] += 1
+        while self.weights and self.weights[0][0] <= now - WINDOW:
+            self.used -= self.weights.popleft()[1]
+        if now < self.banned_until:
+            self.stats['418'] += 1
+            raise DDoSProtection(f"418 IP banned, retry after {self.banned_until - now:.0f}s")
+        if self.outage[0] <= now < self.outage[1]:
+            self.stats['outage'] += 1
+            raise ExchangeNotAvailable('503 Service Unavailable')
+        weight = WEIGHTS.get(endpoint, 1)
+        if self.used + weight > self.weight_limit:
+            self.stats['429'] += 1
+            self.violations += 1
+            if self.violations > BAN_AFTER:
+                self.banned_until = now + self.ban_seconds
+                self.stats['banned_s'] += self.ban_seconds
+                self.ban_seconds *= 2
+                self.violations = 0
+            raise RateLimitExceeded(f"429 Too Many Requests, retry after {self.weights[0][0] + WINDOW - now:.1f}s")
+        self.violations = 0
+        self.weights.append((now, weight))
+        self.used += weight
+
+    async def fetch_ticker(self, symbol: str):
+        self._request('fetch_ticker')
+        return {'symbol': symbol}
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int = 100):
+        self._request('fetch_ohlcv')
+        return []
+
+    async def close(self):
+        pass
+
+async def _scan(exchange, symbol: str) -> bool:
+    try:
+        await exchange.fetch_ticker(symbol)
+        for tf in TIMEFRAMES:
+            await exchange.fetch_ohlcv(symbol, tf, limit=100)
+        return True
+    except Exception:
+        return False
+
+async def _simulate(guard_on: bool, minutes: float, batch: int, weight_limit: int, outage: tuple) -> dict:
+    now = [0.0]
+    inner = ScriptedExchange(now, weight_limit, outage)
+    guard = None
+    exchange = inner
+    if guard_on:
+        async def no_wait(delay):
+            # Retries go out on the next event-loop turn; the simulated clock only moves per tick
+            await asyncio.sleep(0)
+        guard = ExchangeGuard(RetryBudget(), clock=lambda: now[0], rng=random.Random(44).random, sleep=no_wait)
+        for endpoint in WEIGHTS:
+            # Known up front so a 429 on one endpoint opens both
+            guard.breaker(endpoint)
+        exchange = GuardedExchange(inner, guard, WEIGHTS)
+    scans, paused, recovered_at, symbol = 0, 0, None, 0
+    while now[0] < minutes * 60:
+        if now[0] % 300 == 0 and guard is not None:
+            guard.start_cycle()
+        if guard is not None and guard.blocked_for(WEIGHTS) > 0:
+            paused += 1
+        else:
+            size = 1 if guard is not None and 'half_open' in guard.states().values() else batch
+            results = await asyncio.gather(*[_scan(exchange, f"S{(symbol + i) % 500}") for i in range(size)])
+            symbol += size
+            scans += sum(results)
+            if recovered_at is None and now[0] >= outage[1] and any(results):
+                recovered_at = now[0] - outage[1]
+        now[0] += TICK
+    return {
+        'requests': inner.stats['requests'],
+        'rate_limited_429': inner.stats['429'],
+        'banned_418': inner.stats['418'],
+        'outage_errors': inner.stats['outage'],
+        'banned_s': inner.stats['banned_s'],
+        'scans': scans,
+        'paused_ticks': paused,
+        'recovery_s': recovered_at,
+        'retries': guard.stats['retries'] if guard is not None else 0,
+        'rejected': guard.stats['rejected'] if guard is not None else 0
+    }
+
+def run(minutes: float, batch: int, weight_limit: int, outage: tuple) -> dict:
+    return {
+        'minutes': minutes,
+        'batch': batch,
+        'weight_limit': weight_limit,
+        'outage': list(outage),
+        'modes': {label: asyncio.run(_simulate(label == 'guarded', minutes, batch, weight_limit, outage))
+                  for label in ('unguarded', 'guarded')}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Exchange circuit breakers under rate limits and an outage')
+    parser.add_argument('--minutes', type=float, default=30)
+    parser.add_argument('--batch', type=int, default=20, help='symbols scanned every 5 simulated seconds')
+    parser.add_argument('--weight-limit', type=int, default=1200, help='request weight per rolling minute')
+    parser.add_argument('--outage-start', type=float, default=600, help='simulated second the outage starts')
+    parser.add_argument('--outage-end', type=float, default=720)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.minutes, args.batch, args.weight_limit, (args.outage_start, args.outage_end))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['minutes']:g} simulated minutes, {report['batch']} symbols per 5s batch, weight limit "
+          f"{report['weight_limit']}/min, outage {report['outage'][0]:g}-{report['outage'][1]:g}s")
+    for label, r in report['modes'].items():
+        print(f"{label:>9}: {r['requests']} requests, {r['rate_limited_429']} x 429, {r['banned_418']} x 418 "
+              f"({r['banned_s']:g}s banned), {r['outage_errors']} outage errors, {r['scans']} scans completed, "
+              f"{r['retries']} retries, first scan {r['recovery_s']}s after the outage")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# Shared-memory candle store: host memory vs. reader processes, and torn-read check under writes
+# 1. Fills a store with --symbols pairs x 4 timeframes, then starts 1, 2, 4.. reader processes that
+#    each hold every candle history, either as zero-copy views into the store or as private copies
+#    (what per-process caches would do), and reports the private memory each reader adds
+# 2. A writer thread rewrites a few rings continuously while reader processes check every read for
+#    torn bars (mixed old/new rows); reports reads, seqlock retries and torn reads (must be 0)
+# Usage: python -m benchmarks.candle_store [--symbols 1000] [--readers 1,2,4] [--seconds 3] [--json]
+
+import argparse
+import json
+import logging
+import multiprocessing
+import threading
+import time
+import numpy as np
+from data.candles import CandleSeries
+from data.candle_store import CandleStore
+from utils import logger as logger_module
+from utils.logger import logger
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+CANDLES = 100
+STEP_MS = 900_000
+HOT_KEYS = 8
+
+def private_bytes() -> int:
+    # Pages only this process maps (Linux smaps_rollup; 0 elsewhere)
+    total = 0
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    total += int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return total
+
+def _series(index: int, first: int, n: int = CANDLES) -> CandleSeries:
+    # Self-checking candles: every value of row i encodes (index, candle number)
+    numbers = np.arange(first, first + n, dtype=np.int64)
+    values = np.stack([numbers * 10.0 + index * 1e-3 + k for k in range(5)], axis=1).astype(np.float32)
+    return CandleSeries(numbers * STEP_MS, values)
+
+def _symbols(count: int) -> list:
+    return [f"BENCH{i:04d}/USDT" for i in range(count)]
+
+def _hold(spec: str, symbol_count: int, mode: str, results):
+    # Reader process: keep every history (views or copies) and report the private memory added
+    store = CandleStore.attach(spec)
+    before = private_bytes()
+    if mode == 'views':
+        held = [store.read_many([(s, tf, CANDLES)], lambda frames: frames[0]) for s in _symbols(symbol_count) for tf in TIMEFRAMES]
+    else:
+        held = [store.read(s, tf, CANDLES) for s in _symbols(symbol_count) for tf in TIMEFRAMES]
+    checksum = float(sum(float(c.values[-1, 3]) for c in held))
+    results.put((private_bytes() - before, checksum))
+    del held
+    store.close()
+
+def _check(spec: str, seconds: float, results):
+    # Reader process: read hot keys until told to stop, verifying each window is one consistent write
+    store = CandleStore.attach(spec)
+
+    def verify(frames):
+        candles = frames[0]
+        numbers = candles.timestamps // STEP_MS
+        expected = numbers[:, None] * 10.0 + np.arange(5)
+        consistent = (np.all(np.diff(numbers) == 1) and
+                      np.allclose(np.floor(candles.values), np.floor(expected.astype(np.float32))))
+        return bool(consistent)
+
+    reads = torn = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for i in range(HOT_KEYS):
+            ok = store.read_many([(f"HOT{i}/USDT", '15m', CANDLES)], verify)
+            reads += 1
+            torn += ok is False
+    results.put((reads, torn, store.stats['retries']))
+    store.close()
+
+def memory_scaling(symbol_count: int, reader_counts: list) -> dict:
+    store = CandleStore.create('shm', slots=symbol_count * len(TIMEFRAMES), capacity=CANDLES)
+    try:
+        for i, symbol in enumerate(_symbols(symbol_count)):
+            for tf in TIMEFRAMES:
+                store.put(symbol, tf, _series(i, 0))
+        ctx = multiprocessing.get_context('spawn')
+        rows = []
+        for readers in reader_counts:
+            row = {'readers': readers, 'store_mb': round(store.nbytes / 2 ** 20, 1)}
+            for mode in ('views', 'copies'):
+                results = ctx.Queue()
+                procs = [ctx.Process(target=_hold, args=(store.spec, symbol_count, mode, results)) for _ in range(readers)]
+                for p in procs:
+                    p.start()
+                added = [results.get()[0] for _ in procs]
+                for p in procs:
+                    p.join()
+                row[f'{mode}_private_mb_per_reader'] = round(sum(added) / len(added) / 2 ** 20, 2)
+                row[f'{mode}_host_mb'] = round((store.nbytes + sum(added)) / 2 ** 20, 1)
+            rows.append(row)
+        return {'symbols': symbol_count, 'timeframes': len(TIMEFRAMES), 'results': rows}
+    finally:
+        store.close()
+
+def torn_reads(reader_count: int, seconds: float) -> dict:
+    store = CandleStore.create('shm', slots=HOT_KEYS, capacity=CANDLES)
+    stop = threading.Event()
+    writes = [0]
+
+    def writer():
+        # Every put advances the ring by one candle and rewrites the forming one
+        first = 0
+        while not stop.is_set():
+            first += 1
+            for i in range(HOT_KEYS):
+                store.put(f"HOT{i}/USDT", '15m', _series(i, first, 3 if first > 1 else CANDLES))
+                writes[0] += 1
+
+    try:
+        for i in range(HOT_KEYS):
+            store.put(f"HOT{i}/USDT", '15m', _series(i, 0))
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_check, args=(store.spec, seconds, results)) for _ in range(reader_count)]
+        for p in procs:
+            p.start()
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        totals = [results.get() for _ in procs]
+        stop.set()
+        thread.join()
+        for p in procs:
+            p.join()
+        return {
+            'readers': reader_count,
+            'seconds': seconds,
+            'writes': writes[0],
+            'reads': sum(t[0] for t in totals),
+            'seqlock_retries': sum(t[2] for t in totals),
+            'torn_reads': sum(t[1] for t in totals)
+        }
+    finally:
+        store.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-memory candle store memory scaling and consistency')
+    parser.add_argument('--symbols', type=int, default=1000)
+    parser.add_argument('--readers', default='1,2,4', help='comma separated reader process counts')
+    parser.add_argument('--seconds', type=float, default=3.0, help='duration of the torn-read check')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    counts = [int(x) for x in args.readers.split(',') if x]
+    report = {'memory': memory_scaling(args.symbols, counts), 'consistency': torn_reads(max(counts), args.seconds)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    memory = report['memory']
+    print(f"{memory['symbols']} symbols x {memory['timeframes']} timeframes")
+    for row in memory['results']:
+        print(f"{row['readers']:>2} readers: views +{row['views_private_mb_per_reader']:6.2f} MB/reader "
+              f"(host {row['views_host_mb']:7.1f} MB)   copies +{row['copies_private_mb_per_reader']:6.2f} MB/reader "
+              f"(host {row['copies_host_mb']:7.1f} MB)")
+    c = report['consistency']
+    print(f"consistency: {c['reads']} reads by {c['readers']} readers during {c['writes']} writes, "
+          f"{c['seqlock_retries']} seqlock retries, {c['torn_reads']} torn reads")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# Single-flight request coalescing: exchange requests sent with and without data.coalesce
+# Replays --rounds bursts of the lookups the bot makes at about the same moment against a simulated
+# exchange with --latency-ms per request: the scanner (fetch_ticker, then fetch_ohlcv for four
+# timeframes per symbol, with the multi-timeframe check fetching the same candles concurrently), the
+# trade tracker polling tickers of --tracked open trades and Telegram /signal looking up the latest
+# symbol's ticker. Every caller starts at a random offset within --spread-ms. Reports requests that
+# reached the exchange, deduplicated calls (in flight / from the freshness window), per-call latency and
+# responses that differ from the uncoalesced run (must be 0)
+# Usage: python -m benchmarks.coalesce [--symbols 50] [--rounds 10] [--latency-ms 50] [--spread-ms 100] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import numpy as np
+from benchmarks.harness import fixed_exchange
+from data.coalesce import CoalescingExchange, SingleFlight
+from utils import logger as logger_module
+from utils.logger import logger
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+
+def _callers(symbols: list, tracked: int) -> list:
+    # (caller, [(method, args, kwargs), ...]) sequences; calls within one caller run one after another
+    callers = []
+    for symbol in symbols:
+        callers.append(('scanner', [('fetch_ticker', (symbol,), {})] +
+                        [('fetch_ohlcv', (symbol, tf), {'limit': 100}) for tf in TIMEFRAMES]))
+        callers.append(('multi_timeframe', [('fetch_ohlcv', (symbol, tf), {'limit': 100}) for tf in TIMEFRAMES[1:]]))
+    for symbol in symbols[:tracked]:
+        callers.append(('trade_tracker', [('fetch_ticker', (symbol,), {})]))
+    callers.append(('telegram', [('fetch_ticker', (symbols[0],), {})]))
+    return callers
+
+async def _burst(exchange, callers: list, offsets: list, latencies: list) -> list:
+    async def run(offset, calls):
+        await asyncio.sleep(offset)
+        responses = []
+        for method, args, kwargs in calls:
+            started = time.perf_counter()
+            responses.append(await getattr(exchange, method)(*args, **kwargs))
+            latencies.append(time.perf_counter() - started)
+        return responses
+    return await asyncio.gather(*[run(offset, calls) for offset, (_, calls) in zip(offsets, callers)])
+
+async def _run(coalesce: bool, symbol_count: int, rounds: int, latency_ms: float, spread_ms: float,
+               tracked: int, window: float) -> dict:
+    inner = fixed_exchange(symbol_count, latency_ms=latency_ms)
+    flight = SingleFlight(window)
+    exchange = CoalescingExchange(inner, flight) if coalesce else inner
+    callers = _callers(inner.symbols, tracked)
+    rng = np.random.default_rng(43)
+    latencies, responses = [], []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        offsets = (rng.random(len(callers)) * spread_ms / 1000).tolist()
+        responses.append(await _burst(exchange, callers, offsets, latencies))
+        # Next round is a later moment: nothing carries over from the freshness window
+        flight.clear()
+    return {
+        'calls': len(latencies),
+        'exchange_requests': inner.stats['requests'],
+        'deduplicated': {'inflight': flight.stats['joined'], 'fresh': flight.stats['fresh']},
+        'latency_ms': {'p50': round(float(np.percentile(latencies, 50)) * 1000, 1),
+                       'p99': round(float(np.percentile(latencies, 99)) * 1000, 1)},
+        'seconds': round(time.perf_counter() - started, 2),
+        'responses': responses
+    }
+
+def run(symbol_count: int, rounds: int, latency_ms: float, spread_ms: float, tracked: int, window: float) -> dict:
+    plain = asyncio.run(_run(False, symbol_count, rounds, latency_ms, spread_ms, tracked, window))
+    coalesced = asyncio.run(_run(True, symbol_count, rounds, latency_ms, spread_ms, tracked, window))
+    mismatches = sum(a != b for round_a, round_b in zip(plain.pop('responses'), coalesced.pop('responses'))
+                     for caller_a, caller_b in zip(round_a, round_b) for a, b in zip(caller_a, caller_b))
+    return {
+        'symbols': symbol_count,
+        'rounds': rounds,
+        'latency_ms': latency_ms,
+        'spread_ms': spread_ms,
+        'window_s': window,
+        'plain': plain,
+        'coalesced': coalesced,
+        'request_reduction': round(1 - coalesced['exchange_requests'] / max(plain['exchange_requests'], 1), 3),
+        'mismatches': mismatches
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Exchange requests with and without single-flight coalescing')
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=50, help='simulated exchange latency per request')
+    parser.add_argument('--spread-ms', type=float, default=100, help='callers in a burst start within this many ms')
+    parser.add_argument('--tracked', type=int, default=10, help='open trades polled by the trade tracker')
+    parser.add_argument('--window', type=float, default=1.0, help='freshness window in seconds (0 = in-flight only)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.symbols, args.rounds, args.latency_ms, args.spread_ms, args.tracked, args.window)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['symbols']} symbols x {report['rounds']} bursts, {report['latency_ms']:g} ms latency, "
+          f"callers spread over {report['spread_ms']:g} ms, {report['window_s']:g}s freshness window")
+    for label in ('plain', 'coalesced'):
+        r = report[label]
+        print(f"{label:>9}: {r['calls']} calls, {r['exchange_requests']} exchange requests, deduplicated "
+              f"{r['deduplicated']['inflight']} in flight + {r['deduplicated']['fresh']} fresh, "
+              f"latency p50 {r['latency_ms']['p50']} ms p99 {r['latency_ms']['p99']} ms, {r['seconds']}s")
+    print(f"exchange requests cut by {report['request_reduction']:.0%}; {report['mismatches']} responses differ")
+
+if __name__ == '__main__':
+    main()
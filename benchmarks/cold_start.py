@@ -0,0 +1,82 @@
+# Cold-start regression benchmark: time from process spawn to the first `GET /` response
+# Starts `uvicorn main:app` in a fresh interpreter several times and compares the
+# median against benchmarks/cold_start_budget.json; exits 1 on regression
+# Usage: python -m benchmarks.cold_start [--runs 5] [--update]
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(ROOT, 'benchmarks', 'cold_start_budget.json')
+DEFAULT_TOLERANCE = 0.25
+STARTUP_TIMEOUT = 60
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def measure_once() -> float:
+    # Seconds from spawn until `GET /` returns 200
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < STARTUP_TIMEOUT:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from {url} within {STARTUP_TIMEOUT}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-to-first-response benchmark for main:app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--update', action='store_true', help='store the measured median as the new budget')
+    parser.add_argument('--tolerance', type=float, default=None)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    median = statistics.median(samples)
+    result = {'time_to_first_response_s': round(median, 4), 'samples': [round(s, 4) for s in samples]}
+
+    if args.update:
+        budget = {'time_to_first_response_s': round(median, 4), 'tolerance': args.tolerance or DEFAULT_TOLERANCE}
+        with open(BUDGET_FILE, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        result['budget'] = budget
+        print(json.dumps(result, indent=2))
+        return 0
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+    tolerance = args.tolerance if args.tolerance is not None else budget.get('tolerance', DEFAULT_TOLERANCE)
+    limit = budget['time_to_first_response_s'] * (1 + tolerance)
+    result.update(budget=budget['time_to_first_response_s'], limit=round(limit, 4), passed=median <= limit)
+    print(json.dumps(result, indent=2))
+    return 0 if result['passed'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
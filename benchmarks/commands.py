@@ -0,0 +1,106 @@
+# Telegram command replies from telebot.state vs. re-reading the signal log per command
+# Writes a synthetic logs/signals_log.csv (--signals signals over --days days, a pending row and a final
+# row per signal, as the sender logs them) to a temporary directory, then times: the CSV read and
+# pandas rollup /summary and /report used to do per command, seeding BotState from the CSV once, and
+# answering /status, /signal, /summary and /report from BotState. /status used to call get_me() and
+# /signal a ticker lookup on every request; those network round trips are not timed here
+# Usage: python -m benchmarks.commands [--signals 5000] [--days 7] [--repeat 200] [--json]
+
+import argparse
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from telebot.state import BotState
+from utils import logger as logger_module
+from utils.logger import logger
+
+COLUMNS = ['timestamp', 'symbol', 'direction', 'entry_price', 'tp1', 'tp2', 'tp3', 'sl', 'confidence', 'trade_type', 'status']
+
+def write_log(path: str, signals: int, days: int, rng):
+    # Signal log rows in logging order
+    now = datetime.now()
+    issued = sorted(now - timedelta(seconds=float(s)) for s in rng.random(signals) * days * 86400)
+    rows = []
+    for i, at in enumerate(issued):
+        signal = {'timestamp': at.isoformat(), 'symbol': f"S{i % 300}/USDT", 'direction': 'LONG' if rng.random() < 0.5 else 'SHORT',
+                  'entry': 1.0, 'tp1': 1.01, 'tp2': 1.02, 'tp3': 1.03, 'sl': 0.99, 'confidence': float(60 + 40 * rng.random()),
+                  'trade_type': 'Normal'}
+        rows.append((signal, 'pending'))
+        rows.append((signal, str(rng.choice(['tp1', 'tp2', 'tp3', 'sl']))))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for signal, status in rows:
+            writer.writerow([signal['timestamp'], signal['symbol'], signal['direction'], signal['entry'], signal['tp1'],
+                             signal['tp2'], signal['tp3'], signal['sl'], signal['confidence'], signal['trade_type'], status])
+
+def csv_summary(path: str) -> dict:
+    # What /summary and /report did per command (report_generator.generate_daily_summary, minus the send)
+    df = pd.read_csv(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    yesterday = datetime.now().date() - timedelta(days=1)
+    daily = df[df['timestamp'].dt.date == yesterday]
+    return {'total': len(daily), 'confidence': daily['confidence'].mean(),
+            **{status: int((daily['status'] == status).sum()) for status in ('tp1', 'tp2', 'tp3', 'sl', 'pending')}}
+
+def _time(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def run(signals: int, days: int, repeat: int) -> dict:
+    rng = np.random.default_rng(45)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'signals_log.csv')
+        write_log(path, signals, days, rng)
+        csv_s = _time(lambda: csv_summary(path), max(repeat // 20, 3))
+        started = time.perf_counter()
+        state = BotState()
+        state.load_signal_log(path)
+        seed_s = time.perf_counter() - started
+    state.set_identity('bench_bot')
+    state.record_signal('BTC/USDT', {'timestamp': datetime.now().isoformat(), 'direction': 'LONG', 'confidence': 75.0,
+                                     'entry': 1.0, 'tp1': 1.01, 'tp2': 1.02, 'tp3': 1.03, 'sl': 0.99}, 'pending')
+    for i in range(300):
+        state.set_cooldown(f"S{i}/USDT", time.time() + (3600 if i % 2 else -1))
+    handlers = {
+        'status': state.status_text,
+        'signal': state.latest_signal_text,
+        'summary': state.summary_text,
+        'report': state.report_text
+    }
+    return {
+        'signals': signals,
+        'csv_rows': 2 * signals,
+        'csv_summary_ms': round(csv_s * 1000, 2),
+        'seed_ms': round(seed_s * 1000, 1),
+        'state_us': {name: round(_time(fn, repeat) * 1e6, 2) for name, fn in handlers.items()}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Telegram command replies from BotState vs. the CSV log')
+    parser.add_argument('--signals', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.signals, args.days, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['signals']} signals ({report['csv_rows']} CSV rows): CSV read + rollup {report['csv_summary_ms']} ms "
+          f"per /summary or /report; BotState seeded once in {report['seed_ms']} ms")
+    print('BotState replies: ' + ', '.join(f"/{name} {us} us" for name, us in report['state_us'].items()))
+
+if __name__ == '__main__':
+    main()
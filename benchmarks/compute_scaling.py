@@ -0,0 +1,92 @@
+# Compute pool scaling: cycle time and event-loop stalls vs. COMPUTE_WORKERS
+# Runs the same main.process_symbol cycle against the zero-latency simulated exchange with the
+# compute executor inline (0) and with 1..N worker processes, while a probe task measures how
+# long the event loop is blocked (what Telegram polling and FastAPI requests would wait)
+# Usage: python -m benchmarks.compute_scaling [--symbols 40] [--workers 0,1,2,4] [--concurrency 16] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import warnings
+from benchmarks.harness import fixed_exchange, sim_session, no_dispatch
+from utils import logger as logger_module
+from utils.logger import logger
+
+PROBE_INTERVAL = 0.01
+
+async def _probe(stalls: list, stop: asyncio.Event):
+    # Record how late each 10ms tick fires
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        stalls.append(max(time.perf_counter() - expected, 0.0))
+
+async def cycle(exchange, concurrency: int) -> dict:
+    import main
+    main.last_signal_time.clear()
+    stalls = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(stalls, stop))
+    started = time.perf_counter()
+    with sim_session(exchange), no_dispatch():
+        symbols = exchange.symbols
+        for i in range(0, len(symbols), concurrency):
+            await asyncio.gather(*(main.process_symbol(exchange, s) for s in symbols[i:i + concurrency]))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    stalls.sort()
+    return {
+        'cycle_s': round(elapsed, 3),
+        'loop_stall_p99_ms': round(stalls[int(len(stalls) * 0.99)] * 1000, 1) if stalls else 0.0,
+        'loop_stall_max_ms': round(stalls[-1] * 1000, 1) if stalls else 0.0
+    }
+
+def run(workers: int, symbols: int, concurrency: int) -> dict:
+    import main
+    from core.compute import ComputeExecutor
+    executor = ComputeExecutor(workers)
+    executor.start()
+    main._compute = executor
+    try:
+        result = asyncio.run(cycle(fixed_exchange(symbols), concurrency))
+    finally:
+        executor.shutdown()
+        main._compute = None
+    return {'workers': workers, **result}
+
+def main():
+    parser = argparse.ArgumentParser(description='Cycle time vs. compute pool size')
+    parser.add_argument('--symbols', type=int, default=40)
+    parser.add_argument('--workers', default=None, help='comma separated pool sizes (default 0,1,2,4.. up to the core count)')
+    parser.add_argument('--concurrency', type=int, default=16, help='symbols scanned concurrently')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    cores = os.cpu_count() or 1
+    if args.workers:
+        sizes = [int(x) for x in args.workers.split(',') if x]
+    else:
+        sizes = [0] + [n for n in (1, 2, 4, 8, 16, 32) if n <= cores]
+    results = [run(n, args.symbols, args.concurrency) for n in sizes]
+    baseline = results[0]['cycle_s']
+    for r in results:
+        r['speedup'] = round(baseline / r['cycle_s'], 2) if r['cycle_s'] else 0.0
+    report = {'cores': cores, 'symbols': args.symbols, 'concurrency': args.concurrency, 'results': results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.symbols} symbols, concurrency {args.concurrency}, {cores} cores")
+    for r in results:
+        label = 'inline' if r['workers'] == 0 else f"{r['workers']} workers"
+        print(f"{label:>11}: cycle {r['cycle_s']:7.2f}s  speedup {r['speedup']:5.2f}x  "
+              f"loop stall p99 {r['loop_stall_p99_ms']:7.1f}ms  max {r['loop_stall_max_ms']:7.1f}ms")
+
+if __name__ == '__main__':
+    main()
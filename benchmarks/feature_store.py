@@ -0,0 +1,108 @@
+# Feature store vs. recomputing training data on every run
+# --symbols synthetic 15m histories of --history bars grow by --new-bars per training run for --runs
+# runs. Each run prepares the multi-symbol training set twice: the way prepare_training_data used to
+# (indicators, patterns and the per-bar label loop over the whole history) and through model.feature_store
+# (append the new bars, then load every symbol's memory-mapped labelled rows). Reports seconds per run,
+# bars computed per run, load time and whether the labels trained on agree
+# Usage: python -m benchmarks.feature_store [--symbols 5] [--history 1500] [--new-bars 96] [--runs 5] [--json]
+
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import time
+import warnings
+import numpy as np
+from benchmarks.synthetic import symbol_names, synthetic_ohlcv
+from data.candles import CandleSeries
+from utils import logger as logger_module
+from utils.logger import logger
+
+STEP_MS = 900_000
+
+def recompute(candles: CandleSeries):
+    # The old prepare_training_data body for one symbol: indicators, patterns and a Python label loop
+    from core.indicators import calculate_indicators
+    from model.features import compute_features
+    df = calculate_indicators(candles.to_frame(np.float64))
+    features = compute_features(candles.to_frame(np.float64))
+    labels = np.zeros(len(df), dtype=np.int8)
+    for i in range(len(df) - 10):
+        future_highs = df["high"].iloc[i+1:i+11]
+        tp1 = df["close"].iloc[i] + df["atr"].iloc[i] * 1.2
+        if df["close"].iloc[i] < tp1 <= future_highs.max():
+            labels[i] = 1
+    return features, labels
+
+def run(symbol_count: int, history: int, new_bars: int, runs: int) -> dict:
+    from model.feature_store import FeatureStore
+    from model.features import FILLED_BARS
+    symbols = symbol_names(symbol_count)
+    total = history + new_bars * runs
+    series = {s: CandleSeries.from_ohlcv(synthetic_ohlcv(s, '15m', total)) for s in symbols}
+    root = tempfile.mkdtemp(prefix='feature-store-')
+    store = FeatureStore(root)
+    report = {'symbols': symbol_count, 'history': history, 'new_bars': new_bars, 'runs': []}
+    try:
+        for r in range(runs + 1):
+            bars = history + new_bars * r
+            # Candles as of this run: the last bar is still forming
+            now = (series[symbols[0]].timestamps[bars - 1] + STEP_MS) / 1000 - 1
+            candles = {s: CandleSeries(series[s].timestamps[:bars], series[s].values[:bars]) for s in symbols}
+            started = time.perf_counter()
+            recomputed = {s: recompute(candles[s]) for s in symbols}
+            recompute_s = time.perf_counter() - started
+
+            before = store.stats['computed_bars']
+            started = time.perf_counter()
+            for s in symbols:
+                store.extend(s, '15m', candles[s], now=now)
+            extend_s = time.perf_counter() - started
+            started = time.perf_counter()
+            X, y = store.load(symbols, '15m')
+            load_s = time.perf_counter() - started
+
+            # Labels the store trains on must match the old loop on the same bars (the filled first bars
+            # depend on the window and are not trained on)
+            agree = True
+            for s in symbols:
+                labels = np.asarray(store.open(s, '15m').labels)
+                resolved = labels >= 0
+                resolved[:FILLED_BARS] = False
+                agree &= bool((labels[resolved] == recomputed[s][1][:len(labels)][resolved]).all())
+            report['runs'].append({'bars': bars, 'recompute_s': round(recompute_s, 3), 'store_extend_s': round(extend_s, 3),
+                                   'store_load_ms': round(load_s * 1e3, 2), 'computed_bars': store.stats['computed_bars'] - before,
+                                   'training_rows': len(X), 'labels_agree': agree})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    later = report['runs'][1:] or report['runs']
+    report['speedup_after_first'] = round(sum(r['recompute_s'] for r in later) /
+                                          max(sum(r['store_extend_s'] + r['store_load_ms'] / 1e3 for r in later), 1e-9), 1)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Feature store vs. recomputing training data every run')
+    parser.add_argument('--symbols', type=int, default=5)
+    parser.add_argument('--history', type=int, default=1500)
+    parser.add_argument('--new-bars', type=int, default=96, help='bars closed between training runs')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.symbols, args.history, args.new_bars, args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['symbols']} symbols, {report['history']} bars + {report['new_bars']} per run")
+    for r in report['runs']:
+        print(f"{r['bars']:>6} bars: recompute {r['recompute_s']}s, store {r['store_extend_s']}s extend "
+              f"({r['computed_bars']} bars computed) + {r['store_load_ms']} ms load, {r['training_rows']} rows, "
+              f"labels agree: {r['labels_agree']}")
+    print(f"store {report['speedup_after_first']}x faster than recomputing after the first run")
+
+if __name__ == '__main__':
+    main()
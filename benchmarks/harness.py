@@ -0,0 +1,41 @@
+# Shared helpers for benchmarks that drive the scanner against the simulated exchange
+# Changes:
+# - sim_session() routes candle fetches through a SimulatedExchange; no_dispatch() stubs Telegram delivery
+
+from contextlib import contextmanager
+from data import collector
+from data.sim_exchange import SimulatedExchange
+
+# Fixed clock so benchmark candles are identical on every run
+FIXED_CLOCK = 1_700_000_000.0
+
+def fixed_exchange(symbol_count: int, **kwargs) -> SimulatedExchange:
+    # Zero-latency, unlimited simulated exchange with reproducible candles
+    options = {'latency_ms': 0, 'jitter_ms': 0, 'weight_limit': 0, 'clock': lambda: FIXED_CLOCK}
+    options.update(kwargs)
+    return SimulatedExchange(symbol_count=symbol_count, **options)
+
+@contextmanager
+def sim_session(exchange):
+    # Cold candle cache, all fetches through `exchange`
+    collector.candle_cache.clear()
+    collector.set_exchange(exchange)
+    try:
+        yield exchange
+    finally:
+        collector.set_exchange(None)
+
+@contextmanager
+def no_dispatch():
+    # Replace Telegram delivery and the signal log with no-ops so a signal costs no I/O
+    from telebot import sender
+
+    async def send_signal(*args, **kwargs):
+        return None
+
+    originals = sender.send_signal, sender.update_signal_log
+    sender.send_signal, sender.update_signal_log = send_signal, lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        sender.send_signal, sender.update_signal_log = originals
@@ -0,0 +1,77 @@
+# Import-time profile of main.py
+# Runs `python -X importtime -c "import main"` in a fresh interpreter and writes a
+# report of main's direct imports and the heaviest packages
+# Usage: python -m benchmarks.import_profile [--output benchmarks/reports/import_time.md]
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'reports', 'import_time.md')
+
+def run_importtime(module: str = 'main') -> list:
+    # Return (depth, self_us, cumulative_us, name) rows from -X importtime
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+def build_report(rows: list, module: str = 'main', top: int = 15) -> str:
+    # -X importtime prints children before their parent, so main's direct imports
+    # are the depth-1 rows between the previous top-level row and main's own row
+    index = next((i for i, r in enumerate(rows) if r[3] == module and r[0] == 0), len(rows) - 1)
+    total = rows[index][2] if rows else 0
+    start = index
+    while start > 0 and rows[start - 1][0] > 0:
+        start -= 1
+    subtree = rows[start:index + 1]
+    direct = sorted((r for r in subtree if r[0] == 1), key=lambda r: -r[2])
+    packages = defaultdict(int)
+    for _, self_us, _, name in subtree:
+        packages[name.split('.')[0]] += self_us
+    lines = [
+        f"# Import-time profile: `import {module}`",
+        "",
+        f"Python {sys.version.split()[0]}, total {total / 1000:.1f} ms",
+        "",
+        f"## Direct imports of `{module}` (cumulative)",
+        "",
+        "| module | cumulative ms |",
+        "|---|---:|"
+    ]
+    lines += [f"| {name} | {cum / 1000:.1f} |" for _, _, cum, name in direct[:top]]
+    lines += [
+        "",
+        "## Heaviest packages (self time, all submodules)",
+        "",
+        "| package | self ms |",
+        "|---|---:|"
+    ]
+    for name, self_us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        lines.append(f"| {name} | {self_us / 1000:.1f} |")
+    return "\n".join(lines) + "\n"
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time profile of main.py')
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+    report = build_report(run_importtime(args.module), args.module)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        f.write(report)
+    print(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Incremental swing-point levels vs. the original support/resistance and Fibonacci functions
+# Streams --symbols synthetic 15m histories through the predictor's 50-candle window: each step either
+# moves the forming bar or closes it and opens the next one. Every step is checked for exact equality
+# (support, resistance, both Fibonacci levels and the float32 cast) against calculate_fibonacci_levels +
+# calculate_support_resistance, then both are timed per update; also times update_many() cold starts
+# and reports the memory each tracked (symbol, timeframe) keeps
+# Usage: python -m benchmarks.levels [--symbols 200] [--steps 200] [--window 50] [--dtype float32] [--json]
+
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import symbol_names, synthetic_frame
+from data.candles import CandleSeries
+from core.indicators import calculate_fibonacci_levels, calculate_support_resistance
+from core.levels import LevelEngine
+from utils import logger as logger_module
+from utils.logger import logger
+
+LEVEL_KEYS = ('support', 'resistance', 'fib_0.382', 'fib_0.618')
+
+def _history(symbol: str, length: int, dtype):
+    # Prices on a 0.01% tick so equal highs/lows (pivot ties) occur as they do on real books; float32
+    # frames are what the compute path builds (CandleSeries.to_frame), float64 exercises the cast
+    df = synthetic_frame(symbol, '15m', length)
+    tick = float(df['close'].iloc[0]) * 1e-4
+    for col in ('open', 'high', 'low', 'close'):
+        df[col] = (df[col] / tick).round() * tick
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return CandleSeries.from_frame(df).to_frame(dtype)
+
+def _windows(df, window: int, steps: int, rng):
+    # Frames the predictor would see: the forming bar moves, or a new bar opens
+    end = window
+    for _ in range(steps):
+        frame = df.iloc[end - window:end].reset_index(drop=True)
+        if rng.random() < 0.5:
+            frame.loc[window - 1, 'high'] += float(rng.random()) * 0.001 * frame['close'].iloc[-1]
+            frame.loc[window - 1, 'low'] -= float(rng.random()) * 0.001 * frame['close'].iloc[-1]
+        yield frame
+        if rng.random() < 0.5 and end < len(df):
+            end += 1
+
+def reference(symbol: str, frame) -> tuple:
+    # generate_signal's previous level code
+    frame = calculate_fibonacci_levels(frame, '15m', copy=False)
+    sr = calculate_support_resistance(symbol, frame)
+    return sr['support'], sr['resistance'], frame['fib_0.382'].iloc[-1], frame['fib_0.618'].iloc[-1]
+
+def run(symbol_count: int, steps: int, window: int, dtype: str = 'float32') -> dict:
+    rng = np.random.default_rng(40)
+    symbols = symbol_names(symbol_count)
+    streams = {s: list(_windows(_history(s, window + steps, np.dtype(dtype)), window, steps, rng)) for s in symbols}
+    engine = LevelEngine(max_keys=symbol_count)
+    mismatches = checked = 0
+    ref_seconds = engine_seconds = 0.0
+    for symbol, frames in streams.items():
+        for frame in frames:
+            ref_frame, engine_frame = frame.copy(), frame.copy()
+            started = time.perf_counter()
+            expected = reference(symbol, ref_frame)
+            ref_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            levels = engine.update(symbol, '15m', engine_frame, cast=True)
+            engine_seconds += time.perf_counter() - started
+            checked += 1
+            same = tuple(levels[k] for k in LEVEL_KEYS) == expected
+            same = same and all(ref_frame[c].dtype == engine_frame[c].dtype for c in ('high', 'low', 'close'))
+            mismatches += not same
+
+    # Cold start: every symbol at once through update_many vs. one update() each
+    firsts = [(s, '15m', streams[s][0]) for s in symbols]
+    cold = LevelEngine(max_keys=symbol_count)
+    started = time.perf_counter()
+    for symbol, tf, frame in firsts:
+        cold.update(symbol, tf, frame)
+    single_seconds = time.perf_counter() - started
+    batch = LevelEngine(max_keys=symbol_count)
+    started = time.perf_counter()
+    batched = batch.update_many(firsts)
+    batch_seconds = time.perf_counter() - started
+    mismatches += sum(batched[(s, tf)] != cold.get(s, tf) for s, tf, _ in firsts)
+    del batch, batched
+    tracemalloc.start()
+    held = LevelEngine(max_keys=symbol_count)
+    held.update_many(firsts)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'symbols': symbol_count,
+        'dtype': dtype,
+        'updates': checked,
+        'window': window,
+        'mismatches': mismatches,
+        'reference_us_per_update': round(ref_seconds / checked * 1e6, 1),
+        'engine_us_per_update': round(engine_seconds / checked * 1e6, 1),
+        'speedup': round(ref_seconds / max(engine_seconds, 1e-9), 1),
+        'cold_update_us_per_symbol': round(single_seconds / symbol_count * 1e6, 1),
+        'cold_batch_us_per_symbol': round(batch_seconds / symbol_count * 1e6, 1),
+        'kb_per_key': round(retained / symbol_count / 1024, 1),
+        'engine_stats': engine.stats
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental swing-point levels vs. the original functions')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=200, help='updates per symbol')
+    parser.add_argument('--window', type=int, default=50, help='candles per frame (predictor uses 50)')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32',
+                        help='frame dtype; float64 also times the float32 cast')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.symbols, args.steps, args.window, args.dtype)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['updates']} updates over {report['symbols']} symbols ({report['window']}-candle {report['dtype']} frames), "
+          f"{report['mismatches']} mismatches vs. the original functions")
+    print(f"per update: original {report['reference_us_per_update']} us, engine {report['engine_us_per_update']} us "
+          f"({report['speedup']}x)")
+    print(f"cold start per symbol: update() {report['cold_update_us_per_symbol']} us, "
+          f"update_many() {report['cold_batch_us_per_symbol']} us; {report['kb_per_key']} KB per tracked key")
+
+if __name__ == '__main__':
+    main()
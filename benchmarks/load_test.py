@@ -0,0 +1,117 @@
+# Load test: scan cycles against the simulated exchange with realistic latency and rate limits
+# Drives the main.py scan path (fetch_usdt_pairs -> scheduler batches -> process_symbol) or
+# core/engine.process_symbol without the production sleeps, and reports throughput, per-symbol
+# tail latency and how often the simulated exchange answered 429
+# Usage: python -m benchmarks.load_test [--target main|engine] [--symbols 200] [--batch-size 5]
+#        [--latency-ms 50] [--jitter-ms 20] [--weight-limit 6000] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import warnings
+import numpy as np
+from benchmarks.harness import sim_session, no_dispatch
+from data.sim_exchange import SimulatedExchange
+from utils import logger as logger_module
+from utils.logger import logger
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    values = np.array(samples) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(values, q)), 1) for q in (50, 90, 95, 99)} | {'max_ms': round(float(values.max()), 1)}
+
+async def _timed(coro, latencies: list):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        latencies.append(time.perf_counter() - started)
+
+async def run_main(exchange: SimulatedExchange, batch_size: int) -> dict:
+    # One full main.py cycle: universe refresh, then every due symbol in batch_size batches
+    import main
+    main.last_signal_time.clear()
+    main.scheduler = main.SymbolScheduler(main.MIN_SCAN_INTERVAL, main.MAX_SCAN_INTERVAL)
+    latencies = []
+    signals = 0
+    symbols = await main.fetch_usdt_pairs(exchange)
+    main.scheduler.sync_universe(symbols)
+    while True:
+        batch = main.scheduler.pop_due(batch_size)
+        if not batch:
+            break
+        results = await asyncio.gather(*(_timed(main.process_symbol(exchange, s), latencies) for s in batch))
+        signals += sum(1 for r in results if r)
+    return {'universe': len(exchange.symbols), 'scanned': len(latencies), 'signals': signals, 'latencies': latencies}
+
+async def run_engine(exchange: SimulatedExchange, batch_size: int) -> dict:
+    # core/engine.py: every USDT pair in batch_size batches (the per-batch 60s pause is skipped)
+    from core import engine
+    engine.last_signal_time.clear()
+    latencies = []
+    signals = 0
+    symbols = await engine.fetch_usdt_pairs(exchange)
+    for i in range(0, len(symbols), batch_size):
+        batch = symbols[i:i + batch_size]
+        results = await asyncio.gather(*(_timed(engine.process_symbol(exchange, s), latencies) for s in batch))
+        signals += sum(1 for r in results if r)
+    return {'universe': len(exchange.symbols), 'scanned': len(latencies), 'signals': signals, 'latencies': latencies}
+
+async def load_test(target: str, symbols: int, batch_size: int, latency_ms: float, jitter_ms: float,
+                    weight_limit: int) -> dict:
+    exchange = SimulatedExchange(symbol_count=symbols, latency_ms=latency_ms, jitter_ms=jitter_ms, weight_limit=weight_limit)
+    runner = run_main if target == 'main' else run_engine
+    started = time.perf_counter()
+    with sim_session(exchange), no_dispatch():
+        result = await runner(exchange, batch_size)
+    elapsed = time.perf_counter() - started
+    latencies = result.pop('latencies')
+    return {
+        'target': target,
+        'batch_size': batch_size,
+        'latency_ms': latency_ms,
+        'jitter_ms': jitter_ms,
+        'weight_limit': weight_limit,
+        **result,
+        'elapsed_s': round(elapsed, 2),
+        'symbols_per_sec': round(result['scanned'] / elapsed, 2) if elapsed else 0.0,
+        'symbol_latency': _percentiles(latencies),
+        'exchange': dict(exchange.stats)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Scanner load test against the simulated exchange')
+    parser.add_argument('--target', choices=['main', 'engine'], default='main')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=None, help='defaults to the target module BATCH_SIZE')
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--weight-limit', type=int, default=6000)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    if args.batch_size is None:
+        if args.target == 'main':
+            import main as target_module
+        else:
+            from core import engine as target_module
+        args.batch_size = target_module.BATCH_SIZE
+
+    report = asyncio.run(load_test(args.target, args.symbols, args.batch_size, args.latency_ms, args.jitter_ms, args.weight_limit))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['target']}: {report['scanned']}/{report['universe']} symbols in {report['elapsed_s']}s "
+          f"({report['symbols_per_sec']} symbols/s, batch {report['batch_size']}), {report['signals']} signals")
+    print("symbol latency: " + ', '.join(f"{k} {v}" for k, v in report['symbol_latency'].items()))
+    print(f"exchange: {report['exchange']['requests']} requests, weight {report['exchange']['weight']}, "
+          f"{report['exchange']['rate_limited']} rate limited (429)")
+
+if __name__ == '__main__':
+    main()
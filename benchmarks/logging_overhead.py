@@ -0,0 +1,95 @@
+# Logging overhead benchmark: CPU spent on the scanning thread per cycle
+# Compares the previous setup (synchronous file + console handlers, per-step chatter)
+# with the queue/listener pipeline (summary lines, per-site sampling)
+# Usage: python -m benchmarks.logging_overhead [--symbols 50] [--cycles 2] [--json]
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from benchmarks.synthetic import synthetic_frame, symbol_names
+from core.indicators import calculate_indicators
+from model.predictor import SignalPredictor
+from utils import logger as logger_module
+from utils.logger import logger
+
+class _CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+def _handlers(directory: str) -> list:
+    formatter = logger_module.build_formatter()
+    file_handler = RotatingFileHandler(os.path.join(directory, 'bench.log'), maxBytes=2 * 1024 * 1024, backupCount=3)
+    console_handler = logging.StreamHandler(io.StringIO())
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+def _cycle(predictor: SignalPredictor, frames: dict):
+    # One scan cycle: indicators on 4 timeframes, prediction, summary line
+    for symbol, tf_frames in frames.items():
+        started = time.perf_counter()
+        computed = [calculate_indicators(df) for df in tf_frames]
+        signal = asyncio.run(predictor.predict_signal(symbol, computed[0], '15m'))
+        outcome = 'signal' if signal else 'no signal or low confidence'
+        logger.info("[%s] Scan: %s in %.0fms", symbol, outcome, (time.perf_counter() - started) * 1000,
+                    extra={'symbol': symbol, 'outcome': outcome, 'sample': False})
+
+def run_mode(mode: str, frames: dict, predictor: SignalPredictor, cycles: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        counter = _CountingHandler()
+        handlers = _handlers(directory) + [counter]
+        if mode == 'sync':
+            logger.setLevel(logging.DEBUG)
+            listener = logger_module.configure_logging(logger, handlers, use_queue=False)
+        else:
+            logger.setLevel(logging.INFO)
+            listener = logger_module.configure_logging(logger, handlers, use_queue=True, sampler=logger_module.SiteSampler())
+        cpu = []
+        wall = []
+        try:
+            for _ in range(cycles):
+                cpu_start, wall_start = time.thread_time(), time.perf_counter()
+                _cycle(predictor, frames)
+                cpu.append(time.thread_time() - cpu_start)
+                wall.append(time.perf_counter() - wall_start)
+        finally:
+            if listener is not None:
+                listener.stop()
+            for handler in handlers:
+                handler.close()
+    return {'mode': mode, 'cpu_s_per_cycle': min(cpu), 'wall_s_per_cycle': min(wall), 'records': counter.count // cycles}
+
+def main():
+    parser = argparse.ArgumentParser(description='Logging CPU overhead per scan cycle')
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--cycles', type=int, default=2)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    predictor = SignalPredictor()
+    frames = {s: [synthetic_frame(s, tf, 100) for tf in ('15m', '1h', '4h', '1d')] for s in symbol_names(args.symbols)}
+    results = [run_mode('sync', frames, predictor, args.cycles), run_mode('queue', frames, predictor, args.cycles)]
+    saved = results[0]['cpu_s_per_cycle'] - results[1]['cpu_s_per_cycle']
+    report = {'symbols': args.symbols, 'results': results, 'cpu_saved_s_per_cycle': round(saved, 4),
+              'cpu_saved_pct': round(100 * saved / results[0]['cpu_s_per_cycle'], 1)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for r in results:
+            print(f"{r['mode']:>5}: cpu {r['cpu_s_per_cycle'] * 1000:8.1f} ms/cycle, wall {r['wall_s_per_cycle'] * 1000:8.1f} ms/cycle, "
+                  f"{r['records']} records/cycle")
+        print(f"CPU saved on the scanning thread: {saved * 1000:.1f} ms/cycle ({report['cpu_saved_pct']}%)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Memory footprint of the candle cache and of a scan cycle
+# Fills the candle cache for --symbols pairs x 4 timeframes from the zero-latency simulated exchange
+# and reports the bytes it retains (tracemalloc) and the resident-set growth, then runs
+# main.process_symbol (inline compute) over --cycle-symbols pairs and reports the peak traced memory,
+# what the cycle leaves allocated and the time per symbol
+# Usage: python -m benchmarks.memory [--symbols 1000] [--cycle-symbols 50] [--json]
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import time
+import tracemalloc
+import warnings
+from benchmarks.harness import fixed_exchange, sim_session, no_dispatch
+from utils import logger as logger_module
+from utils.logger import logger
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+CANDLES = 100
+
+def rss_bytes() -> int:
+    # Current resident set size (Linux /proc; 0 elsewhere)
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def warm_paths(exchange, symbols: list):
+    # Generate the simulated exchange's price paths up front so they are not counted as cache memory
+    for symbol in symbols:
+        for tf in TIMEFRAMES:
+            exchange._path(symbol, tf)
+
+async def fill_cache(exchange, symbols: list):
+    from data.collector import fetch_realtime_data
+    for symbol in symbols:
+        for tf in TIMEFRAMES:
+            await fetch_realtime_data(symbol, tf, limit=CANDLES)
+
+def cache_footprint(symbol_count: int) -> dict:
+    from data import collector
+    exchange = fixed_exchange(symbol_count)
+    symbols = exchange.symbols
+    warm_paths(exchange, symbols)
+    with sim_session(exchange):
+        gc.collect()
+        rss_before = rss_bytes()
+        tracemalloc.start()
+        asyncio.run(fill_cache(exchange, symbols))
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = rss_bytes()
+        entries = len(collector.candle_cache)
+        collector.candle_cache.clear()
+    return {
+        'symbols': symbol_count,
+        'entries': entries,
+        'retained_mb': round(retained / 2 ** 20, 2),
+        'bytes_per_entry': int(retained / max(entries, 1)),
+        'rss_growth_mb': round((rss_after - rss_before) / 2 ** 20, 1)
+    }
+
+async def run_cycle(exchange, symbols: list):
+    import main
+    for i in range(0, len(symbols), main.BATCH_SIZE):
+        await asyncio.gather(*(main.process_symbol(exchange, s) for s in symbols[i:i + main.BATCH_SIZE]))
+
+def cycle_footprint(symbol_count: int) -> dict:
+    import main
+    main.get_compute().start()
+    exchange = fixed_exchange(symbol_count)
+    symbols = exchange.symbols
+    warm_paths(exchange, symbols)
+    # Warm-up pass so imports and one-off caches are not counted
+    with sim_session(exchange), no_dispatch():
+        main.last_signal_time.clear()
+        asyncio.run(run_cycle(exchange, symbols[:5]))
+    with sim_session(exchange), no_dispatch():
+        main.last_signal_time.clear()
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        asyncio.run(run_cycle(exchange, symbols))
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'symbols': symbol_count,
+        'peak_traced_mb': round(peak / 2 ** 20, 2),
+        'retained_mb': round(retained / 2 ** 20, 2),
+        'ms_per_symbol_traced': round(elapsed / max(symbol_count, 1) * 1000, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Candle cache and scan cycle memory footprint')
+    parser.add_argument('--symbols', type=int, default=1000, help='pairs cached for the footprint measurement')
+    parser.add_argument('--cycle-symbols', type=int, default=50, help='pairs scanned for the cycle measurement')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    # Inline compute so every allocation happens in this process
+    os.environ['COMPUTE_WORKERS'] = '0'
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = {'cache': cache_footprint(args.symbols), 'cycle': cycle_footprint(args.cycle_symbols)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    cache, cycle = report['cache'], report['cycle']
+    print(f"candle cache, {cache['symbols']} symbols x {len(TIMEFRAMES)} timeframes: {cache['retained_mb']} MB retained "
+          f"({cache['bytes_per_entry']} B/entry), RSS +{cache['rss_growth_mb']} MB")
+    print(f"scan cycle, {cycle['symbols']} symbols: peak {cycle['peak_traced_mb']} MB traced, "
+          f"{cycle['retained_mb']} MB retained, "
+          f"{cycle['ms_per_symbol_traced']} ms/symbol under tracemalloc")
+
+if __name__ == '__main__':
+    main()
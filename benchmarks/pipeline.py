@@ -0,0 +1,230 @@
+# Signal pipeline benchmark suite with a stored baseline and regression check
+# Times the hot paths (indicators, candle patterns, Fibonacci, support/resistance, predict_signal,
+# multi-timeframe agreement) on synthetic OHLCV of several lengths and symbol counts, plus an
+# end-to-end process_symbol cycle against a zero-latency simulated exchange with a fixed clock
+# Usage: python -m benchmarks.pipeline [--repeats 5] [--runs 5] [--json out.json] [--update] [--threshold 0.25] [--only name]
+# Each case's time is its fastest sample in one run of the suite, and the suite runs --runs times; the
+# gate (and --update) uses the median of those per-run times, so one noisy run neither fails the gate
+# nor ends up in the baseline. Exits 1 if a case is slower than the baseline's * (1 + threshold);
+# cases under SMALL_CASE_TIME per call (Fibonacci, support/resistance) use the wider small_threshold
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import warnings
+from benchmarks.harness import fixed_exchange, sim_session, no_dispatch
+from benchmarks.synthetic import synthetic_frame, symbol_names
+from utils import logger as logger_module
+from utils.logger import logger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'pipeline_baseline.json')
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_RUNS = 5
+# Cases faster than this per call swing more with host load than the default threshold allows
+SMALL_CASE_TIME = 0.05
+DEFAULT_SMALL_THRESHOLD = 0.5
+DEFAULT_LENGTHS = (50, 100, 500)
+DEFAULT_SYMBOLS = 10
+DEFAULT_CYCLE_SYMBOLS = (10, 25)
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+# Fast cases are looped until one sample takes at least this long
+MIN_SAMPLE_TIME = 0.05
+
+def _measure(fn, repeats: int) -> dict:
+    # Median/min seconds per call of fn(); cheap calls are batched into one sample. The garbage
+    # collector is off while timing (as in timeit), so a collection triggered by an earlier case's
+    # garbage does not land in this case's samples
+    fn()
+    gc.collect()
+    gc.disable()
+    try:
+        return _samples(fn, repeats)
+    finally:
+        gc.enable()
+
+def _samples(fn, repeats: int) -> dict:
+    loops = 1
+    elapsed = 0.0
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_SAMPLE_TIME or loops >= 1000:
+            break
+        loops *= 10
+    samples = [elapsed / loops]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - started) / loops)
+    return {'median_s': statistics.median(samples), 'min_s': min(samples), 'loops': loops, 'repeats': repeats}
+
+def function_cases(lengths, symbol_count: int) -> dict:
+    # name -> zero-argument callable timing one pass over symbol_count synthetic frames
+    from core.indicators import (calculate_indicators, detect_candle_patterns, calculate_fibonacci_levels,
+                                 calculate_support_resistance)
+    from model.predictor import SignalPredictor
+    predictor = SignalPredictor()
+    symbols = symbol_names(symbol_count)
+    cases = {}
+    for length in lengths:
+        raw = [(s, synthetic_frame(s, '15m', length)) for s in symbols]
+        computed = [(s, calculate_indicators(df)) for s, df in raw]
+        suffix = f"[len={length},symbols={symbol_count}]"
+        cases['calculate_indicators' + suffix] = lambda raw=raw: [calculate_indicators(df) for _, df in raw]
+        cases['detect_candle_patterns' + suffix] = lambda raw=raw: [detect_candle_patterns(df) for _, df in raw]
+        cases['calculate_fibonacci_levels' + suffix] = lambda raw=raw: [calculate_fibonacci_levels(df, '15m') for _, df in raw]
+        cases['calculate_support_resistance' + suffix] = lambda raw=raw: [calculate_support_resistance(s, df) for s, df in raw]
+
+        async def predict_all(computed=computed):
+            return [await predictor.predict_signal(s, df, '15m', last_signal_time={}) for s, df in computed]
+        cases['predict_signal' + suffix] = lambda predict_all=predict_all: asyncio.run(predict_all())
+    return cases
+
+def mtf_cases(symbol_count: int) -> dict:
+    # Cold-cache agreement check: every timeframe is fetched from the simulated exchange and recomputed
+    from core.multi_timeframe import check_multi_timeframe_agreement
+    exchange = fixed_exchange(symbol_count)
+
+    async def run():
+        with sim_session(exchange):
+            for symbol in exchange.symbols:
+                await check_multi_timeframe_agreement(symbol, 'LONG', TIMEFRAMES)
+    return {f"check_multi_timeframe_agreement[symbols={symbol_count}]": lambda: asyncio.run(run())}
+
+def cycle_cases(symbol_counts) -> dict:
+    # End-to-end: main.process_symbol for every symbol in BATCH_SIZE batches, like start_bot
+    import main
+    cases = {}
+    for count in symbol_counts:
+        exchange = fixed_exchange(count)
+
+        async def run(exchange=exchange):
+            main.last_signal_time.clear()
+            with sim_session(exchange), no_dispatch():
+                symbols = exchange.symbols
+                for i in range(0, len(symbols), main.BATCH_SIZE):
+                    batch = symbols[i:i + main.BATCH_SIZE]
+                    await asyncio.gather(*(main.process_symbol(exchange, s) for s in batch))
+        cases[f"cycle[symbols={count}]"] = lambda run=run: asyncio.run(run())
+    return cases
+
+def _combine(runs: list) -> dict:
+    # One result per case from several runs: medians of the per-run fastest and median samples
+    results = {}
+    for name in runs[0]:
+        samples = [run[name] for run in runs if name in run]
+        results[name] = {
+            'median_s': statistics.median(r['median_s'] for r in samples),
+            'min_s': statistics.median(r['min_s'] for r in samples),
+            'run_min_s': [r['min_s'] for r in samples],
+            'loops': samples[0]['loops'],
+            'repeats': samples[0]['repeats']
+        }
+    return results
+
+def run_suite(lengths, symbol_count: int, cycle_symbols, repeats: int, only: str = None, runs: int = 1) -> dict:
+    cases = {}
+    cases.update(function_cases(lengths, symbol_count))
+    cases.update(mtf_cases(symbol_count))
+    cases.update(cycle_cases(cycle_symbols))
+    measured = []
+    for run in range(runs):
+        results = {}
+        for name, fn in cases.items():
+            if only and only not in name:
+                continue
+            results[name] = _measure(fn, repeats)
+            print(f"[run {run + 1}/{runs}] {name:<60} {results[name]['min_s'] * 1000:10.2f} ms", file=sys.stderr)
+        measured.append(results)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'runs': runs
+        },
+        'results': _combine(measured)
+    }
+
+def compare(report: dict, baseline: dict, threshold: float, small_threshold: float) -> list:
+    # Cases whose median-of-runs time regressed beyond their threshold; cases missing from either side
+    # are skipped
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = result['min_s'] / base['min_s'] if base['min_s'] else 1.0
+        limit = small_threshold if base['min_s'] < SMALL_CASE_TIME else threshold
+        result['baseline_median_s'] = base['median_s']
+        result['baseline_min_s'] = base['min_s']
+        result['ratio'] = round(ratio, 3)
+        result['threshold'] = limit
+        if ratio > 1 + limit:
+            regressions.append(name)
+    return regressions
+
+def _quiet_logging():
+    # Route the bot logger to a null handler so console/file I/O does not skew timings
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Signal pipeline benchmarks with baseline comparison')
+    parser.add_argument('--lengths', default=','.join(map(str, DEFAULT_LENGTHS)), help='candle counts, comma separated')
+    parser.add_argument('--symbols', type=int, default=DEFAULT_SYMBOLS, help='symbols per function case')
+    parser.add_argument('--cycle-symbols', default=','.join(map(str, DEFAULT_CYCLE_SYMBOLS)), help='symbol counts for end-to-end cycles')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='runs of the whole suite; each case uses the median')
+    parser.add_argument('--only', default=None, help='run only cases whose name contains this string')
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--threshold', type=float, default=None)
+    parser.add_argument('--small-threshold', type=float, default=None, help=f'threshold for cases under {SMALL_CASE_TIME * 1000:.0f} ms')
+    parser.add_argument('--update', action='store_true', help='store these results as the new baseline')
+    args = parser.parse_args()
+
+    _quiet_logging()
+    lengths = [int(x) for x in args.lengths.split(',') if x]
+    cycle_symbols = [int(x) for x in args.cycle_symbols.split(',') if x]
+    report = run_suite(lengths, args.symbols, cycle_symbols, max(args.repeats, 1), args.only, max(args.runs, 1))
+
+    if args.update:
+        report['threshold'] = args.threshold if args.threshold is not None else DEFAULT_THRESHOLD
+        report['small_threshold'] = args.small_threshold if args.small_threshold is not None else DEFAULT_SMALL_THRESHOLD
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(json.dumps(report, indent=2))
+        return 0
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        threshold = args.threshold if args.threshold is not None else baseline.get('threshold', DEFAULT_THRESHOLD)
+        small_threshold = (args.small_threshold if args.small_threshold is not None
+                           else baseline.get('small_threshold', DEFAULT_SMALL_THRESHOLD))
+        regressions = compare(report, baseline, threshold, small_threshold)
+        report.update(threshold=threshold, small_threshold=small_threshold, regressions=regressions, passed=not regressions)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    print(json.dumps(report, indent=2))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# Offline profiling of a recorded cycle: replays an exchange tape through main.process_symbol
+# Record a tape from the live bot with EXCHANGE_RECORD_PATH=state/exchange.tape, or from the
+# simulated exchange with --record. Every replay pass starts from a cold candle cache and
+# reports a digest of the produced signals; identical digests mean the replay was deterministic.
+# Usage: python -m benchmarks.replay TAPE [--passes 3] [--pacing fast|original] [--profile out.prof]
+#        python -m benchmarks.replay TAPE --record [--symbols 50]
+
+import argparse
+import asyncio
+import cProfile
+import hashlib
+import json
+import logging
+import statistics
+import time
+import warnings
+from benchmarks.harness import sim_session, no_dispatch
+from data.recorder import ExchangeTape, RecordingExchange, ReplayExchange
+from data.sim_exchange import SimulatedExchange
+from utils import logger as logger_module
+from utils.logger import logger
+
+async def scan(exchange, symbols: list) -> list:
+    # One main.py-style pass over symbols in BATCH_SIZE batches
+    import main
+    main.last_signal_time.clear()
+    results = []
+    with sim_session(exchange), no_dispatch():
+        for i in range(0, len(symbols), main.BATCH_SIZE):
+            batch = symbols[i:i + main.BATCH_SIZE]
+            results.extend(await asyncio.gather(*(main.process_symbol(exchange, s) for s in batch)))
+    return list(zip(symbols, results))
+
+def digest(results: list) -> str:
+    # Hash of every symbol's outcome; the signal creation time is the only wall-clock field and is left out
+    stable = [(symbol, {k: v for k, v in (signal or {}).items() if k != 'timestamp'}) for symbol, signal in results]
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, default=repr).encode()).hexdigest()[:16]
+
+async def record(path: str, symbol_count: int) -> dict:
+    # Record one full cycle (markets, tickers, candles) from the simulated exchange
+    import main
+    tape = ExchangeTape(path, source='sim')
+    exchange = RecordingExchange(SimulatedExchange(symbol_count=symbol_count, weight_limit=0), tape)
+    symbols = await main.fetch_usdt_pairs(exchange)
+    await scan(exchange, symbols)
+    await exchange.close()
+    return {'tape': path, 'symbols': len(symbols), 'calls': len(tape.events)}
+
+def replay(path: str, passes: int, pacing: str, profile: str = None) -> dict:
+    exchange = ReplayExchange(path, pacing)
+    symbols = exchange.symbols()
+    timings, digests = [], []
+    profiler = cProfile.Profile() if profile else None
+    for _ in range(passes):
+        exchange.reset()
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        results = asyncio.run(scan(exchange, symbols))
+        if profiler:
+            profiler.disable()
+        timings.append(time.perf_counter() - started)
+        digests.append(digest(results))
+    if profiler:
+        profiler.dump_stats(profile)
+    return {
+        'tape': path,
+        'source': exchange.source,
+        'pacing': pacing,
+        'symbols': len(symbols),
+        'calls_per_pass': exchange.stats['calls'],
+        'missing_calls': exchange.stats['missing'],
+        'signals': sum(1 for d in results if d[1]),
+        'cycle_s': {'median': round(statistics.median(timings), 3), 'min': round(min(timings), 3)},
+        'digests': digests,
+        'deterministic': len(set(digests)) == 1,
+        'profile': profile
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded exchange tape through process_symbol')
+    parser.add_argument('tape')
+    parser.add_argument('--record', action='store_true', help='record a tape from the simulated exchange first')
+    parser.add_argument('--symbols', type=int, default=50, help='simulated universe size for --record')
+    parser.add_argument('--passes', type=int, default=3)
+    parser.add_argument('--pacing', choices=['fast', 'original'], default='fast')
+    parser.add_argument('--profile', default=None, help='write cProfile stats of all passes to this file')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    if args.record:
+        print(json.dumps(asyncio.run(record(args.tape, args.symbols)), indent=2))
+        return
+    print(json.dumps(replay(args.tape, max(args.passes, 1), args.pacing, args.profile), indent=2))
+
+if __name__ == '__main__':
+    main()
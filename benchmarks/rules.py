@@ -0,0 +1,155 @@
+# Compiled rule table vs. the string-based condition scoring predict_signal used to do
+# Draws --symbols random latest-candle rows (indicators, swing levels, candle pattern flags; some NaN
+# bands and volume averages) and scores them three ways: the original string path (conditions list,
+# `in` checks, bullish/bearish membership counts, the leverage points and the TP probability parse), the
+# compiled model.rules engine one symbol at a time (from its indicator frame, as predict_signal does), and
+# the engine on the batch's latest rows at once. Reports
+# microseconds per symbol and rows where conditions, confidence, direction votes, leverage or TP
+# probabilities (or determine_leverage on the joined names) differ from the string path (must be 0)
+# Usage: python -m benchmarks.rules [--symbols 2000] [--repeat 5] [--json]
+
+import argparse
+import json
+import logging
+import time
+import numpy as np
+import pandas as pd
+from core.indicators import PATTERN_NAMES, calculate_tp_probabilities_and_prices, tp_probabilities
+from model.rules import determine_leverage, signal_rules
+from utils import logger as logger_module
+from utils.logger import logger
+
+def random_rows(count: int, rng) -> tuple:
+    # (latest rows, levels, pattern flags) spread over every condition's threshold
+    latest, levels, flags = [], [], []
+    for _ in range(count):
+        close = float(rng.uniform(1, 100))
+        band = close * float(rng.uniform(0.005, 0.05))
+        upper, lower = close + float(rng.normal(0, band)), close - float(rng.normal(0, band))
+        row = {'rsi': float(rng.uniform(10, 90)), 'macd': float(rng.normal(0, 1)), 'macd_signal': float(rng.normal(0, 1)),
+               'adx': float(rng.uniform(5, 45)), 'close': close, 'bollinger_upper': upper if rng.random() > 0.05 else np.nan,
+               'bollinger_lower': lower, 'volume': float(rng.uniform(0, 2000))}
+        if rng.random() > 0.05:
+            row['volume_sma_20'] = float(rng.uniform(500, 1500))
+        # A two-candle indicator frame; predict_signal works on the last row
+        latest.append(pd.DataFrame([row, row], dtype=np.float64))
+        levels.append({'support': close * float(rng.uniform(0.9, 1.0)), 'resistance': close * float(rng.uniform(1.0, 1.1))})
+        flags.append([bool(f) for f in rng.random(len(PATTERN_NAMES)) < 0.15])
+    return latest, levels, flags
+
+def string_scores(df, sr_levels, pattern_flags) -> tuple:
+    # predict_signal's original condition list and scoring, verbatim
+    latest = df.iloc[-1]
+    conditions = []
+    if latest['rsi'] < 30:
+        conditions.append("Oversold RSI")
+    elif latest['rsi'] > 70:
+        conditions.append("Overbought RSI")
+    if latest['macd'] > latest['macd_signal'] and latest['macd'] > 0:
+        conditions.append("Bullish MACD")
+    elif latest['macd'] < latest['macd_signal'] and latest['macd'] < 0:
+        conditions.append("Bearish MACD")
+    if latest['adx'] > 25:
+        conditions.append("Strong Trend")
+    if latest['close'] > latest['bollinger_upper']:
+        conditions.append("Above Bollinger Upper")
+    elif latest['close'] < latest['bollinger_lower']:
+        conditions.append("Below Bollinger Lower")
+    conditions.extend(name for name, flag in zip(PATTERN_NAMES, pattern_flags) if flag)
+    current_price = latest['close']
+    if abs(current_price - sr_levels['support']) / current_price < 0.05:
+        conditions.append("Near Support")
+    if abs(current_price - sr_levels['resistance']) / current_price < 0.05:
+        conditions.append("Near Resistance")
+    if 'volume_sma_20' in latest and latest['volume'] > latest['volume_sma_20'] * 1.2:
+        conditions.append("High Volume")
+
+    confidence = 50.0
+    if "Bullish MACD" in conditions or "Bearish MACD" in conditions:
+        confidence += 15.0
+    if any(p in conditions for p in ['bullish_engulfing', 'bearish_engulfing', 'hammer', 'shooting_star']):
+        confidence += 12.0
+    if "Strong Trend" in conditions:
+        confidence += 12.0
+    if "Near Support" in conditions or "Near Resistance" in conditions:
+        confidence += 8.0
+    if "High Volume" in conditions:
+        confidence += 8.0
+    confidence = min(confidence, 95.0)
+    bullish_conditions = ['bullish_engulfing', 'Oversold RSI', 'Bullish MACD', 'hammer', 'three_white_soldiers']
+    bearish_conditions = ['bearish_engulfing', 'Overbought RSI', 'Bearish MACD', 'shooting_star', 'three_black_crows']
+    bullish_count = sum(1 for c in conditions if c in bullish_conditions)
+    bearish_count = sum(1 for c in conditions if c in bearish_conditions)
+    leverage_score = 0
+    if 'MACD' in conditions:
+        leverage_score += 2
+    if 'Strong Trend' in conditions:
+        leverage_score += 2
+    if 'VWAP' in conditions:
+        leverage_score += 1
+    if 'Stochastic' in conditions:
+        leverage_score -= 1
+    leverage = '40x' if leverage_score >= 5 else '30x' if leverage_score >= 3 else '20x' if leverage_score >= 1 else '10x'
+    probabilities, _ = calculate_tp_probabilities_and_prices(conditions, current_price, 0.0)
+    return conditions, confidence, bullish_count, bearish_count, leverage, probabilities
+
+def _time(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def run(symbols: int, repeat: int) -> dict:
+    latest, levels, flags = random_rows(symbols, np.random.default_rng(47))
+    rows = list(zip(latest, levels, flags))
+
+    def per_symbol():
+        # What predict_signal does per symbol
+        return [signal_rules.evaluate(signal_rules.latest_inputs(df.iloc[-1], level, flag)) for df, level, flag in rows]
+
+    last_rows = [{key: float(value) for key, value in df.iloc[-1].items()} for df in latest]
+
+    def batch():
+        # Latest rows of a whole batch scored in one pass
+        return signal_rules.evaluate(signal_rules.inputs(last_rows, levels, flags))
+
+    string_s = _time(lambda: [string_scores(*row) for row in rows], repeat)
+    single_s = _time(per_symbol, repeat)
+    batch_s = _time(batch, repeat)
+
+    scores = batch()
+    mismatches = 0
+    for i, row in enumerate(rows):
+        conditions, confidence, bullish, bearish, leverage, probabilities = string_scores(*row)
+        compiled = (scores.conditions(i), float(scores.values['confidence'][i]), int(scores.values['bullish'][i]),
+                    int(scores.values['bearish'][i]), scores.leverage(i), tp_probabilities(scores.values['tp_probability'][i]))
+        mismatches += compiled != (conditions, confidence, bullish, bearish, leverage, probabilities)
+        mismatches += determine_leverage(', '.join(conditions)) != leverage
+    return {
+        'symbols': symbols,
+        'us_per_symbol': {'strings': round(string_s / symbols * 1e6, 2), 'compiled': round(single_s / symbols * 1e6, 2),
+                          'compiled_batch': round(batch_s / symbols * 1e6, 2)},
+        'emitted_conditions': int(scores.mask.sum()),
+        'mismatches': mismatches
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiled rule table vs. string condition scoring')
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.symbols, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    times = report['us_per_symbol']
+    print(f"{report['symbols']} symbols ({report['emitted_conditions']} conditions hold): strings {times['strings']} us/symbol, "
+          f"compiled {times['compiled']} us/symbol one at a time, {times['compiled_batch']} us/symbol batched")
+    print(f"{report['mismatches']} symbols scored differently")
+
+if __name__ == '__main__':
+    main()
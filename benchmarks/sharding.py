@@ -0,0 +1,129 @@
+# Symbol sharding: balance, ownership movement on resize and claim dedupe during a rebalance
+# Simulates N replicas sharing one store (memory:// or a temporary SQLite file), checks that every
+# symbol has exactly one owner once the ring settles, measures the share of symbols that change
+# owner when a replica joins or leaves (consistent hashing: ~1/N) and counts duplicate scans and
+# signals while replicas still disagree about the ring (a joining replica owns nothing until one
+# heartbeat period has passed, simulated here with a shared clock)
+# Usage: python -m benchmarks.sharding [--symbols 2000] [--replicas 3] [--store memory|sqlite] [--json]
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+from core.sharding import ShardCoordinator, open_store
+from utils import logger as logger_module
+from utils.logger import logger
+
+def _owners(replicas: list, symbols: list) -> dict:
+    owners = {}
+    for replica in replicas:
+        for symbol in replica.assign(symbols):
+            owners.setdefault(symbol, []).append(replica.member)
+    return owners
+
+class Clock:
+    # Heartbeat time shared by the simulated replicas, advanced one heartbeat period per round
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def _settle(replicas: list, clock: Clock):
+    for _ in range(2):
+        for replica in replicas:
+            replica.heartbeat()
+        clock.now += replicas[0].heartbeat_interval
+
+def _coverage(replicas: list, symbols: list) -> dict:
+    owners = _owners(replicas, symbols)
+    counts = [len(replica.assign(symbols)) for replica in replicas]
+    return {
+        'unowned': sum(1 for s in symbols if s not in owners),
+        'multiple_owners': sum(1 for v in owners.values() if len(v) > 1),
+        'min_share': min(counts),
+        'max_share': max(counts)
+    }
+
+def _moved(before: dict, after: dict) -> float:
+    return sum(1 for s in before if before[s] != after.get(s)) / max(len(before), 1)
+
+def run(symbol_count: int, replica_count: int, store_url: str) -> dict:
+    symbols = [f"SIM{i:04d}/USDT" for i in range(symbol_count)]
+    store = open_store(store_url)
+    # Replicas share one store connection here; separate processes would each open their own
+    clock = Clock()
+    replicas = [ShardCoordinator(i, replica_count, store, clock=clock) for i in range(replica_count)]
+    _settle(replicas, clock)
+    steady = _coverage(replicas, symbols)
+    before = {s: owners[0] for s, owners in _owners(replicas, symbols).items()}
+
+    # Scale up: the new replica owns nothing on its first heartbeat; one period later it takes its share
+    # at once, the others only on their next heartbeat
+    joined = ShardCoordinator(replica_count, replica_count + 1, store, clock=clock)
+    joined.heartbeat()
+    owned_on_join = len(joined.assign(symbols))
+    clock.now += joined.heartbeat_interval
+    joined.heartbeat()
+    transition = replicas + [joined]
+    double_owned = _coverage(transition, symbols)['multiple_owners']
+    scans = sum(1 for r in transition for s in r.assign(symbols) if r.claim_scan(s, 60))
+    signals = sum(1 for r in transition for s in r.assign(symbols) if r.claim_signal(s, 3600))
+    _settle(transition, clock)
+    after_join = {s: owners[0] for s, owners in _owners(transition, symbols).items()}
+    scaled_up = _coverage(transition, symbols)
+
+    # Scale down: the joined replica leaves cleanly
+    joined.leave()
+    _settle(replicas, clock)
+    after_leave = {s: owners[0] for s, owners in _owners(replicas, symbols).items()}
+    store.close()
+    return {
+        'symbols': symbol_count,
+        'replicas': replica_count,
+        'store': store_url.split('://')[0],
+        'steady': steady,
+        'join': {
+            'moved_fraction': round(_moved(before, after_join), 3),
+            'ideal_fraction': round(1 / (replica_count + 1), 3),
+            'owned_on_first_heartbeat': owned_on_join,
+            'double_owned_during_transition': double_owned,
+            'scans_admitted': scans,
+            'signals_admitted': signals,
+            'settled': scaled_up
+        },
+        'leave': {
+            'moved_fraction': round(_moved(after_join, after_leave), 3),
+            'restored_original_owners': after_leave == before,
+            'settled': _coverage(replicas, symbols)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Consistent-hash sharding balance and rebalance cost')
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--store', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'shards.db')}" if args.store == 'sqlite' else 'memory://'
+        report = run(args.symbols, max(args.replicas, 1), url)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    join, leave = report['join'], report['leave']
+    print(f"{report['symbols']} symbols, {report['replicas']} replicas, {report['store']} store")
+    print(f"steady: share {report['steady']['min_share']}-{report['steady']['max_share']}, "
+          f"unowned {report['steady']['unowned']}, multiple owners {report['steady']['multiple_owners']}")
+    print(f"join:   {join['owned_on_first_heartbeat']} symbols owned on the first heartbeat, moved {join['moved_fraction']:.1%} (ideal {join['ideal_fraction']:.1%}), "
+          f"{join['double_owned_during_transition']} double-owned mid-rebalance -> "
+          f"{join['scans_admitted']} scans / {join['signals_admitted']} signals admitted")
+    print(f"leave:  moved {leave['moved_fraction']:.1%}, original owners restored: {leave['restored_original_owners']}")
+
+if __name__ == '__main__':
+    main()
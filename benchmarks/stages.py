@@ -0,0 +1,159 @@
+# Staged scan pipeline vs. gather-per-batch: cycle time and how busy the network and compute stay
+# Scans --symbols pairs of the simulated exchange (--latency-ms per request) with --workers compute
+# processes, once the way the scan loops used to (main.process_symbol gathered in --batch batches, no
+# sleeps between batches) and once streamed through core.pipeline with main.py's stage configuration
+# (the signal rate limit is lifted so both send the same signals). Reports cycle time, symbols/sec, the
+# share of the cycle with at least one exchange request in flight and with at least one batch in the
+# features, predict or agreement step, and the signals found (must be identical)
+# Usage: python -m benchmarks.stages [--symbols 100] [--batch 5] [--latency-ms 50] [--workers 2] [--json]
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import warnings
+from benchmarks.harness import fixed_exchange, sim_session, no_dispatch
+from utils import logger as logger_module
+from utils.logger import logger
+
+class BusyClock:
+    # Wall time during which at least one tracked call is running
+    def __init__(self):
+        self.active = 0
+        self.since = 0.0
+        self.busy = 0.0
+
+    async def track(self, awaitable):
+        if self.active == 0:
+            self.since = time.perf_counter()
+        self.active += 1
+        try:
+            return await awaitable
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self.busy += time.perf_counter() - self.since
+
+class TrackedExchange:
+    def __init__(self, inner, clock: BusyClock):
+        self._inner = inner
+        self._clock = clock
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name not in ('fetch_ticker', 'fetch_ohlcv'):
+            return attr
+
+        async def tracked(*args, **kwargs):
+            return await self._clock.track(attr(*args, **kwargs))
+        return tracked
+
+class TrackedCompute:
+    def __init__(self, inner, clock: BusyClock):
+        self._inner = inner
+        self._clock = clock
+        self.workers = inner.workers
+
+    async def features(self, *args, **kwargs):
+        return await self._clock.track(self._inner.features(*args, **kwargs))
+
+    async def predict(self, *args, **kwargs):
+        return await self._clock.track(self._inner.predict(*args, **kwargs))
+
+    async def agreement(self, *args, **kwargs):
+        return await self._clock.track(self._inner.agreement(*args, **kwargs))
+
+async def _gathered(exchange, symbols: list, batch: int) -> set:
+    import main
+    signals = set()
+    for i in range(0, len(symbols), batch):
+        results = await asyncio.gather(*(main.process_symbol(exchange, s) for s in symbols[i:i + batch]))
+        signals.update(r['symbol'] for r in results if r)
+    return signals
+
+async def _staged(exchange, symbols: list, batch: int) -> set:
+    import main
+    from core.pipeline import ScanPipeline
+    signals = set()
+    pending = list(symbols)
+
+    async def source(limit: int):
+        if not pending:
+            return None
+        taken = pending[:limit]
+        del pending[:limit]
+        return taken
+
+    config = main.scan_config(on_done=lambda job: job.outcome == 'signal' and signals.add(job.symbol))
+    config.max_signals_per_minute = 0
+    config.workers['fetch'] = batch
+    await ScanPipeline(exchange, config).run(source)
+    return signals
+
+async def _cycle(mode: str, symbol_count: int, batch: int, latency_ms: float, compute) -> dict:
+    import main
+    main.last_signal_time.clear()
+    network, busy_compute = BusyClock(), BusyClock()
+    inner = fixed_exchange(symbol_count, latency_ms=latency_ms)
+    exchange = TrackedExchange(inner, network)
+    main._compute = TrackedCompute(compute, busy_compute)
+    started = time.perf_counter()
+    with sim_session(exchange), no_dispatch():
+        runner = _staged if mode == 'staged' else _gathered
+        signals = await runner(exchange, inner.symbols, batch)
+    elapsed = time.perf_counter() - started
+    return {
+        'cycle_s': round(elapsed, 2),
+        'symbols_per_sec': round(symbol_count / elapsed, 2),
+        'network_busy': round(network.busy / elapsed, 3),
+        'compute_busy': round(busy_compute.busy / elapsed, 3),
+        'requests': inner.stats['requests'],
+        'signals': sorted(signals)
+    }
+
+def run(symbol_count: int, batch: int, latency_ms: float, workers: int) -> dict:
+    import main
+    from core.compute import ComputeExecutor
+    compute = ComputeExecutor(workers)
+    compute.start()
+    try:
+        modes = {mode: asyncio.run(_cycle(mode, symbol_count, batch, latency_ms, compute)) for mode in ('gathered', 'staged')}
+    finally:
+        compute.shutdown()
+        main._compute = None
+    return {
+        'symbols': symbol_count,
+        'batch': batch,
+        'latency_ms': latency_ms,
+        'workers': workers,
+        'modes': modes,
+        'speedup': round(modes['gathered']['cycle_s'] / max(modes['staged']['cycle_s'], 1e-9), 2),
+        'signals_match': modes['gathered']['signals'] == modes['staged']['signals']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Staged scan pipeline vs. gather-per-batch')
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--batch', type=int, default=5, help='batch size / fetch workers')
+    parser.add_argument('--latency-ms', type=float, default=50, help='simulated exchange latency per request')
+    parser.add_argument('--workers', type=int, default=2, help='compute worker processes (0 = inline)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=UserWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    report = run(args.symbols, args.batch, args.latency_ms, args.workers)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['symbols']} symbols, batch / fetch workers {report['batch']}, {report['latency_ms']:g} ms latency, "
+          f"{report['workers']} compute workers")
+    for label, r in report['modes'].items():
+        print(f"{label:>8}: {r['cycle_s']}s ({r['symbols_per_sec']} symbols/s), network busy {r['network_busy']:.0%}, "
+              f"compute busy {r['compute_busy']:.0%}, {r['requests']} requests, {len(r['signals'])} signals")
+    print(f"staged pipeline {report['speedup']}x faster; signals identical: {report['signals_match']}")
+
+if __name__ == '__main__':
+    main()
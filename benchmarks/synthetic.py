@@ -0,0 +1,35 @@
+# Synthetic OHLCV generation shared by the benchmarks
+# Changes:
+# - Deterministic geometric random-walk candles per (symbol, timeframe) seed
+
+import zlib
+import numpy as np
+import pandas as pd
+
+TIMEFRAME_MS = {'1m': 60_000, '5m': 300_000, '15m': 900_000, '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+def _seed(*parts) -> int:
+    return zlib.crc32('|'.join(str(p) for p in parts).encode())
+
+def synthetic_ohlcv(symbol: str, timeframe: str = '15m', length: int = 100, end_ms: int = 1_700_000_000_000,
+                    volatility: float = 0.01) -> list:
+    # List of [timestamp, open, high, low, close, volume] rows, like ccxt fetch_ohlcv
+    rng = np.random.default_rng(_seed(symbol, timeframe, length))
+    step = TIMEFRAME_MS.get(timeframe, 900_000)
+    start_price = 1 + (_seed(symbol) % 50_000) / 10
+    closes = start_price * np.exp(np.cumsum(rng.normal(0, volatility, length)))
+    opens = np.concatenate([[start_price], closes[:-1]])
+    wick = np.abs(rng.normal(0, volatility / 2, (2, length)))
+    highs = np.maximum(opens, closes) * (1 + wick[0])
+    lows = np.minimum(opens, closes) * (1 - wick[1])
+    volumes = rng.lognormal(8, 0.6, length)
+    timestamps = end_ms - step * np.arange(length - 1, -1, -1)
+    rows = np.column_stack([timestamps, opens, highs, lows, closes, volumes])
+    return [[int(r[0]), *map(float, r[1:])] for r in rows]
+
+def synthetic_frame(symbol: str, timeframe: str = '15m', length: int = 100) -> pd.DataFrame:
+    return pd.DataFrame(synthetic_ohlcv(symbol, timeframe, length), columns=COLUMNS)
+
+def symbol_names(count: int) -> list:
+    return [f"SYN{i:04d}/USDT" for i in range(count)]
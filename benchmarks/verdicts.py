@@ -0,0 +1,119 @@
+# Higher-timeframe verdict cache: hit rate, time saved and agreement drift vs. recomputing every cycle
+# Runs --symbols pairs of the simulated exchange through 5-minute scan cycles (simulated clock) for
+# --hours, computing multi-timeframe agreement uncached and with a verdict cache per live-bar tolerance.
+# The forming candle's close is jittered each cycle (--live-noise, scaled by how far into the candle we
+# are) so tolerances have something to ignore. Reports hit rate per cached timeframe, agreement time per
+# cycle and how often the agreement count / pass-fail verdict differs from the uncached one
+# Usage: python -m benchmarks.verdicts [--symbols 10] [--hours 8] [--tolerances 0,0.002,none] [--json]
+
+import argparse
+import json
+import logging
+import time
+import warnings
+import numpy as np
+from benchmarks.harness import FIXED_CLOCK, fixed_exchange
+from core.multi_timeframe import AGREEMENT_THRESHOLD, MTF_CACHED_TIMEFRAMES, TIMEFRAME_MS, VerdictCache, count_agreement
+from data.candles import CandleSeries, CLOSE, HIGH, LOW
+from utils import logger as logger_module
+from utils.logger import logger
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+CANDLES = 100
+
+class CountingCache(VerdictCache):
+    # Verdict cache that also counts hits/misses per timeframe
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.by_timeframe = {}
+
+    def get(self, symbol, timeframe, open_ms, close):
+        hits = self.stats['hits']
+        verdict = super().get(symbol, timeframe, open_ms, close)
+        counts = self.by_timeframe.setdefault(timeframe, {'hits': 0, 'misses': 0})
+        counts['hits' if self.stats['hits'] > hits else 'misses'] += 1
+        return verdict
+
+def _frames(exchange, symbol: str, now: float, noise: float, rng) -> list:
+    # Candles as the collector would hold them, with the forming candle's close moved by the jitter
+    frames = []
+    for tf in TIMEFRAMES:
+        candles = CandleSeries.from_ohlcv(exchange._candles(symbol, tf, CANDLES))
+        step = TIMEFRAME_MS[tf]
+        elapsed = (now * 1000 - candles.timestamps[-1]) / step
+        live = candles.values[-1]
+        live[CLOSE] *= np.float32(1 + noise * np.sqrt(max(elapsed, 0.0)) * rng.standard_normal())
+        live[HIGH], live[LOW] = max(live[HIGH], live[CLOSE]), min(live[LOW], live[CLOSE])
+        frames.append(candles)
+    return frames
+
+def run(symbol_count: int, hours: float, interval: float, tolerances: list, noise: float) -> dict:
+    now = [FIXED_CLOCK]
+    exchange = fixed_exchange(symbol_count, clock=lambda: now[0])
+    symbols = exchange.symbols
+    rng = np.random.default_rng(41)
+    caches = {label: CountingCache(tolerance, clock=lambda: now[0]) for label, tolerance in tolerances}
+    seconds = {label: 0.0 for label in ['uncached'] + list(caches)}
+    drift = {label: {'count': 0, 'verdict': 0} for label in caches}
+    cycles = int(hours * 3600 // interval)
+    for _ in range(cycles):
+        for symbol in symbols:
+            frames = _frames(exchange, symbol, now[0], noise, rng)
+            started = time.perf_counter()
+            expected = count_agreement(frames, 'LONG')
+            seconds['uncached'] += time.perf_counter() - started
+            for label, cache in caches.items():
+                started = time.perf_counter()
+                got = count_agreement(frames, 'LONG', symbol, TIMEFRAMES, cache)
+                seconds[label] += time.perf_counter() - started
+                drift[label]['count'] += got != expected
+                drift[label]['verdict'] += (got >= AGREEMENT_THRESHOLD) != (expected >= AGREEMENT_THRESHOLD)
+        now[0] += interval
+    evaluations = cycles * len(symbols)
+    results = {}
+    for label, cache in caches.items():
+        lookups = cache.stats['hits'] + cache.stats['misses']
+        results[label] = {
+            'hit_rate': round(cache.stats['hits'] / max(lookups, 1), 4),
+            'hit_rate_by_timeframe': {tf: round(c['hits'] / max(c['hits'] + c['misses'], 1), 4)
+                                      for tf, c in sorted(cache.by_timeframe.items(), key=lambda kv: TIMEFRAME_MS[kv[0]])},
+            'ms_per_cycle': round(seconds[label] / cycles * 1000, 1),
+            'count_drift': round(drift[label]['count'] / evaluations, 4),
+            'verdict_drift': round(drift[label]['verdict'] / evaluations, 4)
+        }
+    return {
+        'symbols': len(symbols),
+        'cycles': cycles,
+        'cached_timeframes': list(MTF_CACHED_TIMEFRAMES),
+        'live_noise': noise,
+        'uncached_ms_per_cycle': round(seconds['uncached'] / cycles * 1000, 1),
+        'tolerances': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Higher-timeframe verdict cache hit rate and drift')
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--hours', type=float, default=8)
+    parser.add_argument('--interval', type=float, default=300, help='seconds between scan cycles')
+    parser.add_argument('--tolerances', default='0,0.002,none', help="live-bar tolerances to compare ('none' = until close)")
+    parser.add_argument('--live-noise', type=float, default=0.004, help='live close jitter over a full candle')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=RuntimeWarning)
+    logger_module.stop_logging()
+    logger_module.configure_logging(logger, [logging.NullHandler()], use_queue=False)
+    tolerances = [(t, None if t == 'none' else float(t)) for t in args.tolerances.split(',') if t]
+    report = run(args.symbols, args.hours, args.interval, tolerances, args.live_noise)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['symbols']} symbols x {report['cycles']} cycles, cached {','.join(report['cached_timeframes'])}; "
+          f"uncached agreement {report['uncached_ms_per_cycle']} ms/cycle")
+    for label, r in report['tolerances'].items():
+        by_tf = ' '.join(f"{tf} {rate:.0%}" for tf, rate in r['hit_rate_by_timeframe'].items())
+        print(f"tolerance {label:>6}: hit rate {r['hit_rate']:.1%} ({by_tf}), {r['ms_per_cycle']} ms/cycle, "
+              f"count differs {r['count_drift']:.2%}, pass/fail differs {r['verdict_drift']:.2%}")
+
+if __name__ == '__main__':
+    main()
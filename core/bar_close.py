@@ -0,0 +1,115 @@
+# Bar-close driven evaluation: one full evaluation per closed 15m candle instead of one per scan
+# Changes:
+# - EVALUATION_MODE=bar_close: each symbol is evaluated right after its 15m candle closes; between
+#   closes the last prediction is reused
+# - Optional intra-bar re-check (INTRABAR_RECHECK): the ticker price is compared with trigger levels
+#   taken from the last evaluation (nearest Bollinger band / support / resistance on each side) and only
+#   a crossing re-runs the evaluation
+# - Candle-close events from the collector invalidate a prediction as soon as fetched data shows a
+#   new bar, even if the clock has not reached the boundary yet
+
+import os
+import time
+from typing import Dict, Optional
+from utils.logger import logger
+
+EVALUATION_MODE = os.getenv('EVALUATION_MODE', 'interval').strip().lower()
+BAR_TIMEFRAME = '15m'
+BAR_SECONDS = 900
+# Seconds after the close before evaluating, so the exchange has opened the new candle
+BAR_CLOSE_DELAY = float(os.getenv('BAR_CLOSE_DELAY', 3))
+INTRABAR_RECHECK = os.getenv('INTRABAR_RECHECK', '1') != '0'
+
+class Prediction:
+    # Last evaluation of a symbol: the 15m candle it saw and the price band that keeps it valid
+    __slots__ = ('bar_ms', 'lower', 'upper', 'outcome', 'evaluated_at')
+
+    def __init__(self, bar_ms: int, lower: Optional[float], upper: Optional[float], outcome: str, evaluated_at: float):
+        self.bar_ms = bar_ms
+        self.lower = lower
+        self.upper = upper
+        self.outcome = outcome
+        self.evaluated_at = evaluated_at
+
+    def crossed(self, price: float) -> bool:
+        return (self.lower is not None and price <= self.lower) or (self.upper is not None and price >= self.upper)
+
+class BarCloseEvaluator:
+    def __init__(self, bar_seconds: int = BAR_SECONDS, delay: float = BAR_CLOSE_DELAY,
+                 recheck: bool = INTRABAR_RECHECK, clock=time.time):
+        self.bar_seconds = bar_seconds
+        self.delay = delay
+        self.recheck = recheck
+        self.clock = clock
+        self.predictions: Dict[str, Prediction] = {}
+        self.stats = {'evaluations': 0, 'reused': 0, 'rechecks': 0, 'bar_closes': 0}
+
+    def current_bar(self, now: float = None) -> int:
+        # Open time (epoch ms) of the candle forming now
+        now = self.clock() if now is None else now
+        return int(now - now % self.bar_seconds) * 1000
+
+    def next_close(self, now: float = None) -> float:
+        # Epoch seconds at which the next evaluation after a close is due
+        now = self.clock() if now is None else now
+        return now - now % self.bar_seconds + self.bar_seconds + self.delay
+
+    def next_due(self, symbol: str, interval: float, now: float = None) -> float:
+        # When the scheduler should look at symbol again: right after the next close, or sooner (every
+        # `interval`) for intra-bar re-checks when the last prediction has trigger levels
+        now = self.clock() if now is None else now
+        due = self.next_close(now)
+        prediction = self.predictions.get(symbol)
+        if self.recheck and prediction is not None and (prediction.lower is not None or prediction.upper is not None):
+            due = min(due, now + interval)
+        return due
+
+    def on_candle_close(self, symbol: str, timeframe: str, open_ms: int):
+        # Collector listener: a new 15m candle makes the symbol's prediction stale
+        if timeframe != BAR_TIMEFRAME:
+            return
+        self.stats['bar_closes'] += 1
+        prediction = self.predictions.get(symbol)
+        if prediction is not None and prediction.bar_ms < open_ms:
+            del self.predictions[symbol]
+
+    def reuse(self, symbol: str, price: float, now: float = None) -> Optional[str]:
+        # Outcome of the cached prediction if it still holds for this bar and price, else None (evaluate)
+        prediction = self.predictions.get(symbol)
+        if prediction is None or prediction.bar_ms < self.current_bar(now):
+            return None
+        if self.recheck and price and prediction.crossed(price):
+            self.stats['rechecks'] += 1
+            logger.debug("[%s] Price %s crossed trigger band %s-%s, re-evaluating", symbol, price, prediction.lower, prediction.upper)
+            return None
+        self.stats['reused'] += 1
+        return prediction.outcome
+
+    def record(self, symbol: str, bar_ms: int, triggers: Optional[dict], outcome: str, now: float = None):
+        # Cache the outcome of a full evaluation on the 15m candle that opened at bar_ms
+        now = self.clock() if now is None else now
+        self.stats['evaluations'] += 1
+        triggers = triggers or {}
+        self.predictions[symbol] = Prediction(bar_ms, triggers.get('lower'), triggers.get('upper'), outcome, now)
+
+    def discard(self, symbol: str):
+        self.predictions.pop(symbol, None)
+
+    @property
+    def cache_stats(self) -> dict:
+        # Reused predictions count as hits, full evaluations as misses (progress.register_cache format)
+        return {'hits': self.stats['reused'], 'misses': self.stats['evaluations']}
+
+def evaluator_from_env() -> Optional[BarCloseEvaluator]:
+    # Bar-close evaluator when EVALUATION_MODE=bar_close, else None (scan on the scheduler's intervals)
+    if EVALUATION_MODE != 'bar_close':
+        return None
+    logger.info(f"Bar-close evaluation: every {BAR_TIMEFRAME} close + {BAR_CLOSE_DELAY:g}s, "
+                f"intra-bar re-check {'on' if INTRABAR_RECHECK else 'off'}")
+    return BarCloseEvaluator()
+
+def trigger_levels(close: float, levels) -> dict:
+    # Nearest level below and above close (None where there is none)
+    below = [level for level in levels if level is not None and level == level and level < close]
+    above = [level for level in levels if level is not None and level == level and level > close]
+    return {'lower': max(below) if below else None, 'upper': min(above) if above else None}
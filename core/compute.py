@@ -0,0 +1,277 @@
+# Process-pool offload of CPU-bound signal computation
+# Changes:
+# - Indicators, prediction (rules + RF) and multi-timeframe agreement run off the event loop
+# - ComputeExecutor runs them in COMPUTE_WORKERS worker processes that load the model once at start-up;
+#   each is its own single-process pool and serves a fixed set of symbols (see below)
+# - Candles go to workers through shared memory (one float64 block per symbol), not pickled DataFrames
+# - COMPUTE_WORKERS sets the number of workers; 0 runs everything inline on the event loop as before
+# - Frames are CandleSeries; the 15m DataFrame is built once and indicators/levels are added to it in place
+# - With the shared candle store, workers get (symbol, timeframe, rows) and read the candles under the
+#   store's seqlock; per-call shared blocks remain the fallback
+# - Agreement uses the (per-process) higher-timeframe verdict cache; each result carries its cache
+#   hits/misses so the main process can report them
+# - Results carry intra-bar trigger levels (nearest Bollinger band / swing level on each side of the close)
+# - The scan pipeline's features, predict and agreement stages run here on batches; each worker keeps
+#   loading the model at start-up and prediction (rules + RF) runs in the symbol's worker
+# - One single-process pool per worker and each symbol always goes to the same one (crc32 of the name),
+#   so a worker's swing-level trackers and verdict cache see every scan of its symbols; a batch copies
+#   each symbol's candles out of the store (one seqlock read per symbol) instead of using views
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional
+import numpy as np
+from data.candles import CandleSeries, PRICE_COLUMNS
+from data import candle_store
+from utils.logger import logger
+
+COMPUTE_WORKERS = int(os.getenv('COMPUTE_WORKERS', max((os.cpu_count() or 1) - 1, 1)))
+# Candles used by the predictor (per timeframe); agreement uses every shipped candle
+PREDICT_CANDLES = 50
+FRAME_COLUMNS = ('timestamp',) + PRICE_COLUMNS
+
+# Per-process predictor: the main process in inline mode, or the worker after _init_worker
+_predictor = None
+# Worker side: the parent's candle store, attached in _init_worker
+_store = None
+# Worker result for candles the store no longer has (the parent resends them in a shared block)
+STORE_MISS = 'store miss'
+
+def _get_predictor():
+    global _predictor
+    if _predictor is None:
+        from model.predictor import SignalPredictor
+        _predictor = SignalPredictor()
+    return _predictor
+
+def features_frames(items: list) -> list:
+    # Per (symbol, frames, timeframes): indicators of the signal timeframe (frames[0]), the
+    # latest_features the predictor needs, the latest close/rsi/adx/atr and intra-bar trigger levels;
+    # swing levels for the whole batch come from one level_engine.update_many call
+    from core.bar_close import trigger_levels
+    from core.indicators import calculate_indicators
+    from core.levels import level_engine
+    from model.predictor import latest_features
+    frames_15m = [(symbol, calculate_indicators(frames[0].tail(PREDICT_CANDLES).to_frame(), copy=False))
+                  for symbol, frames, _ in items]
+    results = latest_features(frames_15m, '15m')
+    for (symbol, _), result in zip(frames_15m, results):
+        latest = result['latest']
+        levels = level_engine.get(symbol, '15m') or {}
+        result['summary'] = {key: float(latest[key]) for key in ('close', 'rsi', 'adx', 'atr') if key in latest}
+        result['triggers'] = trigger_levels(float(latest['close']), [
+            float(latest[key]) for key in ('bollinger_lower', 'bollinger_upper') if key in latest
+        ] + [float(levels[key]) for key in ('support', 'resistance') if key in levels])
+    return results
+
+def predict_features(items: list, timeframe: str = '15m') -> list:
+    # Signal (or None) per (symbol, features) from this process's predictor
+    return _get_predictor().predict_batch(items, timeframe)
+
+def agreement_frames(items: list) -> list:
+    # Per (symbol, frames, timeframes, direction): {'agreement': agreeing timeframes}; the first result
+    # also carries this batch's verdict cache hits/misses
+    from core.multi_timeframe import count_agreement_batch, verdict_cache
+    before = dict(verdict_cache.stats)
+    counts = count_agreement_batch([(symbol, direction, frames, timeframes) for symbol, frames, timeframes, direction in items])
+    results = [{'agreement': count} for count in counts]
+    if results:
+        results[0]['verdicts'] = {key: verdict_cache.stats[key] - before[key] for key in before}
+    return results
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The creating process owns (and unlinks) the block; workers must not track it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def _init_worker(store_spec: Optional[str] = None):
+    # Worker start-up: log to stderr only (the parent owns logs/bot.log), attach the candle store
+    # and load the model once
+    global _store
+    from utils import logger as logger_module
+    logger_module.stop_logging()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logger_module.build_formatter())
+    logger_module.configure_logging(logger, [handler], use_queue=False, sampler=logger_module.SiteSampler())
+    if store_spec:
+        _store = candle_store.attach_store(store_spec)
+    _get_predictor()
+
+def _worker_ready(_=None) -> int:
+    return os.getpid()
+
+def _unpack(shm_name: str, rows: tuple, width: int) -> List[CandleSeries]:
+    # Rebuild the candle series from a shared block (copying out)
+    shm = _attach(shm_name)
+    try:
+        block = np.ndarray((len(rows), width, len(FRAME_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+        frames = [CandleSeries(block[i, :count, 0].astype(np.int64), block[i, :count, 1:].astype(np.float32))
+                  for i, count in enumerate(rows)]
+        del block
+    finally:
+        shm.close()
+    return frames
+
+def _load(source) -> Optional[List[CandleSeries]]:
+    # Frames themselves (inline), ('store', requests) copied out of the candle store (None once the store
+    # no longer has them) or ('shm', name, rows, width)
+    if isinstance(source, list):
+        return source
+    if source[0] == 'store':
+        if _store is None:
+            return None
+        return _store.read_many(source[1], lambda frames: [candles.copy() for candles in frames])
+    return _unpack(*source[1:])
+
+def _run_batch(task, items: list) -> list:
+    # task over items whose second field is a frame source; STORE_MISS for items whose candles are gone,
+    # {'error': ...} for items that fail on their own (the batch is retried one item at a time)
+    loaded = [(item, _load(item[1])) for item in items]
+    ready = [i for i, (_, frames) in enumerate(loaded) if frames is not None]
+    results = [STORE_MISS] * len(items)
+    batch = [(item[0], frames) + tuple(item[2:]) for item, frames in (loaded[i] for i in ready)]
+    try:
+        for i, result in zip(ready, task(batch)):
+            results[i] = result
+    except Exception:
+        for i, one in zip(ready, batch):
+            try:
+                results[i] = task([one])[0]
+            except Exception as e:
+                results[i] = {'error': str(e)}
+    return results
+
+def _pack(frames: List[CandleSeries]):
+    # Copy candles into a new shared block shaped (timeframes, rows, columns); timestamps as epoch ms
+    rows = tuple(len(candles) for candles in frames)
+    width = max(rows)
+    shape = (len(frames), width, len(FRAME_COLUMNS))
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    for i, candles in enumerate(frames):
+        block[i, :len(candles), 0] = candles.timestamps
+        block[i, :len(candles), 1:] = candles.values
+    del block
+    return shm, rows, width
+
+class ComputeExecutor:
+    def __init__(self, workers: int = COMPUTE_WORKERS):
+        self.workers = max(int(workers), 0)
+        self._pools: Optional[List[ProcessPoolExecutor]] = None
+        self._lock = threading.Lock()
+        self.store_spec: Optional[str] = None
+
+    def start(self):
+        # Spawn workers and wait until each has loaded the model (call off the event loop)
+        if self.workers == 0:
+            _get_predictor()
+            return
+        with self._lock:
+            if self._pools is not None:
+                return
+            store = candle_store.get_store()
+            self.store_spec = store.spec if store is not None else None
+            # spawn: forking a process that runs threads (uvicorn, log listener) is unsafe
+            context = multiprocessing.get_context('spawn')
+            pools = [ProcessPoolExecutor(1, mp_context=context, initializer=_init_worker, initargs=(self.store_spec,))
+                     for _ in range(self.workers)]
+            pids = {pool.submit(_worker_ready).result() for pool in pools}
+            self._pools = pools
+            logger.info(f"Compute pool started: {self.workers} workers ({len(pids)} ready)")
+
+    def worker_for(self, symbol: str) -> int:
+        # Fixed worker per symbol, so its per-process level and verdict state stays with it
+        return zlib.crc32(symbol.encode()) % max(self.workers, 1)
+
+    async def features(self, items: list) -> list:
+        # features_frames per (symbol, frames, timeframes); {'error': ...} for symbols that failed
+        return await self._map(features_frames, items)
+
+    async def predict(self, items: list, timeframe: str = '15m') -> list:
+        # Signal (or None) per (symbol, features), predicted by each symbol's worker
+        if self.workers == 0:
+            return predict_features(items, timeframe)
+        return await self._on_workers(predict_features, items, timeframe)
+
+    async def agreement(self, items: list) -> list:
+        # agreement_frames per (symbol, frames, timeframes, direction), with verdict cache hits/misses
+        # folded into this process's stats
+        from core.multi_timeframe import record_verdicts
+        results = await self._map(agreement_frames, items)
+        for result in results:
+            record_verdicts(result.get('verdicts'))
+        return results
+
+    async def _map(self, task, items: list) -> list:
+        # Inline when workers=0; otherwise each symbol's items go to its own worker (all workers in
+        # parallel), which reads the candles from the candle store when the timeframes are given and
+        # from a shared block packed for the call otherwise
+        if self.workers == 0:
+            return _run_batch(task, items)
+        if self._pools is None:
+            await asyncio.to_thread(self.start)
+        results = [None] * len(items)
+        await asyncio.gather(*(self._run_on(self._pools[worker], task, items, indices, results)
+                               for worker, indices in self._groups(items).items()))
+        return results
+
+    def _groups(self, items: list) -> dict:
+        # Worker -> indices of the items (first field the symbol) it runs
+        groups = {}
+        for i, item in enumerate(items):
+            groups.setdefault(self.worker_for(item[0]), []).append(i)
+        return groups
+
+    async def _on_workers(self, fn, items: list, *args) -> list:
+        # fn(one worker's items, *args) on each symbol's worker, all workers in parallel
+        if self._pools is None:
+            await asyncio.to_thread(self.start)
+        loop = asyncio.get_running_loop()
+        results = [None] * len(items)
+
+        async def run(worker: int, indices: List[int]):
+            done = await loop.run_in_executor(self._pools[worker], fn, [items[i] for i in indices], *args)
+            for i, result in zip(indices, done):
+                results[i] = result
+        await asyncio.gather(*(run(worker, indices) for worker, indices in self._groups(items).items()))
+        return results
+
+    async def _run_on(self, pool: ProcessPoolExecutor, task, items: list, indices: List[int], results: list):
+        loop = asyncio.get_running_loop()
+        pending = indices
+        if self.store_spec:
+            stored = [(items[i][0], ('store', [(items[i][0], tf, len(candles)) for tf, candles in zip(items[i][2], items[i][1])]))
+                      + tuple(items[i][2:]) for i in indices if items[i][2]]
+            if len(stored) == len(indices):
+                for i, result in zip(indices, await loop.run_in_executor(pool, _run_batch, task, stored)):
+                    results[i] = result
+                pending = [i for i in indices if results[i] == STORE_MISS]
+        if not pending:
+            return
+        blocks = []
+        try:
+            shipped = []
+            for i in pending:
+                shm, rows, width = _pack(items[i][1])
+                blocks.append(shm)
+                shipped.append((items[i][0], ('shm', shm.name, rows, width)) + tuple(items[i][2:]))
+            for i, result in zip(pending, await loop.run_in_executor(pool, _run_batch, task, shipped)):
+                results[i] = result
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    def shutdown(self):
+        if self._pools is not None:
+            for pool in self._pools:
+                pool.shutdown(wait=True, cancel_futures=True)
+            self._pools = None
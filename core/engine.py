@@ -6,19 +6,25 @@
 # - Used indicators.py for technical indicators
 # - Ensured real-time entry price from collector.py
 # - Fixed import and dependency issues
+# - Exchange comes from data.exchange.create_exchange (EXCHANGE_BACKEND=sim for load tests) and is shared
+#   with the candle collector
+# - Added missing pandas and fetch_realtime_data imports
+# - Scans run on core.pipeline (the same staged pipeline as main.py) configured with this engine's volume
+#   floor, confidence, cooldown and best-signal-per-batch selection; no per-batch 60s pause
+# - Indicators, prediction and agreement go through one shared compute executor instead of a new
+#   SignalPredictor (model load) per symbol and a second candle fetch for the agreement check
 
 import asyncio
-import ccxt.async_support as ccxt
-from typing import Dict, List, Set
-from core.indicators import calculate_indicators
-from core.multi_timeframe import check_multi_timeframe_agreement
-from model.predictor import SignalPredictor
-from telebot.sender import send_signal
+import json
+import os
+from collections import deque
+from typing import Dict, List, Optional, Set
+from core.pipeline import ScanConfig, ScanPipeline
+from data import collector
+from data.exchange import create_exchange
 from utils.helpers import get_timestamp
 from utils.logger import logger
 from dotenv import load_dotenv
-import json
-import os
 
 # Load environment variables
 load_dotenv()
@@ -29,11 +35,15 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 # Track scanned symbols and signal times
 scanned_symbols: Set[str] = set()
 last_signal_time: Dict[str, float] = {}
+# Concurrent symbol fetches, and the batch whose most confident signal is sent
 BATCH_SIZE = 20
 COOLDOWN = 6 * 3600
 CYCLE_INTERVAL = 1200
 MAX_SIGNALS_PER_MINUTE = 1
+MIN_VOLUME = 2_000_000
+MIN_CONFIDENCE = 70.0
 SIGNAL_TIME_FILE = "last_signal_times.json"
+_compute = None
 
 def load_signal_times():
     # Load last signal times from JSON
@@ -47,7 +57,33 @@ def save_signal_times():
     with open(SIGNAL_TIME_FILE, 'w') as f:
         json.dump(last_signal_time, f)
 
-async def fetch_usdt_pairs(exchange: ccxt.binance) -> List[str]:
+def get_compute():
+    # One compute executor (one model load per worker) for every symbol
+    global _compute
+    if _compute is None:
+        from core.compute import ComputeExecutor
+        _compute = ComputeExecutor()
+    return _compute
+
+def cooling_down(symbol: str) -> bool:
+    return symbol in last_signal_time and (get_timestamp() - last_signal_time[symbol]) < COOLDOWN
+
+def mark_signaled(symbol: str):
+    last_signal_time[symbol] = get_timestamp()
+    save_signal_times()
+
+def scan_config() -> ScanConfig:
+    return ScanConfig(
+        'engine', MIN_VOLUME, MIN_CONFIDENCE, TELEGRAM_CHAT_ID,
+        compute=get_compute,
+        cooling_down=cooling_down,
+        mark_signaled=mark_signaled,
+        workers={'fetch': BATCH_SIZE, 'validate': 1, 'dispatch': 1},
+        max_signals_per_minute=MAX_SIGNALS_PER_MINUTE,
+        select_window=BATCH_SIZE
+    )
+
+async def fetch_usdt_pairs(exchange) -> List[str]:
     # Fetch all USDT trading pairs
     try:
         markets = await exchange.load_markets()
@@ -58,113 +94,59 @@ async def fetch_usdt_pairs(exchange: ccxt.binance) -> List[str]:
         logger.error(f"Error fetching USDT pairs: {str(e)}")
         return []
 
-async def process_symbol(exchange: ccxt.binance, symbol: str) -> Dict:
-    # Process a single symbol for signal generation
-    try:
-        ticker = await exchange.fetch_ticker(symbol)
-        volume_usd = ticker['quoteVolume']
-        if volume_usd < 2_000_000:
-            logger.info(f"[{symbol}] Low volume (${volume_usd:.2f} < $2M)")
-            return None
-
-        timeframes = ['15m', '1h', '4h', '1d']
-        ohlcv_data = []
-        for tf in timeframes:
-            ohlcv = await fetch_realtime_data(symbol, tf, limit=50)
-            if ohlcv is None or len(ohlcv) < 30:
-                logger.warning(f"[{symbol}] Insufficient data for {tf}")
-                return None
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df = calculate_indicators(df)
-            ohlcv_data.append(df)
-
-        predictor = SignalPredictor()
-        signal = await predictor.predict_signal(symbol, ohlcv_data[0], '15m')
-        if not signal or signal['confidence'] < 70.0:
-            logger.info(f"[{symbol}] No signal or low confidence")
-            return None
-
-        if signal['tp1'] == signal['tp2'] == signal['tp3'] == signal['entry']:
-            logger.info(f"[{symbol}] Identical TP/entry values")
-            return None
-
-        current_time = get_timestamp()
-        if symbol in last_signal_time and (current_time - last_signal_time[symbol]) < COOLDOWN:
-            logger.info(f"[{symbol}] In cooldown")
-            return None
-
-        if not await check_multi_timeframe_agreement(symbol, signal['direction'], timeframes):
-            logger.info(f"[{symbol}] No multi-timeframe agreement")
-            return None
-
-        return {'symbol': symbol, 'signal': signal, 'confidence': signal['confidence']}
-
-    except Exception as e:
-        logger.error(f"[{symbol}] Error processing: {e}")
+async def process_symbol(exchange, symbol: str) -> Optional[Dict]:
+    # Scan one symbol up to the send decision: the candidate the pipeline would pick from, or None
+    job = await ScanPipeline(exchange, scan_config()).process(symbol, dispatch=False)
+    if job.outcome != 'validated':
         return None
+    return {'symbol': symbol, 'signal': job.signal, 'confidence': job.signal['confidence']}
 
 async def main():
-    # Main loop to process USDT pairs
-    exchange = ccxt.binance({
-        'apiKey': API_KEY,
-        'secret': API_SECRET,
-        'enableRateLimit': True,
-    })
-
-    global last_signal_time
-    last_signal_time = load_signal_times()
-
-    signal_count = 0
-    last_signal_minute = get_timestamp() // 60
-
-    while True:
+    # Stream every USDT pair through the pipeline once per cycle, CYCLE_INTERVAL between cycles
+    exchange = create_exchange(API_KEY, API_SECRET)
+    collector.set_exchange(exchange)
+    last_signal_time.update(load_signal_times())
+    pending = deque()
+    cycle_open = False
+    cycles = 0
+
+    async def next_symbols(limit: int) -> list:
+        nonlocal cycle_open, cycles
         try:
-            usdt_pairs = await fetch_usdt_pairs(exchange)
-            for i in range(0, len(usdt_pairs), BATCH_SIZE):
-                batch = usdt_pairs[i:i + BATCH_SIZE]
-                tasks = [process_symbol(exchange, symbol) for symbol in batch if symbol not in scanned_symbols]
-                results = await asyncio.gather(*tasks)
+            if pending:
+                batch = [pending.popleft() for _ in range(min(limit, len(pending)))]
                 scanned_symbols.update(batch)
-
-                valid_signals = [r for r in results if r is not None]
-                if valid_signals:
-                    top_signal = max(valid_signals, key=lambda x: x['confidence'])
-                    current_time = get_timestamp()
-                    current_minute = current_time // 60
-
-                    if current_minute > last_signal_minute:
-                        signal_count = 0
-                        last_signal_minute = current_minute
-
-                    if signal_count >= MAX_SIGNALS_PER_MINUTE:
-                        logger.info("Max signals per minute reached")
-                        continue
-
-                    symbol = top_signal['symbol']
-                    signal = top_signal['signal']
-                    await send_signal(symbol, signal, TELEGRAM_CHAT_ID)
-                    last_signal_time[symbol] = current_time
-                    save_signal_times()
-                    signal_count += 1
-                    logger.info(f"[{symbol}] Signal sent successfully")
-
+                return batch
+            if cycle_open:
+                # Nothing left this cycle: an empty answer closes the last selection batch before the pause
+                cycle_open = False
+                logger.info(f"Completed cycle, {len(scanned_symbols)} symbols queued")
+                return []
+            if cycles:
+                await asyncio.sleep(CYCLE_INTERVAL)
+            scanned_symbols.clear()
+            usdt_pairs = await fetch_usdt_pairs(exchange)
+            if not usdt_pairs:
                 await asyncio.sleep(60)
-
-            if len(scanned_symbols) >= len(usdt_pairs):
-                current_time = get_timestamp()
-                scanned_symbols.clear()
-                scanned_symbols.update(
-                    s for s in usdt_pairs if s in last_signal_time and (current_time - last_signal_time[s]) < COOLDOWN
-                )
-                logger.info("Completed cycle, retained cooldown symbols")
-
-            await asyncio.sleep(CYCLE_INTERVAL)
-
+                return []
+            pending.extend(usdt_pairs)
+            cycle_open = True
+            cycles += 1
+            return []
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Main loop error: {str(e)}")
             await asyncio.sleep(60)
+            return []
 
-    await exchange.close()
+    try:
+        await ScanPipeline(exchange, scan_config()).run(next_symbols)
+    finally:
+        collector.set_exchange(None)
+        await exchange.close()
+        if _compute is not None:
+            await asyncio.to_thread(_compute.shutdown)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -5,6 +5,10 @@
 # - Integrated candle patterns from candle_patterns.py
 # - Added Fibonacci and support/resistance calculations
 # - Ensured compatibility with predictor.py and multi_timeframe.py
+# - Per-step and per-pattern chatter logged lazily at DEBUG (hot path)
+# - copy=False lets calculate_indicators/calculate_fibonacci_levels add columns to a frame the caller owns
+# - candle_pattern_flags returns one flag per PATTERN_NAMES entry (the rule engine's input); TP prices
+#   split out of calculate_tp_probabilities_and_prices as calculate_tp_prices
 
 import pandas as pd
 import numpy as np
@@ -18,15 +22,16 @@ def calculate_ema(series, period):
     return series.ewm(span=period, adjust=False).mean()
 
 # Calculate technical indicators (RSI, MACD, ATR, etc.)
-def calculate_indicators(df):
+def calculate_indicators(df, copy: bool = True):
     try:
-        df = df.copy()
+        if copy:
+            df = df.copy()
         # Validate input data
         if len(df) < 30 or df[['open', 'high', 'low', 'close', 'volume']].isnull().any().any():
             logger.warning("Invalid or insufficient input data for indicators")
             return df
 
-        logger.info(f"Calculating indicators for {len(df)} candles")
+        logger.debug("Calculating indicators for %d candles", len(df))
 
         # RSI
         delta = df['close'].diff()
@@ -84,7 +89,7 @@ def calculate_indicators(df):
         df.ffill(inplace=True)
         df.fillna(df.mean(numeric_only=True), inplace=True)
 
-        logger.info("Indicators calculated: rsi, volume_sma_20, macd, atr, adx, bollinger_bands, stochastic, vwap")
+        logger.debug("Indicators calculated: rsi, volume_sma_20, macd, atr, adx, bollinger_bands, stochastic, vwap")
         return df
     except Exception as e:
         logger.error(f"Error calculating indicators: {str(e)}")
@@ -93,9 +98,8 @@ def calculate_indicators(df):
 # Calculate dynamic TP probabilities and prices (from analysis.py)
 def calculate_tp_probabilities_and_prices(indicators, entry_price, atr):
     # Calculate TP probabilities based on indicators
-    logger.info("Calculating dynamic TP probabilities and prices")
+    logger.debug("Calculating dynamic TP probabilities and prices")
     base_prob = 50
-    tp_multipliers = [1.01, 1.015, 1.02]
     if isinstance(indicators, str):
         indicators = indicators.split(", ")
     if "MACD" in indicators:
@@ -104,17 +108,22 @@ def calculate_tp_probabilities_and_prices(indicators, entry_price, atr):
         base_prob += 10
     if "Near Support" in indicators or "Near Resistance" in indicators:
         base_prob -= 5
-    probabilities = {
+    return tp_probabilities(base_prob), calculate_tp_prices(entry_price, atr)
+
+def tp_probabilities(base_prob):
+    return {
         "TP1": min(base_prob, 80),
         "TP2": min(base_prob * 0.7, 60),
         "TP3": min(base_prob * 0.5, 40)
     }
-    prices = {
+
+def calculate_tp_prices(entry_price, atr):
+    tp_multipliers = [1.01, 1.015, 1.02]
+    return {
         "TP1": entry_price * (1 + atr * tp_multipliers[0]),
         "TP2": entry_price * (1 + atr * tp_multipliers[1]),
         "TP3": entry_price * (1 + atr * tp_multipliers[2])
     }
-    return probabilities, prices
 
 # Adjust TP for stablecoin pairs (from analysis.py)
 def adjust_tp_for_stablecoin(symbol, tp1, tp2, tp3, entry):
@@ -139,7 +148,7 @@ def is_bullish_engulfing(df):
             (df['open'] <= prev_candle['close']) &
             (df['close'] >= prev_candle['open'])
         )
-        logger.info("Bullish engulfing pattern calculated")
+        logger.debug("Bullish engulfing pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_bullish_engulfing: {str(e)}")
@@ -157,7 +166,7 @@ def is_bearish_engulfing(df):
             (df['open'] >= prev_candle['close']) &
             (df['close'] <= prev_candle['open'])
         )
-        logger.info("Bearish engulfing pattern calculated")
+        logger.debug("Bearish engulfing pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_bearish_engulfing: {str(e)}")
@@ -168,7 +177,7 @@ def is_doji(df):
         body = abs(df['close'] - df['open'])
         range_candle = df['high'] - df['low']
         conditions = (body <= range_candle * 0.1) & (range_candle > 0)
-        logger.info("Doji pattern calculated")
+        logger.debug("Doji pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_doji: {str(e)}")
@@ -185,7 +194,7 @@ def is_hammer(df):
             (upper_shadow <= body * 0.5) &
             (range_candle > 0)
         )
-        logger.info("Hammer pattern calculated")
+        logger.debug("Hammer pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_hammer: {str(e)}")
@@ -202,7 +211,7 @@ def is_shooting_star(df):
             (lower_shadow <= body * 0.5) &
             (range_candle > 0)
         )
-        logger.info("Shooting star pattern calculated")
+        logger.debug("Shooting star pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_shooting_star: {str(e)}")
@@ -228,7 +237,7 @@ def is_three_white_soldiers(df):
             (df['volume'] > avg_volume) &
             ((df['close'] - df['open']) > min_candle_size)
         )
-        logger.info("Three white soldiers pattern calculated")
+        logger.debug("Three white soldiers pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_three_white_soldiers: {str(e)}")
@@ -254,53 +263,51 @@ def is_three_black_crows(df):
             (df['volume'] > avg_volume) &
             ((df['open'] - df['close']) > min_candle_size)
         )
-        logger.info("Three black crows pattern calculated")
+        logger.debug("Three black crows pattern calculated")
         return conditions
     except Exception as e:
         logger.error(f"Error in is_three_black_crows: {str(e)}")
         return [False] * len(df)
 
 # Detect all candle patterns
-def detect_candle_patterns(df: pd.DataFrame) -> list:
-    # Detect candle patterns and return list
+PATTERN_NAMES = ('bullish_engulfing', 'bearish_engulfing', 'doji', 'hammer',
+                 'shooting_star', 'three_white_soldiers', 'three_black_crows')
+PATTERN_DETECTORS = (is_bullish_engulfing, is_bearish_engulfing, is_doji, is_hammer,
+                     is_shooting_star, is_three_white_soldiers, is_three_black_crows)
+
+def candle_pattern_flags(df: pd.DataFrame) -> list:
+    # Whether each PATTERN_NAMES pattern shows on the latest candle
     try:
-        patterns = []
-        if is_bullish_engulfing(df).iloc[-1]:
-            patterns.append('bullish_engulfing')
-        if is_bearish_engulfing(df).iloc[-1]:
-            patterns.append('bearish_engulfing')
-        if is_doji(df).iloc[-1]:
-            patterns.append('doji')
-        if is_hammer(df).iloc[-1]:
-            patterns.append('hammer')
-        if is_shooting_star(df).iloc[-1]:
-            patterns.append('shooting_star')
-        if is_three_white_soldiers(df).iloc[-1]:
-            patterns.append('three_white_soldiers')
-        if is_three_black_crows(df).iloc[-1]:
-            patterns.append('three_black_crows')
-        logger.info(f"Candle patterns detected: {patterns if patterns else 'None'}")
-        return patterns
+        return [bool(detector(df).iloc[-1]) for detector in PATTERN_DETECTORS]
     except Exception as e:
         logger.error(f"Error in detect_candle_patterns: {str(e)}")
-        return []
+        return [False] * len(PATTERN_NAMES)
+
+def detect_candle_patterns(df: pd.DataFrame) -> list:
+    # Detect candle patterns and return list
+    patterns = [name for name, flag in zip(PATTERN_NAMES, candle_pattern_flags(df)) if flag]
+    logger.debug("Candle patterns detected: %s", patterns or 'None')
+    return patterns
 
 # Calculate Fibonacci levels (from fibonacci.py)
-def calculate_fibonacci_levels(df, timeframe="15m"):
+def calculate_fibonacci_levels(df, timeframe="15m", copy: bool = True):
     # Calculate Fibonacci retracement levels
     try:
         if len(df) < 2 or df['high'].std() <= 0 or df['low'].std() <= 0:
             logger.warning("Insufficient data for Fibonacci levels, returning dummy DataFrame")
-            dummy_df = df.copy()
+            dummy_df = df.copy() if copy else df
             latest_close = dummy_df['close'].iloc[-1] if not dummy_df['close'].empty else 0.0
             fib_levels = {'fib_0.382': latest_close, 'fib_0.618': latest_close}
             for level, value in fib_levels.items():
                 dummy_df[level] = value
-            logger.info("Dummy Fibonacci levels added: fib_0.382, fib_0.618")
+            logger.debug("Dummy Fibonacci levels added: fib_0.382, fib_0.618")
             return dummy_df
 
-        df = df.copy()
-        df = df.astype({'high': 'float32', 'low': 'float32', 'close': 'float32'})
+        if copy:
+            df = df.copy()
+        for col in ('high', 'low', 'close'):
+            if df[col].dtype != np.float32:
+                df[col] = df[col].astype(np.float32)
         window_map = {'15m': 100, '1h': 50, '4h': 30, '1d': 20}
         window = min(len(df), window_map.get(timeframe, 100))
         max_high = df['high'].tail(window).max()
@@ -308,12 +315,12 @@ def calculate_fibonacci_levels(df, timeframe="15m"):
 
         if pd.isna(max_high) or pd.isna(min_low) or max_high <= min_low:
             logger.warning("Invalid high/low for Fibonacci levels, returning dummy DataFrame")
-            dummy_df = df.copy()
+            dummy_df = df
             latest_close = dummy_df['close'].iloc[-1] if not dummy_df['close'].empty else 0.0
             fib_levels = {'fib_0.382': latest_close, 'fib_0.618': latest_close}
             for level, value in fib_levels.items():
                 dummy_df[level] = value
-            logger.info("Dummy Fibonacci levels added: fib_0.382, fib_0.618")
+            logger.debug("Dummy Fibonacci levels added: fib_0.382, fib_0.618")
             return dummy_df
 
         diff = max_high - min_low
@@ -334,7 +341,7 @@ def calculate_fibonacci_levels(df, timeframe="15m"):
             logger.error(f"NaN or Inf values detected in Fibonacci levels")
             return df
 
-        logger.info(f"Fibonacci levels calculated for {len(df)} rows: fib_0.382, fib_0.618")
+        logger.debug("Fibonacci levels calculated for %d rows: fib_0.382, fib_0.618", len(df))
         return df
     except Exception as e:
         logger.error(f"Error in calculate_fibonacci_levels: {e}")
@@ -379,7 +386,7 @@ def calculate_support_resistance(symbol: str, df: pd.DataFrame) -> dict:
             logger.warning(f"[{symbol}] Invalid support/resistance: support={support}, resistance={resistance}")
             return {'support': latest_close * 0.99, 'resistance': latest_close * 1.01}
             
-        logger.info(f"[{symbol}] Support: {support}, Resistance: {resistance}")
+        logger.debug("[%s] Support: %s, Resistance: %s", symbol, support, resistance)
         return {'support': support, 'resistance': resistance}
     except Exception as e:
         logger.error(f"[{symbol}] Error calculating support/resistance: {str(e)}")
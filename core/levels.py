@@ -0,0 +1,317 @@
+# Incremental swing-point levels: support/resistance and Fibonacci per (symbol, timeframe)
+# Changes:
+# - Same results as calculate_support_resistance and calculate_fibonacci_levels, without rolling
+#   windows or frame copies: each update only touches the bars that changed since the last call
+# - Swing highs/lows (5-bar centered pivots) kept in deques; window highs/lows in monotonic deques
+#   over closed bars, combined with the forming bar at query time
+# - Levels are cached scalars (get() is O(1)); update_many() syncs many symbols in one call and
+#   detects pivots for cold symbols with one vectorized pass per frame length
+
+import os
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from core.indicators import calculate_fibonacci_levels, calculate_support_resistance
+from utils.logger import logger
+
+# Bars considered by calculate_support_resistance, and its minimum
+SR_WINDOW = 100
+SR_MIN_BARS = 20
+# Fibonacci lookback per timeframe (calculate_fibonacci_levels window_map)
+FIB_WINDOWS = {'15m': 100, '1h': 50, '4h': 30, '1d': 20}
+PIVOT_SPAN = 2
+# Tracked (symbol, timeframe) keys per process; the oldest is dropped beyond this
+LEVEL_ENGINE_KEYS = int(os.getenv('LEVEL_ENGINE_KEYS', 5000))
+
+def _keeps_max(kept, new) -> bool:
+    return kept >= new
+
+def _keeps_min(kept, new) -> bool:
+    return kept <= new
+
+def _mean(pivots: deque):
+    # pandas' mean: sum in the input precision (pairwise, in bar order) divided by a count of the same type
+    values = np.array([value for _, value in pivots], dtype=type(pivots[0][1]))
+    return values.sum(dtype=values.dtype) / values.dtype.type(len(values))
+
+class _Window:
+    # Monotonic deque: max (or min) of closed bars inside a trailing window of seq numbers
+    __slots__ = ('items', 'better')
+
+    def __init__(self, better):
+        self.items = deque()
+        self.better = better
+
+    def push(self, seq: int, value):
+        while self.items and not self.better(self.items[-1][1], value):
+            self.items.pop()
+        self.items.append((seq, value))
+
+    def best(self, start: int):
+        while self.items and self.items[0][0] < start:
+            self.items.popleft()
+        return self.items[0][1] if self.items else None
+
+class SwingTracker:
+    # Bars of one (symbol, timeframe); bar seq numbers increase by one per candle
+    __slots__ = ('timeframe', 'first', 'end', 'ts', 'highs', 'lows', 'closes', 'pivot_highs', 'pivot_lows',
+                 'max_high', 'min_high', 'max_low', 'min_low', 'fib_high', 'fib_low', 'levels')
+
+    def __init__(self, timeframe: str):
+        self.timeframe = timeframe
+        self.first = 0
+        self.end = 0
+        self.ts, self.highs, self.lows, self.closes = deque(), deque(), deque(), deque()
+        self.pivot_highs, self.pivot_lows = deque(), deque()
+        # Whole-window extremes (fallback levels and the constant-series check) and Fibonacci-window ones
+        self.max_high, self.min_high = _Window(_keeps_max), _Window(_keeps_min)
+        self.max_low, self.min_low = _Window(_keeps_max), _Window(_keeps_min)
+        self.fib_high, self.fib_low = _Window(_keeps_max), _Window(_keeps_min)
+        self.levels = None
+
+    def __len__(self) -> int:
+        return self.end - self.first
+
+    def _bar(self, seq: int) -> Tuple:
+        i = seq - self.first
+        return self.highs[i], self.lows[i]
+
+    def _pivot_check(self, seq: int, pivots_known: Tuple[bool, bool] = None):
+        # Is bar seq a swing high/low (equal to the max/min of the 5 bars centred on it)?
+        if seq - PIVOT_SPAN < self.first or seq + PIVOT_SPAN >= self.end:
+            return
+        if pivots_known is None:
+            bars = [self._bar(s) for s in range(seq - PIVOT_SPAN, seq + PIVOT_SPAN + 1)]
+            high, low = bars[PIVOT_SPAN]
+            is_high = high == max(b[0] for b in bars)
+            is_low = low == min(b[1] for b in bars)
+        else:
+            is_high, is_low = pivots_known
+            high, low = self._bar(seq)
+        if is_high:
+            self.pivot_highs.append((seq, high))
+        if is_low:
+            self.pivot_lows.append((seq, low))
+
+    def _unpivot(self, seq: int):
+        if self.pivot_highs and self.pivot_highs[-1][0] == seq:
+            self.pivot_highs.pop()
+        if self.pivot_lows and self.pivot_lows[-1][0] == seq:
+            self.pivot_lows.pop()
+
+    def append(self, ts, high, low, close, pivots_known: Tuple[bool, bool] = None):
+        # New forming bar; the previous forming bar is closed and joins the window deques
+        if self.end > self.first:
+            seq = self.end - 1
+            high_prev, low_prev = self._bar(seq)
+            self.max_high.push(seq, high_prev)
+            self.min_high.push(seq, high_prev)
+            self.max_low.push(seq, low_prev)
+            self.min_low.push(seq, low_prev)
+            self.fib_high.push(seq, high_prev)
+            self.fib_low.push(seq, low_prev)
+        self.ts.append(ts)
+        self.highs.append(high)
+        self.lows.append(low)
+        self.closes.append(close)
+        self.end += 1
+        self._pivot_check(self.end - 1 - PIVOT_SPAN, pivots_known)
+
+    def replace_last(self, high, low, close):
+        # The forming bar moved: only the pivot status of the bar two before it can change
+        self.highs[-1], self.lows[-1], self.closes[-1] = high, low, close
+        seq = self.end - 1 - PIVOT_SPAN
+        self._unpivot(seq)
+        self._pivot_check(seq)
+
+    def trim(self, keep: int):
+        # Drop the oldest bars so that `keep` remain
+        while len(self) > keep:
+            self.ts.popleft()
+            self.highs.popleft()
+            self.lows.popleft()
+            self.closes.popleft()
+            self.first += 1
+        # Bars within PIVOT_SPAN of the window start have no centred window any more
+        while self.pivot_highs and self.pivot_highs[0][0] < self.first + PIVOT_SPAN:
+            self.pivot_highs.popleft()
+        while self.pivot_lows and self.pivot_lows[0][0] < self.first + PIVOT_SPAN:
+            self.pivot_lows.popleft()
+
+    def _max(self, window: _Window, start: int, forming):
+        closed = window.best(start)
+        return forming if closed is None or forming > closed else closed
+
+    def _min(self, window: _Window, start: int, forming):
+        closed = window.best(start)
+        return forming if closed is None or forming < closed else closed
+
+    def compute(self) -> dict:
+        # Levels for the current bars, exactly as calculate_support_resistance / calculate_fibonacci_levels
+        n = len(self)
+        close = self.closes[-1]
+        high_last, low_last = self.highs[-1], self.lows[-1]
+        highest, lowest = self._max(self.max_high, self.first, high_last), self._min(self.min_low, self.first, low_last)
+        levels = {}
+
+        if n < SR_MIN_BARS:
+            levels['support'], levels['resistance'] = close * 0.99, close * 1.01
+        else:
+            resistance = float(_mean(self.pivot_highs)) if self.pivot_highs else float(highest)
+            support = float(_mean(self.pivot_lows)) if self.pivot_lows else float(lowest)
+            if abs(resistance - support) < 0.002 * close:
+                support, resistance = close * 0.99, close * 1.01
+            if support <= 0.001 or resistance <= 0.001 or support >= resistance:
+                support, resistance = close * 0.99, close * 1.01
+            levels['support'], levels['resistance'] = support, resistance
+
+        # All highs (or all lows) equal is the zero standard deviation case
+        flat = (highest == self._min(self.min_high, self.first, high_last) or
+                self._max(self.max_low, self.first, low_last) == lowest)
+        if n < 2 or flat:
+            # calculate_fibonacci_levels' dummy branch (no float32 cast); LevelEngine defers to it
+            fib = (close, close)
+        else:
+            start = max(self.first, self.end - FIB_WINDOWS.get(self.timeframe, SR_WINDOW))
+            max_high = self._max(self.fib_high, start, high_last)
+            min_low = self._min(self.fib_low, start, low_last)
+            diff = max_high - min_low
+            if max_high <= min_low or diff < 0.01 * min_low:
+                fib = (close, close)
+            else:
+                fib = (min_low + 0.382 * diff, min_low + 0.618 * diff)
+        levels['fib_0.382'], levels['fib_0.618'] = fib
+        levels['flat'] = n < 2 or flat
+        self.levels = levels
+        return levels
+
+def _columns(df: pd.DataFrame, limit: int = SR_WINDOW):
+    # Last `limit` timestamps as int64 ms plus high/low/close as float32 (the dtype the Fibonacci
+    # function casts to; views when the frame is already float32, as CandleSeries.to_frame() makes it),
+    # and whether the frame's columns still need that cast
+    ts = df['timestamp'].to_numpy()[-limit:]
+    ts = ts.astype('datetime64[ms]').astype(np.int64) if ts.dtype.kind == 'M' else ts.astype(np.int64)
+    series = [df[col] for col in ('high', 'low', 'close')]
+    needs_cast = any(s.dtype != np.float32 for s in series)
+    return (ts, *(s.to_numpy(np.float32)[-limit:] for s in series)), needs_cast
+
+class LevelEngine:
+    def __init__(self, max_keys: int = LEVEL_ENGINE_KEYS):
+        self.trackers: Dict[Tuple[str, str], SwingTracker] = {}
+        self.max_keys = max_keys
+        self.stats = {'incremental': 0, 'rebuilt': 0, 'fallback': 0}
+
+    def get(self, symbol: str, timeframe: str) -> Optional[dict]:
+        # Last computed levels (support, resistance, fib_0.382, fib_0.618), O(1)
+        tracker = self.trackers.get((symbol, timeframe))
+        return tracker.levels if tracker else None
+
+    def discard(self, symbol: str):
+        for key in [k for k in self.trackers if k[0] == symbol]:
+            del self.trackers[key]
+
+    def _fallback(self, symbol: str, timeframe: str, df: pd.DataFrame, cast: bool, forget: bool) -> dict:
+        # The original functions, in generate_signal's order: frames with NaN bars (forget=True drops the
+        # tracker) and flat frames, whose Fibonacci dummy branch skips the float32 cast
+        self.stats['fallback'] += 1
+        if forget:
+            self.trackers.pop((symbol, timeframe), None)
+        fib = calculate_fibonacci_levels(df, timeframe, copy=not cast)
+        sr = calculate_support_resistance(symbol, fib)
+        return {'support': sr['support'], 'resistance': sr['resistance'], 'fib_0.382': fib['fib_0.382'].iloc[-1],
+                'fib_0.618': fib['fib_0.618'].iloc[-1], 'flat': False}
+
+    def _finish(self, tracker: SwingTracker, symbol: str, timeframe: str, df: pd.DataFrame, cast: bool) -> dict:
+        levels = tracker.compute()
+        if levels['flat']:
+            return self._fallback(symbol, timeframe, df, cast, forget=False)
+        if cast:
+            # What calculate_fibonacci_levels(df, copy=False) does to the caller's frame
+            for col in ('high', 'low', 'close'):
+                if df[col].dtype != np.float32:
+                    df[col] = df[col].astype(np.float32)
+        return levels
+
+    def _build(self, key: Tuple[str, str], ts, highs, lows, closes, pivots=None) -> SwingTracker:
+        tracker = SwingTracker(key[1])
+        for i in range(len(ts)):
+            known = None
+            if pivots is not None:
+                centre = i - PIVOT_SPAN
+                known = (bool(pivots[0][centre]), bool(pivots[1][centre])) if centre >= PIVOT_SPAN else (False, False)
+            tracker.append(ts[i], highs[i], lows[i], closes[i], known)
+        if len(self.trackers) >= self.max_keys and key not in self.trackers:
+            self.trackers.pop(next(iter(self.trackers)))
+        self.trackers[key] = tracker
+        self.stats['rebuilt'] += 1
+        return tracker
+
+    def _sync(self, tracker: SwingTracker, ts, highs, lows, closes) -> bool:
+        # Bring tracker in line with the frame; False if the frame does not continue the tracked bars
+        last_ts = tracker.ts[-1]
+        overlap = int(np.searchsorted(ts, last_ts, side='right'))
+        if overlap == 0 or ts[overlap - 1] != last_ts or overlap > len(tracker):
+            return False
+        if tracker.ts[len(tracker) - overlap] != ts[0]:
+            return False
+        tracker.replace_last(highs[overlap - 1], lows[overlap - 1], closes[overlap - 1])
+        for i in range(overlap, len(ts)):
+            tracker.append(ts[i], highs[i], lows[i], closes[i])
+        tracker.trim(len(ts))
+        return True
+
+    def update(self, symbol: str, timeframe: str, df: pd.DataFrame, cast: bool = False) -> dict:
+        # Levels for df (the frame the original functions would get), reusing earlier work. cast=True
+        # also converts df's high/low/close to float32 in place, as the Fibonacci function did
+        try:
+            (ts, highs, lows, closes), needs_cast = _columns(df)
+            if np.isnan(highs).any() or np.isnan(lows).any() or np.isnan(closes).any():
+                return self._fallback(symbol, timeframe, df, cast, forget=True)
+            key = (symbol, timeframe)
+            tracker = self.trackers.get(key)
+            if tracker is not None and len(tracker) and self._sync(tracker, ts, highs, lows, closes):
+                self.stats['incremental'] += 1
+            else:
+                tracker = self._build(key, ts, highs, lows, closes)
+            return self._finish(tracker, symbol, timeframe, df, cast and needs_cast)
+        except Exception as e:
+            logger.error(f"[{symbol}] Error updating swing levels: {str(e)}")
+            return self._fallback(symbol, timeframe, df, cast, forget=True)
+
+    def update_many(self, frames: Iterable[Tuple[str, str, pd.DataFrame]], cast: bool = False) -> Dict[Tuple[str, str], dict]:
+        # Batch mode: incremental for tracked symbols; cold symbols grouped by frame length and their
+        # pivots detected with one vectorized pass per group
+        results, cold = {}, {}
+        for symbol, timeframe, df in frames:
+            key = (symbol, timeframe)
+            if key in self.trackers:
+                results[key] = self.update(symbol, timeframe, df, cast)
+            else:
+                cold.setdefault(min(len(df), SR_WINDOW), []).append((key, df))
+        for length, group in cold.items():
+            columns = [_columns(df) for _, df in group]
+            casts = [cast and needs_cast for _, needs_cast in columns]
+            columns = [c for c, _ in columns]
+            if length < 2 * PIVOT_SPAN + 1:
+                for key, df in group:
+                    results[key] = self.update(key[0], key[1], df, cast)
+                continue
+            highs = np.stack([c[1] for c in columns])
+            lows = np.stack([c[2] for c in columns])
+            windows_high = np.lib.stride_tricks.sliding_window_view(highs, 2 * PIVOT_SPAN + 1, axis=1)
+            windows_low = np.lib.stride_tricks.sliding_window_view(lows, 2 * PIVOT_SPAN + 1, axis=1)
+            # Index i of these masks is bar i + PIVOT_SPAN
+            pivot_high = highs[:, PIVOT_SPAN:length - PIVOT_SPAN] == windows_high.max(axis=2)
+            pivot_low = lows[:, PIVOT_SPAN:length - PIVOT_SPAN] == windows_low.min(axis=2)
+            for row, ((key, df), (ts, h, l, c)) in enumerate(zip(group, columns)):
+                if np.isnan(h).any() or np.isnan(l).any() or np.isnan(c).any():
+                    results[key] = self._fallback(key[0], key[1], df, cast, forget=True)
+                    continue
+                masks = (np.concatenate([[False] * PIVOT_SPAN, pivot_high[row]]),
+                         np.concatenate([[False] * PIVOT_SPAN, pivot_low[row]]))
+                results[key] = self._finish(self._build(key, ts, h, l, c, masks), key[0], key[1], df, casts[row])
+        return results
+
+# Process-wide engine used by the predictor
+level_engine = LevelEngine()
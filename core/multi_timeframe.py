@@ -3,49 +3,234 @@
 # - Increased agreement threshold from 2/4 to 3/4 timeframes
 # - Enhanced logging for agreement count
 # - Optimized for Cloud Run async compatibility
+# - Agreement result logged lazily at DEBUG (summarized per symbol in main.py)
+# - Per-timeframe check split into timeframe_agrees/count_agreement so compute workers can run it on shipped candles
+# - count_agreement takes CandleSeries (hot path) as well as DataFrames
+# - Higher-timeframe verdicts cached per (symbol, timeframe, candle open time) until that candle closes,
+#   optionally only while the live close stays within MTF_LIVE_TOLERANCE; only invalid entries are
+#   recomputed, and hits/misses are reported as the 'verdicts' cache
+# - Bullish/bearish verdicts and agreement counts are NumPy masks over latest-bar indicator arrays
+#   (verdict_masks / agreement_counts), shared by the per-symbol and batch paths
+# - check_multi_timeframe_agreement_batch validates many candidates at once: candles fetched
+#   concurrently, every (symbol, timeframe) verdict in one array pass, the 3-of-4 set returned
+# - verdict_grid is the one verdict path (cache lookups, then one verdict_masks pass) behind
+#   count_agreement, count_agreement_batch (the pipeline's agreement stage) and the batch check
 
-import pandas as pd
 import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+import pandas as pd
 from core.indicators import calculate_indicators
-from data.collector import fetch_realtime_data
+from data.candles import CandleSeries, CLOSE
+from data.collector import fetch_candles
 from utils.logger import logger
+from utils.metrics import cache_requests
 
-async def check_multi_timeframe_agreement(symbol: str, direction: str, timeframes: list) -> bool:
-    # Check if at least 3/4 timeframes agree on signal direction
-    try:
-        agreement_count = 0
-        for timeframe in timeframes:
-            # Fetch real-time data for timeframe
-            ohlcv = await fetch_realtime_data(symbol, timeframe, limit=100)
+AGREEMENT_THRESHOLD = 3
+# Latest-bar indicators a timeframe verdict reads
+VERDICT_INPUTS = ('rsi', 'macd', 'macd_signal', 'adx')
+# Timeframes whose verdicts are cached ('' disables the cache)
+MTF_CACHED_TIMEFRAMES = tuple(tf for tf in os.getenv('MTF_CACHED_TIMEFRAMES', '1h,4h,1d').split(',') if tf)
+# Largest move of the live close (fraction of the close the verdict was computed on) that keeps a
+# verdict valid; 'none' keeps it until the candle closes whatever the live bar does
+_tolerance = os.getenv('MTF_LIVE_TOLERANCE', '0.002').strip().lower()
+MTF_LIVE_TOLERANCE = None if _tolerance in ('', 'none') else float(_tolerance)
+MTF_VERDICT_ENTRIES = int(os.getenv('MTF_VERDICT_ENTRIES', 20000))
+TIMEFRAME_MS = {'1m': 60_000, '5m': 300_000, '15m': 900_000, '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# Hits/misses seen by this process's callers (fed from compute results, so workers' lookups count too)
+verdict_stats = {'hits': 0, 'misses': 0}
+
+class VerdictCache:
+    # (bullish, bearish) verdict of a timeframe's latest candle, keyed by (symbol, timeframe, candle open
+    # time); valid until the candle's close time and, with a live tolerance, while the live close is near
+    # the close the verdict was computed on
+    def __init__(self, live_tolerance: Optional[float] = MTF_LIVE_TOLERANCE, max_entries: int = MTF_VERDICT_ENTRIES,
+                 clock=time.time):
+        self.live_tolerance = live_tolerance
+        self.max_entries = max_entries
+        self.clock = clock
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries = {}
+        self._open = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, symbol: str, timeframe: str, open_ms: int, close: float) -> Optional[Tuple[bool, bool]]:
+        entry = self._entries.get((symbol, timeframe, open_ms))
+        if entry is not None and self.clock() * 1000 < entry[0] and (
+                self.live_tolerance is None or abs(close - entry[1]) <= self.live_tolerance * abs(entry[1])):
+            self.stats['hits'] += 1
+            return entry[2]
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, symbol: str, timeframe: str, open_ms: int, close: float, verdict: Tuple[bool, bool]):
+        # A new candle replaces the previous candle's entry; the oldest entry goes when full
+        previous = self._open.get((symbol, timeframe))
+        if previous is not None and previous != open_ms:
+            self._entries.pop((symbol, timeframe, previous), None)
+        key = (symbol, timeframe, open_ms)
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            oldest = next(iter(self._entries))
+            del self._entries[oldest]
+            if self._open.get(oldest[:2]) == oldest[2]:
+                del self._open[oldest[:2]]
+        self._entries[key] = (open_ms + TIMEFRAME_MS.get(timeframe, 0), close, verdict)
+        self._open[(symbol, timeframe)] = open_ms
+
+# Per-process cache (each compute worker keeps its own)
+verdict_cache = VerdictCache()
+
+def verdict_masks(values: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    # Bullish and bearish masks over latest-bar VERDICT_INPUTS arrays of any shape (a NaN input never holds)
+    rsi, macd, macd_signal, adx = (np.asarray(values[key], dtype=np.float64) for key in VERDICT_INPUTS)
+    strong_trend = adx > 25
+    is_bullish = (rsi < 30) | ((macd > macd_signal) & (macd > 0)) | strong_trend
+    is_bearish = (rsi > 70) | ((macd < macd_signal) & (macd < 0)) | strong_trend
+    return is_bullish, is_bearish
+
+def agreement_counts(bullish: np.ndarray, bearish: np.ndarray, directions: Sequence[str]) -> np.ndarray:
+    # Agreeing timeframes per symbol: bullish/bearish are (symbols, timeframes), directions one per symbol
+    directions = np.asarray(directions)[:, None]
+    return (((directions == "LONG") & bullish) | ((directions == "SHORT") & bearish)).sum(axis=1)
+
+def latest_verdict_inputs(df: pd.DataFrame) -> np.ndarray:
+    # VERDICT_INPUTS of the latest candle, read from one row instead of one lookup per column
+    row = df.iloc[-1].to_numpy()
+    return np.array([row[df.columns.get_loc(key)] for key in VERDICT_INPUTS], dtype=np.float64)
+
+def verdict_inputs(stacked: np.ndarray) -> Dict[str, np.ndarray]:
+    # Named arrays from latest_verdict_inputs vectors stacked on the last axis
+    return {key: stacked[..., k] for k, key in enumerate(VERDICT_INPUTS)}
+
+def timeframe_verdict(df: pd.DataFrame) -> Tuple[bool, bool]:
+    # Is the latest candle of one timeframe (indicators computed) bullish, bearish (or both)?
+    is_bullish, is_bearish = verdict_masks(verdict_inputs(latest_verdict_inputs(df)))
+    return bool(is_bullish), bool(is_bearish)
+
+def timeframe_agrees(df: pd.DataFrame, direction: str) -> bool:
+    # Does the latest candle of one timeframe (indicators computed) support direction?
+    return _supports(timeframe_verdict(df), direction)
+
+def _supports(verdict: Tuple[bool, bool], direction: str) -> bool:
+    return (direction == "LONG" and verdict[0]) or (direction == "SHORT" and verdict[1])
+
+def _latest_bar(ohlcv) -> Tuple[int, float]:
+    # Open time (epoch ms) and close of the latest candle
+    if isinstance(ohlcv, CandleSeries):
+        return int(ohlcv.timestamps[-1]), float(ohlcv.values[-1, CLOSE])
+    if isinstance(ohlcv, pd.DataFrame):
+        ts = ohlcv['timestamp'].iloc[-1]
+        return (pd.Timestamp(ts).value // 1_000_000 if not isinstance(ts, (int, np.integer)) else int(ts),
+                float(ohlcv['close'].iloc[-1]))
+    return int(ohlcv[-1][0]), float(ohlcv[-1][4])
+
+def _indicator_frame(ohlcv) -> pd.DataFrame:
+    if isinstance(ohlcv, CandleSeries):
+        return calculate_indicators(ohlcv.to_frame(np.float64), copy=False)
+    return calculate_indicators(pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS))
+
+def _compute_verdict(ohlcv) -> Tuple[bool, bool]:
+    return timeframe_verdict(_indicator_frame(ohlcv))
+
+def verdict_grid(rows: Sequence[Tuple[Optional[str], list, Optional[list]]],
+                 cache: VerdictCache = None) -> Tuple[np.ndarray, np.ndarray]:
+    # Bullish and bearish masks (rows, timeframes) for rows of (symbol, raw OHLCV frames, timeframes);
+    # frames that are None or under 30 rows hold neither. With a symbol and timeframes, cached verdicts of
+    # MTF_CACHED_TIMEFRAMES fill their cells and the rest are one verdict_masks pass
+    cache = verdict_cache if cache is None else cache
+    shape = (len(rows), max((len(frames) for _, frames, _ in rows), default=0))
+    inputs = np.full(shape + (len(VERDICT_INPUTS),), np.nan)
+    cached = np.zeros(shape, dtype=bool)
+    cached_bullish, cached_bearish = np.zeros(shape, dtype=bool), np.zeros(shape, dtype=bool)
+    pending = []
+    for i, (symbol, frames, timeframes) in enumerate(rows):
+        for j, ohlcv in enumerate(frames):
             if ohlcv is None or len(ohlcv) < 30:
-                logger.warning(f"[{symbol}] Insufficient data for {timeframe}")
                 continue
+            timeframe = timeframes[j] if timeframes and j < len(timeframes) else None
+            if symbol and timeframe in MTF_CACHED_TIMEFRAMES:
+                open_ms, close = _latest_bar(ohlcv)
+                verdict = cache.get(symbol, timeframe, open_ms, close)
+                if verdict is not None:
+                    cached[i, j] = True
+                    cached_bullish[i, j], cached_bearish[i, j] = verdict
+                    continue
+                pending.append((i, j, timeframe, open_ms, close))
+            inputs[i, j] = latest_verdict_inputs(_indicator_frame(ohlcv))
+
+    bullish, bearish = verdict_masks(verdict_inputs(inputs))
+    bullish, bearish = np.where(cached, cached_bullish, bullish), np.where(cached, cached_bearish, bearish)
+    for i, j, timeframe, open_ms, close in pending:
+        cache.put(rows[i][0], timeframe, open_ms, close, (bool(bullish[i, j]), bool(bearish[i, j])))
+    return bullish, bearish
 
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df = calculate_indicators(df)
-            latest = df.iloc[-1]
-
-            # Check directional agreement
-            is_bullish = (
-                latest['rsi'] < 30 or
-                (latest['macd'] > latest['macd_signal'] and latest['macd'] > 0) or
-                latest['adx'] > 25
-            )
-            is_bearish = (
-                latest['rsi'] > 70 or
-                (latest['macd'] < latest['macd_signal'] and latest['macd'] < 0) or
-                latest['adx'] > 25
-            )
-
-            if direction == "LONG" and is_bullish:
-                agreement_count += 1
-            elif direction == "SHORT" and is_bearish:
-                agreement_count += 1
+def count_agreement(frames: list, direction: str, symbol: str = None, timeframes: list = None,
+                    cache: VerdictCache = None) -> int:
+    # Number of raw OHLCV frames whose latest candle agrees; frames under 30 rows are skipped. With symbol
+    # and timeframes, verdicts of MTF_CACHED_TIMEFRAMES come from the verdict cache when still valid
+    return count_agreement_batch([(symbol, direction, frames, timeframes)], cache)[0]
+
+def count_agreement_batch(items: Sequence[Tuple[str, str, list, list]], cache: VerdictCache = None) -> List[int]:
+    # count_agreement for many (symbol, direction, frames, timeframes) at once: one verdict grid
+    bullish, bearish = verdict_grid([(symbol, frames, timeframes) for symbol, _, frames, timeframes in items], cache)
+    return [int(count) for count in agreement_counts(bullish, bearish, [direction for _, direction, _, _ in items])]
+
+def record_verdicts(counts: dict):
+    # Fold one evaluation's verdict cache hits/misses into verdict_stats and the cache metric
+    for key, result in (('hits', 'hit'), ('misses', 'miss')):
+        n = (counts or {}).get(key, 0)
+        if n:
+            verdict_stats[key] += n
+            cache_requests.inc(n, cache='verdicts', result=result)
+
+async def check_multi_timeframe_agreement(symbol: str, direction: str, timeframes: list) -> bool:
+    # Check if at least 3/4 timeframes agree on signal direction
+    return symbol in await check_multi_timeframe_agreement_batch({symbol: direction}, timeframes)
+
+async def check_multi_timeframe_agreement_batch(candidates: Dict[str, str], timeframes: list,
+                                                cache: VerdictCache = None) -> Set[str]:
+    # Symbols of candidates (symbol -> direction) on which at least 3/4 timeframes agree. Candles for every
+    # (symbol, timeframe) are fetched concurrently; cached higher-timeframe verdicts fill their cells and
+    # the rest are one verdict_masks pass over (symbols, timeframes) latest-bar arrays
+    cache = verdict_cache if cache is None else cache
+    symbols = list(candidates)
+    try:
+        fetched = await asyncio.gather(*(fetch_candles(symbol, timeframe, limit=100)
+                                         for symbol in symbols for timeframe in timeframes), return_exceptions=True)
+        rows, failed = [], set()
+        before = dict(cache.stats)
+        for i, symbol in enumerate(symbols):
+            frames = []
+            for j, timeframe in enumerate(timeframes):
+                ohlcv = fetched[i * len(timeframes) + j]
+                if isinstance(ohlcv, Exception):
+                    logger.error(f"[{symbol}] Error in multi-timeframe agreement: {str(ohlcv)}")
+                    failed.add(symbol)
+                    ohlcv = None
+                elif ohlcv is None or len(ohlcv) < 30:
+                    logger.warning(f"[{symbol}] Insufficient data for {timeframe}")
+                frames.append(ohlcv)
+            rows.append((symbol, frames, timeframes))
+        bullish, bearish = verdict_grid(rows, cache)
+        if cache is verdict_cache:
+            record_verdicts({k: cache.stats[k] - before[k] for k in before})
+        counts = agreement_counts(bullish, bearish, [candidates[symbol] for symbol in symbols])
 
         # Require at least 3/4 timeframes to agree
-        agreement = agreement_count >= 3
-        logger.info(f"[{symbol}] Multi-timeframe agreement: {agreement_count}/4 timeframes for {direction}, Result: {agreement}")
-        return agreement
+        agreeing = set()
+        for symbol, count in zip(symbols, counts):
+            agreement = symbol not in failed and count >= AGREEMENT_THRESHOLD
+            logger.debug("[%s] Multi-timeframe agreement: %d/%d timeframes for %s, Result: %s",
+                         symbol, count, len(timeframes), candidates[symbol], agreement)
+            if agreement:
+                agreeing.add(symbol)
+        return agreeing
     except Exception as e:
-        logger.error(f"[{symbol}] Error in multi-timeframe agreement: {str(e)}")
-        return False
+        logger.error(f"Error in multi-timeframe agreement for {len(symbols)} symbols: {str(e)}")
+        return set()
@@ -0,0 +1,494 @@
+# Staged scan pipeline shared by main.py and core/engine.py
+# Changes:
+# - One scan path for both entry points: universe -> fetch -> evaluate -> validate -> dispatch, each stage
+#   a pool of asyncio workers joined by bounded queues
+# - Bounded queues give backpressure: when a stage falls behind its input queue fills, the stage before it
+#   blocks on put and the universe stage stops pulling symbols until there is room
+# - Stages overlap, so exchange requests for the next symbols are in flight while earlier symbols are in
+#   the compute pool (no gather-per-batch followed by a fixed sleep)
+# - Features, prediction and multi-timeframe agreement are one evaluate stage: one compute-worker round
+#   trip on shared-memory candles (core.compute) instead of shipping indicator frames between stages
+# - evaluate split into features, predict and agreement (strong signals only) stages with their own
+#   bounded queues, all run in the compute workers (each symbol's own worker); their asyncio workers take
+#   up to PIPELINE_BATCH queued jobs at once, so levels, rule scores, ML and timeframe verdicts are batch
+#   passes. Jobs carry only the latest-candle features from features to predict, not frames
+# - determine_leverage lives in model.rules (imported where used, so importing main stays light)
+# - ScanConfig holds what differs between the entry points: volume floor, confidence, cooldown, signal
+#   rate, best-of-window selection, worker counts and hooks into the scheduler, bar evaluator and shard
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from utils import metrics
+from utils.logger import logger
+
+TIMEFRAMES = ['15m', '1h', '4h', '1d']
+# Candles per timeframe fetched for a scan (the predictor uses the last 50)
+SCAN_CANDLES = 100
+STAGES = ('fetch', 'features', 'predict', 'agreement', 'validate', 'dispatch')
+# Stages whose workers take queued jobs in batches of up to PIPELINE_BATCH
+BATCH_STAGES = ('features', 'predict', 'agreement')
+PIPELINE_BATCH = int(os.getenv('PIPELINE_BATCH', 8))
+# Per-stage worker overrides (PIPELINE_FETCH_WORKERS, ...); unset keeps the entry point's own counts
+STAGE_WORKER_OVERRIDES = {stage: int(os.environ[f'PIPELINE_{stage.upper()}_WORKERS'])
+                          for stage in STAGES if os.getenv(f'PIPELINE_{stage.upper()}_WORKERS')}
+# Queue capacity per worker of the consuming stage
+PIPELINE_QUEUE_FACTOR = int(os.getenv('PIPELINE_QUEUE_FACTOR', 2))
+# Longest the universe stage waits for due symbols while scans are still in flight (they reschedule)
+IDLE_POLL_SECONDS = 5
+
+def _identical_targets(signal) -> bool:
+    return signal['tp1'] == signal['tp2'] == signal['tp3'] == signal['entry']
+
+class ScanConfig:
+    # What an entry point decides; the hooks are called at scan time so module globals can be swapped
+    def __init__(self, name: str, min_volume: float, min_confidence: float, chat_id: str,
+                 compute: Callable[[], object], cooling_down: Callable[[str], bool], mark_signaled: Callable[[str], None],
+                 workers: Dict[str, int], max_signals_per_minute: int = 0, select_window: int = 0,
+                 candles: int = SCAN_CANDLES, timeframes: List[str] = None,
+                 scheduler: Callable[[], object] = None, bar_evaluator: Callable[[], object] = None,
+                 claim_scan: Callable[[str], Awaitable[bool]] = None, claim_signal: Callable[[str], Awaitable[bool]] = None,
+                 on_done: Callable[['ScanJob'], None] = None):
+        self.name = name
+        self.min_volume = min_volume
+        self.min_confidence = min_confidence
+        self.chat_id = chat_id
+        self.compute = compute
+        self.cooling_down = cooling_down
+        self.mark_signaled = mark_signaled
+        # Stage -> worker count; a missing features count follows the compute pool (see stage_workers)
+        self.workers = dict(workers)
+        # 0 = no limit
+        self.max_signals_per_minute = max_signals_per_minute
+        # 0 = send every signal; N = only the most confident signal of every N symbols
+        self.select_window = select_window
+        self.candles = candles
+        self.timeframes = list(timeframes or TIMEFRAMES)
+        self.scheduler = scheduler or (lambda: None)
+        self.bar_evaluator = bar_evaluator or (lambda: None)
+        self.claim_scan = claim_scan
+        self.claim_signal = claim_signal
+        self.on_done = on_done
+
+    def stage_workers(self) -> Dict[str, int]:
+        # One features worker more than compute processes, so a process never waits for its next batch
+        counts = dict(self.workers)
+        if 'features' not in counts:
+            counts['features'] = max(getattr(self.compute(), 'workers', 0), 1) + 1
+        counts.update(STAGE_WORKER_OVERRIDES)
+        return {stage: max(int(counts.get(stage, 1)), 1) for stage in STAGES}
+
+class ScanJob:
+    __slots__ = ('symbol', 'started', 'outcome', 'details', 'volume', 'frames', 'features', 'signal', 'agreement',
+                 'evaluated', 'window')
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.started = time.perf_counter()
+        self.outcome = 'error'
+        self.details = {}
+        self.volume = 0.0
+        self.frames = None
+        # Latest-candle features from the features stage, until predict
+        self.features = None
+        self.signal = None
+        # Agreeing timeframes (None when the signal is not checked)
+        self.agreement = None
+        # (15m candle open ms, trigger levels) for the bar evaluator
+        self.evaluated = None
+        # Selection window id while the job counts towards one
+        self.window = None
+
+class ScanPipeline:
+    def __init__(self, exchange, config: ScanConfig):
+        self.exchange = exchange
+        self.config = config
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.busy = {stage: 0 for stage in STAGES}
+        self.stats = {'started': 0, 'finished': 0, 'signals': 0, 'rate_limited': 0, 'not_selected': 0}
+        self._minute = 0
+        self._minute_signals = 0
+        # window id -> [jobs not yet settled, jobs assigned, best candidate]
+        self._windows: Dict[int, list] = {}
+        self._open_window = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self.stats['started'] - self.stats['finished']
+
+    def depths(self) -> Dict[str, int]:
+        # Queued jobs per stage (waiting for a worker)
+        return {stage: queue.qsize() for stage, queue in self.queues.items()}
+
+    async def _fetch(self, job: ScanJob) -> bool:
+        # Ticker (24h volume, last price) and candles for every timeframe
+        from data.breaker import exchange_guard
+        from data.collector import fetch_candles
+        config = self.config
+        symbol = job.symbol
+        if config.cooling_down(symbol):
+            job.outcome = 'cooldown'
+            return False
+        if config.claim_scan is not None and not await config.claim_scan(symbol):
+            job.outcome = 'scanned by another replica'
+            return False
+
+        # The ticker already carries the 24h quote volume; no separate REST volume lookup
+        metrics.exchange_calls.inc(endpoint='fetch_ticker')
+        with metrics.span('ticker'):
+            ticker = await self.exchange.fetch_ticker(symbol)
+        job.volume = float(ticker.get('quoteVolume') or 0.0)
+        scheduler = config.scheduler()
+        if scheduler is not None:
+            scheduler.observe(symbol, quote_volume=job.volume)
+        if job.volume < config.min_volume:
+            job.outcome = f'low volume ${job.volume:,.2f}'
+            return False
+
+        bar_evaluator = config.bar_evaluator()
+        if bar_evaluator is not None:
+            # Same 15m candle and price inside the trigger band: the last evaluation still stands
+            reused = bar_evaluator.reuse(symbol, float(ticker.get('last') or 0.0))
+            metrics.cache_requests.inc(cache='predictions', result='hit' if reused is not None else 'miss')
+            if reused is not None:
+                job.outcome = f'cached prediction: {reused}'
+                return False
+
+        frames = []
+        for tf in config.timeframes:
+            with metrics.span('fetch_ohlcv'):
+                ohlcv = await fetch_candles(symbol, tf, limit=config.candles)
+            if ohlcv is None or len(ohlcv) < 30:
+                job.outcome = 'exchange backing off' if exchange_guard.blocked_for(['fetch_ohlcv']) else f'insufficient data for {tf}'
+                return False
+            frames.append(ohlcv)
+        job.frames = frames
+        return True
+
+    def _failed(self, job: ScanJob, result: dict) -> bool:
+        # A compute result for one symbol of a batch that raised on its own
+        if 'error' not in result:
+            return False
+        logger.error(f"[{job.symbol}] Error processing: {result['error']}")
+        job.outcome = 'error'
+        return True
+
+    async def _features(self, jobs: List[ScanJob]) -> List[bool]:
+        # Signal-timeframe indicators, swing levels and candle patterns for a batch of symbols
+        config = self.config
+        with metrics.span('compute'):
+            results = await config.compute().features([(job.symbol, job.frames, config.timeframes) for job in jobs])
+        scheduler = config.scheduler()
+        passed = []
+        for job, result in zip(jobs, results):
+            if self._failed(job, result):
+                passed.append(False)
+                continue
+            job.evaluated = (int(job.frames[0].timestamps[-1]), result.pop('triggers'))
+            latest_15m = result.pop('summary')
+            job.details.update(rsi=round(latest_15m.get('rsi', 0.0), 2), adx=round(latest_15m.get('adx', 0.0), 2))
+            if scheduler is not None and latest_15m.get('close', 0) > 0 and 'atr' in latest_15m:
+                scheduler.observe(job.symbol, atr_pct=latest_15m['atr'] / latest_15m['close'])
+            job.features = result
+            passed.append(True)
+        return passed
+
+    async def _predict(self, jobs: List[ScanJob]) -> List[bool]:
+        # Rules and the ML model over the batch's features; weak or missing signals end here
+        config = self.config
+        with metrics.span('predict'):
+            signals = await config.compute().predict([(job.symbol, job.features) for job in jobs])
+        passed = []
+        for job, signal in zip(jobs, signals):
+            job.features = None
+            if signal:
+                job.details.update(direction=signal['direction'], confidence=round(signal['confidence'], 2))
+            if not signal or signal['confidence'] < config.min_confidence:
+                job.outcome = 'no signal or low confidence'
+                job.frames = None
+                passed.append(False)
+                continue
+            job.signal = signal
+            passed.append(True)
+        return passed
+
+    async def _agreement(self, jobs: List[ScanJob]) -> List[bool]:
+        # Timeframe agreement for the batch's sendable signals (validate rejects identical TP/entry values)
+        config = self.config
+        checked = [i for i, job in enumerate(jobs) if not _identical_targets(job.signal)]
+        passed = [True] * len(jobs)
+        if checked:
+            with metrics.span('agreement'):
+                results = await config.compute().agreement([(jobs[i].symbol, jobs[i].frames, config.timeframes,
+                                                             jobs[i].signal['direction']) for i in checked])
+            for i, result in zip(checked, results):
+                if self._failed(jobs[i], result):
+                    passed[i] = False
+                else:
+                    jobs[i].agreement = result['agreement']
+        for job in jobs:
+            job.frames = None
+        return passed
+
+    async def _validate(self, job: ScanJob) -> bool:
+        # Gates a signal must pass before it may be sent
+        from core.multi_timeframe import AGREEMENT_THRESHOLD
+        from model.rules import determine_leverage
+        config = self.config
+        signal = job.signal
+        if _identical_targets(signal):
+            job.outcome = 'identical TP/entry values'
+            return False
+
+        job.details.update(agreement=job.agreement)
+        if job.agreement < AGREEMENT_THRESHOLD:
+            job.outcome = 'no multi-timeframe agreement'
+            return False
+
+        signal['quote_volume_24h'] = f"${job.volume:,.2f}"
+        # The predictor scores leverage with the rule table; older records are parsed from their conditions
+        signal['leverage'] = signal.get('leverage') or determine_leverage(signal['conditions'])
+        signal['tp1_profit'] = ((signal['tp1'] - signal['entry']) / signal['entry'] * 100) if signal['direction'] == 'buy' else ((signal['entry'] - signal['tp1']) / signal['entry'] * 100)
+        signal['tp2_profit'] = ((signal['tp2'] - signal['entry']) / signal['entry'] * 100) if signal['direction'] == 'buy' else ((signal['entry'] - signal['tp2']) / signal['entry'] * 100)
+        signal['tp3_profit'] = ((signal['tp3'] - signal['entry']) / signal['entry'] * 100) if signal['direction'] == 'buy' else ((signal['entry'] - signal['tp3']) / signal['entry'] * 100)
+        if config.claim_signal is not None and not await config.claim_signal(job.symbol):
+            job.outcome = 'cooldown (signaled by another replica)'
+            config.mark_signaled(job.symbol)
+            return False
+        job.outcome = 'validated'
+        return True
+
+    def _rate_limited(self) -> bool:
+        # Signals per calendar minute, counted when they are sent
+        limit = self.config.max_signals_per_minute
+        if not limit:
+            return False
+        minute = int(time.time() // 60)
+        if minute != self._minute:
+            self._minute, self._minute_signals = minute, 0
+        if self._minute_signals >= limit:
+            return True
+        self._minute_signals += 1
+        return False
+
+    async def _dispatch(self, job: ScanJob) -> bool:
+        if self._rate_limited():
+            job.outcome = 'max signals per minute reached'
+            self.stats['rate_limited'] += 1
+            return False
+        await self._deliver(job)
+        return False
+
+    async def _deliver(self, job: ScanJob):
+        # Log, send and start the cooldown
+        from telebot import sender
+        job.outcome = 'signal'
+        with metrics.span('dispatch'):
+            sender.update_signal_log(job.symbol, job.signal, 'pending')
+            await sender.send_signal(job.symbol, job.signal, self.config.chat_id)
+        metrics.signals_total.inc()
+        self.stats['signals'] += 1
+        self.config.mark_signaled(job.symbol)
+
+    async def _step(self, handler, job: ScanJob) -> bool:
+        # One stage for one job; False ends the job with job.outcome
+        from data.breaker import CircuitOpenError
+        try:
+            return await handler(job)
+        except CircuitOpenError:
+            job.outcome = 'exchange backing off'
+            return False
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[{job.symbol}] Error processing: {str(e)}")
+            job.outcome = 'error'
+            return False
+
+    async def _step_batch(self, handler, jobs: List[ScanJob]) -> List[bool]:
+        # One batch stage for several jobs; if the batch itself fails, every job in it ends
+        from data.breaker import CircuitOpenError
+        try:
+            return await handler(jobs)
+        except CircuitOpenError:
+            outcome = 'exchange backing off'
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing {', '.join(job.symbol for job in jobs)}: {str(e)}")
+            outcome = 'error'
+        for job in jobs:
+            job.outcome = outcome
+        return [False] * len(jobs)
+
+    def _finish(self, job: ScanJob):
+        # One summary line per symbol instead of per-step chatter
+        bar_evaluator = self.config.bar_evaluator()
+        if bar_evaluator is not None and job.evaluated is not None and job.outcome != 'error':
+            bar_evaluator.record(job.symbol, job.evaluated[0], job.evaluated[1], job.outcome)
+        elapsed = time.perf_counter() - job.started
+        metrics.symbol_seconds.observe(elapsed)
+        details = job.details
+        summary = ', '.join(f"{k}={v}" for k, v in details.items())
+        logger.info(
+            "[%s] Scan: %s in %.0fms%s", job.symbol, job.outcome, elapsed * 1000, f" ({summary})" if summary else '',
+            extra={'symbol': job.symbol, 'outcome': job.outcome, 'elapsed_ms': round(elapsed * 1000, 1), 'sample': False, **details}
+        )
+
+    async def process(self, symbol: str, dispatch: bool = True) -> ScanJob:
+        # Every stage in turn for one symbol, without queues, selection or the signal rate limit
+        job = ScanJob(symbol)
+        try:
+            if not await self._step(self._fetch, job):
+                return job
+            for handler in (self._features, self._predict, self._agreement):
+                if not (await self._step_batch(handler, [job]))[0]:
+                    return job
+            if not await self._step(self._validate, job):
+                return job
+            if dispatch:
+                await self._step(self._deliver, job)
+            return job
+        finally:
+            self._finish(job)
+
+    async def _complete(self, job: ScanJob):
+        # Job left the pipeline: log it, tell the entry point, settle its selection window
+        self._finish(job)
+        self.stats['finished'] += 1
+        if self.config.on_done is not None:
+            try:
+                self.config.on_done(job)
+            except Exception as e:
+                logger.error(f"[{job.symbol}] Scan completion hook failed: {str(e)}")
+        if job.window is not None:
+            await self._settle(job.window)
+
+    async def _settle(self, window: int):
+        entry = self._windows[window]
+        entry[0] -= 1
+        if entry[0] == 0 and window < self._open_window:
+            await self._flush(window)
+
+    async def _flush(self, window: int):
+        # Window complete: its best candidate goes on to dispatch
+        best = self._windows.pop(window)[2]
+        if best is not None:
+            await self.queues['dispatch'].put(best)
+
+    async def _close_window(self):
+        window = self._open_window
+        self._open_window += 1
+        entry = self._windows.get(window)
+        if entry is not None and entry[0] == 0:
+            await self._flush(window)
+
+    async def _select(self, job: ScanJob):
+        # Hold the most confident validated signal of the job's window; the others end here. A held job
+        # has settled its window already (window None), so it is not counted again when it completes
+        window = job.window
+        entry = self._windows[window]
+        best = entry[2]
+        held = best is None or job.signal['confidence'] > best.signal['confidence']
+        rejected = best if held else job
+        if held:
+            entry[2], job.window = job, None
+        if rejected is not None:
+            rejected.outcome = 'not selected (stronger signal in batch)'
+            self.stats['not_selected'] += 1
+            await self._complete(rejected)
+        if held:
+            await self._settle(window)
+
+    async def _worker(self, stage: str, handler, forward):
+        inbox = self.queues[stage]
+        while True:
+            job = await inbox.get()
+            try:
+                self.busy[stage] += 1
+                try:
+                    passed = await self._step(handler, job)
+                finally:
+                    self.busy[stage] -= 1
+                if passed:
+                    # Blocks while the next stage is full: backpressure towards the universe stage
+                    await forward(job)
+                else:
+                    await self._complete(job)
+            finally:
+                # Only once the job is in the next queue (or done), so join() in stage order drains
+                inbox.task_done()
+
+    async def _batch_worker(self, stage: str, handler, forward):
+        # Like _worker, on whatever is queued (up to PIPELINE_BATCH jobs) once a job arrives
+        inbox = self.queues[stage]
+        while True:
+            jobs = [await inbox.get()]
+            while len(jobs) < PIPELINE_BATCH and not inbox.empty():
+                jobs.append(inbox.get_nowait())
+            try:
+                self.busy[stage] += 1
+                try:
+                    passed = await self._step_batch(handler, jobs)
+                finally:
+                    self.busy[stage] -= 1
+                for job, ok in zip(jobs, passed):
+                    if ok:
+                        await forward(job)
+                    else:
+                        await self._complete(job)
+            finally:
+                for _ in jobs:
+                    inbox.task_done()
+
+    async def _universe(self, source: Callable[[int], Awaitable[Optional[list]]]):
+        # Pull as many symbols as the fetch queue has room for; source() waits itself when none are due
+        inbox = self.queues['fetch']
+        window_size = self.config.select_window
+        while True:
+            symbols = await source(max(inbox.maxsize - inbox.qsize(), 1))
+            if symbols is None:
+                return
+            if not symbols:
+                if window_size and self._windows.get(self._open_window):
+                    await self._close_window()
+                continue
+            for symbol in symbols:
+                job = ScanJob(symbol)
+                self.stats['started'] += 1
+                if window_size:
+                    job.window = self._open_window
+                    entry = self._windows.setdefault(job.window, [0, 0, None])
+                    entry[0] += 1
+                    entry[1] += 1
+                    if entry[1] >= window_size:
+                        await self._close_window()
+                await inbox.put(job)
+
+    async def run(self, source: Callable[[int], Awaitable[Optional[list]]]):
+        # Run until source() returns None (then drain) or the task is cancelled
+        config = self.config
+        counts = config.stage_workers()
+        # A batch stage's queue holds a full batch per worker
+        self.queues = {stage: asyncio.Queue(maxsize=counts[stage] * PIPELINE_QUEUE_FACTOR * (PIPELINE_BATCH if stage in BATCH_STAGES else 1))
+                       for stage in STAGES}
+        nexts = {stage: self.queues[following].put for stage, following in zip(STAGES, STAGES[1:])}
+        nexts['validate'] = self._select if config.select_window else self.queues['dispatch'].put
+        nexts['dispatch'] = None
+        handlers = {'fetch': self._fetch, 'features': self._features, 'predict': self._predict, 'agreement': self._agreement,
+                    'validate': self._validate, 'dispatch': self._dispatch}
+        workers = [asyncio.create_task((self._batch_worker if stage in BATCH_STAGES else self._worker)(stage, handlers[stage], nexts[stage]),
+                                       name=f"{config.name}-{stage}-{i}")
+                   for stage in STAGES for i in range(counts[stage])]
+        logger.info(f"Scan pipeline {config.name}: " + ', '.join(f"{stage} x{counts[stage]}" for stage in STAGES))
+        try:
+            await self._universe(source)
+            if config.select_window:
+                await self._close_window()
+            for stage in STAGES:
+                await self.queues[stage].join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,147 @@
+# Cheap first-stage screen over the bulk ticker table
+# Changes:
+# - Vectorized screen over fetch_tickers output for the whole USDT universe
+# - Filters on 24h volume, spread and 24h range before any OHLCV fetch
+# - Ranks survivors by 24h change, range position and volume vs. own average
+# - Tracks per-stage pass rates (ticker stages and expensive stage) for tuning
+# - Every symbol passing the thresholds is kept (ranked, best first); PRESCREEN_KEEP_RATIO opts in to
+#   scanning only the top share
+# - Stage counts are per universe refresh, and the expensive stage counts unique symbols, so rescans
+#   within a cycle cannot push a pass rate past 100%
+
+import os
+import numpy as np
+from typing import Dict, List, Set
+from utils.logger import logger
+
+MIN_QUOTE_VOLUME = 500_000
+MAX_SPREAD_PCT = 0.003
+# TP1 is at least 1% away from entry, so pairs that barely moved in 24h cannot plausibly reach it
+MIN_RANGE_PCT = 0.01
+# Share of the passing symbols to keep, best first (1 keeps all of them)
+KEEP_RATIO = float(os.getenv('PRESCREEN_KEEP_RATIO', 1.0))
+MIN_KEEP = 20
+VOLUME_EMA_ALPHA = 0.2
+# Score weights for 24h change, range-position extremity and relative volume
+CHANGE_WEIGHT = 0.4
+RANGE_WEIGHT = 0.3
+VOLUME_WEIGHT = 0.3
+
+STAGES = ['universe', 'volume', 'spread', 'range', 'ranked', 'scanned', 'signal']
+
+class TickerPrescreen:
+    def __init__(self, min_quote_volume: float = MIN_QUOTE_VOLUME, max_spread_pct: float = MAX_SPREAD_PCT,
+                 min_range_pct: float = MIN_RANGE_PCT, keep_ratio: float = KEEP_RATIO, min_keep: int = MIN_KEEP):
+        # Thresholds are plain attributes so they can be tuned at runtime
+        self.min_quote_volume = min_quote_volume
+        self.max_spread_pct = max_spread_pct
+        self.min_range_pct = min_range_pct
+        self.keep_ratio = keep_ratio
+        self.min_keep = min_keep
+        self.volume_avg: Dict[str, float] = {}
+        # Counts of the current universe refresh and of the last completed one
+        self.stage_counts: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.last_cycle_counts: Dict[str, int] = dict(self.stage_counts)
+        self.scanned: Set[str] = set()
+        self.signaled: Set[str] = set()
+        self.last_scores: Dict[str, float] = {}
+
+    def _table(self, tickers: Dict[str, dict]):
+        # Flatten ticker dicts into column arrays (NaN for missing fields)
+        symbols = list(tickers)
+        fields = ['last', 'high', 'low', 'bid', 'ask', 'percentage', 'quoteVolume']
+        table = np.full((len(symbols), len(fields)), np.nan, dtype=np.float64)
+        for i, symbol in enumerate(symbols):
+            ticker = tickers[symbol]
+            for j, field in enumerate(fields):
+                value = ticker.get(field)
+                if value is not None:
+                    table[i, j] = value
+        return symbols, table
+
+    def screen(self, tickers: Dict[str, dict]) -> List[str]:
+        # Return symbols worth the expensive OHLCV/indicator/ML stage, best first
+        try:
+            if not tickers:
+                return []
+            symbols, table = self._table(tickers)
+            last, high, low, bid, ask, change, quote_volume = table.T
+            quote_volume = np.nan_to_num(quote_volume)
+
+            avg = np.array([self.volume_avg.get(s, np.nan) for s in symbols])
+            avg = np.where(np.isnan(avg), quote_volume, avg)
+            volume_ratio = np.divide(quote_volume, avg, out=np.ones_like(quote_volume), where=avg > 0)
+            new_avg = avg + VOLUME_EMA_ALPHA * (quote_volume - avg)
+            self.volume_avg.update(zip(symbols, new_avg.tolist()))
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mid = np.where((bid > 0) & (ask > 0), (bid + ask) / 2, last)
+                spread = np.where((bid > 0) & (ask > 0), (ask - bid) / mid, 0.0)
+                price_range = high - low
+                range_pct = price_range / last
+                range_pos = np.where(price_range > 0, (last - low) / price_range, 0.5)
+            change = np.nan_to_num(change)
+
+            volume_mask = (quote_volume >= self.min_quote_volume) & (last > 0)
+            spread_mask = volume_mask & (spread <= self.max_spread_pct)
+            range_mask = spread_mask & (np.nan_to_num(range_pct) >= self.min_range_pct)
+
+            change_score = np.clip(np.abs(change) / 10.0, 0, 1)
+            range_score = np.clip(np.abs(np.nan_to_num(range_pos, nan=0.5) - 0.5) * 2, 0, 1)
+            volume_score = np.clip(volume_ratio / 2.0, 0, 1)
+            score = CHANGE_WEIGHT * change_score + RANGE_WEIGHT * range_score + VOLUME_WEIGHT * volume_score
+            score = np.where(range_mask, score, -1.0)
+
+            passed = int(range_mask.sum())
+            keep = passed
+            if self.keep_ratio < 1:
+                keep = min(passed, max(int(np.ceil(passed * self.keep_ratio)), self.min_keep))
+            order = np.argsort(-score, kind='stable')[:keep]
+            survivors = [symbols[i] for i in order]
+            self.last_scores = {symbols[i]: float(score[i]) for i in order}
+
+            counts = {
+                'universe': len(symbols),
+                'volume': int(volume_mask.sum()),
+                'spread': int(spread_mask.sum()),
+                'range': passed,
+                'ranked': len(survivors)
+            }
+            self.start_cycle()
+            self.stage_counts.update(counts)
+            logger.info(
+                f"Prescreen: {counts['universe']} tickers -> volume {counts['volume']} -> spread {counts['spread']}"
+                f" -> range {counts['range']} -> ranked {counts['ranked']}"
+            )
+            return survivors
+        except Exception as e:
+            logger.error(f"Error in ticker prescreen: {str(e)}")
+            return [s for s, t in tickers.items() if (t.get('quoteVolume') or 0) >= self.min_quote_volume]
+
+    def start_cycle(self):
+        # Close the current universe refresh's counts (reported by pass_rates) and start new ones
+        self.last_cycle_counts = dict(self.stage_counts)
+        self.stage_counts = {stage: 0 for stage in STAGES}
+        self.scanned.clear()
+        self.signaled.clear()
+
+    def record_outcome(self, symbol: str, signaled: bool):
+        # Record a survivor going through the expensive stage; rescans of a symbol count once
+        self.scanned.add(symbol)
+        if signaled:
+            self.signaled.add(symbol)
+        self.stage_counts['scanned'] = len(self.scanned)
+        self.stage_counts['signal'] = len(self.signaled)
+
+    def pass_rates(self) -> Dict[str, float]:
+        # Pass rate of each stage relative to the previous one over the last completed cycle
+        counts = self.last_cycle_counts
+        rates = {}
+        for prev, stage in zip(STAGES, STAGES[1:]):
+            base = counts[prev]
+            rates[stage] = counts[stage] / base if base else 0.0
+        return rates
+
+    def log_pass_rates(self):
+        rates = self.pass_rates()
+        logger.info("Prescreen pass rates: " + ", ".join(f"{stage} {rate:.1%}" for stage, rate in rates.items()))
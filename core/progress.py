@@ -0,0 +1,127 @@
+# Scan cycle progress and throughput tracking for the HTTP status endpoints
+# Changes:
+# - Tracks current cycle progress, symbols/sec over a sliding window and last cycle duration
+# - Queue depths and cache hit rates come from registered callables so sources stay decoupled
+
+import time
+from collections import deque
+from typing import Callable, Dict
+
+THROUGHPUT_WINDOW = 300
+
+class ScanProgress:
+    def __init__(self, window: float = THROUGHPUT_WINDOW):
+        self.window = window
+        self.state = 'idle'
+        self.started_at = time.time()
+        self.cycle = 0
+        self.cycle_started_at = None
+        self.cycle_total = 0
+        self.cycle_done = 0
+        self.cycle_signals = 0
+        self.last_cycle_duration = None
+        self.last_cycle_symbols = 0
+        self.symbols_scanned = 0
+        self.signals_generated = 0
+        self.restarts = 0
+        self.last_error = None
+        self._events = deque()
+        self._queues: Dict[str, Callable[[], int]] = {}
+        self._caches: Dict[str, Callable[[], dict]] = {}
+
+    def register_queue(self, name: str, depth: Callable[[], int]):
+        self._queues[name] = depth
+
+    def register_cache(self, name: str, stats: Callable[[], dict]):
+        # stats() must return a dict with 'hits' and 'misses'
+        self._caches[name] = stats
+
+    def set_state(self, state: str, error: str = None):
+        self.state = state
+        if error:
+            self.last_error = error
+
+    def record_restart(self, error: str):
+        self.restarts += 1
+        self.set_state('restarting', error)
+
+    def start_cycle(self, total: int):
+        # Close the running cycle (if any) and start counting a new one
+        now = time.time()
+        if self.cycle_started_at is not None:
+            self.last_cycle_duration = now - self.cycle_started_at
+            self.last_cycle_symbols = self.cycle_done
+        self.cycle += 1
+        self.cycle_started_at = now
+        self.cycle_total = total
+        self.cycle_done = 0
+        self.cycle_signals = 0
+        self.state = 'scanning'
+
+    def record_batch(self, scanned: int, signals: int = 0):
+        now = time.time()
+        self.cycle_done += scanned
+        self.cycle_signals += signals
+        self.symbols_scanned += scanned
+        self.signals_generated += signals
+        self._events.append((now, scanned))
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+    def symbols_per_second(self) -> float:
+        now = time.time()
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+        if not self._events:
+            return 0.0
+        span = max(min(self.window, now - self.started_at), 1e-6)
+        return sum(count for _, count in self._events) / span
+
+    def queue_depths(self) -> Dict[str, int]:
+        depths = {}
+        for name, depth in self._queues.items():
+            try:
+                depths[name] = int(depth())
+            except Exception:
+                depths[name] = -1
+        return depths
+
+    def cache_hit_rates(self) -> Dict[str, dict]:
+        caches = {}
+        for name, stats in self._caches.items():
+            try:
+                data = dict(stats())
+            except Exception:
+                continue
+            hits, misses = data.get('hits', 0), data.get('misses', 0)
+            data['hit_rate'] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+            caches[name] = data
+        return caches
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            'state': self.state,
+            'uptime_s': round(now - self.started_at, 1),
+            'cycle': {
+                'number': self.cycle,
+                'done': self.cycle_done,
+                'total': self.cycle_total,
+                'percent': round(100.0 * self.cycle_done / self.cycle_total, 1) if self.cycle_total else 0.0,
+                'elapsed_s': round(now - self.cycle_started_at, 1) if self.cycle_started_at else None,
+                'signals': self.cycle_signals
+            },
+            'last_cycle': {
+                'duration_s': round(self.last_cycle_duration, 1) if self.last_cycle_duration is not None else None,
+                'symbols': self.last_cycle_symbols
+            },
+            'throughput': {
+                'symbols_per_sec': round(self.symbols_per_second(), 3),
+                'window_s': self.window,
+                'symbols_scanned': self.symbols_scanned,
+                'signals_generated': self.signals_generated
+            },
+            'queues': self.queue_depths(),
+            'restarts': self.restarts,
+            'last_error': self.last_error
+        }
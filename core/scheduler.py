@@ -0,0 +1,182 @@
+# Priority-based scan scheduling for USDT pairs
+# Changes:
+# - Added heap of next-due times so symbols are scanned by urgency, not markets order
+# - Scan interval derived from recent ATR%, 24h volume rank and recent signal activity
+# - Every symbol keeps a minimum refresh guarantee (max_interval)
+# - get_state/set_state for warm-restart snapshots
+# - reschedule() accepts an explicit due time (bar-close evaluation)
+# - The signal-activity boost starts when the symbol's signal cooldown ends (no boost while it cannot
+#   signal), and signal times older than cooldown + boost window are pruned, also from snapshots
+
+import heapq
+import itertools
+import time
+from typing import Dict, Iterable, List, Optional
+from utils.logger import logger
+
+MIN_SCAN_INTERVAL = 60
+MAX_SCAN_INTERVAL = 1200
+SIGNAL_ACTIVITY_WINDOW = 6 * 3600
+# 15m ATR of 2% of price is treated as "fully volatile"
+ATR_PCT_REFERENCE = 0.02
+# Score weights for volatility, liquidity and recent signals
+ATR_WEIGHT = 0.45
+VOLUME_WEIGHT = 0.35
+SIGNAL_WEIGHT = 0.20
+
+class SymbolScheduler:
+    def __init__(self, min_interval: float = MIN_SCAN_INTERVAL, max_interval: float = MAX_SCAN_INTERVAL,
+                 signal_window: float = SIGNAL_ACTIVITY_WINDOW, cooldown: float = 0):
+        # Heap entries are (due_time, seq, symbol); _due holds the authoritative due time
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.signal_window = signal_window
+        self.cooldown = cooldown
+        self._heap = []
+        self._due: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._atr_pct: Dict[str, float] = {}
+        self._volume: Dict[str, float] = {}
+        self._volume_rank: Dict[str, float] = {}
+        self._last_signal: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._due
+
+    def _push(self, symbol: str, due: float):
+        self._due[symbol] = due
+        heapq.heappush(self._heap, (due, next(self._seq), symbol))
+
+    def sync_universe(self, symbols: Iterable[str], now: Optional[float] = None):
+        # Add new symbols (due immediately) and forget symbols no longer in the universe
+        now = time.time() if now is None else now
+        symbols = set(symbols)
+        added = 0
+        for symbol in symbols:
+            if symbol not in self._due:
+                self._push(symbol, now)
+                added += 1
+        removed = [s for s in self._due if s not in symbols]
+        for symbol in removed:
+            del self._due[symbol]
+            self._atr_pct.pop(symbol, None)
+            self._volume.pop(symbol, None)
+            self._volume_rank.pop(symbol, None)
+        if removed:
+            # Drop stale heap entries in one pass instead of lazily
+            self._heap = [entry for entry in self._heap if entry[2] in self._due]
+            heapq.heapify(self._heap)
+        logger.info(f"Scheduler universe: {len(self._due)} symbols (+{added}, -{len(removed)})")
+
+    def update_volumes(self, volumes: Dict[str, float]):
+        # Store 24h quote volumes and recompute percentile ranks (1.0 = most liquid)
+        self._volume.update({s: float(v or 0.0) for s, v in volumes.items()})
+        ranked = sorted(self._volume, key=self._volume.get)
+        count = len(ranked)
+        if count == 0:
+            self._volume_rank = {}
+            return
+        denom = max(count - 1, 1)
+        self._volume_rank = {symbol: i / denom for i, symbol in enumerate(ranked)}
+
+    def observe(self, symbol: str, atr_pct: Optional[float] = None, quote_volume: Optional[float] = None):
+        # Record fresh per-symbol measurements from a scan
+        if atr_pct is not None and atr_pct == atr_pct and atr_pct >= 0:
+            self._atr_pct[symbol] = float(atr_pct)
+        if quote_volume is not None:
+            self._volume[symbol] = float(quote_volume)
+
+    def record_signal(self, symbol: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._last_signal[symbol] = now
+        self._prune_signals(now)
+
+    def _prune_signals(self, now: float):
+        # Forget signals whose boost window (which starts after the cooldown) has passed
+        horizon = now - self.cooldown - self.signal_window
+        for symbol in [s for s, at in self._last_signal.items() if at <= horizon]:
+            del self._last_signal[symbol]
+
+    def priority(self, symbol: str, now: Optional[float] = None) -> float:
+        # Priority score in [0, 1]; unknown inputs count as neutral
+        now = time.time() if now is None else now
+        atr_pct = self._atr_pct.get(symbol)
+        atr_score = 0.5 if atr_pct is None else min(atr_pct / ATR_PCT_REFERENCE, 1.0)
+        volume_score = self._volume_rank.get(symbol, 0.5)
+        signal_score = 0.0
+        last_signal = self._last_signal.get(symbol)
+        if last_signal is not None:
+            # Age since the cooldown ended; a symbol still cooling down gets no boost
+            age = now - last_signal - self.cooldown
+            if 0 <= age < self.signal_window:
+                signal_score = 1.0 - age / self.signal_window
+        return ATR_WEIGHT * atr_score + VOLUME_WEIGHT * volume_score + SIGNAL_WEIGHT * signal_score
+
+    def interval(self, symbol: str, now: Optional[float] = None) -> float:
+        # Higher priority -> shorter interval, never longer than max_interval
+        score = self.priority(symbol, now)
+        return self.max_interval - score * (self.max_interval - self.min_interval)
+
+    def reschedule(self, symbol: str, signaled: bool = False, now: Optional[float] = None, due: Optional[float] = None):
+        # Schedule the next scan after a symbol has been processed (at `due` if given)
+        if symbol not in self._due:
+            return
+        now = time.time() if now is None else now
+        if signaled:
+            self.record_signal(symbol, now)
+        self._push(symbol, now + self.interval(symbol, now) if due is None else due)
+
+    def pop_due(self, limit: int, now: Optional[float] = None) -> List[str]:
+        # Pop up to `limit` due symbols, most overdue first
+        now = time.time() if now is None else now
+        batch = []
+        while self._heap and len(batch) < limit:
+            due, _, symbol = self._heap[0]
+            if self._due.get(symbol) != due:
+                heapq.heappop(self._heap)
+                continue
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            # Keep a placeholder due time so a crash mid-scan never loses the symbol
+            self._due[symbol] = now + self.max_interval
+            heapq.heappush(self._heap, (self._due[symbol], next(self._seq), symbol))
+            batch.append(symbol)
+        return batch
+
+    def due_count(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        return sum(1 for due in self._due.values() if due <= now)
+
+    def next_due_in(self, now: Optional[float] = None) -> float:
+        # Seconds until the next symbol becomes due (0 if one is already due)
+        now = time.time() if now is None else now
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return float(self.max_interval)
+        return max(self._heap[0][0] - now, 0.0)
+
+    def get_state(self) -> dict:
+        # Plain-dict state for warm-restart snapshots
+        self._prune_signals(time.time())
+        return {
+            'due': dict(self._due),
+            'atr_pct': dict(self._atr_pct),
+            'volume': dict(self._volume),
+            'last_signal': dict(self._last_signal)
+        }
+
+    def set_state(self, state: dict):
+        # Restore state produced by get_state
+        self._heap = []
+        self._due = {}
+        for symbol, due in state.get('due', {}).items():
+            self._push(symbol, due)
+        self._atr_pct.update(state.get('atr_pct', {}))
+        self._last_signal.update(state.get('last_signal', {}))
+        self._prune_signals(time.time())
+        self.update_volumes(state.get('volume', {}))
@@ -0,0 +1,267 @@
+# Horizontal sharding of the symbol universe across replicas
+# Changes:
+# - Consistent-hash ring (blake2b, virtual nodes) so every replica computes the same owner per symbol
+# - SHARD_INDEX / SHARD_COUNT from configuration; SHARD_STORE coordinates live replicas and claims
+# - Shared store backends: SQLite file on a shared volume, Redis, or an in-process Redis stand-in
+# - Replicas heartbeat into the store; the ring is built from live replicas, so adding or losing one
+#   moves only ~1/N of the symbols, and per-symbol scan/signal claims stop double scans and signals
+#   while replicas disagree during a rebalance
+# - Claims are re-entrant for their owner (a replica renews its own scan claim when it rescans early)
+# - A replica with a store owns no symbols until one heartbeat period after it joined, so replicas that
+#   start together see each other before taking their share
+
+import bisect
+import fnmatch
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from utils.logger import logger
+
+SHARD_INDEX = int(os.getenv('SHARD_INDEX', 0))
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 1))
+# sqlite:///path/to/shards.db, redis://host:6379/0 or memory:// (single process, tests)
+SHARD_STORE = os.getenv('SHARD_STORE', '')
+SHARD_HEARTBEAT_TTL = float(os.getenv('SHARD_HEARTBEAT_TTL', 30))
+RING_VNODES = 64
+
+def _hash(value: str) -> int:
+    # Stable across processes and Python versions (unlike hash())
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+class HashRing:
+    def __init__(self, members: Iterable[str], vnodes: int = RING_VNODES):
+        self.members = sorted(set(members))
+        points = sorted((_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+class SQLiteStore:
+    # Claims and heartbeats in one SQLite file; every operation is a single atomic statement
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS members (member TEXT PRIMARY KEY, expires REAL, info TEXT)")
+
+    def claim(self, key: str, owner: str, ttl: float) -> bool:
+        # Take (or renew) key for ttl seconds unless another owner holds an unexpired claim
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO claims (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE claims.expires <= ? OR claims.owner = excluded.owner",
+                (key, owner, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+    def heartbeat(self, member: str, ttl: float, info: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO members (member, expires, info) VALUES (?, ?, ?) "
+                "ON CONFLICT(member) DO UPDATE SET expires = excluded.expires, info = excluded.info",
+                (member, now + ttl, json.dumps(info))
+            )
+            self._conn.execute("DELETE FROM claims WHERE expires <= ?", (now,))
+
+    def leave(self, member: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM members WHERE member = ?", (member,))
+
+    def members(self) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT member, info FROM members WHERE expires > ?", (time.time(),)).fetchall()
+        return {member: json.loads(info) for member, info in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class MemoryRedis:
+    # In-process stand-in for the subset of the redis-py client RedisStore uses (set NX/XX/PX, get, delete, scan_iter)
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, name: str):
+        entry = self._data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[name]
+            return None
+        return entry
+
+    def set(self, name: str, value, nx: bool = False, xx: bool = False, px: int = None, ex: float = None):
+        with self._lock:
+            alive = self._alive(name) is not None
+            if (nx and alive) or (xx and not alive):
+                return None
+            ttl = px / 1000 if px is not None else ex
+            self._data[name] = (value if isinstance(value, bytes) else str(value).encode(), time.time() + ttl if ttl else None)
+            return True
+
+    def get(self, name: str):
+        with self._lock:
+            entry = self._alive(name)
+            return entry[0] if entry else None
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def scan_iter(self, match: str = '*'):
+        with self._lock:
+            names = [name for name in list(self._data) if self._alive(name) is not None and fnmatch.fnmatchcase(name, match)]
+        return iter(name.encode() for name in names)
+
+    def close(self):
+        pass
+
+class RedisStore:
+    # Claims are SET NX PX; heartbeats are keys that expire with the member
+    def __init__(self, client, prefix: str = 'csb:shard:'):
+        self.client = client
+        self.prefix = prefix
+
+    def claim(self, key: str, owner: str, ttl: float) -> bool:
+        # SET NX takes a free key; the owner renews its own with SET XX (the key is far from expiring then,
+        # so another replica cannot take it between the GET and the SET)
+        name = f"{self.prefix}claim:{key}"
+        if self.client.set(name, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        value = self.client.get(name)
+        if value is None or (value.decode() if isinstance(value, bytes) else value) != owner:
+            return False
+        return bool(self.client.set(name, owner, xx=True, px=int(ttl * 1000)))
+
+    def heartbeat(self, member: str, ttl: float, info: dict):
+        self.client.set(f"{self.prefix}member:{member}", json.dumps(info), px=int(ttl * 1000))
+
+    def leave(self, member: str):
+        self.client.delete(f"{self.prefix}member:{member}")
+
+    def members(self) -> Dict[str, dict]:
+        members = {}
+        prefix = f"{self.prefix}member:"
+        for name in self.client.scan_iter(match=prefix + '*'):
+            name = name.decode() if isinstance(name, bytes) else name
+            value = self.client.get(name)
+            if value is not None:
+                members[name[len(prefix):]] = json.loads(value)
+        return members
+
+    def close(self):
+        self.client.close()
+
+def open_store(url: str):
+    # sqlite:///path, redis://..., memory:// -> store instance (None for an empty url)
+    if not url:
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        import redis
+        return RedisStore(redis.Redis.from_url(url))
+    if url.startswith('memory://'):
+        return RedisStore(MemoryRedis())
+    raise ValueError(f"Unsupported SHARD_STORE {url!r}")
+
+class ShardCoordinator:
+    def __init__(self, shard_index: int = SHARD_INDEX, shard_count: int = SHARD_COUNT, store=None,
+                 heartbeat_ttl: float = SHARD_HEARTBEAT_TTL, clock=time.time):
+        # Without a store the ring is static (shard-0..shard-{count-1}); with one it follows live replicas
+        if not 0 <= shard_index < max(shard_count, 1):
+            raise ValueError(f"SHARD_INDEX {shard_index} outside 0..{shard_count - 1}")
+        self.shard_index = shard_index
+        self.shard_count = max(shard_count, 1)
+        self.member = f"shard-{shard_index}"
+        self.store = store
+        self.heartbeat_ttl = heartbeat_ttl
+        self.clock = clock
+        self.last_heartbeat = 0.0
+        self.joined_at = None
+        # A static ring is known up front; a live one only after a heartbeat period of peer views
+        self.ready = store is None
+        self.ring = HashRing([f"shard-{i}" for i in range(self.shard_count)])
+
+    @property
+    def enabled(self) -> bool:
+        return self.shard_count > 1 or self.store is not None
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return self.heartbeat_ttl / 3
+
+    def heartbeat(self) -> bool:
+        # Announce this replica and rebuild the ring from live replicas; True if ownership changed
+        if self.store is None:
+            return False
+        self.store.heartbeat(self.member, self.heartbeat_ttl, {'shard_count': self.shard_count, 'pid': os.getpid()})
+        self.last_heartbeat = self.clock()
+        if self.joined_at is None:
+            self.joined_at = self.last_heartbeat
+        live = set(self.store.members()) | {self.member}
+        changed = live != set(self.ring.members)
+        if changed:
+            logger.info(f"Shard ring changed: {sorted(self.ring.members)} -> {sorted(live)}")
+            self.ring = HashRing(live)
+        if not self.ready and self.last_heartbeat - self.joined_at >= self.heartbeat_interval:
+            # Replicas that started with this one have heartbeated by now
+            self.ready = True
+            logger.info(f"{self.member} taking its share of symbols, live replicas {self.ring.members}")
+            return True
+        return changed and self.ready
+
+    def heartbeat_due(self) -> bool:
+        return self.store is not None and self.heartbeat_in() <= 0
+
+    def heartbeat_in(self) -> float:
+        # Seconds until the next heartbeat is due (inf without a store)
+        if self.store is None:
+            return float('inf')
+        return max(self.last_heartbeat + self.heartbeat_interval - self.clock(), 0.0)
+
+    def owns(self, symbol: str) -> bool:
+        return self.ready and self.ring.owner(symbol) == self.member
+
+    def assign(self, symbols: Iterable[str]) -> List[str]:
+        # This replica's share of the universe
+        return [symbol for symbol in symbols if self.owns(symbol)]
+
+    def claim_scan(self, symbol: str, ttl: float) -> bool:
+        # False if another replica claimed symbol less than its ttl ago (only possible mid-rebalance)
+        return self.store is None or self.store.claim(f"scan:{symbol}", self.member, ttl)
+
+    def claim_signal(self, symbol: str, cooldown: float) -> bool:
+        # Shared cooldown: only one signal per symbol per cooldown across all replicas
+        return self.store is None or self.store.claim(f"signal:{symbol}", self.member, cooldown)
+
+    def leave(self):
+        if self.store is not None:
+            try:
+                self.store.leave(self.member)
+            except Exception as e:
+                logger.error(f"Error leaving shard ring: {str(e)}")
+
+def coordinator_from_env() -> Optional[ShardCoordinator]:
+    # None when sharding is not configured
+    store = open_store(SHARD_STORE)
+    coordinator = ShardCoordinator(SHARD_INDEX, SHARD_COUNT, store)
+    if not coordinator.enabled:
+        return None
+    if store is None:
+        logger.warning("SHARD_COUNT > 1 without SHARD_STORE: static split, no shared cooldown or rebalancing")
+    return coordinator
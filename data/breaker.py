@@ -0,0 +1,266 @@
+# Circuit breakers, backoff and retry budgets for exchange requests
+# Changes:
+# - One circuit breaker per exchange endpoint: closed -> open after BREAKER_FAILURES consecutive network
+#   errors, half-open after the open period (one probe request), closed again on a successful probe
+# - Open periods grow exponentially (BREAKER_OPEN_SECONDS doubling up to BREAKER_MAX_OPEN_SECONDS) with
+#   jitter so replicas do not probe in lockstep
+# - RateLimitExceeded / DDoSProtection (429/418) open every breaker at once, since Binance limits are per
+#   IP; the exchange's "retry after" hint is honoured when the error carries one
+# - Timeouts and other network errors are retried with full-jitter exponential backoff, paid from a
+#   per-cycle retry budget (EXCHANGE_RETRY_BUDGET) so an incident cannot multiply the request volume
+# - Breaker state, trips, rejected requests and retries exported through utils.metrics
+
+import asyncio
+import os
+import random
+import re
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from ccxt.base.errors import DDoSProtection, ExchangeNotAvailable, NetworkError, RateLimitExceeded
+from utils.logger import logger
+from utils.metrics import exchange_breaker_state, exchange_breaker_trips, exchange_errors, exchange_retries
+
+EXCHANGE_GUARD = os.getenv('EXCHANGE_GUARD', '1') != '0'
+# Consecutive network errors that open an endpoint's breaker
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+# First open period; doubles with every failed half-open probe, up to the max (an outage is probed at
+# least that often, so scanning resumes within about that long after it ends)
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 5))
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv('BREAKER_MAX_OPEN_SECONDS', 30))
+# Open period after a 429/418 that does not say how long to wait
+BREAKER_RATE_LIMIT_SECONDS = float(os.getenv('BREAKER_RATE_LIMIT_SECONDS', 60))
+# Retries per request for network errors, and their backoff
+RETRY_ATTEMPTS = int(os.getenv('EXCHANGE_RETRY_ATTEMPTS', 2))
+RETRY_BASE_DELAY = float(os.getenv('EXCHANGE_RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.getenv('EXCHANGE_RETRY_MAX_DELAY', 8))
+# Retries allowed per scan cycle across all endpoints
+EXCHANGE_RETRY_BUDGET = int(os.getenv('EXCHANGE_RETRY_BUDGET', 50))
+# Extra open time as a fraction of the period, drawn at random
+BREAKER_JITTER = 0.2
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+_RETRY_AFTER = re.compile(r'retry after ([\d.]+)\s*s', re.IGNORECASE)
+
+class CircuitOpenError(ExchangeNotAvailable):
+    # Raised without contacting the exchange while an endpoint's breaker is open
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"{endpoint} circuit open, retry in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+def classify(error: Exception) -> Optional[str]:
+    # 'rate_limit', 'network' or None (the exchange answered: bad symbol, bad arguments, ...)
+    if isinstance(error, CircuitOpenError):
+        return None
+    if isinstance(error, (RateLimitExceeded, DDoSProtection)):
+        return 'rate_limit'
+    if isinstance(error, (NetworkError, asyncio.TimeoutError, ConnectionError)):
+        return 'network'
+    return None
+
+def retry_after(error: Exception) -> Optional[float]:
+    # Seconds to wait when the error message carries a hint ("... retry after 12.5s")
+    match = _RETRY_AFTER.search(str(error))
+    return float(match.group(1)) if match else None
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY, rng=random.random) -> float:
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return rng() * min(cap, base * 2 ** attempt)
+
+class CircuitBreaker:
+    def __init__(self, endpoint: str, failures: int = BREAKER_FAILURES, open_seconds: float = BREAKER_OPEN_SECONDS,
+                 max_open_seconds: float = BREAKER_MAX_OPEN_SECONDS, clock=time.monotonic, rng=random.random):
+        self.endpoint = endpoint
+        self.failure_threshold = max(failures, 1)
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(max_open_seconds, open_seconds)
+        self.clock = clock
+        self.rng = rng
+        self.state = CLOSED
+        self.failures = 0
+        # Openings since the breaker was last closed; sets the next open period
+        self.trips = 0
+        self.open_until = 0.0
+        self._probing = False
+        exchange_breaker_state.set(STATE_VALUES[CLOSED], endpoint=endpoint)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.info(f"Exchange breaker {self.endpoint}: {self.state} -> {state}")
+            self.state = state
+            exchange_breaker_state.set(STATE_VALUES[state], endpoint=self.endpoint)
+
+    def retry_in(self, now: float = None) -> float:
+        # Seconds until this breaker lets a request through (0 when it would now)
+        now = self.clock() if now is None else now
+        if self.state == OPEN:
+            return max(self.open_until - now, 0.0)
+        if self.state == HALF_OPEN and self._probing:
+            return self.open_seconds
+        return 0.0
+
+    def allow(self) -> bool:
+        # Whether a request may go out now; in half-open state only the first caller (the probe) may
+        if self.state == OPEN and self.clock() >= self.open_until:
+            self._set_state(HALF_OPEN)
+            self._probing = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        # The probe never finished (cancelled): let the next caller probe
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.trips = 0
+        self._probing = False
+        self._set_state(CLOSED)
+
+    def record_failure(self, kind: str, hint: float = None):
+        self.failures += 1
+        if kind == 'rate_limit' or self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip(kind, hint)
+
+    def trip(self, reason: str, hint: float = None):
+        # Open for the next backoff period (or the exchange's own hint), plus jitter
+        self.trips += 1
+        period = min(self.open_seconds * 2 ** (self.trips - 1), self.max_open_seconds)
+        if reason == 'rate_limit':
+            period = hint if hint is not None else max(period, BREAKER_RATE_LIMIT_SECONDS)
+        period *= 1 + BREAKER_JITTER * self.rng()
+        self.open_until = max(self.open_until, self.clock() + period)
+        self.failures = 0
+        self._probing = False
+        exchange_breaker_trips.inc(endpoint=self.endpoint, reason=reason)
+        if self.state != OPEN:
+            logger.warning(f"Exchange breaker {self.endpoint} open for {period:.1f}s after {reason}")
+        self._set_state(OPEN)
+
+class RetryBudget:
+    # Retries allowed until the next reset (start of a scan cycle)
+    def __init__(self, per_cycle: int = EXCHANGE_RETRY_BUDGET):
+        self.per_cycle = per_cycle
+        self.remaining = per_cycle
+        self.stats = {'spent': 0, 'denied': 0}
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            self.stats['denied'] += 1
+            return False
+        self.remaining -= 1
+        self.stats['spent'] += 1
+        return True
+
+    def reset(self):
+        self.remaining = self.per_cycle
+
+class ExchangeGuard:
+    # Process-wide breakers and retry budget; exchange sessions share them, like they share the IP limit
+    def __init__(self, budget: RetryBudget = None, attempts: int = RETRY_ATTEMPTS, clock=time.monotonic,
+                 rng=random.random, sleep=asyncio.sleep, **breaker_options):
+        self.budget = budget if budget is not None else RetryBudget()
+        self.attempts = attempts
+        self.clock = clock
+        self.rng = rng
+        self.sleep = sleep
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats = {'requests': 0, 'failures': 0, 'rejected': 0, 'retries': 0}
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(endpoint, clock=self.clock, rng=self.rng, **self.breaker_options)
+        return breaker
+
+    def blocked_for(self, endpoints: Iterable[str]) -> float:
+        # Seconds until every one of the endpoints accepts requests again (0 if they all do now)
+        now = self.clock()
+        return max((self.breakers[e].retry_in(now) for e in endpoints if e in self.breakers), default=0.0)
+
+    def states(self) -> dict:
+        return {endpoint: breaker.state for endpoint, breaker in self.breakers.items()}
+
+    def start_cycle(self):
+        self.budget.reset()
+
+    def _failed(self, endpoint: str, breaker: CircuitBreaker, kind: str, error: Exception):
+        self.stats['failures'] += 1
+        exchange_errors.inc(endpoint=endpoint, kind=kind)
+        if kind == 'rate_limit':
+            # The weight limit is per IP: every endpoint is banned, not just the one that hit it
+            hint = retry_after(error)
+            for other in list(self.breakers.values()):
+                if other is not breaker:
+                    other.trip(kind, hint)
+            breaker.record_failure(kind, hint)
+        else:
+            breaker.record_failure(kind)
+
+    async def call(self, endpoint: str, request: Callable[[], Awaitable]):
+        # request() through the endpoint's breaker, retrying network errors while budget remains
+        breaker = self.breaker(endpoint)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.stats['rejected'] += 1
+                exchange_errors.inc(endpoint=endpoint, kind='circuit_open')
+                raise CircuitOpenError(endpoint, breaker.retry_in())
+            self.stats['requests'] += 1
+            try:
+                response = await request()
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                kind = classify(e)
+                if kind is None:
+                    # The exchange answered; the request itself was wrong
+                    breaker.record_success()
+                    raise
+                self._failed(endpoint, breaker, kind, e)
+                if kind != 'network' or attempt >= self.attempts or breaker.state != CLOSED:
+                    raise
+                if not self.budget.take():
+                    exchange_retries.inc(endpoint=endpoint, outcome='budget_exhausted')
+                    raise
+                delay = backoff_delay(attempt, rng=self.rng)
+                attempt += 1
+                self.stats['retries'] += 1
+                exchange_retries.inc(endpoint=endpoint, outcome='retried')
+                logger.debug("Retrying %s in %.2fs after %s (attempt %d)", endpoint, delay, e, attempt)
+                await self.sleep(delay)
+                continue
+            breaker.record_success()
+            return response
+
+class GuardedExchange:
+    # Transparent proxy: market data calls go through the ExchangeGuard, everything else passes through
+    def __init__(self, inner, guard: ExchangeGuard, methods: Iterable[str]):
+        self._inner = inner
+        self._guard = guard
+        self._methods = frozenset(methods)
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name not in self._methods:
+            return attr
+
+        async def guarded(*args, **kwargs):
+            return await self._guard.call(name, lambda: attr(*args, **kwargs))
+        return guarded
+
+    async def close(self):
+        await self._inner.close()
+
+exchange_guard = ExchangeGuard()
+
+def guarded(exchange, methods: Iterable[str]):
+    # Wrap an exchange session in the process-wide guard (unchanged when EXCHANGE_GUARD=0)
+    return GuardedExchange(exchange, exchange_guard, methods) if EXCHANGE_GUARD else exchange
@@ -0,0 +1,274 @@
+# Shared-memory candle store: every process on the host reads the same candle histories
+# Changes:
+# - One named shared-memory segment (or an mmap'd file) with a fixed header, a slot table and one
+#   ring region per (symbol, timeframe); CANDLE_STORE=shm (default), a file path, or off
+# - Rings are mirrored (each candle is written at i and i + capacity), so the latest N candles are
+#   always one contiguous slice and readers get zero-copy NumPy views
+# - Seqlock per slot: the single writer (the collector) makes the sequence odd while it writes and even
+#   when done; readers run on the views and retry if the sequence moved, so they never use torn bars
+# - Least recently written slot is reused when the table is full (on_evict tells the owner)
+
+import atexit
+import mmap
+import os
+import time
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from data.candles import CandleSeries, PRICE_COLUMNS
+from utils.logger import logger
+
+CANDLE_STORE = os.getenv('CANDLE_STORE', 'shm')
+CANDLE_STORE_SLOTS = int(os.getenv('CANDLE_STORE_SLOTS', 4096))
+# Candles kept per (symbol, timeframe); matches the collector's fetch size
+CANDLE_STORE_CAPACITY = int(os.getenv('CANDLE_STORE_CAPACITY', 100))
+STORE_MAGIC = b'CSBCNDL1'
+STORE_VERSION = 1
+KEY_BYTES = 48
+READ_RETRIES = 1000
+
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('slots', '<u4'), ('capacity', '<u4'), ('used', '<u4')])
+SLOT = np.dtype([('seq', '<u8'), ('count', '<i8'), ('head', '<i8'), ('written_at', '<f8'), ('key', f'S{KEY_BYTES}')])
+HEADER_SIZE = 64
+
+def _layout(slots: int, capacity: int) -> Tuple[int, int, int]:
+    # Offsets of the timestamp and value regions and the total size
+    ts_offset = HEADER_SIZE + slots * SLOT.itemsize
+    ts_offset += -ts_offset % 64
+    values_offset = ts_offset + slots * 2 * capacity * 8
+    size = values_offset + slots * 2 * capacity * len(PRICE_COLUMNS) * 4
+    return ts_offset, values_offset, size
+
+def _key(symbol: str, timeframe: str) -> bytes:
+    key = f"{symbol}|{timeframe}".encode()
+    if len(key) > KEY_BYTES:
+        raise ValueError(f"Candle store key too long: {key!r}")
+    return key
+
+class CandleStore:
+    def __init__(self, buf, spec: str, owner: bool, release: Callable[[], None]):
+        # Use create() or attach()
+        self.spec = spec
+        self.owner = owner
+        self.on_evict: Optional[Callable[[str, str], None]] = None
+        self.stats = {'writes': 0, 'reads': 0, 'retries': 0, 'evictions': 0}
+        self._release = release
+        self._header = np.ndarray((), HEADER, buf, 0)
+        if bytes(self._header['magic']) != STORE_MAGIC or int(self._header['version']) != STORE_VERSION:
+            raise ValueError(f"{spec} is not a version {STORE_VERSION} candle store")
+        self.slots = int(self._header['slots'])
+        self.capacity = int(self._header['capacity'])
+        ts_offset, values_offset, _ = _layout(self.slots, self.capacity)
+        table = np.ndarray((self.slots,), SLOT, buf, HEADER_SIZE)
+        self._seq, self._count, self._head = table['seq'], table['count'], table['head']
+        self._written_at, self._keys = table['written_at'], table['key']
+        self._ts = np.ndarray((self.slots, 2 * self.capacity), np.int64, buf, ts_offset)
+        self._values = np.ndarray((self.slots, 2 * self.capacity, len(PRICE_COLUMNS)), np.float32, buf, values_offset)
+        self._index = {}
+
+    @classmethod
+    def create(cls, spec: str = 'shm', slots: int = CANDLE_STORE_SLOTS, capacity: int = CANDLE_STORE_CAPACITY) -> 'CandleStore':
+        # spec 'shm' -> new shared-memory segment; anything else is a file path to mmap
+        _, _, size = _layout(slots, capacity)
+        if spec == 'shm':
+            shm = shared_memory.SharedMemory(name=f"csb-candles-{os.getpid()}", create=True, size=size)
+            buf, spec = shm.buf, f"shm:{shm.name}"
+
+            def release():
+                try:
+                    shm.unlink()
+                finally:
+                    shm.close()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(spec)), exist_ok=True)
+            with open(spec, 'w+b') as f:
+                f.truncate(size)
+                mapped = mmap.mmap(f.fileno(), size)
+            buf, path = memoryview(mapped), spec
+
+            def release():
+                try:
+                    os.remove(path)
+                finally:
+                    mapped.close()
+        header = np.ndarray((), HEADER, buf, 0)
+        header['magic'], header['version'] = STORE_MAGIC, STORE_VERSION
+        header['slots'], header['capacity'], header['used'] = slots, capacity, 0
+        del header
+        return cls(buf, spec, True, release)
+
+    @classmethod
+    def attach(cls, spec: str) -> 'CandleStore':
+        # Open an existing store read-only in spirit (only the creating process writes)
+        if spec.startswith('shm:'):
+            try:
+                shm = shared_memory.SharedMemory(name=spec[len('shm:'):], track=False)
+            except TypeError:
+                shm = shared_memory.SharedMemory(name=spec[len('shm:'):])
+            return cls(shm.buf, spec, False, shm.close)
+        with open(spec, 'r+b') as f:
+            mapped = mmap.mmap(f.fileno(), 0)
+        return cls(memoryview(mapped), spec, False, mapped.close)
+
+    @property
+    def nbytes(self) -> int:
+        return _layout(self.slots, self.capacity)[2]
+
+    def __len__(self) -> int:
+        return int(self._header['used'])
+
+    def _find(self, key: bytes) -> Optional[int]:
+        slot = self._index.get(key)
+        if slot is not None and self._keys[slot] == key:
+            return slot
+        used = int(self._header['used'])
+        matches = np.flatnonzero(self._keys[:used] == key)
+        if not len(matches):
+            self._index.pop(key, None)
+            return None
+        self._index[key] = int(matches[0])
+        return self._index[key]
+
+    def _claim(self, key: bytes) -> int:
+        # Writer: slot for key, taking a free slot or evicting the least recently written one
+        slot = self._find(key)
+        if slot is not None:
+            return slot
+        used = int(self._header['used'])
+        if used < self.slots:
+            slot = used
+        else:
+            slot = int(np.argmin(self._written_at))
+            evicted = bytes(self._keys[slot]).decode()
+            self._index.pop(bytes(self._keys[slot]), None)
+            self.stats['evictions'] += 1
+            if self.on_evict:
+                self.on_evict(*evicted.split('|', 1))
+        self._seq[slot] += 1
+        self._keys[slot] = key
+        self._count[slot] = 0
+        self._head[slot] = 0
+        self._seq[slot] += 1
+        if slot == used:
+            self._header['used'] = used + 1
+        self._index[key] = slot
+        return slot
+
+    def _window(self, slot: int, limit: int) -> CandleSeries:
+        # Latest min(limit, count) candles as views; contiguous thanks to the mirrored ring
+        n = min(int(limit), int(self._count[slot]))
+        end = int(self._head[slot]) + self.capacity
+        return CandleSeries(self._ts[slot, end - n:end], self._values[slot, end - n:end])
+
+    def put(self, symbol: str, timeframe: str, candles: CandleSeries, written_at: float = None) -> CandleSeries:
+        # Writer only. Appends candles newer than the stored ones (re-writing the last stored candle,
+        # which may still have been forming) and returns a view of the ring
+        key = _key(symbol, timeframe)
+        slot = self._claim(key)
+        cap = self.capacity
+        timestamps, values = candles.timestamps[-cap:], candles.values[-cap:]
+        count, head = int(self._count[slot]), int(self._head[slot])
+        start = 0
+        if count:
+            last = self._ts[slot, head - 1 + cap]
+            start = int(np.searchsorted(timestamps, last))
+            if start < len(timestamps) and timestamps[start] == last:
+                head, count = (head - 1) % cap, count - 1
+            else:
+                # The new rows do not continue the ring (gap or older data): replace it
+                start, head, count = 0, 0, 0
+        rows = len(timestamps) - start
+        positions = (head + np.arange(rows)) % cap
+        self._seq[slot] += 1
+        self._ts[slot, positions] = timestamps[start:]
+        self._ts[slot, positions + cap] = timestamps[start:]
+        self._values[slot, positions] = values[start:]
+        self._values[slot, positions + cap] = values[start:]
+        self._head[slot] = (head + rows) % cap
+        self._count[slot] = min(count + rows, cap)
+        self._written_at[slot] = time.time() if written_at is None else written_at
+        self._seq[slot] += 1
+        self.stats['writes'] += 1
+        return self._window(slot, cap)
+
+    def read_many(self, requests: List[Tuple[str, str, int]], fn: Callable[[List[CandleSeries]], object]):
+        # Run fn on zero-copy views of the latest candles for each (symbol, timeframe, limit); fn may
+        # run more than once and its result is only returned if no write overlapped it. None if a key
+        # is missing or the writer kept interfering
+        keys = [_key(symbol, timeframe) for symbol, timeframe, _ in requests]
+        self.stats['reads'] += 1
+        for attempt in range(READ_RETRIES):
+            if attempt:
+                self.stats['retries'] += 1
+                time.sleep(0)
+            slots = [self._find(key) for key in keys]
+            if any(slot is None for slot in slots):
+                return None
+            seqs = [int(self._seq[slot]) for slot in slots]
+            if any(seq & 1 for seq in seqs):
+                continue
+            if any(self._keys[slot] != key for slot, key in zip(slots, keys)):
+                continue
+            try:
+                result = fn([self._window(slot, limit) for slot, (_, _, limit) in zip(slots, requests)])
+            except Exception:
+                # A torn read can make fn fail; only a failure on consistent data is real
+                if all(int(self._seq[slot]) == seq for slot, seq in zip(slots, seqs)):
+                    raise
+                continue
+            if all(int(self._seq[slot]) == seq for slot, seq in zip(slots, seqs)):
+                return result
+        logger.warning(f"Candle store read gave up after {READ_RETRIES} retries: {[k.decode() for k in keys]}")
+        return None
+
+    def read(self, symbol: str, timeframe: str, limit: int) -> Optional[CandleSeries]:
+        # Consistent private copy of the latest candles
+        return self.read_many([(symbol, timeframe, limit)], lambda frames: frames[0].copy())
+
+    def close(self):
+        # Drop the NumPy views before releasing the buffer they point into
+        self._header = self._seq = self._count = self._head = self._written_at = self._keys = None
+        self._ts = self._values = None
+        try:
+            self._release()
+        except BufferError:
+            # Views handed out earlier are still alive; the mapping goes away with them
+            logger.debug("Candle store %s closed with views still in use", self.spec)
+        except Exception as e:
+            logger.error(f"Error closing candle store {self.spec}: {str(e)}")
+
+_store: Optional[CandleStore] = None
+_disabled = False
+
+def get_store() -> Optional[CandleStore]:
+    # The process-wide store: attached (workers) or created on first use from CANDLE_STORE
+    global _store, _disabled
+    if _store is None and not _disabled:
+        if CANDLE_STORE in ('', 'off', '0'):
+            _disabled = True
+            return None
+        try:
+            _store = CandleStore.create(CANDLE_STORE)
+            atexit.register(close_store)
+            logger.info(f"Candle store {_store.spec}: {_store.slots} slots x {_store.capacity} candles, "
+                        f"{_store.nbytes / 2 ** 20:.1f} MB")
+        except Exception as e:
+            _disabled = True
+            logger.error(f"Candle store unavailable, using process-local candles: {str(e)}")
+    return _store
+
+def attach_store(spec: str) -> Optional[CandleStore]:
+    # Worker start-up: read the store the parent created
+    global _store
+    try:
+        _store = CandleStore.attach(spec)
+    except Exception as e:
+        logger.error(f"Error attaching candle store {spec}: {str(e)}")
+        _store = None
+    return _store
+
+def close_store():
+    global _store
+    if _store is not None:
+        store, _store = _store, None
+        store.close()
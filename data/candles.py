@@ -0,0 +1,64 @@
+# Compact candle series: one float32 NumPy block per (symbol, timeframe) instead of a DataFrame
+# Changes:
+# - Fixed column layout (open, high, low, close, volume) in float32 plus int64 epoch-ms timestamps
+# - __slots__, no per-column objects; tail() and column accessors are views, not copies
+# - to_frame() builds the DataFrame the indicator code expects, once, at the point of use
+
+from typing import Sequence
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(PRICE_COLUMNS))
+
+class CandleSeries:
+    __slots__ = ('timestamps', 'values')
+
+    def __init__(self, timestamps: np.ndarray, values: np.ndarray):
+        # timestamps: int64 epoch ms, shape (n,); values: float32, shape (n, 5) in PRICE_COLUMNS order
+        self.timestamps = timestamps
+        self.values = values
+
+    @classmethod
+    def from_ohlcv(cls, rows: Sequence) -> 'CandleSeries':
+        # ccxt fetch_ohlcv rows [timestamp, open, high, low, close, volume]
+        block = np.asarray(rows, dtype=np.float64).reshape(-1, len(PRICE_COLUMNS) + 1)
+        return cls(block[:, 0].astype(np.int64), block[:, 1:].astype(np.float32))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'CandleSeries':
+        # Convert a collector-style DataFrame (e.g. from an older snapshot)
+        timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        return cls(timestamps, df[list(PRICE_COLUMNS)].to_numpy(dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __repr__(self) -> str:
+        return f"CandleSeries({len(self)} candles)"
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes
+
+    def tail(self, n: int) -> 'CandleSeries':
+        # Last n candles as views into the same arrays
+        start = max(len(self) - n, 0)
+        return CandleSeries(self.timestamps[start:], self.values[start:])
+
+    def copy(self) -> 'CandleSeries':
+        return CandleSeries(self.timestamps.copy(), self.values.copy())
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, PRICE_COLUMNS.index(name)]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.values[:, CLOSE]
+
+    def to_frame(self, dtype=np.float32) -> pd.DataFrame:
+        # DataFrame with timestamp + price columns; the caller owns it and may add indicator columns in place
+        frame = {'timestamp': pd.to_datetime(self.timestamps, unit='ms')}
+        for i, name in enumerate(PRICE_COLUMNS):
+            frame[name] = self.values[:, i].astype(dtype, copy=False)
+        return pd.DataFrame(frame)
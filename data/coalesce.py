@@ -0,0 +1,120 @@
+# Single-flight coalescing of identical exchange requests
+# Changes:
+# - Concurrent calls with the same method and arguments share one request to the exchange; callers
+#   joining a request in flight get the same response (or the same error)
+# - A finished response keeps answering identical calls for COALESCE_WINDOW seconds (0 = in-flight only)
+# - One process-wide SingleFlight, so the scanner, collector, trade tracker and Telegram commands
+#   coalesce with each other even when they hold separate exchange sessions
+# - Deduplicated requests counted per endpoint (exchange_deduplicated_total) and as the 'exchange' cache
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from data.recorder import RECORDED_METHODS, call_key
+from utils.logger import logger
+from utils.metrics import exchange_deduplicated
+
+EXCHANGE_COALESCE = os.getenv('EXCHANGE_COALESCE', '1') != '0'
+# Seconds a completed response still answers identical requests
+COALESCE_WINDOW = float(os.getenv('COALESCE_WINDOW', 1.0))
+# Read-only market data calls; anything else (orders, balances) always reaches the exchange
+COALESCED_METHODS = RECORDED_METHODS
+
+class SingleFlight:
+    # Responses are shared between callers as-is, so callers must treat them as read-only
+    def __init__(self, window: float = COALESCE_WINDOW, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self.stats = {'requests': 0, 'executed': 0, 'joined': 0, 'fresh': 0}
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        # key -> (expires_at, response)
+        self._recent: Dict[Tuple, Tuple[float, Any]] = {}
+        self._prune_at = 256
+
+    @property
+    def deduplicated(self) -> int:
+        return self.stats['joined'] + self.stats['fresh']
+
+    @property
+    def cache_stats(self) -> dict:
+        # Deduplicated requests count as hits, requests sent to the exchange as misses
+        return {'hits': self.deduplicated, 'misses': self.stats['executed']}
+
+    async def do(self, key: Tuple, call: Callable[[], Awaitable]):
+        # Response for key: from an identical call in flight or finished within the window, else call()
+        self.stats['requests'] += 1
+        endpoint = key[0]
+        now = self.clock()
+        recent = self._recent.get(key)
+        if recent is not None:
+            if recent[0] > now:
+                self.stats['fresh'] += 1
+                exchange_deduplicated.inc(endpoint=endpoint, source='fresh')
+                return recent[1]
+            del self._recent[key]
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.stats['joined'] += 1
+            exchange_deduplicated.inc(endpoint=endpoint, source='inflight')
+        else:
+            self.stats['executed'] += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield: a cancelled caller must not cancel the request the other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Tuple, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Errors are shared with callers already waiting but never served from the window
+            logger.debug("Coalesced %s failed: %s", key[0], task.exception())
+            return
+        if self.window > 0:
+            self._recent[key] = (self.clock() + self.window, task.result())
+            if len(self._recent) >= self._prune_at:
+                self.prune()
+
+    def prune(self):
+        # Drop responses past their window
+        now = self.clock()
+        for key in [k for k, (expires_at, _) in self._recent.items() if expires_at <= now]:
+            del self._recent[key]
+        self._prune_at = max(2 * len(self._recent), 256)
+
+    def clear(self):
+        self._recent.clear()
+
+class CoalescingExchange:
+    # Transparent proxy: market data calls go through the SingleFlight, everything else passes through
+    def __init__(self, inner, flight: SingleFlight):
+        self._inner = inner
+        self._flight = flight
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name not in COALESCED_METHODS:
+            return attr
+
+        async def coalesced(*args, **kwargs):
+            key = call_key(name, args, kwargs)
+            try:
+                hash(key)
+            except TypeError:
+                # Unhashable arguments (e.g. a params dict) are never coalesced
+                return await attr(*args, **kwargs)
+            return await self._flight.do(key, lambda: attr(*args, **kwargs))
+        return coalesced
+
+    async def close(self):
+        await self._inner.close()
+
+single_flight = SingleFlight()
+
+def coalescing(exchange):
+    # Wrap an exchange session in the process-wide SingleFlight (unchanged when EXCHANGE_COALESCE=0)
+    return CoalescingExchange(exchange, single_flight) if EXCHANGE_COALESCE else exchange
@@ -4,32 +4,173 @@
 # - Optimized fetch_realtime_data for all USDT pairs
 # - Ensured rate limiting for Binance API
 # - Enhanced logging for Cloud Run
+# - Added short-lived candle cache keyed by (symbol, timeframe), included in warm-restart snapshots
+# - Always fetch CANDLE_FETCH_LIMIT rows (same Binance weight) so smaller requests are served from cache
+# - Counts exchange calls and cache hits/misses in utils.metrics
+# - Per-fetch and per-step chatter logged lazily at DEBUG (hot path)
+# - set_exchange() lets callers share one exchange session (or a fake one) instead of a client per fetch
+# - Per-fetch clients come from data.exchange.create_exchange (honours EXCHANGE_BACKEND=sim)
+# - Cache holds compact CandleSeries (float32 block + int64 timestamps) instead of DataFrames;
+#   fetch_candles serves the hot path, fetch_realtime_data still returns a DataFrame for other callers
+# - Fetched candles are written to the shared-memory candle store (data.candle_store) and the cache
+#   holds views into it, so compute workers read the same bytes instead of receiving copies
+# - Candle-close events: on_candle_close() listeners hear when a fetch shows a new bar for a
+#   (symbol, timeframe); cached candles fetched before the current bar opened are no longer served
+# - Fetches rejected by an open exchange circuit breaker are logged at DEBUG, not as errors
+# - fetch_history serves long training histories straight from the exchange (the scan cache and candle
+#   store hold CANDLE_FETCH_LIMIT-candle windows)
+# - fetch_candles/get_cached_candles return private copies of the window: the cache still holds views
+#   of the store's ring, but a scan keeps its candles across awaits while later fetches rewrite the ring
 
+import os
+import time
 import pandas as pd
 import numpy as np
-import ccxt.async_support as ccxt
+from typing import Callable, Dict, List, Optional, Tuple
+from data.candles import CandleSeries
+from data.candle_store import get_store
+from data.exchange import create_exchange
 from utils.logger import logger
+from utils.metrics import exchange_calls, cache_requests
+
+CANDLE_CACHE_TTL = float(os.getenv('CANDLE_CACHE_TTL', 60))
+CANDLE_FETCH_LIMIT = 100
+
+# (symbol, timeframe) -> (fetched_at, CandleSeries)
+candle_cache: Dict[Tuple[str, str], Tuple[float, CandleSeries]] = {}
+cache_stats = {'hits': 0, 'misses': 0}
+# (symbol, timeframe) -> open time (epoch ms) of the latest candle seen, and candle-close listeners
+latest_bar: Dict[Tuple[str, str], int] = {}
+_close_listeners: List[Callable[[str, str, int], None]] = []
+TIMEFRAME_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+# Shared exchange session; None means a short-lived Binance client per fetch
+_shared_exchange = None
+
+def set_exchange(exchange):
+    # Route fetches through an existing exchange session; the caller owns and closes it
+    global _shared_exchange
+    _shared_exchange = exchange
+
+def _shared_store():
+    # Process-wide candle store (None when CANDLE_STORE=off); evicted slots drop their cache entry
+    store = get_store()
+    if store is not None and store.on_evict is None:
+        store.on_evict = lambda symbol, timeframe: candle_cache.pop((symbol, timeframe), None)
+    return store
+
+def on_candle_close(callback: Callable[[str, str, int], None]):
+    # callback(symbol, timeframe, open_ms) runs when a fetch shows a new candle opened at open_ms,
+    # i.e. the previous one has closed
+    _close_listeners.append(callback)
+
+def bar_open(timeframe: str, now: float = None) -> float:
+    # Epoch seconds at which the current candle of timeframe opened
+    now = time.time() if now is None else now
+    step = TIMEFRAME_SECONDS.get(timeframe)
+    return now - now % step if step else now
+
+def _note_bar(symbol: str, timeframe: str, candles: CandleSeries):
+    # Remember the latest candle and tell the listeners if it is new
+    opened = int(candles.timestamps[-1])
+    previous = latest_bar.get((symbol, timeframe))
+    latest_bar[(symbol, timeframe)] = opened
+    if previous is not None and opened > previous:
+        for callback in _close_listeners:
+            try:
+                callback(symbol, timeframe, opened)
+            except Exception as e:
+                logger.error(f"Error in candle-close listener for {symbol} {timeframe}: {str(e)}")
+
+def get_cached_candles(symbol: str, timeframe: str, limit: int) -> Optional[CandleSeries]:
+    # Return a copy of the last `limit` cached candles if fresh enough and fetched during the current
+    # candle (a closed candle makes the cache stale whatever the TTL), else None
+    entry = candle_cache.get((symbol, timeframe))
+    if entry is None:
+        return None
+    fetched_at, candles = entry
+    now = time.time()
+    if now - fetched_at > CANDLE_CACHE_TTL or fetched_at < bar_open(timeframe, now) or len(candles) < limit:
+        return None
+    return candles.tail(limit).copy()
+
+def restore_candle_cache(entries: dict):
+    # Load snapshot entries; snapshots written before CandleSeries hold DataFrames
+    store = _shared_store()
+    for (symbol, timeframe), (fetched_at, candles) in entries.items():
+        if isinstance(candles, pd.DataFrame):
+            candles = CandleSeries.from_frame(candles)
+        if store is not None:
+            candles = store.put(symbol, timeframe, candles, fetched_at)
+        candle_cache[(symbol, timeframe)] = (fetched_at, candles)
 
 async def fetch_realtime_data(symbol: str, timeframe: str, limit: int = 50) -> pd.DataFrame:
-    # Fetch real-time OHLCV data from Binance
+    # Fetch real-time OHLCV data from Binance as a DataFrame (timestamp, open, high, low, close, volume)
+    candles = await fetch_candles(symbol, timeframe, limit)
+    return candles.to_frame(np.float64) if candles is not None else None
+
+async def fetch_candles(symbol: str, timeframe: str, limit: int = 50) -> Optional[CandleSeries]:
+    # Fetch real-time OHLCV data from Binance as a CandleSeries
+    cached = get_cached_candles(symbol, timeframe, limit)
+    if cached is not None:
+        cache_stats['hits'] += 1
+        cache_requests.inc(cache='candles', result='hit')
+        return cached
+    cache_stats['misses'] += 1
+    cache_requests.inc(cache='candles', result='miss')
+    exchange = None
     try:
-        exchange = ccxt.binance({
-            'enableRateLimit': True,
-        })
-        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        if _shared_exchange is None:
+            exchange = create_exchange()
+        exchange_calls.inc(endpoint='fetch_ohlcv')
+        ohlcv = await (exchange or _shared_exchange).fetch_ohlcv(symbol, timeframe, limit=max(limit, CANDLE_FETCH_LIMIT))
         if not ohlcv or len(ohlcv) < 30:
-            logger.warning(f"Insufficient OHLCV data for {symbol} on {timeframe}: {len(ohlcv)} rows")
+            logger.warning(f"Insufficient OHLCV data for {symbol} on {timeframe}: {len(ohlcv) if ohlcv else 0} rows")
             return None
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['quote_volume_24h'] = df['close'] * df['volume']
-        logger.info(f"Fetched {len(df)} rows for {symbol} on {timeframe}")
-        return df
+        candles = CandleSeries.from_ohlcv(ohlcv)
+        store = _shared_store()
+        if store is not None:
+            candles = store.put(symbol, timeframe, candles)
+        candle_cache[(symbol, timeframe)] = (time.time(), candles)
+        _note_bar(symbol, timeframe, candles)
+        logger.debug("Fetched %d rows for %s on %s", len(candles), symbol, timeframe)
+        return candles.tail(limit).copy()
+    except Exception as e:
+        from data.breaker import CircuitOpenError
+        if isinstance(e, CircuitOpenError):
+            # Expected while the exchange is backing off; the breaker already logged the opening
+            logger.debug("Skipped fetch for %s on %s: %s", symbol, timeframe, e)
+        else:
+            logger.error(f"Error fetching data for {symbol} on {timeframe}: {str(e)}")
+        return None
+    finally:
+        if exchange is not None:
+            await exchange.close()
+
+async def fetch_history(symbol: str, timeframe: str, limit: int = 500) -> Optional[CandleSeries]:
+    # Up to limit candles for training, not cached or written to the candle store
+    exchange = None
+    try:
+        if _shared_exchange is None:
+            exchange = create_exchange()
+        exchange_calls.inc(endpoint='fetch_ohlcv')
+        ohlcv = await (exchange or _shared_exchange).fetch_ohlcv(symbol, timeframe, limit=limit)
+        if not ohlcv:
+            logger.warning(f"No OHLCV history for {symbol} on {timeframe}")
+            return None
+        return CandleSeries.from_ohlcv(ohlcv)
     except Exception as e:
-        logger.error(f"Error fetching data for {symbol} on {timeframe}: {str(e)}")
+        logger.error(f"Error fetching history for {symbol} on {timeframe}: {str(e)}")
         return None
     finally:
-        await exchange.close()
+        if exchange is not None:
+            await exchange.close()
+
+def prune_candle_cache(max_age: float = None):
+    # Drop cache entries older than max_age (defaults to the cache TTL)
+    max_age = CANDLE_CACHE_TTL if max_age is None else max_age
+    cutoff = time.time() - max_age
+    for key in [k for k, (fetched_at, _) in candle_cache.items() if fetched_at < cutoff]:
+        del candle_cache[key]
 
 def calculate_ema(series, period):
     # Manual EMA calculation to avoid library issues
@@ -46,7 +187,7 @@ def calculate_indicators(df):
             logger.warning(f"Invalid or insufficient input data: {len(df)} rows")
             return None
 
-        logger.info(f"Calculating indicators for {len(df)} candles")
+        logger.debug("Calculating indicators for %d candles", len(df))
 
         # RSI
         delta = df['close'].diff()
@@ -104,7 +245,7 @@ def calculate_indicators(df):
         df.ffill(inplace=True)
         df.fillna(df.mean(numeric_only=True), inplace=True)
 
-        logger.info("Indicators calculated: rsi, volume_sma_20, macd, atr, adx, bollinger_bands, stochastic, vwap")
+        logger.debug("Indicators calculated: rsi, volume_sma_20, macd, atr, adx, bollinger_bands, stochastic, vwap")
         return df
     except Exception as e:
         logger.error(f"Error calculating indicators: {str(e)}")
@@ -0,0 +1,54 @@
+# Exchange factory: live Binance via ccxt, the simulated exchange, or replay of a recorded tape
+# Changes:
+# - EXCHANGE_BACKEND=sim points the scanner, candle collector and trade tracking at data.sim_exchange
+# - One simulated exchange per process so every caller shares its rate-limit budget
+# - EXCHANGE_RECORD_PATH records all exchange traffic to a tape; EXCHANGE_BACKEND=replay serves one back
+# - Sessions are wrapped in data.coalesce so identical concurrent market data requests are sent once
+# - Market data requests pass the process-wide circuit breakers and retry budget in data.breaker
+
+import os
+
+EXCHANGE_BACKEND = os.getenv('EXCHANGE_BACKEND', 'binance').lower()
+# Tape written while running against any backend (empty disables recording)
+EXCHANGE_RECORD_PATH = os.getenv('EXCHANGE_RECORD_PATH', '')
+# Tape read by EXCHANGE_BACKEND=replay, and its pacing: 'fast' or 'original'
+EXCHANGE_TAPE = os.getenv('EXCHANGE_TAPE', 'state/exchange.tape')
+EXCHANGE_REPLAY_PACING = os.getenv('EXCHANGE_REPLAY_PACING', 'fast')
+
+_sim_exchange = None
+_replay_exchange = None
+
+def requires_credentials() -> bool:
+    # Only the live Binance backend needs API keys
+    return EXCHANGE_BACKEND not in ('sim', 'replay')
+
+def _create_backend(api_key: str = None, secret: str = None):
+    global _sim_exchange, _replay_exchange
+    if EXCHANGE_BACKEND == 'sim':
+        if _sim_exchange is None:
+            from data.sim_exchange import SimulatedExchange
+            _sim_exchange = SimulatedExchange.from_env()
+        return _sim_exchange
+    if EXCHANGE_BACKEND == 'replay':
+        if _replay_exchange is None:
+            from data.recorder import ReplayExchange
+            _replay_exchange = ReplayExchange(EXCHANGE_TAPE, EXCHANGE_REPLAY_PACING)
+        return _replay_exchange
+    import ccxt.async_support as ccxt
+    config = {'enableRateLimit': True}
+    if api_key and secret:
+        config.update(apiKey=api_key, secret=secret)
+    return ccxt.binance(config)
+
+def create_exchange(api_key: str = None, secret: str = None):
+    # New ccxt Binance client (caller closes it), or the shared simulated/replay exchange,
+    # wrapped in a recorder when EXCHANGE_RECORD_PATH is set, then in the process-wide circuit breakers and
+    # request coalescer (outermost, so the tape only holds requests that reached the exchange and a
+    # deduplicated call costs no retry budget)
+    from data.breaker import guarded
+    from data.coalesce import COALESCED_METHODS, coalescing
+    exchange = _create_backend(api_key, secret)
+    if EXCHANGE_RECORD_PATH:
+        from data.recorder import RecordingExchange, get_tape
+        exchange = RecordingExchange(exchange, get_tape(EXCHANGE_RECORD_PATH, EXCHANGE_BACKEND))
+    return coalescing(guarded(exchange, COALESCED_METHODS))
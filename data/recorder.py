@@ -0,0 +1,168 @@
+# Record-and-replay of exchange traffic for offline, deterministic profiling
+# Changes:
+# - RecordingExchange wraps a ccxt-style exchange and captures every response (or error) with its latency
+# - Tapes are compressed, versioned files written with utils.snapshot (atomic, like scanner snapshots)
+# - ReplayExchange serves a tape back per (method, arguments) in recorded order, fast or at original pacing
+
+import asyncio
+import pickle
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+from ccxt.base.errors import ExchangeError
+from utils.logger import logger
+from utils.snapshot import save_snapshot, load_snapshot
+
+TAPE_MAGIC = b'CSBTAPE'
+TAPE_VERSION = 1
+RECORDED_METHODS = ('load_markets', 'fetch_ticker', 'fetch_tickers', 'fetch_ohlcv')
+
+def call_key(method: str, args: tuple, kwargs: dict) -> tuple:
+    # Hashable key for one call; arguments left at their default are dropped
+    kwargs = tuple(sorted((k, v) for k, v in kwargs.items() if v is not None))
+    args = tuple(tuple(a) if isinstance(a, list) else a for a in args)
+    return (method, args, kwargs)
+
+class ExchangeTape:
+    # In-memory list of recorded calls, shared by every recording session in the process
+    def __init__(self, path: str, source: str = ''):
+        self.path = path
+        self.source = source
+        self.started_at = time.time()
+        self.events = []
+        self._saved = 0
+        self._lock = threading.Lock()
+
+    def add(self, key: tuple, offset: float, duration: float, response=None, error: Exception = None):
+        # Responses are pickled immediately so later mutation by the caller cannot change the tape
+        event = {'key': key, 'offset': offset, 'duration': duration,
+                 'response': pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL) if error is None else None,
+                 'error': error}
+        with self._lock:
+            self.events.append(event)
+
+    def save(self) -> bool:
+        # Write the tape if there is anything new since the last save
+        with self._lock:
+            if len(self.events) == self._saved:
+                return True
+            state = {'source': self.source, 'started_at': self.started_at, 'events': list(self.events)}
+            count = len(self.events)
+        if save_snapshot(self.path, state, magic=TAPE_MAGIC, version=TAPE_VERSION):
+            self._saved = count
+            logger.info(f"Exchange tape saved to {self.path}: {count} calls")
+            return True
+        return False
+
+class RecordingExchange:
+    # Transparent proxy: recorded methods are timed and captured, everything else passes through
+    def __init__(self, inner, tape: ExchangeTape):
+        self._inner = inner
+        self._tape = tape
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name not in RECORDED_METHODS:
+            return attr
+
+        async def recorded(*args, **kwargs):
+            key = call_key(name, args, kwargs)
+            started = time.perf_counter()
+            offset = time.time() - self._tape.started_at
+            try:
+                response = await attr(*args, **kwargs)
+            except Exception as e:
+                self._tape.add(key, offset, time.perf_counter() - started, error=e)
+                raise
+            self._tape.add(key, offset, time.perf_counter() - started, response=response)
+            return response
+        return recorded
+
+    async def close(self):
+        try:
+            self._tape.save()
+        finally:
+            await self._inner.close()
+
+class ReplayExchange:
+    # Serves a tape back. The n-th call with a given key gets the n-th recorded response for that key,
+    # so replay does not depend on how concurrent calls interleave. When a key runs out, its last
+    # response is repeated; unknown calls raise ExchangeError.
+    id = 'replay'
+
+    def __init__(self, path: str, pacing: str = 'fast'):
+        state = load_snapshot(path, magic=TAPE_MAGIC, version=TAPE_VERSION)
+        if state is None:
+            raise FileNotFoundError(f"No readable exchange tape at {path}")
+        if pacing not in ('fast', 'original'):
+            raise ValueError(f"Unknown replay pacing {pacing!r}, expected 'fast' or 'original'")
+        self.path = path
+        self.pacing = pacing
+        self.source = state.get('source', '')
+        self.events = state['events']
+        self.markets = {}
+        self.stats = {'calls': 0, 'repeated': 0, 'missing': 0}
+        self._by_key = defaultdict(list)
+        for event in self.events:
+            self._by_key[event['key']].append(event)
+        self.reset()
+
+    def reset(self):
+        # Rewind to the start of the tape
+        self._queues = {key: deque(events) for key, events in self._by_key.items()}
+        self._last = {}
+        self.stats = {'calls': 0, 'repeated': 0, 'missing': 0}
+
+    def symbols(self) -> list:
+        # Symbols scanned in the recorded cycle, in first-seen order
+        seen = {}
+        for event in self.events:
+            method, args, _ = event['key']
+            if method == 'fetch_ticker' and args:
+                seen.setdefault(args[0], None)
+        return list(seen)
+
+    async def _replay(self, method: str, args: tuple, kwargs: dict):
+        key = call_key(method, args, kwargs)
+        self.stats['calls'] += 1
+        queue = self._queues.get(key)
+        if queue:
+            event = queue.popleft()
+            self._last[key] = event
+        elif key in self._last:
+            event = self._last[key]
+            self.stats['repeated'] += 1
+        else:
+            self.stats['missing'] += 1
+            raise ExchangeError(f"replay: {method}{args} not recorded in {self.path}")
+        if self.pacing == 'original' and event['duration'] > 0:
+            await asyncio.sleep(event['duration'])
+        if event['error'] is not None:
+            raise event['error']
+        return pickle.loads(event['response'])
+
+    async def load_markets(self, *args, **kwargs):
+        self.markets = await self._replay('load_markets', args, kwargs)
+        return self.markets
+
+    async def fetch_ticker(self, symbol: str, *args, **kwargs):
+        return await self._replay('fetch_ticker', (symbol,) + args, kwargs)
+
+    async def fetch_tickers(self, *args, **kwargs):
+        return await self._replay('fetch_tickers', args, kwargs)
+
+    async def fetch_ohlcv(self, symbol: str, *args, **kwargs):
+        return await self._replay('fetch_ohlcv', (symbol,) + args, kwargs)
+
+    async def close(self):
+        logger.debug("Replay stats for %s: %s", self.path, self.stats)
+
+_tape: Optional[ExchangeTape] = None
+
+def get_tape(path: str, source: str = '') -> ExchangeTape:
+    # Process-wide tape so every exchange session records into the same file
+    global _tape
+    if _tape is None or _tape.path != path:
+        _tape = ExchangeTape(path, source)
+    return _tape
@@ -0,0 +1,184 @@
+# Simulated ccxt-compatible exchange for load testing the scanner without hitting Binance
+# Changes:
+# - Async load_markets, fetch_ticker, fetch_tickers, fetch_ohlcv and close, same shapes as ccxt
+# - Deterministic per-symbol price paths anchored to the clock, so candles roll over like live data
+# - Simulated request latency and Binance-style request weight with HTTP 429 (RateLimitExceeded)
+
+import asyncio
+import os
+import random
+import time
+import zlib
+from collections import deque
+import numpy as np
+from ccxt.base.errors import BadSymbol, RateLimitExceeded
+from utils.logger import logger
+
+SIM_SYMBOLS = int(os.getenv('SIM_SYMBOLS', 500))
+SIM_LATENCY_MS = float(os.getenv('SIM_LATENCY_MS', 50))
+SIM_JITTER_MS = float(os.getenv('SIM_JITTER_MS', 20))
+# Request weight allowed per rolling minute (Binance spot default is 6000); 0 disables the limit
+SIM_WEIGHT_LIMIT = int(os.getenv('SIM_WEIGHT_LIMIT', 6000))
+SIM_SEED = int(os.getenv('SIM_SEED', 7))
+
+WEIGHT_WINDOW = 60.0
+# Binance spot request weights for the endpoints behind each ccxt method
+ENDPOINT_WEIGHTS = {'load_markets': 20, 'fetch_ticker': 2, 'fetch_tickers': 80, 'fetch_ohlcv': 2}
+TIMEFRAME_MS = {'1m': 60_000, '5m': 300_000, '15m': 900_000, '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+MAX_OHLCV_LIMIT = 1000
+# Noise tables are indexed by candle number modulo this length
+PATH_PERIOD = 4096
+
+class SimulatedExchange:
+    id = 'sim'
+
+    def __init__(self, symbol_count: int = SIM_SYMBOLS, latency_ms: float = SIM_LATENCY_MS,
+                 jitter_ms: float = SIM_JITTER_MS, weight_limit: int = SIM_WEIGHT_LIMIT, seed: int = SIM_SEED,
+                 clock=None):
+        # clock() returns epoch seconds; pass a constant for fully reproducible candles
+        self.symbols = [f"SIM{i:04d}/USDT" for i in range(symbol_count)]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.weight_limit = weight_limit
+        self.seed = seed
+        self.clock = clock or time.time
+        self.markets = {}
+        self.stats = {'requests': 0, 'weight': 0, 'rate_limited': 0}
+        self._random = random.Random(seed)
+        self._weights = deque()
+        self._weight_used = 0
+        self._paths = {}
+        self._profiles = {symbol: self._profile(symbol) for symbol in self.symbols}
+
+    @classmethod
+    def from_env(cls) -> 'SimulatedExchange':
+        return cls()
+
+    def _profile(self, symbol: str) -> dict:
+        # Base price, volatility and 24h quote volume per symbol (log-normal spread, like a real universe)
+        rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+        return {
+            'price': float(np.exp(rng.uniform(-4, 10))),
+            'volatility': float(rng.uniform(0.002, 0.02)),
+            'quote_volume': float(rng.lognormal(15, 2))
+        }
+
+    def _path(self, symbol: str, timeframe: str) -> dict:
+        # Fixed noise tables per (symbol, timeframe); price at candle n is a function of n only
+        key = (symbol, timeframe)
+        path = self._paths.get(key)
+        if path is None:
+            rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), zlib.crc32(timeframe.encode())])
+            path = {
+                'noise': rng.normal(0, 1, PATH_PERIOD),
+                'wick': np.abs(rng.normal(0, 0.5, (2, PATH_PERIOD))),
+                'volume': rng.lognormal(0, 0.6, PATH_PERIOD),
+                'phase': rng.uniform(0, 2 * np.pi, 2)
+            }
+            self._paths[key] = path
+        return path
+
+    def _candles(self, symbol: str, timeframe: str, limit: int) -> np.ndarray:
+        # Rows of [timestamp, open, high, low, close, volume]; the last row is the candle still forming
+        profile = self._profiles[symbol]
+        path = self._path(symbol, timeframe)
+        step = TIMEFRAME_MS[timeframe]
+        last = int(self.clock() * 1000) // step
+        n = np.arange(last - limit, last + 1)
+        idx = n % PATH_PERIOD
+        vol = profile['volatility'] * np.sqrt(step / TIMEFRAME_MS['15m'])
+        # Two slow cycles give trends and reversals; the noise term gives candle-to-candle moves
+        log_price = (8 * vol * np.sin(n / 97.0 + path['phase'][0]) + 4 * vol * np.sin(n / 23.0 + path['phase'][1])
+                     + vol * path['noise'][idx])
+        prices = profile['price'] * np.exp(log_price)
+        opens, closes = prices[:-1], prices[1:]
+        idx = idx[1:]
+        highs = np.maximum(opens, closes) * (1 + vol * path['wick'][0][idx])
+        lows = np.minimum(opens, closes) * (1 - vol * path['wick'][1][idx])
+        volumes = profile['quote_volume'] / profile['price'] * (step / TIMEFRAME_MS['1d']) * path['volume'][idx]
+        return np.column_stack([n[1:] * step, opens, highs, lows, closes, volumes])
+
+    async def _request(self, endpoint: str):
+        # Charge request weight, reject with 429 when over the limit, then wait out the simulated latency
+        now = time.monotonic()
+        weight = ENDPOINT_WEIGHTS.get(endpoint, 1)
+        self._expire_weights(now)
+        self.stats['requests'] += 1
+        if self.weight_limit and self._weight_used + weight > self.weight_limit:
+            self.stats['rate_limited'] += 1
+            retry_after = self._weights[0][0] + WEIGHT_WINDOW - now if self._weights else WEIGHT_WINDOW
+            raise RateLimitExceeded(f"sim 429 Too Many Requests: {endpoint} weight {self._weight_used}/{self.weight_limit}, "
+                                    f"retry after {retry_after:.1f}s")
+        self._weights.append((now, weight))
+        self._weight_used += weight
+        self.stats['weight'] += weight
+        delay = self.latency_ms + (self._random.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _check_symbol(self, symbol: str):
+        if symbol not in self._profiles:
+            raise BadSymbol(f"sim does not have market symbol {symbol}")
+
+    def _expire_weights(self, now: float):
+        while self._weights and self._weights[0][0] <= now - WEIGHT_WINDOW:
+            self._weight_used -= self._weights.popleft()[1]
+
+    def weight_used(self) -> int:
+        # Request weight spent in the current rolling minute
+        self._expire_weights(time.monotonic())
+        return self._weight_used
+
+    async def load_markets(self, reload: bool = False) -> dict:
+        await self._request('load_markets')
+        if not self.markets or reload:
+            self.markets = {
+                symbol: {'id': symbol.replace('/', ''), 'symbol': symbol, 'base': symbol.split('/')[0],
+                         'quote': 'USDT', 'spot': True, 'active': True}
+                for symbol in self.symbols
+            }
+        return self.markets
+
+    def _ticker(self, symbol: str) -> dict:
+        # 24h statistics from the last 96 15m candles
+        candles = self._candles(symbol, '15m', 96)
+        last = float(candles[-1, 4])
+        open_24h = float(candles[0, 1])
+        volume = float(candles[:, 5].sum())
+        return {
+            'symbol': symbol,
+            'timestamp': int(self.clock() * 1000),
+            'last': last,
+            'close': last,
+            'bid': last * 0.9998,
+            'ask': last * 1.0002,
+            'open': open_24h,
+            'high': float(candles[:, 2].max()),
+            'low': float(candles[:, 3].min()),
+            'change': last - open_24h,
+            'percentage': (last / open_24h - 1) * 100,
+            'baseVolume': volume,
+            'quoteVolume': float((candles[:, 4] * candles[:, 5]).sum())
+        }
+
+    async def fetch_ticker(self, symbol: str, params: dict = None) -> dict:
+        self._check_symbol(symbol)
+        await self._request('fetch_ticker')
+        return self._ticker(symbol)
+
+    async def fetch_tickers(self, symbols: list = None, params: dict = None) -> dict:
+        await self._request('fetch_tickers')
+        return {symbol: self._ticker(symbol) for symbol in (symbols or self.symbols) if symbol in self._profiles}
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: int = None, limit: int = None,
+                          params: dict = None) -> list:
+        self._check_symbol(symbol)
+        if timeframe not in TIMEFRAME_MS:
+            raise ValueError(f"sim does not support timeframe {timeframe}")
+        await self._request('fetch_ohlcv')
+        limit = min(limit or 500, MAX_OHLCV_LIMIT)
+        candles = self._candles(symbol, timeframe, limit)
+        return [[int(row[0]), *map(float, row[1:])] for row in candles]
+
+    async def close(self):
+        logger.debug("Simulated exchange stats: %s", self.stats)
@@ -1,27 +1,61 @@
-import telegram
+# Entry point: FastAPI health server, Telegram commands and the scan loop
+# Changes:
+# - Heavy modules (pandas, numpy, sklearn, ccxt, python-telegram-bot, pytz) are imported on first use
+# - App lifespan warms heavy modules and the ML model in a background thread after the server is up
+# - Single shared SignalPredictor instead of loading the model for every symbol
+# - Scanner runs as a supervised background task in the app lifespan with graceful cancellation
+# - Added /progress and /caches JSON endpoints for cycle progress, throughput, queues and cache hit rates
+# - Per-stage timing spans and exchange call counters, exposed in Prometheus format at /metrics
+# - process_symbol logs one structured summary line per symbol instead of per-step lines
+# - 24h volume taken from the fetched ticker instead of a blocking REST call per symbol
+# - Only price/volume columns are cast to float32 (casting the datetime column raised for every symbol)
+# - Exchange comes from data.exchange (EXCHANGE_BACKEND=sim runs against the simulated exchange) and
+#   is shared with the candle collector instead of a new client per fetch
+# - Binance keys are only required for the live backend (not for sim or replay)
+# - Indicators, prediction and multi-timeframe agreement run in core.compute worker processes
+#   (COMPUTE_WORKERS, 0 = inline); candles are fetched once per timeframe and shipped via shared memory
+# - Sharded mode (SHARD_INDEX/SHARD_COUNT/SHARD_STORE): each replica scans its consistent-hash share,
+#   claims scans and signals in the shared store and rebalances when replicas join or leave
+# - Snapshots work with exchanges that have no currencies/set_markets (sim, replay)
+# - Candles travel as compact CandleSeries (collector.fetch_candles); signals are slotted SignalRecords
+# - Compute workers read candles from the shared-memory candle store; it is closed on shutdown
+# - Higher-timeframe verdict cache hits/misses reported next to the candle cache
+# - EVALUATION_MODE=bar_close: symbols are evaluated right after each 15m close and otherwise reuse the
+#   last prediction unless the ticker crosses its trigger levels (core.bar_close)
+# - /signal's 24h volume comes from the scanner's coalesced exchange session (data.coalesce) instead of
+#   a blocking REST call; deduplicated exchange requests are reported as the 'exchange' cache
+# - Exchange circuit breakers (data.breaker): the loop pauses while the scan endpoints are open, the retry
+#   budget is refilled every cycle and rejected requests end a symbol's scan quietly
+# - Telegram commands answer from telebot.state.bot_state (scan counts, cooldowns, latest signals,
+#   cached bot identity, daily rollups) with no network or disk I/O; /signal no longer looks up volume
+# - The scan loop is a configuration of core.pipeline (shared with core/engine.py): symbols stream through
+#   bounded fetch/evaluate/validate/dispatch queues instead of gather-per-batch plus a 5s sleep;
+#   MAX_SIGNALS_PER_MINUTE is enforced when signals are sent
+# - Background retrainer process (model.retrainer, RETRAIN_INTERVAL, 0 = off) started after warm-up and
+#   stopped on shutdown; compute workers switch to promoted model versions on their own
+# - Pipeline queues are fetch/features/predict/agreement/validate/dispatch
+# - The scanner starts after warm-up and start_bot's imports run off the event loop, so the first
+#   HTTP response does not wait for telegram, pandas and the exchange modules
+# - The scheduler knows COOLDOWN, so a symbol's signal-activity boost starts when its cooldown ends
+
 import asyncio
-import pandas as pd
+import importlib
 import json
 import os
-import pytz
-import requests
-import numpy as np
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from telegram.ext import Application, CommandHandler
-from telegram.error import TelegramError
 from fastapi import FastAPI
 from typing import Set, Dict
-import ccxt.async_support as ccxt
 from dotenv import load_dotenv
 from utils.logger import logger
-from utils.helpers import get_timestamp, format_timestamp, is_cooldown_active, scan_pause
-from model.predictor import SignalPredictor
-from telebot.sender import send_signal, update_signal_log
-from telebot.report_generator import generate_daily_summary
-from data.collector import fetch_realtime_data
-from core.indicators import calculate_indicators
-from core.multi_timeframe import check_multi_timeframe_agreement
-import uvicorn
+from utils.helpers import get_timestamp, is_cooldown_active
+from utils.snapshot import save_snapshot, load_snapshot
+from utils import metrics
+from core.scheduler import SymbolScheduler
+from core.progress import ScanProgress
+from core.pipeline import IDLE_POLL_SECONDS, STAGES, ScanConfig, ScanPipeline
+from telebot.state import bot_state
 
 load_dotenv()
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
@@ -34,125 +68,243 @@ MAX_SIGNALS_PER_MINUTE = 10
 CYCLE_INTERVAL = 300
 BATCH_SIZE = 5
 COOLDOWN = 4 * 3600
+MIN_SCAN_INTERVAL = 60
+MAX_SCAN_INTERVAL = 1200
+# A sharded scan claim lasts the symbol's scan interval plus this, so it outlives the gap to the next scan
+SCAN_CLAIM_SLACK = 30
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', 'state/scanner.snapshot')
+SNAPSHOT_INTERVAL = 60
+# Endpoints a symbol scan needs; while any of their breakers is open the loop waits instead of scanning
+SCAN_ENDPOINTS = ('fetch_ticker', 'fetch_ohlcv')
+RUN_SCANNER = os.getenv('RUN_SCANNER', '1') == '1'
+SUPERVISOR_MIN_BACKOFF = 5
+SUPERVISOR_MAX_BACKOFF = 300
+SHUTDOWN_TIMEOUT = 20
+MIN_CONFIDENCE = 70.0
+# Candles per timeframe fetched for a scan (the predictor uses the last 50)
+AGREEMENT_CANDLES = 100
 
 scanned_symbols: Set[str] = set()
 last_signal_time: Dict[str, datetime] = {}
+latest_tickers: Dict[str, dict] = {}
+universe: list = []
+scheduler = SymbolScheduler(MIN_SCAN_INTERVAL, MAX_SCAN_INTERVAL, cooldown=COOLDOWN)
+progress = ScanProgress()
+_prescreen = None
+_compute = None
+_retrainer = None
+_warm_task = None
+shard = None
+# Bar-close evaluation (EVALUATION_MODE=bar_close); None scans on the scheduler's intervals
+bar_evaluator = None
+
+# Modules start_bot uses; imported off the event loop before it runs
+SCANNER_MODULES = [
+    'telegram', 'telegram.ext', 'data.collector', 'data.exchange', 'core.multi_timeframe', 'core.bar_close',
+    'core.sharding', 'data.breaker', 'data.coalesce', 'telebot.sender'
+]
+# Imported in the background once the HTTP server is answering
+WARM_MODULES = [
+    'numpy', 'pandas', 'pytz', 'ccxt.async_support', 'core.indicators', 'core.prescreen',
+    'model.predictor', 'telebot.report_generator'
+] + SCANNER_MODULES
+
+def get_prescreen():
+    global _prescreen
+    if _prescreen is None:
+        from core.prescreen import TickerPrescreen
+        _prescreen = TickerPrescreen(min_quote_volume=MIN_VOLUME)
+    return _prescreen
+
+def owned(symbols: list) -> list:
+    # This replica's share of symbols (all of them when not sharded)
+    return shard.assign(symbols) if shard else list(symbols)
+
+def get_compute():
+    # One compute executor (one model load per worker) shared by all symbols
+    global _compute
+    if _compute is None:
+        from core.compute import ComputeExecutor
+        _compute = ComputeExecutor()
+    return _compute
+
+def _import_modules(modules: list):
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.error(f"Warm-up import of {module} failed: {str(e)}")
+
+def _warm_imports():
+    started = get_timestamp()
+    _import_modules(WARM_MODULES)
+    get_compute().start()
+    global _retrainer
+    try:
+        from model.retrainer import start_retrainer
+        _retrainer = start_retrainer()
+    except Exception as e:
+        logger.error(f"Retrainer start failed: {str(e)}")
+    logger.info(f"Warm-up completed in {get_timestamp() - started:.2f}s")
 
-app = FastAPI()
+async def warm_up():
+    # Load heavy modules off the event loop so health checks are answered immediately
+    try:
+        await asyncio.to_thread(_warm_imports)
+    except Exception as e:
+        logger.error(f"Warm-up error: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Health checks are served as soon as this yields; warm-up and scanner run in the background
+    global _warm_task
+    _warm_task = asyncio.create_task(warm_up())
+    scanner_task = asyncio.create_task(run_scanner()) if RUN_SCANNER else None
+    yield
+    _warm_task.cancel()
+    if scanner_task is not None:
+        scanner_task.cancel()
+        try:
+            await asyncio.wait_for(scanner_task, SHUTDOWN_TIMEOUT)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            logger.error(f"Scanner shutdown error: {str(e)}")
+    if _compute is not None:
+        await asyncio.to_thread(_compute.shutdown)
+    if _retrainer is not None:
+        _retrainer.terminate()
+        await asyncio.to_thread(_retrainer.join, 5)
+    from data.candle_store import close_store
+    close_store()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
     return {"message": "Crypto Signal Bot is running"}
 
-def format_timestamp_to_pk(utc_timestamp_str):
-    try:
-        utc_time = datetime.fromisoformat(utc_timestamp_str.replace('Z', '+00:00').split('+00:00+')[0])
-        utc_time = utc_time.replace(tzinfo=pytz.UTC)
-        pk_time = utc_time.astimezone(pytz.timezone('Asia/Karachi'))
-        return pk_time.strftime('%d %B %Y, %I:%M %p')
-    except Exception as e:
-        logger.error(f"Error converting timestamp: {str(e)}")
-        return utc_timestamp_str
-
-def determine_leverage(indicators):
-    score = 0
-    if isinstance(indicators, str):
-        indicators = indicators.split(', ')
-    if 'MACD' in indicators:
-        score += 2
-    if 'Strong Trend' in indicators:
-        score += 2
-    if 'VWAP' in indicators:
-        score += 1
-    if 'Stochastic' in indicators:
-        score -= 1
-    return '40x' if score >= 5 else '30x' if score >= 3 else '20x' if score >= 1 else '10x'
-
-def get_24h_volume(symbol):
-    try:
-        symbol_clean = symbol.replace('/', '').upper()
-        url = f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol_clean}"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        quote_volume = float(data.get('quoteVolume', 0))
-        return quote_volume, f"${quote_volume:,.2f}"
-    except Exception as e:
-        logger.error(f"Error fetching volume for {symbol}: {str(e)}")
-        return 0, '$0.00'
+@app.get("/progress")
+async def scan_progress():
+    # Cycle progress, throughput and queue depths
+    return progress.snapshot()
+
+@app.get("/caches")
+async def cache_stats():
+    # Hit/miss counters and hit rates for scanner caches
+    return progress.cache_hit_rates()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    from fastapi.responses import PlainTextResponse
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
 
 async def fetch_usdt_pairs(exchange):
     try:
         markets = await exchange.load_markets()
         symbols = [symbol for symbol in markets if symbol.endswith('USDT')]
-        high_volume_symbols = []
-        for symbol in symbols:
-            volume, _ = get_24h_volume(symbol)
-            if volume > MIN_VOLUME:
-                high_volume_symbols.append(symbol)
-        logger.info(f"Found {len(high_volume_symbols)} USDT pairs with volume > ${MIN_VOLUME:,}")
+        metrics.exchange_calls.inc(endpoint='fetch_tickers')
+        # One bulk ticker call for the whole universe instead of a volume request per symbol
+        tickers = await exchange.fetch_tickers()
+        tickers = {symbol: tickers[symbol] for symbol in symbols if symbol in tickers}
+        latest_tickers.clear()
+        latest_tickers.update(tickers)
+        scheduler.update_volumes({symbol: t.get('quoteVolume') or 0.0 for symbol, t in tickers.items()})
+        high_volume_symbols = get_prescreen().screen(tickers)
+        universe[:] = high_volume_symbols
+        logger.info(f"Found {len(high_volume_symbols)} USDT pairs with volume > ${MIN_VOLUME:,} passing prescreen")
         return high_volume_symbols
     except Exception as e:
         logger.error(f"Error fetching USDT pairs: {str(e)}")
+        import telegram
         bot = telegram.Bot(token=BOT_TOKEN)
         await bot.send_message(chat_id=CHAT_ID, text=f"⚠ Binance API error: {str(e)}")
         return []
 
-async def process_symbol(exchange, symbol):
+def build_snapshot(exchange, universe_refreshed_at: float) -> dict:
+    # Collect scanner state for a warm restart (shallow copies taken on the event loop)
+    from data import collector
+    from telebot import sender
+    return {
+        'last_signal_time': dict(last_signal_time),
+        'markets': exchange.markets,
+        'currencies': getattr(exchange, 'currencies', None),
+        'tickers': dict(latest_tickers),
+        'universe': list(universe),
+        'universe_refreshed_at': universe_refreshed_at,
+        'scheduler': scheduler.get_state(),
+        'prescreen_volume_avg': dict(get_prescreen().volume_avg),
+        'candles': dict(collector.candle_cache),
+        'open_trades': {symbol: dict(trade) for symbol, trade in sender.open_trades.items()}
+    }
+
+async def save_state(exchange, universe_refreshed_at: float):
+    state = build_snapshot(exchange, universe_refreshed_at)
+    await asyncio.to_thread(save_snapshot, SNAPSHOT_PATH, state)
+
+def restore_state(exchange, state: dict) -> float:
+    # Apply a loaded snapshot; returns the restored universe refresh time (0 forces a cold scan)
+    from data import collector
     try:
-        logger.info(f"[{symbol}] Scanning for signal")
-        current_time = datetime.now(pytz.UTC)
-        if is_cooldown_active(symbol, last_signal_time, COOLDOWN):
-            logger.info(f"[{symbol}] In cooldown")
-            return None
-
-        volume, volume_str = get_24h_volume(symbol)
-        if volume < MIN_VOLUME:
-            logger.info(f"[{symbol}] Low volume: {volume_str}")
-            return None
-
-        ticker = await exchange.fetch_ticker(symbol)
-        if ticker['quoteVolume'] < MIN_VOLUME:
-            logger.info(f"[{symbol}] Low ticker volume: ${ticker['quoteVolume']:.2f}")
-            return None
-
-        timeframes = ['15m', '1h', '4h', '1d']
-        ohlcv_data = []
-        for tf in timeframes:
-            ohlcv = await fetch_realtime_data(symbol, tf, limit=50)
-            if ohlcv is None or len(ohlcv) < 30:
-                logger.warning(f"[{symbol}] Insufficient data for {tf}")
-                return None
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']).astype(np.float32)
-            df = calculate_indicators(df)
-            ohlcv_data.append(df)
-
-        predictor = SignalPredictor()
-        signal = await predictor.predict_signal(symbol, ohlcv_data[0], '15m')
-        if not signal or signal['confidence'] < 70.0:
-            logger.info(f"[{symbol}] No signal or low confidence")
-            return None
-
-        if signal['tp1'] == signal['tp2'] == signal['tp3'] == signal['entry']:
-            logger.info(f"[{symbol}] Identical TP/entry values")
-            return None
-
-        if not await check_multi_timeframe_agreement(symbol, signal['direction'], timeframes):
-            logger.info(f"[{symbol}] No multi-timeframe agreement")
-            return None
-
-        signal['quote_volume_24h'] = volume_str
-        signal['leverage'] = determine_leverage(signal['conditions'])
-        signal['tp1_profit'] = ((signal['tp1'] - signal['entry']) / signal['entry'] * 100) if signal['direction'] == 'buy' else ((signal['entry'] - signal['tp1']) / signal['entry'] * 100)
-        signal['tp2_profit'] = ((signal['tp2'] - signal['entry']) / signal['entry'] * 100) if signal['direction'] == 'buy' else ((signal['entry'] - signal['tp2']) / signal['entry'] * 100)
-        signal['tp3_profit'] = ((signal['tp3'] - signal['entry']) / signal['entry'] * 100) if signal['direction'] == 'buy' else ((signal['entry'] - signal['tp3']) / signal['entry'] * 100)
-        logger.info(f"[{symbol}] Signal generated: {signal['direction']}, Confidence: {signal['confidence']:.2f}%")
-        update_signal_log(symbol, signal, 'pending')
-        await send_signal(symbol, signal, CHAT_ID)
-        last_signal_time[symbol] = current_time
-        return signal
+        last_signal_time.update(state.get('last_signal_time', {}))
+        for symbol, signaled_at in last_signal_time.items():
+            if isinstance(signaled_at, datetime):
+                bot_state.set_cooldown(symbol, signaled_at.timestamp() + COOLDOWN)
+        if state.get('markets') and hasattr(exchange, 'set_markets'):
+            exchange.set_markets(state['markets'], state.get('currencies'))
+        latest_tickers.update(state.get('tickers', {}))
+        get_prescreen().volume_avg.update(state.get('prescreen_volume_avg', {}))
+        collector.restore_candle_cache(state.get('candles', {}))
+        collector.prune_candle_cache()
+        scheduler.set_state(state.get('scheduler', {}))
+        universe[:] = state.get('universe', [])
+        refreshed_at = state.get('universe_refreshed_at', 0.0)
+        if not universe or get_timestamp() - refreshed_at >= CYCLE_INTERVAL:
+            refreshed_at = 0.0
+        else:
+            scheduler.sync_universe(owned(universe))
+        logger.info(f"Restored snapshot: {len(last_signal_time)} cooldowns, {len(universe)} symbols, "
+                    f"{len(collector.candle_cache)} candle sets, {len(state.get('open_trades', {}))} open trades")
+        return refreshed_at
     except Exception as e:
-        logger.error(f"[{symbol}] Error processing: {str(e)}")
-        return None
+        logger.error(f"Error restoring snapshot: {str(e)}")
+        return 0.0
+
+def mark_signaled(symbol: str):
+    # Start a symbol's cooldown (signal sent here, or by another replica)
+    import pytz
+    last_signal_time[symbol] = datetime.now(pytz.UTC)
+    bot_state.set_cooldown(symbol, time.time() + COOLDOWN)
+
+async def claim_scan(symbol: str) -> bool:
+    # Mid-rebalance two replicas may both own a symbol; the scan claim lets only one through
+    return shard is None or await asyncio.to_thread(shard.claim_scan, symbol, scheduler.interval(symbol) + SCAN_CLAIM_SLACK)
+
+async def claim_signal(symbol: str) -> bool:
+    return shard is None or await asyncio.to_thread(shard.claim_signal, symbol, COOLDOWN)
+
+def scan_config(on_done=None) -> ScanConfig:
+    # main.py's pipeline settings; hooks look the module globals up per scan (benchmarks swap them)
+    return ScanConfig(
+        'main', MIN_VOLUME, MIN_CONFIDENCE, CHAT_ID,
+        compute=lambda: get_compute(),
+        cooling_down=lambda symbol: is_cooldown_active(symbol, last_signal_time, COOLDOWN),
+        mark_signaled=mark_signaled,
+        workers={'fetch': BATCH_SIZE, 'validate': 2, 'dispatch': 1},
+        max_signals_per_minute=MAX_SIGNALS_PER_MINUTE,
+        candles=AGREEMENT_CANDLES,
+        scheduler=lambda: scheduler,
+        bar_evaluator=lambda: bar_evaluator,
+        claim_scan=claim_scan,
+        claim_signal=claim_signal,
+        on_done=on_done
+    )
+
+async def process_symbol(exchange, symbol):
+    # One symbol through every pipeline stage in turn (benchmarks, replay); the scan loop streams
+    # symbols through ScanPipeline.run instead
+    job = await ScanPipeline(exchange, scan_config()).process(symbol)
+    return job.signal if job.outcome == 'signal' else None
 
 async def start(update, context):
     try:
@@ -187,55 +339,17 @@ async def test(update, context):
 
 async def status(update, context):
     try:
-        bot = telegram.Bot(token=BOT_TOKEN)
-        bot_info = await bot.get_me()
-        status_text = (
-            f"🟬 Bot running\n"
-            f"🤖 @{bot_info.username}\n"
-            f"📡 Symbols scanned: {len(scanned_symbols)}\n"
-            f"📈 Active signals: {len(last_signal_time)}"
-        )
-        await update.message.reply_text(status_text, parse_mode='Markdown')
+        await update.message.reply_text(bot_state.status_text(), parse_mode='Markdown')
         logger.info('Status command executed')
     except Exception as e:
         logger.error(f"Error in status: {str(e)}")
 
 async def signal(update, context):
     try:
-        if not hasattr(update_signal_log, 'signals_data') or not update_signal_log.signals_data:
+        message = bot_state.latest_signal_text()
+        if message is None:
             await update.message.reply_text('No signals available.')
             return
-        latest_signal = update_signal_log.signals_data[-1]
-        conditions_str = ', '.join(latest_signal['conditions'])
-        volume, volume_str = get_24h_volume(latest_signal['symbol'])
-        if volume < MIN_VOLUME:
-            logger.warning(f"[{latest_signal['symbol']}] Low volume: {volume_str}")
-            await update.message.reply_text('Insufficient signal volume.')
-            return
-
-        latest_signal['leverage'] = determine_leverage(latest_signal['conditions'])
-        latest_signal['quote_volume_24h'] = volume_str
-        latest_signal['timestamp'] = format_timestamp_to_pk(latest_signal['timestamp'])
-
-        message = (
-            f"📈 Trading Signal\n"
-            f"💱 Symbol: {latest_signal['symbol']}\n"
-            f"📊 Direction: {latest_signal['direction']}\n"
-            f"⏰ Timeframe: {latest_signal['timeframe']}\n"
-            f"⏳ Duration: {latest_signal['trade_duration']}\n"
-            f"💰 Entry: ${latest_signal['entry_price']:.2f}\n"
-            f"🎯 TP1: ${latest_signal['tp1']:.2f} ({latest_signal['tp1_profit']:.2f}%)\n"
-            f"🎯 TP2: ${latest_signal['tp2']:.2f} ({latest_signal['tp2_profit']:.2f}%)\n"
-            f"🎯 TP3: ${latest_signal['tp3']:.2f} ({latest_signal['tp3_profit']:.2f}%)\n"
-            f"🛑 SL: ${latest_signal['sl']:.2f}\n"
-            f"🔍 Confidence: {latest_signal['confidence']:.2f}%\n"
-            f"⚡ Type: {latest_signal['trade_type']}\n"
-            f"⚖ Leverage: {latest_signal.get('leverage', 'N/A')}\n"
-            f"📈 Volume: ${latest_signal['volume']:,.2f}\n"
-            f"📈 24h Volume: ${latest_signal['quote_volume_24h']}\n"
-            f"🔎 Indicators: {conditions_str}\n"
-            f"🕒 Timestamp: {latest_signal['timestamp']}"
-        )
         await update.message.reply_text(message, parse_mode='Markdown')
         logger.info('Signal command executed')
     except Exception as e:
@@ -243,44 +357,67 @@ async def signal(update, context):
 
 async def summary(update, context):
     try:
-        report = await generate_daily_summary()
-        if report:
-            await update.message.reply_text(report, parse_mode='Markdown')
-        else:
-            await update.message.reply_text('No signals available.')
+        await update.message.reply_text(bot_state.summary_text() or 'No signals available.', parse_mode='Markdown')
         logger.info('Summary command executed')
     except Exception as e:
         logger.error(f"Error in summary: {str(e)}")
 
 async def report(update, context):
     try:
-        report = await generate_daily_summary()
-        if report:
-            await update.message.reply_text(report, parse_mode='Markdown')
-        else:
-            await update.message.reply_text('No signals available.')
+        await update.message.reply_text(bot_state.report_text() or 'No signals available.', parse_mode='Markdown')
         logger.info('Report command executed')
     except Exception as e:
         logger.error(f"Error in report: {str(e)}")
 
 async def start_bot():
-    global application, last_signal_time
-    try:
-        if not API_KEY or not API_SECRET:
-            logger.error("Binance API key/secret missing")
+    global application, shard, bar_evaluator
+    # Already loaded by warm-up when run from the lifespan; never import them on the event loop
+    await asyncio.to_thread(_import_modules, SCANNER_MODULES)
+    import telegram
+    from telegram.ext import Application, CommandHandler
+    from data import collector
+    from data.exchange import create_exchange, requires_credentials
+    from core import multi_timeframe
+    from core.bar_close import evaluator_from_env
+    from core.sharding import coordinator_from_env
+    from data.breaker import HALF_OPEN, exchange_guard
+    from data.coalesce import single_flight
+    from telebot import sender
+    if requires_credentials() and (not API_KEY or not API_SECRET):
+        logger.error("Binance API key/secret missing")
+        progress.set_state('stopped', 'Binance API key/secret missing')
+        try:
             bot = telegram.Bot(token=BOT_TOKEN)
             await bot.send_message(chat_id=CHAT_ID, text="⚠️ API key/secret missing")
-            return
-
-        exchange = ccxt.binance({
-            'apiKey': API_KEY,
-            'secret': API_SECRET,
-            'enableRateLimit': True
-        })
-
-        last_signal_time = {}
-        signal_count = 0
-        last_signal_minute = get_timestamp() // 60
+        except Exception as e:
+            logger.error(f"Error sending startup alert: {str(e)}")
+        return
+
+    exchange = create_exchange(API_KEY, API_SECRET)
+    collector.set_exchange(exchange)
+    application = None
+    last_universe_refresh = 0.0
+    try:
+        progress.set_state('starting')
+        progress.register_queue('scheduler_total', lambda: len(scheduler))
+        progress.register_queue('scheduler_due', scheduler.due_count)
+        progress.register_queue('open_trades', lambda: len(sender.open_trades))
+        progress.register_cache('candles', lambda: collector.cache_stats)
+        progress.register_cache('verdicts', lambda: multi_timeframe.verdict_stats)
+        progress.register_cache('exchange', lambda: single_flight.cache_stats)
+        bar_evaluator = evaluator_from_env()
+        if bar_evaluator is not None:
+            collector.on_candle_close(bar_evaluator.on_candle_close)
+            progress.register_cache('predictions', lambda: bar_evaluator.cache_stats)
+
+        shard = await asyncio.to_thread(coordinator_from_env)
+        if shard:
+            await asyncio.to_thread(shard.heartbeat)
+            logger.info(f"Sharded mode: {shard.member}, live replicas {shard.ring.members}")
+        state = await asyncio.to_thread(load_snapshot, SNAPSHOT_PATH)
+        last_universe_refresh = restore_state(exchange, state) if state else 0.0
+        # Daily rollups for /summary and /report, read once here instead of per command
+        await asyncio.to_thread(bot_state.load_signal_log)
 
         application = Application.builder().token(BOT_TOKEN).build()
         application.add_handler(CommandHandler('start', start))
@@ -291,57 +428,156 @@ async def start_bot():
         application.add_handler(CommandHandler('summary', summary))
         application.add_handler(CommandHandler('report', report))
         await application.initialize()
+        # initialize() already fetched the bot's identity; /status reuses it
+        bot_state.set_identity(application.bot.username)
         await application.start()
         await application.updater.start_polling(drop_pending_updates=True)
 
-        logger.info("Bot started, fetching USDT pairs...")
-        while True:
+        if state:
+            sender.resume_open_trades(state.get('open_trades', {}))
+            if last_universe_refresh:
+                progress.start_cycle(len(owned(universe)))
+
+        def scan_done(job):
+            # Per-symbol bookkeeping as each scan leaves the pipeline
+            signaled = job.outcome == 'signal'
+            scanned_symbols.add(job.symbol)
+            bot_state.record_scans(1, len(scanned_symbols))
+            if job.outcome not in ('cooldown', 'scanned by another replica'):
+                get_prescreen().record_outcome(job.symbol, signaled)
+            progress.record_batch(1, int(signaled))
+            # A breaker that opened mid-scan rejected it: retry once the breaker closes
+            blocked = exchange_guard.blocked_for(SCAN_ENDPOINTS)
+            if blocked > 0 and not signaled:
+                scheduler.reschedule(job.symbol, due=get_timestamp() + blocked)
+            elif bar_evaluator is not None:
+                # Next look right after the 15m close (or at the usual interval for trigger re-checks)
+                due = bar_evaluator.next_due(job.symbol, scheduler.interval(job.symbol))
+                scheduler.reschedule(job.symbol, signaled=signaled, due=due)
+            else:
+                scheduler.reschedule(job.symbol, signaled=signaled)
+
+        pipeline = ScanPipeline(exchange, scan_config(on_done=scan_done))
+        for stage in STAGES:
+            progress.register_queue(f'pipeline_{stage}', lambda stage=stage: pipeline.depths().get(stage, 0))
+        progress.register_queue('pipeline_in_flight', lambda: pipeline.in_flight)
+        last_snapshot = get_timestamp()
+
+        async def next_symbols(limit: int) -> list:
+            # Universe stage: heartbeat, universe refresh, snapshots and breaker backoff, then up to
+            # `limit` due symbols (as many as the fetch queue has room for)
+            nonlocal last_universe_refresh, last_snapshot
             try:
-                symbols = await fetch_usdt_pairs(exchange)
-                if not symbols:
-                    logger.warning("No USDT pairs, retrying in 60s")
-                    await asyncio.sleep(60)
-                    continue
-
-                logger.info(f"Starting scan cycle for {len(symbols)} symbols")
-                for i in range(0, len(symbols), BATCH_SIZE):
-                    batch = symbols[i:i + BATCH_SIZE]
-                    logger.debug(f"Processing batch: {batch}")
-                    tasks = [process_symbol(exchange, symbol) for symbol in batch if not is_cooldown_active(symbol, last_signal_time, COOLDOWN)]
-                    results = await asyncio.gather(*tasks)
-                    scanned_symbols.update(batch)
-
-                    valid_signals = [r for r in results if r]
-                    if valid_signals:
-                        current_time = get_timestamp()
-                        current_minute = current_time // 60
-
-                        if current_minute > last_signal_minute:
-                            signal_count = 0
-                            last_signal_minute = current_minute
-
-                        if signal_count >= MAX_SIGNALS_PER_MINUTE:
-                            logger.info("Max signals limit reached for this minute")
-                            continue
-
-                        signal_count += 1
-                        logger.info(f"Processed {len(valid_signals)} signals in batch")
-
-                    await asyncio.sleep(5)
-
-                scanned_symbols.clear()
-                logger.info("Scan cycle completed, pausing for 5 minutes")
-                await scan_pause(CYCLE_INTERVAL)
-
+                if shard and shard.heartbeat_due() and await asyncio.to_thread(shard.heartbeat) and universe:
+                    # Replica joined or left: take over / hand off symbols without waiting for the next refresh
+                    scheduler.sync_universe(owned(universe))
+
+                if not universe or get_timestamp() - last_universe_refresh >= CYCLE_INTERVAL:
+                    symbols = await fetch_usdt_pairs(exchange)
+                    if not symbols:
+                        logger.warning("No USDT pairs, retrying in 60s")
+                        await asyncio.sleep(60)
+                        return []
+                    if last_universe_refresh:
+                        logger.info(f"Scan cycle completed, {len(scanned_symbols)} symbols scanned")
+                        get_prescreen().log_pass_rates()
+                    symbols = owned(symbols)
+                    scheduler.sync_universe(symbols)
+                    scanned_symbols.clear()
+                    bot_state.start_cycle()
+                    last_universe_refresh = get_timestamp()
+                    progress.start_cycle(len(symbols))
+                    exchange_guard.start_cycle()
+                    if progress.last_cycle_duration is not None:
+                        metrics.cycle_seconds.observe(progress.last_cycle_duration)
+                    logger.info(f"Starting scan cycle for {len(symbols)} symbols")
+
+                if get_timestamp() - last_snapshot >= SNAPSHOT_INTERVAL:
+                    await save_state(exchange, last_universe_refresh)
+                    last_snapshot = get_timestamp()
+
+                blocked = exchange_guard.blocked_for(SCAN_ENDPOINTS)
+                if blocked > 0:
+                    # Breaker open (rate limit, outage): due symbols wait in the scheduler rather than fail fast
+                    progress.set_state('backing off')
+                    await asyncio.sleep(min(blocked, 60))
+                    return []
+
+                # Half-open breaker: one symbol at a time, so its request is the probe and little else is rejected
+                half_open = HALF_OPEN in map(exchange_guard.states().get, SCAN_ENDPOINTS)
+                batch = scheduler.pop_due(1 if half_open else limit)
+                if not batch:
+                    progress.set_state('scanning' if pipeline.in_flight else 'waiting')
+                    wait = min(scheduler.next_due_in(), CYCLE_INTERVAL - (get_timestamp() - last_universe_refresh))
+                    if pipeline.in_flight:
+                        # Scans still in the pipeline reschedule their symbols; look again soon
+                        wait = min(wait, IDLE_POLL_SECONDS)
+                    if shard:
+                        # Keep heartbeating while idle (and take over symbols as soon as the ring allows)
+                        wait = min(wait, shard.heartbeat_in())
+                    await asyncio.sleep(max(wait, 1))
+                    return []
+
+                progress.set_state('scanning')
+                logger.debug(f"Queued for scanning: {batch}")
+                return batch
+
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Main loop error: {str(e)}")
+                progress.set_state('error', str(e))
                 await asyncio.sleep(60)
+                return []
 
-        await exchange.close()
+        logger.info("Bot started, fetching USDT pairs...")
+        await pipeline.run(next_symbols)
 
+    except asyncio.CancelledError:
+        logger.info("Scanner cancelled, shutting down")
+        raise
     except Exception as e:
         logger.error(f"Bot startup error: {str(e)}")
         raise
+    finally:
+        # Persist state and release connections whether we crashed or were cancelled
+        progress.set_state('stopped')
+        await save_state(exchange, last_universe_refresh)
+        if application is not None:
+            try:
+                if application.updater and application.updater.running:
+                    await application.updater.stop()
+                if application.running:
+                    await application.stop()
+                await application.shutdown()
+            except Exception as e:
+                logger.error(f"Error stopping Telegram application: {str(e)}")
+        collector.set_exchange(None)
+        await exchange.close()
+        if shard:
+            await asyncio.to_thread(shard.leave)
+
+async def run_scanner():
+    # Supervise start_bot: restart with exponential backoff on crashes, stop on cancellation. Starts
+    # after warm-up, so the scanner's imports do not block the first HTTP responses
+    if _warm_task is not None:
+        await asyncio.wait({_warm_task})
+    backoff = SUPERVISOR_MIN_BACKOFF
+    while True:
+        started = get_timestamp()
+        try:
+            await start_bot()
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            progress.record_restart(str(e))
+            if get_timestamp() - started > SUPERVISOR_MAX_BACKOFF:
+                backoff = SUPERVISOR_MIN_BACKOFF
+            logger.error(f"Scanner crashed, restarting in {backoff}s: {str(e)}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, SUPERVISOR_MAX_BACKOFF)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=PORT)
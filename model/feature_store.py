@@ -0,0 +1,208 @@
+# Persistent, incrementally extended store of ML features and labels
+# Changes:
+# - One directory per (feature-set version, symbol, timeframe) holding raw little-endian arrays
+#   (timestamps, candles, features, labels) that np.memmap opens without reading or parsing them
+# - extend() appends only closed bars newer than the last stored one: their features are computed with
+#   WARMUP_BARS stored candles as indicator history, and labels still pending are resolved in place
+# - meta.json (written atomically, last) holds the committed row count, so a crash mid-append leaves
+#   the previous rows readable; a bar gap or a changed feature set starts the series over
+# - load() stacks several symbols' labelled rows for training without recomputing anything
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from data.candles import CandleSeries, HIGH, CLOSE, PRICE_COLUMNS
+from data.collector import TIMEFRAME_SECONDS
+from model.features import (FEATURE_COLUMNS, FEATURE_SET_VERSION, FILLED_BARS, PENDING_LABEL, WARMUP_BARS,
+                            compute_features, label_bars)
+from utils.logger import logger
+
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', 'ml_models/features')
+# Fewest closed candles a new series is built from (indicators need 30)
+MIN_SERIES_BARS = 30
+
+# file name -> (dtype, columns per row)
+ARRAYS = {
+    'timestamps.i8': ('<i8', None),
+    'candles.f8': ('<f8', len(PRICE_COLUMNS)),
+    'features.f8': ('<f8', len(FEATURE_COLUMNS)),
+    'labels.i1': ('i1', None)
+}
+
+class FeatureSeries:
+    # Memory-mapped view of one stored (symbol, timeframe) series; arrays are read-only
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.rows = meta['rows']
+        self.timestamps, self.candles, self.features, self.labels = (
+            _map(os.path.join(path, name), dtype, width, self.rows) for name, (dtype, width) in ARRAYS.items())
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def labelled(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Features and labels of the bars whose label is resolved, past the series' filled first bars
+        mask = self.labels != PENDING_LABEL
+        mask[:FILLED_BARS] = False
+        return self.features[mask], self.labels[mask]
+
+def _map(path: str, dtype: str, width: Optional[int], rows: int) -> np.ndarray:
+    shape = (rows,) if width is None else (rows, width)
+    if rows == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+def _series_name(symbol: str, timeframe: str) -> str:
+    return f"{symbol.replace('/', '-')}_{timeframe}"
+
+class FeatureStore:
+    def __init__(self, root: str = FEATURE_STORE_DIR, version: str = FEATURE_SET_VERSION):
+        self.root = root
+        self.version = version
+        self.stats = {'computed_bars': 0, 'appended_bars': 0, 'rebuilt_series': 0}
+
+    def series_path(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, self.version, _series_name(symbol, timeframe))
+
+    def _read_meta(self, path: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            return meta if meta.get('version') == self.version else None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading feature store metadata in {path}: {str(e)}")
+            return None
+
+    def _write_meta(self, path: str, meta: dict):
+        # Commit point of an update: the row count only moves once every array is written
+        fd, tmp_path = tempfile.mkstemp(prefix='.meta-', dir=path)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(meta, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(path, 'meta.json'))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, symbol: str, timeframe: str) -> Optional[FeatureSeries]:
+        path = self.series_path(symbol, timeframe)
+        meta = self._read_meta(path)
+        return FeatureSeries(path, meta) if meta else None
+
+    def extend(self, symbol: str, timeframe: str, candles: CandleSeries, now: float = None) -> int:
+        # Store features and labels for the closed bars of candles not stored yet; returns how many
+        # bars were added
+        try:
+            step_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+            now_ms = (time.time() if now is None else now) * 1000
+            closed = int(np.searchsorted(candles.timestamps + step_ms, now_ms, side='right'))
+            timestamps = np.asarray(candles.timestamps[:closed], dtype=np.int64)
+            values = np.asarray(candles.values[:closed], dtype=np.float64)
+            path = self.series_path(symbol, timeframe)
+            series = self.open(symbol, timeframe)
+            if series is not None and len(series):
+                last = int(series.timestamps[-1])
+                start = int(np.searchsorted(timestamps, last, side='right'))
+                if start == len(timestamps):
+                    return 0
+                if start == 0 and timestamps[0] != last + step_ms:
+                    logger.warning(f"[{symbol}] Feature store gap on {timeframe} after {last}, rebuilding the series")
+                    series = None
+                else:
+                    return self._append(path, series, timestamps[start:], values[start:])
+            if len(timestamps) < MIN_SERIES_BARS:
+                logger.warning(f"[{symbol}] Too few closed {timeframe} candles for the feature store: {len(timestamps)}")
+                return 0
+            return self._build(path, symbol, timeframe, timestamps, values)
+        except Exception as e:
+            logger.error(f"[{symbol}] Error extending feature store on {timeframe}: {str(e)}")
+            return 0
+
+    def _build(self, path: str, symbol: str, timeframe: str, timestamps: np.ndarray, values: np.ndarray) -> int:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        features = compute_features(_frame(timestamps, values))
+        labels = label_bars(values[:, CLOSE], values[:, HIGH], features[:, FEATURE_COLUMNS.index('atr')])
+        for name, block in zip(ARRAYS, (timestamps, values, features, labels)):
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(np.ascontiguousarray(block, dtype=ARRAYS[name][0]).tobytes())
+        self._write_meta(path, {'version': self.version, 'symbol': symbol, 'timeframe': timeframe,
+                                'features': FEATURE_COLUMNS, 'rows': len(timestamps), 'updated': time.time()})
+        self.stats['computed_bars'] += len(timestamps)
+        self.stats['rebuilt_series'] += 1
+        logger.info(f"[{symbol}] Feature store built {len(timestamps)} {timeframe} bars")
+        return len(timestamps)
+
+    def _append(self, path: str, series: FeatureSeries, timestamps: np.ndarray, values: np.ndarray) -> int:
+        # Features of the new bars with stored candles as warm-up; labels from the first pending bar on
+        rows = series.rows
+        history = np.asarray(series.candles[max(rows - WARMUP_BARS, 0):])
+        context = np.vstack([history, values])
+        context_ts = np.concatenate([np.asarray(series.timestamps[rows - len(history):]), timestamps])
+        features = compute_features(_frame(context_ts, context))[len(history):]
+
+        pending = np.flatnonzero(np.asarray(series.labels) == PENDING_LABEL)
+        first_pending = int(pending[0]) if len(pending) else rows
+        atr_column = FEATURE_COLUMNS.index('atr')
+        tail_candles = np.vstack([np.asarray(series.candles[first_pending:]), values])
+        tail_atr = np.concatenate([np.asarray(series.features[first_pending:, atr_column]), features[:, atr_column]])
+        labels = label_bars(tail_candles[:, CLOSE], tail_candles[:, HIGH], tail_atr)
+
+        # Drop anything past the committed rows (an interrupted append), then write
+        for name, (dtype, width) in ARRAYS.items():
+            with open(os.path.join(path, name), 'r+b') as f:
+                f.truncate(rows * np.dtype(dtype).itemsize * (width or 1))
+        with open(os.path.join(path, 'labels.i1'), 'r+b') as f:
+            f.seek(first_pending)
+            f.write(labels.astype('i1').tobytes())
+        for name, block in (('timestamps.i8', timestamps), ('candles.f8', values), ('features.f8', features)):
+            with open(os.path.join(path, name), 'ab') as f:
+                f.write(np.ascontiguousarray(block, dtype=ARRAYS[name][0]).tobytes())
+        meta = dict(series.meta, rows=rows + len(timestamps), updated=time.time())
+        self._write_meta(path, meta)
+        self.stats['computed_bars'] += len(timestamps)
+        self.stats['appended_bars'] += len(timestamps)
+        logger.debug("[%s] Feature store appended %d %s bars", meta['symbol'], len(timestamps), meta['timeframe'])
+        return len(timestamps)
+
+    def load(self, symbols: Iterable[str], timeframe: str = '15m') -> Tuple[pd.DataFrame, pd.Series]:
+        # Labelled rows of every stored symbol, stacked (symbols without stored features are skipped)
+        blocks, labels = [], []
+        for symbol in symbols:
+            series = self.open(symbol, timeframe)
+            if series is None:
+                continue
+            X, y = series.labelled()
+            blocks.append(X)
+            labels.append(y)
+        if not blocks:
+            return pd.DataFrame(columns=FEATURE_COLUMNS), pd.Series(dtype=np.int8, name='label')
+        return (pd.DataFrame(np.concatenate(blocks), columns=FEATURE_COLUMNS),
+                pd.Series(np.concatenate(labels), name='label'))
+
+    def prune(self) -> int:
+        # Remove series stored under other feature-set versions; returns how many versions went
+        if not os.path.isdir(self.root):
+            return 0
+        stale = [name for name in os.listdir(self.root) if name != self.version and os.path.isdir(os.path.join(self.root, name))]
+        for name in stale:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            logger.info(f"Removed stale feature set {name} from {self.root}")
+        return len(stale)
+
+def _frame(timestamps: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    return CandleSeries(timestamps, values).to_frame(np.float64)
+
+# Process-wide store
+feature_store = FeatureStore()
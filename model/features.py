@@ -0,0 +1,66 @@
+# ML feature set: the columns the model is trained and predicts on, how they are computed and labelled
+# Changes:
+# - One definition shared by the trainer, the feature store and the predictor (the trainer used to
+#   build 12 features while predict_signal built 17)
+# - compute_features turns candles into the feature matrix for every bar (indicators plus per-bar
+#   candle pattern flags); label_bars marks bars whose TP1 was reached within LABEL_HORIZON bars
+# - FEATURE_SET_VERSION hashes the feature names, label parameters and the source of the indicator
+#   and pattern code, so stored features are invalidated whenever their definition changes
+
+import hashlib
+import inspect
+import json
+import numpy as np
+import pandas as pd
+from core import indicators
+from core.indicators import PATTERN_DETECTORS, PATTERN_NAMES, calculate_indicators
+
+ML_INDICATOR_FEATURES = [
+    'rsi', 'macd', 'macd_signal', 'atr', 'adx', 'volume_sma_20',
+    'bollinger_upper', 'bollinger_lower', 'stoch_k', 'vwap'
+]
+ML_PATTERN_FEATURES = list(PATTERN_NAMES)
+FEATURE_COLUMNS = ML_INDICATOR_FEATURES + ML_PATTERN_FEATURES
+
+# Label: TP1 (close + LABEL_ATR_MULTIPLIER * ATR) reached by a high within the next LABEL_HORIZON bars
+LABEL_HORIZON = 10
+LABEL_ATR_MULTIPLIER = 1.2
+# Bars whose horizon has not passed yet
+PENDING_LABEL = -1
+# Earlier candles used as indicator history when features are computed for new bars only
+WARMUP_BARS = 200
+# Leading bars of a series whose indicator windows are incomplete (calculate_indicators fills them with
+# the frame mean, so they are not trained on)
+FILLED_BARS = 30
+
+def _definition_hash() -> str:
+    # Everything that changes a stored feature or label value
+    sources = [inspect.getsource(fn) for fn in (indicators.calculate_ema, calculate_indicators) + PATTERN_DETECTORS]
+    definition = json.dumps({
+        'features': FEATURE_COLUMNS,
+        'label': [LABEL_HORIZON, LABEL_ATR_MULTIPLIER],
+        'warmup': [WARMUP_BARS, FILLED_BARS],
+        'sources': sources
+    })
+    return hashlib.sha256(definition.encode()).hexdigest()[:12]
+
+FEATURE_SET_VERSION = _definition_hash()
+
+def compute_features(df: pd.DataFrame) -> np.ndarray:
+    # (bars, FEATURE_COLUMNS) float64 matrix for every candle of df (timestamp + price columns)
+    df = calculate_indicators(df)
+    indicator_block = df[ML_INDICATOR_FEATURES].to_numpy(dtype=np.float64)
+    pattern_block = np.column_stack([detector(df).to_numpy(dtype=np.float64) for detector in PATTERN_DETECTORS])
+    return np.hstack([indicator_block, pattern_block])
+
+def label_bars(close: np.ndarray, high: np.ndarray, atr: np.ndarray) -> np.ndarray:
+    # 1 if bar i's TP1 is reached within the next LABEL_HORIZON highs, 0 if not, PENDING_LABEL while
+    # fewer than LABEL_HORIZON bars follow it
+    labels = np.full(len(close), PENDING_LABEL, dtype=np.int8)
+    resolved = len(close) - LABEL_HORIZON
+    if resolved <= 0:
+        return labels
+    future_high = np.lib.stride_tricks.sliding_window_view(high[1:], LABEL_HORIZON).max(axis=1)[:resolved]
+    tp1 = close[:resolved] + atr[:resolved] * LABEL_ATR_MULTIPLIER
+    labels[:resolved] = (close[:resolved] < tp1) & (tp1 <= future_high)
+    return labels
@@ -5,33 +5,70 @@
 # - Set MIN_VOLUME to 500,000 USD
 # - Added cooldown check with is_cooldown_active
 # - Optimized logging for Cloud Run
+# - Dropped unused sklearn import; joblib pulls sklearn in only when the model is loaded
+# - Timing spans around indicator, level, pattern and ML stages of predict_signal
+# - Per-step chatter logged lazily at DEBUG; main.py emits one summary line per symbol
+# - Synchronous generate_signal so compute workers can run it without an event loop
+# - One frame copy per signal (none with prepared=True); ML features reuse the computed indicators
+#   and detected patterns instead of recomputing them; signals are slotted SignalRecords
+# - Support/resistance and Fibonacci levels from the incremental swing-point engine (core.levels)
+# - Conditions, confidence, direction votes, leverage and TP probabilities come from the compiled rule
+#   table (model.rules) as masks and dot products; condition names are built only for emitted signals
+# - ML feature columns come from model.features (shared with the trainer); a model trained on a
+#   different number of features is not used (one warning at load instead of an error per symbol)
+# - The model comes from model.registry: the promoted version, switched in the background when the
+#   retrainer promotes a new one, with no reload or pause per call
+# - latest_features (levels via level_engine.update_many, patterns, latest-candle values) runs without
+#   the model; predict_batch scores many symbols with one rule-table pass and one predict_proba call,
+#   and generate_signal is a batch of one
 
+import logging
 import pandas as pd
 import numpy as np
 import asyncio
-from joblib import load
-from core.indicators import calculate_indicators, calculate_fibonacci_levels, calculate_support_resistance, detect_candle_patterns
-from core.indicators import calculate_tp_probabilities_and_prices, adjust_tp_for_stablecoin
+from core.indicators import calculate_indicators, candle_pattern_flags, detect_candle_patterns
+from core.levels import level_engine
+from core.indicators import calculate_tp_prices, tp_probabilities, adjust_tp_for_stablecoin
+from model.rules import CANDLE_INPUTS, signal_rules
 from utils.logger import logger
+from utils.metrics import span
 from utils.helpers import is_cooldown_active
 from data.collector import fetch_realtime_data
-from sklearn.ensemble import RandomForestClassifier
-import os
+from model.features import ML_INDICATOR_FEATURES, ML_PATTERN_FEATURES
+from model.registry import model_registry
+from model.signal_record import SignalRecord
+
+# Latest-candle values the rules, the ML features and the signal read
+LATEST_KEYS = tuple(dict.fromkeys(CANDLE_INPUTS + tuple(ML_INDICATOR_FEATURES) + ('atr',)))
+
+def latest_features(items: list, timeframe: str = '15m') -> list:
+    # Per (symbol, indicator frame): the latest candle's values, swing levels and candle pattern flags
+    # predict_batch needs. Frames are scratch space (levels cast prices in place); their levels come from
+    # one level_engine.update_many call. Needs no model, so compute workers run it
+    with span('predict_levels'):
+        levels = level_engine.update_many([(symbol, timeframe, df) for symbol, df in items], cast=True)
+    features = []
+    for symbol, df in items:
+        latest = df.iloc[-1]
+        with span('predict_patterns'):
+            pattern_flags = candle_pattern_flags(df)
+        features.append({'latest': {key: latest[key] for key in LATEST_KEYS if key in latest},
+                         'levels': levels[(symbol, timeframe)], 'pattern_flags': pattern_flags})
+    return features
 
 class SignalPredictor:
     def __init__(self):
         # Initialize SignalPredictor with minimum data points
         self.min_data_points = 30
-        self.model_path = "ml_models/rf_model.joblib"
-        self.ml_model = None
-        if os.path.exists(self.model_path):
-            try:
-                self.ml_model = load(self.model_path)
-                logger.info("Loaded RandomForest model for prediction")
-            except Exception as e:
-                logger.error(f"Error loading ML model: {str(e)}")
+        self.models = model_registry
+        self.models.load()
         logger.info("SignalPredictor initialized")
 
+    @property
+    def ml_model(self):
+        # Currently promoted model (switched in the background when a new version is promoted)
+        return self.models.current()
+
     def get_trade_duration(self, timeframe: str) -> str:
         # Get trade duration based on timeframe
         durations = {
@@ -45,33 +82,27 @@ class SignalPredictor:
 
     def calculate_tp_hit_possibilities(self, symbol: str, direction: str, entry: float, tp1: float, tp2: float, tp3: float) -> tuple:
         # Use fixed TP hit probabilities
-        logger.info(f"[{symbol}] Using fixed TP possibilities")
+        logger.debug("[%s] Using fixed TP possibilities", symbol)
         return 60.0, 40.0, 20.0
 
-    def prepare_ml_features(self, df, symbol):
-        # Prepare features for ML prediction
+    def prepare_ml_features(self, df, symbol, patterns: list = None, pattern_flags: list = None):
+        # Prepare features for ML prediction from the latest candle (indicators computed if missing);
+        # pattern_flags (one per ML_PATTERN_FEATURES entry) stand in for the pattern list
         try:
-            df = df.copy()
-            df = calculate_indicators(df)
+            if 'rsi' not in df:
+                df = calculate_indicators(df)
             if df.empty:
                 logger.error(f"[{symbol}] Failed to prepare ML features")
                 return None
+            if pattern_flags is not None:
+                counts = np.array(pattern_flags, dtype=np.float64)
+            else:
+                if patterns is None:
+                    patterns = detect_candle_patterns(df)
+                counts = np.array([patterns.count(p) for p in ML_PATTERN_FEATURES], dtype=np.float64)
 
-            df['bullish_engulfing'] = detect_candle_patterns(df).count('bullish_engulfing')
-            df['bearish_engulfing'] = detect_candle_patterns(df).count('bearish_engulfing')
-            df['doji'] = detect_candle_patterns(df).count('doji')
-            df['hammer'] = detect_candle_patterns(df).count('hammer')
-            df['shooting_star'] = detect_candle_patterns(df).count('shooting_star')
-            df['three_white_soldiers'] = detect_candle_patterns(df).count('three_white_soldiers')
-            df['three_black_crows'] = detect_candle_patterns(df).count('three_black_crows')
-
-            features = [
-                'rsi', 'macd', 'macd_signal', 'atr', 'adx', 'volume_sma_20',
-                'bollinger_upper', 'bollinger_lower', 'stoch_k', 'vwap',
-                'bullish_engulfing', 'bearish_engulfing', 'doji', 'hammer',
-                'shooting_star', 'three_white_soldiers', 'three_black_crows'
-            ]
-            X = df[features].iloc[-1:].values
+            indicators = df[ML_INDICATOR_FEATURES].iloc[-1].to_numpy(dtype=np.float64)
+            X = np.concatenate([indicators, counts]).reshape(1, -1)
             return X
         except Exception as e:
             logger.error(f"[{symbol}] Error preparing ML features: {str(e)}")
@@ -84,116 +115,101 @@ class SignalPredictor:
                 trade_type = "Normal"
             else:
                 trade_type = "Scalping"
-            logger.info(f"Trade classified as {trade_type} with confidence {confidence:.2f}")
+            logger.debug("Trade classified as %s with confidence %.2f", trade_type, confidence)
             return trade_type
         except Exception as e:
             logger.error(f"Error classifying trade: {str(e)}")
             return "Scalping"
 
-    async def predict_signal(self, symbol: str, df: pd.DataFrame, timeframe: str, last_signal_time: dict) -> dict:
-        # Predict signal using rule-based and ML logic
+    async def predict_signal(self, symbol: str, df: pd.DataFrame, timeframe: str, last_signal_time: dict = None) -> dict:
+        # Async entry point for callers on the event loop; the work itself is synchronous
+        return self.generate_signal(symbol, df, timeframe, last_signal_time)
+
+    def generate_signal(self, symbol: str, df: pd.DataFrame, timeframe: str, last_signal_time: dict = None,
+                        prepared: bool = False) -> SignalRecord:
+        # Predict signal using rule-based and ML logic. prepared=True: df already has indicators and
+        # is scratch space owned by the caller, so level columns are added to it without a copy
         try:
             if df is None or len(df) < self.min_data_points:
                 logger.warning(f"[{symbol}] Insufficient data for {timeframe}: {len(df) if df is not None else 'None'}")
                 return None
 
-            df = df.copy()
-            logger.info(f"[{symbol}] Calculating indicators for {timeframe}")
-            df = calculate_indicators(df)
-            logger.info(f"[{symbol}] Calculating Fibonacci levels for {timeframe}")
-            df = calculate_fibonacci_levels(df, timeframe)
-            logger.info(f"[{symbol}] Calculating support/resistance for {timeframe}")
-            sr_levels = calculate_support_resistance(symbol, df)
-
-            latest = df.iloc[-1]
-            conditions = []
-            logger.info(f"[{symbol}] {timeframe} - RSI: {latest['rsi']:.2f}, MACD: {latest['macd']:.4f}, ADX: {latest['adx']:.2f}")
-
-            if latest['rsi'] < 30:
-                conditions.append("Oversold RSI")
-            elif latest['rsi'] > 70:
-                conditions.append("Overbought RSI")
-
-            if latest['macd'] > latest['macd_signal'] and latest['macd'] > 0:
-                conditions.append("Bullish MACD")
-            elif latest['macd'] < latest['macd_signal'] and latest['macd'] < 0:
-                conditions.append("Bearish MACD")
+            if not prepared:
+                logger.debug("[%s] Calculating indicators for %s", symbol, timeframe)
+                with span('predict_indicators'):
+                    df = calculate_indicators(df)
+            return self.predict_batch([(symbol, latest_features([(symbol, df)], timeframe)[0])], timeframe)[0]
+        except Exception as e:
+            logger.error(f"Error in predict_signal for {str(e)}")
+            return None
 
-            if latest['adx'] > 25:
-                conditions.append("Strong Trend")
+    def ml_features(self, symbol: str, features: dict):
+        # ML feature row from latest_features (the same values prepare_ml_features reads from a frame)
+        try:
+            indicators = np.array([features['latest'][key] for key in ML_INDICATOR_FEATURES], dtype=np.float64)
+            counts = np.array(features['pattern_flags'], dtype=np.float64)
+            return np.concatenate([indicators, counts]).reshape(1, -1)
+        except Exception as e:
+            logger.error(f"[{symbol}] Error preparing ML features: {str(e)}")
+            return None
 
-            if latest['close'] > latest['bollinger_upper']:
-                conditions.append("Above Bollinger Upper")
-            elif latest['close'] < latest['bollinger_lower']:
-                conditions.append("Below Bollinger Lower")
+    def ml_predictions(self, items: list) -> list:
+        # (direction, confidence) per (symbol, features) from one predict_proba call for the batch;
+        # (None, 0.0) without a model or features
+        predictions = [(None, 0.0)] * len(items)
+        ml_model = self.ml_model
+        if not ml_model:
+            return predictions
+        with span('predict_ml_features'):
+            rows = [(i, self.ml_features(symbol, features)) for i, (symbol, features) in enumerate(items)]
+            rows = [(i, X) for i, X in rows if X is not None]
+        if not rows:
+            return predictions
+        try:
+            with span('predict_ml'):
+                probabilities = ml_model.predict_proba(np.vstack([X for _, X in rows]))
+            for (i, _), ml_pred in zip(rows, probabilities):
+                ml_direction = "LONG" if ml_pred[0] > ml_pred[1] else "SHORT"
+                predictions[i] = (ml_direction, max(ml_pred) * 100)
+                logger.debug("[%s] ML prediction: %s, Confidence: %.2f%%", items[i][0], ml_direction, predictions[i][1])
+        except Exception as e:
+            logger.error(f"ML prediction error for {len(rows)} symbols: {str(e)}")
+        return predictions
 
-            patterns = detect_candle_patterns(df)
-            conditions.extend(patterns)
+    def predict_batch(self, items: list, timeframe: str = '15m') -> list:
+        # Signal (or None) per (symbol, latest_features): the rule table scores the whole batch in one
+        # pass and the ML model is asked once
+        if not items:
+            return []
+        features = [f for _, f in items]
+        scores = signal_rules.evaluate(signal_rules.inputs([f['latest'] for f in features], [f['levels'] for f in features],
+                                                           [f['pattern_flags'] for f in features]))
+        ml = self.ml_predictions(items)
+        return [self._signal(symbol, f['latest'], scores, i, ml[i], timeframe) for i, (symbol, f) in enumerate(items)]
 
+    def _signal(self, symbol: str, latest: dict, scores, i: int, ml: tuple, timeframe: str) -> SignalRecord:
+        # Signal of batch row i from its rule scores and ML prediction
+        try:
+            logger.debug("[%s] %s - RSI: %.2f, MACD: %.4f, ADX: %.2f", symbol, timeframe, latest['rsi'], latest['macd'], latest['adx'])
             current_price = latest['close']
-            support = sr_levels['support']
-            resistance = sr_levels['resistance']
-            if abs(current_price - support) / current_price < 0.05:
-                conditions.append("Near Support")
-            if abs(current_price - resistance) / current_price < 0.05:
-                conditions.append("Near Resistance")
-
-            if 'volume_sma_20' in latest and latest['volume'] > latest['volume_sma_20'] * 1.2:
-                conditions.append("High Volume")
-
-            logger.info(f"[{symbol}] Conditions: {', '.join(conditions) if conditions else 'None'}")
-
-            confidence = 50.0
-            weights = []
-            if "Bullish MACD" in conditions or "Bearish MACD" in conditions:
-                confidence += 15.0
-                weights.append("MACD: +15")
-            if any(p in conditions for p in ['bullish_engulfing', 'bearish_engulfing', 'hammer', 'shooting_star']):
-                confidence += 12.0
-                weights.append("Candlestick: +12")
-            if "Strong Trend" in conditions:
-                confidence += 12.0
-                weights.append("ADX: +12")
-            if "Near Support" in conditions or "Near Resistance" in conditions:
-                confidence += 8.0
-            if "High Volume" in conditions:
-                confidence += 8.0
-            confidence = min(confidence, 95.0)
-            logger.info(f"[{symbol}] Rule-based confidence: {confidence:.2f}")
-
-            ml_confidence = 0.0
-            ml_direction = None
-            if self.ml_model:
-                X_ml = self.prepare_ml_features(df, symbol)
-                if X_ml is not None:
-                    try:
-                        ml_pred = self.ml_model.predict_proba(X_ml)[0]
-                        ml_direction = "LONG" if ml_pred[0] > ml_pred[1] else "SHORT"
-                        ml_confidence = max(ml_pred) * 100
-                        logger.info(f"[{symbol}] ML prediction: {ml_direction}, Confidence: {ml_confidence:.2f}%")
-                    except Exception as e:
-                        logger.error(f"[{symbol}] ML prediction error: {str(e)}")
+            confidence = float(scores.values['confidence'][i])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[%s] Conditions: %s", symbol, scores.conditions(i) or 'None')
+            logger.debug("[%s] Rule-based confidence: %.2f", symbol, confidence)
 
+            ml_direction, ml_confidence = ml
             direction = None
             final_confidence = confidence
             if ml_confidence >= 70.0 and ml_direction:
                 direction = ml_direction
                 final_confidence = (ml_confidence + confidence) / 2
-                logger.info(f"[{symbol}] Using ML prediction: {direction}, Combined Confidence: {final_confidence:.2f}%")
+                logger.debug("[%s] Using ML prediction: %s, Combined Confidence: %.2f%%", symbol, direction, final_confidence)
             else:
-                bullish_conditions = ['bullish_engulfing', 'Oversold RSI', 'Bullish MACD', 'hammer', 'three_white_soldiers']
-                bearish_conditions = ['bearish_engulfing', 'Overbought RSI', 'Bearish MACD', 'shooting_star', 'three_black_crows']
-                bullish_count = sum(1 for c in conditions if c in bullish_conditions)
-                bearish_count = sum(1 for c in conditions if c in bearish_conditions)
-
-                if bullish_count > bearish_count and confidence >= 70:
-                    direction = "LONG"
-                elif bearish_count > bullish_count and confidence >= 70:
-                    direction = "SHORT"
-                logger.info(f"[{symbol}] Using rule-based prediction: {direction}, Confidence: {confidence:.2f}%")
+                direction = scores.direction(i)
+                logger.debug("[%s] Using rule-based prediction: %s, Confidence: %.2f%%", symbol, direction, confidence)
 
             if not direction:
-                logger.warning(f"[{symbol}] No clear direction found")
+                logger.debug("[%s] No clear direction found", symbol)
                 return None
 
             atr = max(latest.get('atr', 0.005 * current_price), 0.002 * current_price)
@@ -210,7 +226,8 @@ class SignalPredictor:
                 sl = round(entry_price * 1.01, 2)  # 1% above entry
 
             tp1, tp2, tp3 = adjust_tp_for_stablecoin(symbol, tp1, tp2, tp3, entry_price)
-            probabilities, prices = calculate_tp_probabilities_and_prices(conditions, entry_price, atr)
+            probabilities = tp_probabilities(scores.values['tp_probability'][i])
+            prices = calculate_tp_prices(entry_price, atr)
             tp1_possibility, tp2_possibility, tp3_possibility = self.calculate_tp_hit_possibilities(symbol, direction, entry_price, prices['TP1'], prices['TP2'], prices['TP3'])
 
             # Calculate TP profit percentages
@@ -220,32 +237,33 @@ class SignalPredictor:
 
             trade_type = self.classify_trade(final_confidence)
 
-            signal = {
-                'symbol': symbol,
-                'direction': direction,
-                'entry': float(entry_price),
-                'confidence': float(final_confidence),
-                'timeframe': timeframe,
-                'conditions': conditions,
-                'tp1': float(prices['TP1']),
-                'tp2': float(prices['TP2']),
-                'tp3': float(prices['TP3']),
-                'sl': float(sl),
-                'tp1_possibility': float(probabilities['TP1']),
-                'tp2_possibility': float(probabilities['TP2']),
-                'tp3_possibility': float(probabilities['TP3']),
-                'tp1_profit_pct': float(tp1_profit_pct),  # Added profit percentage
-                'tp2_profit_pct': float(tp2_profit_pct),  # Added profit percentage
-                'tp3_profit_pct': float(tp3_profit_pct),  # Added profit percentage
-                'volume': float(latest['volume']),
-                'trade_type': trade_type,
-                'trade_duration': self.get_trade_duration(timeframe),
-                'timestamp': pd.Timestamp.now().isoformat(),
-                'atr': float(atr)
-            }
-
-            logger.info(f"[{symbol}] Signal generated: {direction}, Entry: ${entry_price:.2f}, Confidence: {final_confidence:.2f}%")
+            signal = SignalRecord(
+                symbol=symbol,
+                direction=direction,
+                entry=float(entry_price),
+                confidence=float(final_confidence),
+                timeframe=timeframe,
+                conditions=scores.conditions(i),
+                tp1=float(prices['TP1']),
+                tp2=float(prices['TP2']),
+                tp3=float(prices['TP3']),
+                sl=float(sl),
+                tp1_possibility=float(probabilities['TP1']),
+                tp2_possibility=float(probabilities['TP2']),
+                tp3_possibility=float(probabilities['TP3']),
+                tp1_profit_pct=float(tp1_profit_pct),  # Added profit percentage
+                tp2_profit_pct=float(tp2_profit_pct),  # Added profit percentage
+                tp3_profit_pct=float(tp3_profit_pct),  # Added profit percentage
+                volume=float(latest['volume']),
+                trade_type=trade_type,
+                trade_duration=self.get_trade_duration(timeframe),
+                timestamp=pd.Timestamp.now().isoformat(),
+                atr=float(atr),
+                leverage=scores.leverage(i)
+            )
+
+            logger.debug("[%s] Signal generated: %s, Entry: $%.2f, Confidence: %.2f%%", symbol, direction, entry_price, final_confidence)
             return signal
         except Exception as e:
-            logger.error(f"Error in predict_signal for {str(e)}")
+            logger.error(f"[{symbol}] Error in predict_signal: {str(e)}")
             return None
@@ -0,0 +1,158 @@
+# Versioned ML model artifacts with atomic promotion and hot switching
+# Changes:
+# - Each trained model is written once as ml_models/versions/<version>.joblib; ml_models/current.json
+#   names the promoted version and is replaced atomically, so readers never see a half-written model
+# - ModelRegistry.current() serves the loaded model and, at most every MODEL_POLL_SECONDS, stats the
+#   pointer; a new version is loaded on a background thread and swapped in when ready (the old model
+#   keeps serving meanwhile, and no call loads or waits)
+# - Models whose feature count differs from model.features are refused; the legacy rf_model.joblib is
+#   used while no version has been promoted
+# - Older versions beyond MODEL_KEEP_VERSIONS are removed on promotion (never the current one)
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+from model.features import FEATURE_COLUMNS, FEATURE_SET_VERSION
+from utils.logger import logger
+
+MODEL_DIR = os.getenv('MODEL_DIR', 'ml_models')
+MODEL_POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', 30))
+MODEL_KEEP_VERSIONS = int(os.getenv('MODEL_KEEP_VERSIONS', 5))
+LEGACY_MODEL_FILE = 'rf_model.joblib'
+POINTER_FILE = 'current.json'
+
+def _atomic_write(path: str, write):
+    # write(file) into a temp file next to path, fsync, then os.replace
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.model-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ModelRegistry:
+    def __init__(self, directory: str = MODEL_DIR, poll_seconds: float = MODEL_POLL_SECONDS, clock=time.monotonic):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        self.version: Optional[str] = None
+        self._model = None
+        self._pointer_stamp = None
+        self._next_poll = 0.0
+        self._loading: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.directory, POINTER_FILE)
+
+    def read_pointer(self) -> Optional[dict]:
+        try:
+            with open(self.pointer_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading model pointer {self.pointer_path}: {str(e)}")
+            return None
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.pointer_path)
+            return stat.st_mtime_ns, stat.st_ino
+        except FileNotFoundError:
+            return None
+
+    def _load_model(self, path: str):
+        from joblib import load
+        model = load(path)
+        expected = getattr(model, 'n_features_in_', len(FEATURE_COLUMNS))
+        if expected != len(FEATURE_COLUMNS):
+            logger.warning(f"ML model {path} expects {expected} features, predictor builds {len(FEATURE_COLUMNS)}; "
+                           f"not using it (retrain with python -m model.trainer)")
+            return None
+        return model
+
+    def load(self):
+        # Synchronous load of the promoted version (or the legacy file): start-up only
+        self._pointer_stamp = self._stamp()
+        self._next_poll = self.clock() + self.poll_seconds
+        pointer = self.read_pointer()
+        try:
+            if pointer is not None:
+                self._swap(pointer['version'], self._load_model(os.path.join(self.directory, pointer['path'])))
+            elif os.path.exists(os.path.join(self.directory, LEGACY_MODEL_FILE)):
+                self._swap(LEGACY_MODEL_FILE, self._load_model(os.path.join(self.directory, LEGACY_MODEL_FILE)))
+        except Exception as e:
+            logger.error(f"Error loading ML model: {str(e)}")
+        return self._model
+
+    def _swap(self, version: str, model):
+        with self._lock:
+            self._model = model
+            self.version = version if model is not None else None
+        if model is not None:
+            logger.info(f"Loaded RandomForest model {version} for prediction")
+
+    def current(self):
+        # The model to predict with; checks for a promoted version at most every poll_seconds
+        now = self.clock()
+        if now >= self._next_poll:
+            self._next_poll = now + self.poll_seconds
+            stamp = self._stamp()
+            if stamp is not None and stamp != self._pointer_stamp and (self._loading is None or not self._loading.is_alive()):
+                self._pointer_stamp = stamp
+                self._loading = threading.Thread(target=self._reload, name='model-reload', daemon=True)
+                self._loading.start()
+        return self._model
+
+    def _reload(self):
+        pointer = self.read_pointer()
+        if pointer is None or pointer.get('version') == self.version:
+            return
+        try:
+            model = self._load_model(os.path.join(self.directory, pointer['path']))
+            if model is not None:
+                self._swap(pointer['version'], model)
+        except Exception as e:
+            logger.error(f"Error loading ML model {pointer.get('version')}: {str(e)}")
+
+    def promote(self, model, info: dict = None) -> str:
+        # Write model as a new version, then point current.json at it; returns the version
+        from joblib import dump
+        now = time.time()
+        version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}-{FEATURE_SET_VERSION[:6]}"
+        path = os.path.join('versions', f"{version}.joblib")
+        _atomic_write(os.path.join(self.directory, path), lambda f: dump(model, f))
+        pointer = dict(info or {}, version=version, path=path, feature_set=FEATURE_SET_VERSION,
+                       features=len(FEATURE_COLUMNS), promoted_at=time.time())
+        _atomic_write(self.pointer_path, lambda f: f.write(json.dumps(pointer, indent=2).encode()))
+        logger.info(f"Promoted ML model {version}")
+        self.prune(keep=version)
+        return version
+
+    def prune(self, keep: str = None) -> int:
+        # Remove all but the newest MODEL_KEEP_VERSIONS versions (and never keep)
+        directory = os.path.join(self.directory, 'versions')
+        if not os.path.isdir(directory):
+            return 0
+        if MODEL_KEEP_VERSIONS <= 0:
+            return 0
+        versions = sorted(name[:-len('.joblib')] for name in os.listdir(directory) if name.endswith('.joblib'))
+        stale = [v for v in versions[:-MODEL_KEEP_VERSIONS] if v != keep]
+        for version in stale:
+            os.remove(os.path.join(directory, f"{version}.joblib"))
+        return len(stale)
+
+# Process-wide registry (each compute worker has its own and switches on its own)
+model_registry = ModelRegistry()
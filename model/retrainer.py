@@ -0,0 +1,181 @@
+# Background retraining: scheduled, validated against the current model, promoted atomically
+# Changes:
+# - retrain_once extends the feature store with recent history, adds resolved signal outcomes from the
+#   signal log as extra-weighted labels, trains a candidate on the older bars and scores it and the
+#   promoted model on the newest RETRAIN_HOLDOUT share; the candidate is promoted (model.registry) only
+#   if it scores at least RETRAIN_MIN_GAIN better, or nothing usable is promoted yet
+# - start_retrainer runs it every RETRAIN_INTERVAL seconds in a separate, niced process; scanners pick
+#   the new version up through their registries without pausing
+# Usage: python -m model.retrainer [--once] [SYMBOL ...]
+
+import asyncio
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from model.feature_store import FeatureStore, feature_store
+from model.features import FILLED_BARS, PENDING_LABEL
+from model.registry import ModelRegistry, model_registry
+from utils.logger import logger
+
+# Seconds between retraining runs (0 disables the background retrainer)
+RETRAIN_INTERVAL = float(os.getenv('RETRAIN_INTERVAL', 6 * 3600))
+# Seconds after start-up before the first run
+RETRAIN_FIRST_DELAY = float(os.getenv('RETRAIN_FIRST_DELAY', 600))
+RETRAIN_SYMBOLS = [s for s in os.getenv('RETRAIN_SYMBOLS', 'BTC/USDT,ETH/USDT').split(',') if s]
+# Symbols with resolved signals are added, up to this many symbols in total
+RETRAIN_MAX_SYMBOLS = int(os.getenv('RETRAIN_MAX_SYMBOLS', 20))
+# Newest share of the bars held out to compare the candidate with the promoted model
+RETRAIN_HOLDOUT = float(os.getenv('RETRAIN_HOLDOUT', 0.2))
+RETRAIN_MIN_GAIN = float(os.getenv('RETRAIN_MIN_GAIN', 0.0))
+# Sample weight of a bar labelled by a resolved signal instead of the TP1 horizon rule
+OUTCOME_WEIGHT = float(os.getenv('RETRAIN_OUTCOME_WEIGHT', 5.0))
+RETRAIN_NICE = int(os.getenv('RETRAIN_NICE', 19))
+RESOLVED_STATUSES = ('tp1', 'tp2', 'tp3', 'sl')
+
+def resolved_outcomes(path: str = None) -> Dict[Tuple[str, int], int]:
+    # (symbol, signal time in epoch ms) -> 1 if price went the label's way (a LONG reached a TP or a
+    # SHORT was stopped out), else 0; the latest status of each signal counts, pending ones are skipped
+    from telebot.state import SIGNAL_LOG_PATH
+    path = path or SIGNAL_LOG_PATH
+    latest = {}
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                latest[(row.get('symbol', ''), row.get('timestamp', ''))] = (row.get('direction', ''), row.get('status', ''))
+    except Exception as e:
+        logger.error(f"Error reading signal outcomes from {path}: {str(e)}")
+        return {}
+    outcomes = {}
+    for (symbol, timestamp), (direction, status) in latest.items():
+        if status not in RESOLVED_STATUSES or direction not in ('LONG', 'SHORT'):
+            continue
+        try:
+            signal_ms = int(pd.Timestamp(timestamp).value // 1_000_000)
+        except Exception:
+            continue
+        outcomes[(symbol, signal_ms)] = int((direction == 'LONG') == (status != 'sl'))
+    return outcomes
+
+def training_set(store: FeatureStore, symbols: List[str], outcomes: Dict[Tuple[str, int], int],
+                 timeframe: str = '15m') -> Optional[dict]:
+    # Features, labels, sample weights and bar times of every stored symbol; a resolved signal relabels
+    # the bar it was generated on
+    from data.collector import TIMEFRAME_SECONDS
+    step_ms = TIMEFRAME_SECONDS[timeframe] * 1000
+    by_symbol = {}
+    for (symbol, signal_ms), label in outcomes.items():
+        by_symbol.setdefault(symbol, []).append((signal_ms - signal_ms % step_ms, label))
+    parts, relabelled = [], 0
+    for symbol in symbols:
+        series = store.open(symbol, timeframe)
+        if series is None:
+            continue
+        labels = np.array(series.labels, dtype=np.int8)
+        weights = np.ones(len(labels))
+        timestamps = np.asarray(series.timestamps)
+        for bar_ms, label in by_symbol.get(symbol, []):
+            i = int(np.searchsorted(timestamps, bar_ms))
+            if FILLED_BARS <= i < len(timestamps) and timestamps[i] == bar_ms:
+                labels[i], weights[i] = label, OUTCOME_WEIGHT
+                relabelled += 1
+        keep = labels != PENDING_LABEL
+        keep[:FILLED_BARS] = False
+        parts.append((np.asarray(series.features)[keep], labels[keep], weights[keep], timestamps[keep]))
+    if not parts:
+        return None
+    X, y, w, t = (np.concatenate(column) for column in zip(*parts))
+    return {'X': X, 'y': y, 'weights': w, 'timestamps': t, 'outcomes': relabelled}
+
+def _score(model, X: np.ndarray, y: np.ndarray, weights: np.ndarray) -> float:
+    return float(model.score(X, y, sample_weight=weights))
+
+async def retrain_once(symbols: List[str] = None, store: FeatureStore = feature_store,
+                       registry: ModelRegistry = model_registry, signal_log: str = None) -> dict:
+    # One run: refresh features, train a candidate, promote it if it beats the promoted model
+    from sklearn.ensemble import RandomForestClassifier
+    from model.trainer import update_features
+    started = time.time()
+    report = {'promoted': None}
+    try:
+        outcomes = resolved_outcomes(signal_log)
+        if symbols is None:
+            symbols = list(dict.fromkeys(RETRAIN_SYMBOLS + sorted({symbol for symbol, _ in outcomes})))[:RETRAIN_MAX_SYMBOLS]
+        for symbol in symbols:
+            await update_features(symbol, store=store)
+        data = training_set(store, symbols, outcomes)
+        if data is None:
+            logger.warning("Retraining skipped: no stored features")
+            return report
+        cutoff = np.quantile(data['timestamps'], 1 - RETRAIN_HOLDOUT)
+        train, holdout = data['timestamps'] < cutoff, data['timestamps'] >= cutoff
+        report.update(samples=int(train.sum()), holdout=int(holdout.sum()), outcomes=data['outcomes'], symbols=len(symbols))
+        if len(np.unique(data['y'][train])) < 2 or not holdout.any():
+            logger.warning(f"Retraining skipped: {report['samples']} training / {report['holdout']} holdout samples")
+            return report
+
+        candidate = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42, n_jobs=1)
+        candidate.fit(data['X'][train], data['y'][train], sample_weight=data['weights'][train])
+        held = (data['X'][holdout], data['y'][holdout], data['weights'][holdout])
+        report['candidate_score'] = _score(candidate, *held)
+        current = registry.current()
+        report['current_version'] = registry.version
+        report['current_score'] = _score(current, *held) if current is not None else None
+        if report['current_score'] is None or report['candidate_score'] >= report['current_score'] + RETRAIN_MIN_GAIN:
+            report['promoted'] = registry.promote(candidate, {
+                'samples': report['samples'], 'holdout': report['holdout'], 'outcomes': report['outcomes'],
+                'holdout_score': report['candidate_score'], 'previous_version': report['current_version'],
+                'previous_score': report['current_score']
+            })
+            # This process serves the new version from now on as well
+            registry.load()
+        current_score = f"{report['current_score']:.3f}" if report['current_score'] is not None else 'none'
+        logger.info(f"Retraining on {report['samples']} samples ({report['outcomes']} signal outcomes): candidate "
+                    f"{report['candidate_score']:.3f} vs current {current_score} on {report['holdout']} holdout samples, promoted: {report['promoted'] or 'no'} "
+                    f"({time.time() - started:.1f}s)")
+        return report
+    except Exception as e:
+        logger.error(f"Error retraining model: {str(e)}")
+        return report
+
+def run_retrainer(interval: float = RETRAIN_INTERVAL, first_delay: float = RETRAIN_FIRST_DELAY):
+    # Retrainer process body: lowest CPU priority, stderr logging, one run per interval
+    from utils import logger as logger_module
+    import logging
+    try:
+        os.nice(RETRAIN_NICE)
+    except (AttributeError, OSError):
+        pass
+    logger_module.stop_logging()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logger_module.build_formatter())
+    logger_module.configure_logging(logger, [handler], use_queue=False)
+    model_registry.load()
+    time.sleep(first_delay)
+    while True:
+        asyncio.run(retrain_once())
+        time.sleep(interval)
+
+def start_retrainer(interval: float = RETRAIN_INTERVAL) -> Optional[multiprocessing.Process]:
+    # Spawn the background retrainer (None when RETRAIN_INTERVAL is 0); the caller terminates it
+    if interval <= 0:
+        return None
+    process = multiprocessing.get_context('spawn').Process(target=run_retrainer, args=(interval,),
+                                                            name='retrainer', daemon=True)
+    process.start()
+    logger.info(f"Retrainer started (pid {process.pid}), every {interval / 3600:g}h")
+    return process
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--once']
+    if '--once' in sys.argv[1:]:
+        model_registry.load()
+        asyncio.run(retrain_once(args or None))
+    else:
+        run_retrainer(first_delay=0)
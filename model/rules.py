@@ -0,0 +1,158 @@
+# Declarative signal rules compiled into boolean masks and weight vectors
+# Changes:
+# - CONDITIONS lists every rule-based condition once (name and predicate over the latest candle), in
+#   the order predict_signal used to append them
+# - SCORES describes confidence, bullish/bearish votes, leverage points and the TP probability base as
+#   weighted groups of conditions (a group counts once however many of its conditions hold)
+# - RuleEngine compiles both tables into one (conditions x groups) matrix and a (groups x scores)
+#   weight matrix, so one symbol (numpy scalars) or a batch (arrays) is scored with two matrix products
+#   instead of string lookups
+# - Condition names are only built (RuleScores.conditions) for signals that are emitted
+# - determine_leverage scores condition names with the same leverage table (records without a leverage)
+
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from core.indicators import PATTERN_NAMES
+
+# Inputs the predicates read: latest-candle indicator columns, swing levels and one flag per candle pattern
+CANDLE_INPUTS = ('rsi', 'macd', 'macd_signal', 'adx', 'close', 'bollinger_upper', 'bollinger_lower',
+                 'volume', 'volume_sma_20')
+LEVEL_INPUTS = ('support', 'resistance')
+
+def _pattern(name: str):
+    return lambda v: v[name]
+
+CONDITIONS = (
+    ('Oversold RSI', lambda v: v['rsi'] < 30),
+    ('Overbought RSI', lambda v: v['rsi'] > 70),
+    ('Bullish MACD', lambda v: (v['macd'] > v['macd_signal']) & (v['macd'] > 0)),
+    ('Bearish MACD', lambda v: (v['macd'] < v['macd_signal']) & (v['macd'] < 0)),
+    ('Strong Trend', lambda v: v['adx'] > 25),
+    ('Above Bollinger Upper', lambda v: v['close'] > v['bollinger_upper']),
+    # Only when the close is not above the upper band as well (bands can be NaN or crossed)
+    ('Below Bollinger Lower', lambda v: (v['close'] < v['bollinger_lower']) & ~(v['close'] > v['bollinger_upper'])),
+) + tuple((name, _pattern(name)) for name in PATTERN_NAMES) + (
+    ('Near Support', lambda v: np.abs(v['close'] - v['support']) / v['close'] < 0.05),
+    ('Near Resistance', lambda v: np.abs(v['close'] - v['resistance']) / v['close'] < 0.05),
+    ('High Volume', lambda v: v['volume'] > v['volume_sma_20'] * 1.2),
+)
+
+BULLISH = ('bullish_engulfing', 'Oversold RSI', 'Bullish MACD', 'hammer', 'three_white_soldiers')
+BEARISH = ('bearish_engulfing', 'Overbought RSI', 'Bearish MACD', 'shooting_star', 'three_black_crows')
+
+# score -> (base, [(weight, conditions any of which adds the weight once), ...]). Names that are not
+# in CONDITIONS never hold: leverage and TP probabilities were keyed on 'MACD', 'VWAP' and 'Stochastic',
+# which no rule emits (the MACD conditions are 'Bullish MACD' / 'Bearish MACD'), and still are
+SCORES = {
+    'confidence': (50.0, [
+        (15.0, ('Bullish MACD', 'Bearish MACD')),
+        (12.0, ('bullish_engulfing', 'bearish_engulfing', 'hammer', 'shooting_star')),
+        (12.0, ('Strong Trend',)),
+        (8.0, ('Near Support', 'Near Resistance')),
+        (8.0, ('High Volume',))
+    ]),
+    'bullish': (0.0, [(1.0, (name,)) for name in BULLISH]),
+    'bearish': (0.0, [(1.0, (name,)) for name in BEARISH]),
+    'leverage': (0.0, [(2.0, ('MACD',)), (2.0, ('Strong Trend',)), (1.0, ('VWAP',)), (-1.0, ('Stochastic',))]),
+    'tp_probability': (50.0, [(10.0, ('MACD',)), (10.0, ('Strong Trend',)), (-5.0, ('Near Support', 'Near Resistance'))])
+}
+MAX_CONFIDENCE = 95.0
+
+def leverage_label(score: float) -> str:
+    return '40x' if score >= 5 else '30x' if score >= 3 else '20x' if score >= 1 else '10x'
+
+def determine_leverage(conditions) -> str:
+    # Leverage from condition names (a list, or the ', '-joined string of older records)
+    if isinstance(conditions, str):
+        conditions = conditions.split(', ')
+    base, groups = SCORES['leverage']
+    return leverage_label(base + sum(weight for weight, members in groups if any(name in conditions for name in members)))
+
+class RuleScores:
+    # Scores for a batch of symbols: mask[i, j] is condition j on symbol i; values[score][i]
+    __slots__ = ('names', 'mask', 'values')
+
+    def __init__(self, names: Sequence[str], mask: np.ndarray, values: Dict[str, np.ndarray]):
+        self.names = names
+        self.mask = mask
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.mask)
+
+    def conditions(self, i: int) -> List[str]:
+        # Human-readable condition names of symbol i (only needed for emitted signals)
+        return [self.names[j] for j in np.flatnonzero(self.mask[i])]
+
+    def direction(self, i: int, min_confidence: float = 70.0) -> Optional[str]:
+        # Rule-based direction: more bullish than bearish votes (or the reverse) at enough confidence
+        if self.values['confidence'][i] < min_confidence:
+            return None
+        bullish, bearish = self.values['bullish'][i], self.values['bearish'][i]
+        return 'LONG' if bullish > bearish else 'SHORT' if bearish > bullish else None
+
+    def leverage(self, i: int) -> str:
+        return leverage_label(self.values['leverage'][i])
+
+class RuleEngine:
+    def __init__(self, conditions=CONDITIONS, scores=SCORES, max_confidence: float = MAX_CONFIDENCE):
+        self.names = tuple(name for name, _ in conditions)
+        self.predicates = tuple(predicate for _, predicate in conditions)
+        self.score_names = tuple(scores)
+        self.max_confidence = max_confidence
+        index = {name: j for j, name in enumerate(self.names)}
+        groups, weights = [], []
+        for s, (_, score_groups) in enumerate(scores.values()):
+            for weight, members in score_groups:
+                row = np.zeros(len(self.names))
+                for name in members:
+                    if name in index:
+                        row[index[name]] = 1.0
+                groups.append(row)
+                column = np.zeros(len(scores))
+                column[s] = weight
+                weights.append(column)
+        # (groups x conditions) membership and (groups x scores) weights
+        self.groups = np.array(groups).T
+        self.weights = np.array(weights)
+        self.bases = np.array([base for base, _ in scores.values()])
+
+    def inputs(self, latest_rows: Sequence, levels: Sequence[dict], pattern_flags: Sequence[Sequence[bool]]) -> Dict[str, np.ndarray]:
+        # Column arrays from per-symbol latest candles (dicts or Series), swing levels and pattern flags;
+        # a missing input is NaN, so conditions on it do not hold
+        rows = [row.to_dict() if hasattr(row, 'to_dict') else row for row in latest_rows]
+        values = {key: np.array([row.get(key, np.nan) for row in rows], dtype=np.float64) for key in CANDLE_INPUTS}
+        return self._finish_inputs(values, levels, pattern_flags)
+
+    def latest_inputs(self, latest, levels: dict, pattern_flags: Sequence[bool]) -> Dict[str, np.generic]:
+        # Inputs for one symbol as numpy scalars: the same predicates and products run without the
+        # per-call cost of building one-element arrays, which dominates when scoring a single symbol
+        row = dict(zip(latest.index, latest.to_numpy())) if hasattr(latest, 'index') else latest
+        values = {key: np.float64(row.get(key, np.nan)) for key in CANDLE_INPUTS}
+        for key in LEVEL_INPUTS:
+            values[key] = np.float64(levels.get(key, np.nan))
+        for name, flag in zip(PATTERN_NAMES, pattern_flags):
+            values[name] = np.bool_(flag)
+        return values
+
+    def _finish_inputs(self, values: Dict[str, np.ndarray], levels: Sequence[dict], pattern_flags) -> Dict[str, np.ndarray]:
+        for key in LEVEL_INPUTS:
+            values[key] = np.array([level.get(key, np.nan) for level in levels], dtype=np.float64)
+        flags = np.array(pattern_flags, dtype=bool).reshape(len(levels), len(PATTERN_NAMES))
+        for j, name in enumerate(PATTERN_NAMES):
+            values[name] = flags[:, j]
+        return values
+
+    def evaluate(self, values: Dict[str, np.ndarray]) -> RuleScores:
+        # One pass over the batch: predicates into the condition mask, then all scores from two products
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mask = np.array([predicate(values) for predicate in self.predicates], dtype=bool)
+        # (conditions,) for one symbol's scalars, (conditions, symbols) for a batch
+        mask = mask.reshape(len(self.predicates), -1).T
+        active = (mask.astype(np.float64) @ self.groups) > 0
+        scored = active.astype(np.float64) @ self.weights + self.bases
+        values = {name: scored[:, s] for s, name in enumerate(self.score_names)}
+        values['confidence'] = np.minimum(values['confidence'], self.max_confidence)
+        return RuleScores(self.names, mask, values)
+
+signal_rules = RuleEngine()
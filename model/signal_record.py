@@ -0,0 +1,65 @@
+# Slotted signal record
+# Changes:
+# - Fixed set of fields in __slots__ instead of a ~25-key dict per signal
+# - Behaves as a mutable mapping (signal['tp1'], .get, .items, dict(signal)), so Telegram, the signal log
+#   and open-trade tracking keep working unchanged; unset fields are simply absent
+# - Pickles as one positional tuple (compute workers return it, snapshots store it)
+
+from collections.abc import MutableMapping
+
+SIGNAL_FIELDS = (
+    'symbol', 'direction', 'entry', 'confidence', 'timeframe', 'conditions',
+    'tp1', 'tp2', 'tp3', 'sl',
+    'tp1_possibility', 'tp2_possibility', 'tp3_possibility',
+    'tp1_profit_pct', 'tp2_profit_pct', 'tp3_profit_pct',
+    'volume', 'trade_type', 'trade_duration', 'timestamp', 'atr',
+    # Added by the scanner before dispatch
+    'quote_volume_24h', 'leverage', 'tp1_profit', 'tp2_profit', 'tp3_profit'
+)
+
+def _restore(values: tuple) -> 'SignalRecord':
+    record = SignalRecord()
+    for name, value in zip(SIGNAL_FIELDS, values):
+        if value is not None:
+            setattr(record, name, value)
+    return record
+
+class SignalRecord(MutableMapping):
+    __slots__ = SIGNAL_FIELDS
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            self[name] = value
+
+    def __getitem__(self, name: str):
+        try:
+            return getattr(self, name)
+        except (AttributeError, TypeError):
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value):
+        if name not in SIGNAL_FIELDS:
+            raise KeyError(f"SignalRecord has no field {name!r}")
+        setattr(self, name, value)
+
+    def __delitem__(self, name: str):
+        try:
+            delattr(self, name)
+        except (AttributeError, TypeError):
+            raise KeyError(name) from None
+
+    def __iter__(self):
+        return (name for name in SIGNAL_FIELDS if hasattr(self, name))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        # None marks an unset field; no field is ever None when set
+        return _restore, (tuple(getattr(self, name, None) for name in SIGNAL_FIELDS),)
+
+    def __repr__(self) -> str:
+        return f"SignalRecord({dict(self)!r})"
+
+    def to_dict(self) -> dict:
+        return dict(self)
@@ -1,92 +1,84 @@
-import pandas as pd
-import numpy import np
+# RandomForest training on the feature store
+# Changes:
+# - Fixed the numpy import and dropped the trainer's own engulfing detector: features, patterns and
+#   labels come from model.features, the same definition predict_signal uses (17 features)
+# - Features and labels are kept in model.feature_store; a training run fetches candles, appends the
+#   bars closed since the last run and loads every symbol's labelled rows without recomputing them
+# - Trains on several symbols at once; bars whose 10-bar label horizon has not passed are left out
+#   instead of being counted as misses
+# - The model is promoted as a new version through model.registry instead of overwriting
+#   ml_models/rf_model.joblib under running predictors; model.retrainer does this on a schedule
+# Usage: python -m model.trainer [SYMBOL ...]
+
+import asyncio
+import sys
+from typing import List
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from joblib import dump
-import os
-import asyncio
-from core.indicators import calculate_indicators
-from data.collector import fetch_realtime_data
-import logging
+from data.collector import fetch_history
+from model.feature_store import FeatureStore, feature_store
+from model.registry import model_registry
+from utils.logger import logger
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+TRAINING_TIMEFRAME = '15m'
+TRAINING_CANDLES = 500
+# Candles a symbol needs before its first training run
+MIN_TRAINING_CANDLES = 360
 
-MODEL_PATH = "ml_models/rf_model.joblib"
-
-def detect_candle_patterns(df):
-    patterns = []
-    for i in range(1, len(df)):
-        open_price = df['open'].iloc[i]
-        close_price = df['close'].iloc[i]
-        prev_open = df['open'].iloc[i-1]
-        pattern = []
-        if close_price > open_price and prev_open < close_price:
-            pattern.append('bullish_engulfing')
-        elif close_price < open_price and prev_open > open_price:
-            pattern.append('bearish_engulfing')
-        patterns.append(pattern)
-    return patterns
-
-async def prepare_training_data(symbol: str, timeframe: str = '15m', limit: int = 500):
+async def update_features(symbol: str, timeframe: str = TRAINING_TIMEFRAME, limit: int = TRAINING_CANDLES,
+                          store: FeatureStore = None) -> int:
+    # Fetch recent candles and append the bars the feature store does not have yet
+    store = feature_store if store is None else store
     try:
-        ohlcv = await fetch_realtime_data(symbol, timeframe, limit)
-        if ohlcv is None or len(ohlcv) < 360:
+        candles = await fetch_history(symbol, timeframe, limit)
+        if candles is None or (len(candles) < MIN_TRAINING_CANDLES and store.open(symbol, timeframe) is None):
             logger.warning(f"[{symbol}] Insufficient data")
-            return None, None
-
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df = calculate_indicators(df)
-
-        patterns = detect_candle_patterns(df)
-        df['bullish_engulfing'] = [1 if 'bullish_engulfing' in p else 0 for p in patterns] + [0]
-        df['bearish_engulfing'] = [1 if 'bearish_engulfing' in p else 0 for p in patterns] + [0]
-
-        df["label"] = 0
-        for i in range(len(df) - 10):
-            future_highs = df["high"].iloc[i+1:i+11]
-            future_lows = df["low"].iloc[i+1:i+11]
-            tp1 = df["close"].iloc[i] + df["atr"].iloc[i] * 1.2
-            if df["close"].iloc[i] < tp1 <= future_highs.max():
-                df.loc[df.index[i], "label"] = 1
+            return 0
+        added = store.extend(symbol, timeframe, candles)
+        logger.info(f"[{symbol}] Feature store: {added} new {timeframe} bars")
+        return added
+    except Exception as e:
+        logger.error(f"[{symbol}] Error updating features: {str(e)}")
+        return 0
 
-        features = [
-            "rsi", "macd", "macd_signal", "atr", "adx", "volume_sma_20",
-            "bollinger_upper", "bollinger_lower", "stoch_k", "vwap",
-            "bullish_engulfing", "bearish_engulfing"
-        ]
-        X = df[features]
-        y = df["label"]
+async def prepare_training_data(symbol: str, timeframe: str = TRAINING_TIMEFRAME, limit: int = TRAINING_CANDLES):
+    try:
+        await update_features(symbol, timeframe, limit)
+        X, y = feature_store.load([symbol], timeframe)
+        if X.empty:
+            return None, None
         logger.info(f"[{symbol}] Prepared training data with {len(X)} samples")
         return X, y
     except Exception as e:
         logger.error(f"[{symbol}] Error preparing training data: {str(e)}")
         return None, None
 
-async def train_model(symbol: str, timeframe: str = '15m', limit: int = 500):
+async def train_model(symbols: List[str], timeframe: str = TRAINING_TIMEFRAME, limit: int = TRAINING_CANDLES):
     try:
-        X, y = await prepare_training_data(symbol, timeframe, limit)
-        if X is None or y is None:
-            logger.error(f"[{symbol}] Failed to prepare training data")
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        for symbol in symbols:
+            await update_features(symbol, timeframe, limit)
+        X, y = feature_store.load(symbols, timeframe)
+        if X.empty or y.nunique() < 2:
+            logger.error(f"Failed to prepare training data for {len(symbols)} symbols")
             return False
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test = train_test_split(X.to_numpy(), y.to_numpy(), test_size=0.2, random_state=42)
         model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42)
         model.fit(X_train, y_train)
 
         accuracy = model.score(X_test, y_test)
-        logger.info(f"[{symbol}] Model trained with accuracy: {accuracy:.2f}")
+        logger.info(f"Model trained on {len(X)} samples from {len(symbols)} symbols with accuracy: {accuracy:.2f}")
 
-        os.makedirs("ml_models", exist_ok=True)
-        dump(model, MODEL_PATH)
-        logger.info(f"[{symbol}] Model saved to {MODEL_PATH}")
+        model_registry.promote(model, {'samples': len(X), 'holdout_score': accuracy})
         return True
     except Exception as e:
-        logger.error(f"[{symbol}] Error training model: {str(e)}")
+        logger.error(f"Error training model: {str(e)}")
         return False
 
 if __name__ == "__main__":
     async def main():
-        symbol = "BTC/USDT"
-        await train_model(symbol)
+        feature_store.prune()
+        await train_model(sys.argv[1:] or ["BTC/USDT"])
     asyncio.run(main())
@@ -4,24 +4,32 @@
 # - Fixed json.dumps syntax
 # - Fixed bot.send_message syntax
 # - Made Cloud Tasks optional with local tracking for Replit
+# - Registered locally tracked trades in open_trades so they survive warm restarts
+# - Cloud Tasks client is imported and created on first use instead of at import time
+# - Trade tracking runs as a background task so send_signal returns after the Telegram send
+# - Timing spans for Telegram sends and signal log writes
+# - Trade tracking gets its exchange from data.exchange.create_exchange (EXCHANGE_BACKEND=sim for load tests)
+# - Signals may be SignalRecords (mapping); converted to a dict for the Cloud Tasks JSON body
+# - Exchange network errors (timeouts, rate limits, open circuit breaker) skip one trade check instead
+#   of abandoning the trade
+# - Every signal log update also goes to telebot.state.bot_state (Telegram command replies)
+# - Resumed trades are tracked like new ones (background task kept in _tracking_tasks, final status
+#   written to the signal log)
 
 import asyncio
 import telegram
 import pandas as pd
 import json
 import os
-import ccxt.async_support as ccxt
 from datetime import datetime
 import pytz
 import time
+from ccxt.base.errors import NetworkError
+from data.exchange import create_exchange
+from telebot.state import SIGNAL_LOG_PATH, bot_state
 from utils.logger import logger
+from utils.metrics import span, exchange_calls
 from dotenv import load_dotenv
-try:
-    from google.cloud import tasks_v2
-    from google.protobuf import duration_pb2
-except ImportError:
-    tasks_v2 = None
-    duration_pb2 = None
 
 load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -30,26 +38,57 @@ PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", "crypto-sniper-bot")
 QUEUE_NAME = "trade-tracking-queue"
 LOCATION = "us-central1"
 
+tasks_v2 = None
+duration_pb2 = None
 tasks_client = None
-if tasks_v2:
+_tasks_client_checked = False
+
+def get_tasks_client():
+    # Import and create the Cloud Tasks client on first use (None if unavailable)
+    global tasks_v2, duration_pb2, tasks_client, _tasks_client_checked
+    if _tasks_client_checked:
+        return tasks_client
+    _tasks_client_checked = True
+    try:
+        from google.cloud import tasks_v2
+        from google.protobuf import duration_pb2
+    except ImportError:
+        return None
     try:
         tasks_client = tasks_v2.CloudTasksClient()
     except Exception as e:
         logger.error(f"Cloud Tasks initialization failed: {str(e)}")
+    return tasks_client
+
+TRACK_CHECKS = 720  # 3 hours at 15s
+TRACK_INTERVAL = 15
 
-async def track_trade_local(symbol: str, signal: dict):
+# symbol -> {'signal': dict, 'status': str, 'checks_done': int}, persisted in scanner snapshots
+open_trades = {}
+
+async def track_trade_local(symbol: str, signal: dict, checks_done: int = 0):
+    exchange = None
     try:
-        exchange = ccxt.binance({'enableRateLimit': True})
+        exchange = create_exchange()
         direction = signal['direction']
         price = signal['entry']
         tp1 = signal['tp1']
         tp2 = signal['tp2']
         tp3 = signal['tp3']
         sl = signal['sl']
-        status = "pending"
+        status = open_trades.get(symbol, {}).get('status', "pending")
+        open_trades[symbol] = {'signal': signal, 'status': status, 'checks_done': checks_done}
 
-        for _ in range(720):  # 3 hours
-            ticker = await exchange.fetch_ticker(symbol)
+        for check in range(checks_done, TRACK_CHECKS):
+            open_trades[symbol].update(status=status, checks_done=check)
+            exchange_calls.inc(endpoint='fetch_ticker')
+            try:
+                ticker = await exchange.fetch_ticker(symbol)
+            except NetworkError as e:
+                # Timeouts, rate limits and open breakers skip this check instead of ending the tracking
+                logger.warning(f"[{symbol}] Trade check skipped: {str(e)}")
+                await asyncio.sleep(max(TRACK_INTERVAL, getattr(e, 'retry_in', 0)))
+                continue
             current_price = ticker.get('last', 0.0)
             if direction == "LONG":
                 if current_price >= tp3:
@@ -73,15 +112,32 @@ async def track_trade_local(symbol: str, signal: dict):
                 elif current_price >= sl:
                     status = "sl"
                     break
-            await asyncio.sleep(15)
+            await asyncio.sleep(TRACK_INTERVAL)
 
+        open_trades.pop(symbol, None)
         logger.info(f"[{symbol}] Trade status: {status}")
         return status
     except Exception as e:
+        open_trades.pop(symbol, None)
         logger.error(f"[{symbol}] Error tracking trade: {str(e)}")
         return "error"
+    finally:
+        if exchange is not None:
+            await exchange.close()
+
+def resume_open_trades(trades: dict):
+    # Restart local tracking for trades restored from a snapshot; final statuses reach the signal log
+    for symbol, trade in trades.items():
+        if symbol in open_trades:
+            continue
+        open_trades[symbol] = dict(trade)
+        task = asyncio.create_task(_track_and_log(symbol, trade['signal'], trade.get('checks_done', 0)))
+        _tracking_tasks.add(task)
+        task.add_done_callback(_tracking_tasks.discard)
+        logger.info(f"[{symbol}] Resumed trade tracking at check {trade.get('checks_done', 0)}/{TRACK_CHECKS}")
 
 async def track_trade(symbol: str, signal: dict):
+    tasks_client = get_tasks_client()
     if tasks_client:
         try:
             parent = tasks_client.queue_path(PROJECT_ID, LOCATION, QUEUE_NAME)
@@ -89,7 +145,7 @@ async def track_trade(symbol: str, signal: dict):
                 "http_request": {
                     "http_method": tasks_v2.HttpMethod.POST,
                     "url": f"https://{LOCATION}-{PROJECT_ID}.cloudfunctions.net/track_trade",
-                    "body": json.dumps({"symbol": symbol, "signal": signal}).encode(),
+                    "body": json.dumps({"symbol": symbol, "signal": dict(signal)}).encode(),
                     "headers": {"Content-Type": "application/json"}
                 },
                 "schedule_time": None,
@@ -105,8 +161,13 @@ async def track_trade(symbol: str, signal: dict):
         return await track_trade_local(symbol, signal)
 
 def update_signal_log(symbol: str, signal: dict, status: str):
+    with span('signal_log'):
+        bot_state.record_signal(symbol, signal, status)
+        _update_signal_log(symbol, signal, status)
+
+def _update_signal_log(symbol: str, signal: dict, status: str):
     try:
-        csv_path = "logs/signals_log.csv"
+        csv_path = SIGNAL_LOG_PATH
         data = pd.DataFrame({
             "timestamp": [signal.get("timestamp", datetime.now(pytz.UTC).isoformat())],
             "symbol": [symbol],
@@ -147,10 +208,23 @@ async def send_signal(symbol: str, signal: dict, chat_id: str):
             f"Timeframe: {signal.get('timeframe', 'N/A')}\n"
             f"Trade Type: {signal.get('trade_type', 'N/A')}"
         )
-        await bot.send_message(chat_id=chat_id, text=message)
+        with span('telegram_send'):
+            await bot.send_message(chat_id=chat_id, text=message)
         logger.info(f"[{symbol}] Signal sent to Telegram")
 
-        status = await track_trade(symbol, signal)
-        update_signal_log(symbol, signal, status)
+        task = asyncio.create_task(_track_and_log(symbol, signal))
+        _tracking_tasks.add(task)
+        task.add_done_callback(_tracking_tasks.discard)
     except Exception as e:
         logger.error(f"[{symbol}] Failed to send signal: {str(e)}")
+
+# Strong references so background tracking tasks are not garbage collected
+_tracking_tasks = set()
+
+async def _track_and_log(symbol: str, signal: dict, checks_done: int = None):
+    # Track until the trade resolves, then log its status; resumed trades (checks_done set) stay local
+    if checks_done is None:
+        status = await track_trade(symbol, signal)
+    else:
+        status = await track_trade_local(symbol, signal, checks_done)
+    update_signal_log(symbol, signal, status)
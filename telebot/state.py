@@ -0,0 +1,217 @@
+# Precomputed state for Telegram command replies
+# Changes:
+# - BotState is updated where things change (scan loop, cooldowns, signal log), so /status, /signal,
+#   /summary and /report answer from memory with no network or disk I/O on the request path
+# - Bot identity cached once at start-up instead of a new Bot + get_me() per /status
+# - Latest signals kept with their /signal text rendered when they are logged
+# - Daily rollups count each signal once with its latest status (the CSV log has a row per status
+#   change); seeded from logs/signals_log.csv once at start-up
+
+import csv
+import os
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from utils.logger import logger
+
+SIGNAL_LOG_PATH = 'logs/signals_log.csv'
+LATEST_SIGNALS = 20
+# Days of rollups (and per-signal status keys) kept in memory
+ROLLUP_DAYS = 8
+
+class DailyRollup:
+    __slots__ = ('total', 'long', 'short', 'confidence_sum', 'statuses')
+
+    def __init__(self):
+        self.total = 0
+        self.long = 0
+        self.short = 0
+        self.confidence_sum = 0.0
+        self.statuses: Dict[str, int] = {}
+
+    def add(self, direction: str, confidence: float, status: str):
+        self.total += 1
+        self.long += direction == 'LONG'
+        self.short += direction == 'SHORT'
+        self.confidence_sum += confidence
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def move(self, old: str, new: str):
+        self.statuses[old] = self.statuses.get(old, 0) - 1
+        self.statuses[new] = self.statuses.get(new, 0) + 1
+
+def signal_day(timestamp) -> date:
+    # Calendar day of a signal timestamp (ISO string as the predictor writes it); today if unreadable
+    try:
+        return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).date()
+    except ValueError:
+        return date.today()
+
+def format_pk_time(timestamp) -> str:
+    # Signal time in Pakistan time for display, e.g. '05 March 2025, 02:30 PM'
+    import pytz
+    try:
+        utc_time = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00').split('+00:00+')[0])
+        utc_time = utc_time.replace(tzinfo=pytz.UTC)
+        return utc_time.astimezone(pytz.timezone('Asia/Karachi')).strftime('%d %B %Y, %I:%M %p')
+    except Exception as e:
+        logger.error(f"Error converting timestamp: {str(e)}")
+        return str(timestamp)
+
+def render_signal(symbol: str, signal, status: str) -> str:
+    # /signal text for one logged signal
+    conditions = signal.get('conditions') or []
+    quote_volume = signal.get('quote_volume_24h', 'N/A')
+    return (
+        f"📈 Trading Signal\n"
+        f"💱 Symbol: {symbol}\n"
+        f"📊 Direction: {signal.get('direction', '')}\n"
+        f"⏰ Timeframe: {signal.get('timeframe', 'N/A')}\n"
+        f"⏳ Duration: {signal.get('trade_duration', 'N/A')}\n"
+        f"💰 Entry: ${signal.get('entry', 0.0):.2f}\n"
+        f"🎯 TP1: ${signal.get('tp1', 0.0):.2f} ({signal.get('tp1_profit', 0.0):.2f}%)\n"
+        f"🎯 TP2: ${signal.get('tp2', 0.0):.2f} ({signal.get('tp2_profit', 0.0):.2f}%)\n"
+        f"🎯 TP3: ${signal.get('tp3', 0.0):.2f} ({signal.get('tp3_profit', 0.0):.2f}%)\n"
+        f"🛑 SL: ${signal.get('sl', 0.0):.2f}\n"
+        f"🔍 Confidence: {signal.get('confidence', 0.0):.2f}%\n"
+        f"⚡ Type: {signal.get('trade_type', 'N/A')}\n"
+        f"⚖ Leverage: {signal.get('leverage', 'N/A')}\n"
+        f"📈 Volume: ${signal.get('volume', 0.0):,.2f}\n"
+        f"📈 24h Volume: {quote_volume}\n"
+        f"🔎 Indicators: {', '.join(conditions) if isinstance(conditions, (list, tuple)) else conditions}\n"
+        f"🕒 Timestamp: {format_pk_time(signal.get('timestamp', ''))}\n"
+        f"📌 Status: {status}"
+    )
+
+def render_summary(day: date, rollup: Optional[DailyRollup]) -> Optional[str]:
+    # Daily summary text (same layout as report_generator.generate_daily_summary); None without signals
+    if rollup is None or rollup.total == 0:
+        return None
+    statuses = rollup.statuses
+    return (
+        f"📊 *Daily Signal Summary ({day})*\n\n"
+        f"Total Signals: {rollup.total}\n"
+        f"Long Signals: {rollup.long}\n"
+        f"Short Signals: {rollup.short}\n"
+        f"Average Confidence: {rollup.confidence_sum / rollup.total:.2f}%\n"
+        f"TP1 Hit: {statuses.get('tp1', 0)}\n"
+        f"TP2 Hit: {statuses.get('tp2', 0)}\n"
+        f"TP3 Hit: {statuses.get('tp3', 0)}\n"
+        f"SL Hit: {statuses.get('sl', 0)}\n"
+        f"Pending: {statuses.get('pending', 0)}\n"
+    )
+
+class BotState:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.username: Optional[str] = None
+        self.started_at = clock()
+        # ((symbol, timestamp), status, rendered /signal text), newest last
+        self.latest = deque(maxlen=LATEST_SIGNALS)
+        self.scanned_this_cycle = 0
+        self.scans_total = 0
+        self.signals_total = 0
+        # symbol -> cooldown end (epoch seconds)
+        self.cooldowns: Dict[str, float] = {}
+        self.rollups: Dict[date, DailyRollup] = {}
+        # (symbol, timestamp) -> (day, status) so a status change moves the signal between counts
+        self._signals: Dict[Tuple[str, str], Tuple[date, str]] = {}
+
+    def set_identity(self, username: Optional[str]):
+        self.username = username
+
+    def start_cycle(self):
+        self.scanned_this_cycle = 0
+
+    def record_scans(self, count: int, scanned_this_cycle: int):
+        self.scans_total += count
+        self.scanned_this_cycle = scanned_this_cycle
+
+    def set_cooldown(self, symbol: str, until: float):
+        self.cooldowns[symbol] = until
+
+    def active_cooldowns(self, now: float = None) -> int:
+        # Symbols still cooling down after a signal; expired entries are dropped on the way
+        now = self.clock() if now is None else now
+        expired = [symbol for symbol, until in self.cooldowns.items() if until <= now]
+        for symbol in expired:
+            del self.cooldowns[symbol]
+        return len(self.cooldowns)
+
+    def record_signal(self, symbol: str, signal, status: str, render: bool = True):
+        # Signal log hook: first call for a signal counts it, later calls move it to its new status
+        timestamp = str(signal.get('timestamp', ''))
+        key = (symbol, timestamp)
+        known = self._signals.get(key)
+        if known is None:
+            day = signal_day(timestamp)
+            rollup = self.rollups.get(day)
+            if rollup is None:
+                rollup = self.rollups[day] = DailyRollup()
+                self._prune(day)
+            rollup.add(signal.get('direction', ''), float(signal.get('confidence', 0.0) or 0.0), status)
+            self.signals_total += 1
+        else:
+            day = known[0]
+            if known[1] != status and day in self.rollups:
+                self.rollups[day].move(known[1], status)
+        self._signals[key] = (day, status)
+        if not render:
+            return
+        for i, entry in enumerate(self.latest):
+            if entry[0] == key:
+                self.latest[i] = (key, status, render_signal(symbol, signal, status))
+                return
+        self.latest.append((key, status, render_signal(symbol, signal, status)))
+
+    def _prune(self, newest: date):
+        # Forget rollups and signal keys older than ROLLUP_DAYS
+        cutoff = newest - timedelta(days=ROLLUP_DAYS)
+        for day in [d for d in self.rollups if d < cutoff]:
+            del self.rollups[day]
+        for key in [k for k, (day, _) in self._signals.items() if day < cutoff]:
+            del self._signals[key]
+
+    def load_signal_log(self, path: str = SIGNAL_LOG_PATH) -> int:
+        # Seed rollups from the CSV signal log (start-up only; rows are in logging order)
+        if not os.path.exists(path):
+            return 0
+        rows = 0
+        try:
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    signal = {'timestamp': row.get('timestamp', ''), 'direction': row.get('direction', ''),
+                              'confidence': float(row.get('confidence') or 0.0)}
+                    self.record_signal(row.get('symbol', ''), signal, row.get('status', 'pending'), render=False)
+                    rows += 1
+        except Exception as e:
+            logger.error(f"Error loading signal log {path}: {str(e)}")
+        logger.info(f"Bot state seeded from {path}: {rows} rows, {len(self._signals)} signals")
+        return rows
+
+    def status_text(self, now: float = None) -> str:
+        return (
+            f"🟬 Bot running\n"
+            f"🤖 @{self.username or 'unknown'}\n"
+            f"📡 Symbols scanned: {self.scanned_this_cycle} this cycle, {self.scans_total} total\n"
+            f"📈 Active signals: {self.active_cooldowns(now)} ({self.signals_total} signals logged)"
+        )
+
+    def latest_signal_text(self) -> Optional[str]:
+        return self.latest[-1][2] if self.latest else None
+
+    def summary_text(self, day: date = None) -> Optional[str]:
+        # Summary for `day` (default yesterday, like the daily report)
+        day = date.today() - timedelta(days=1) if day is None else day
+        return render_summary(day, self.rollups.get(day))
+
+    def report_text(self) -> Optional[str]:
+        # Today's rollup so far followed by yesterday's
+        today = date.today()
+        parts = [text for text in (render_summary(today, self.rollups.get(today)),
+                                   render_summary(today - timedelta(days=1), self.rollups.get(today - timedelta(days=1))))
+                 if text]
+        return '\n'.join(parts) if parts else None
+
+bot_state = BotState()
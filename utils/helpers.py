@@ -3,16 +3,14 @@
 # - Added scan_pause function for 5-minute pause
 # - Added is_cooldown_active for 4-hour cooldown check
 # - Optimized logging for Cloud Run
+# - is_cooldown_active compares in the stored timestamp's timezone (main.py stores UTC-aware times)
+# - Use the shared bot logger instead of reconfiguring root logging at DEBUG
 
 from datetime import datetime
 import time
 import asyncio
-import logging
 from utils.logger import logger
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
 def get_timestamp() -> float:
     # Get current timestamp in seconds
     return time.time()
@@ -52,10 +50,10 @@ def is_cooldown_active(symbol: str, last_signal_time: dict, cooldown: int) -> bo
     # Check if symbol is in 4-hour cooldown
     try:
         if symbol in last_signal_time:
-            current_time = datetime.now()
+            current_time = datetime.now(last_signal_time[symbol].tzinfo)
             time_diff = (current_time - last_signal_time[symbol]).total_seconds()
             if time_diff < cooldown:
-                logger.info(f"[{symbol}] Cooldown active, {int((cooldown - time_diff)/60)} minutes remaining")
+                logger.debug("[%s] Cooldown active, %d minutes remaining", symbol, int((cooldown - time_diff) / 60))
                 return True
         return False
     except Exception as e:
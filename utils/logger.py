@@ -4,38 +4,136 @@
 # - Integrated with Cloud Logging
 # - Updated log_signal_to_csv to store in memory
 # - Removed archiving due to in-memory logging
+# - Dropped unused pandas import (kept out of the cold-start path)
+# - File/console I/O moved to a background QueueListener thread; callers only enqueue records
+# - Optional JSON (structured) output with LOG_FORMAT=json, including `extra` fields
+# - Per-message-site sampling for INFO/DEBUG so hot-path lines cannot flood the log
 
+import atexit
+import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
-import pandas as pd
 import pytz
 
 # Ensure logs directory exists
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Configure logger for Cloud Run
-log_formatter = logging.Formatter(
-    fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# At most LOG_SAMPLE_BURST records per message site every LOG_SAMPLE_INTERVAL seconds (0 disables)
+LOG_SAMPLE_INTERVAL = float(os.getenv("LOG_SAMPLE_INTERVAL", 60))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", 20))
 
-log_file = os.path.join(LOG_DIR, "bot.log")
-file_handler = RotatingFileHandler(log_file, maxBytes=2 * 1024 * 1024, backupCount=3)
-file_handler.setFormatter(log_formatter)
-file_handler.setLevel(logging.INFO)
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
 
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(log_formatter)
-console_handler.setLevel(logging.INFO)
+class StructuredFormatter(logging.Formatter):
+    # One JSON object per line with standard fields plus any `extra` fields
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sample":
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+class SiteSampler(logging.Filter):
+    # Rate-limit INFO/DEBUG records per call site (pathname, lineno); WARNING and above always pass.
+    # Records logged with extra={'sample': False} are never dropped.
+    def __init__(self, interval: float = LOG_SAMPLE_INTERVAL, burst: int = LOG_SAMPLE_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._sites = {}
+        self.suppressed_total = 0
+
+    def filter(self, record):
+        if self.interval <= 0 or record.levelno >= logging.WARNING or not getattr(record, "sample", True):
+            return True
+        site = (record.pathname, record.lineno)
+        now = record.created
+        state = self._sites.get(site)
+        if state is None or now - state[0] >= self.interval:
+            suppressed = state[2] if state else 0
+            self._sites[site] = [now, 1, 0]
+            if suppressed:
+                record.msg = f"{record.msg} (+{suppressed} similar suppressed)"
+            return True
+        if state[1] < self.burst:
+            state[1] += 1
+            return True
+        state[2] += 1
+        self.suppressed_total += 1
+        return False
+
+class LocalQueueHandler(QueueHandler):
+    # Enqueue the record untouched: the listener lives in this process, so the
+    # message does not need to be formatted (or made picklable) on the caller's thread
+    def prepare(self, record):
+        return record
+
+def build_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return StructuredFormatter(datefmt="%Y-%m-%dT%H:%M:%S")
+    return logging.Formatter(
+        fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+def build_io_handlers() -> list:
+    # File + console handlers; these do the actual I/O
+    log_formatter = build_formatter()
+    file_handler = RotatingFileHandler(os.path.join(LOG_DIR, "bot.log"), maxBytes=2 * 1024 * 1024, backupCount=3)
+    file_handler.setFormatter(log_formatter)
+    file_handler.setLevel(logging.DEBUG)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(log_formatter)
+    console_handler.setLevel(logging.DEBUG)
+    return [file_handler, console_handler]
+
+def configure_logging(target: logging.Logger, handlers: list, use_queue: bool = True, sampler: logging.Filter = None):
+    # Attach handlers to target, behind a queue unless use_queue is False; returns the listener (or None)
+    for handler in list(target.handlers):
+        target.removeHandler(handler)
+    listener = None
+    if use_queue:
+        queue_handler = LocalQueueHandler(queue.SimpleQueue())
+        if sampler is not None:
+            queue_handler.addFilter(sampler)
+        target.addHandler(queue_handler)
+        listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+    else:
+        for handler in handlers:
+            if sampler is not None:
+                handler.addFilter(sampler)
+            target.addHandler(handler)
+    return listener
 
 logger = logging.getLogger("crypto-signal-bot")
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+logger.setLevel(LOG_LEVEL)
 logger.propagate = False
+sampler = SiteSampler()
+log_listener = configure_logging(logger, build_io_handlers(), use_queue=True, sampler=sampler)
+
+def stop_logging():
+    # Flush queued records; safe to call more than once
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+atexit.register(stop_logging)
 
 # In-memory signals log for Cloud Run
 signals_data = []
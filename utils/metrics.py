@@ -0,0 +1,164 @@
+# Lightweight in-process metrics with Prometheus text exposition
+# Changes:
+# - Added Counter, Gauge and Histogram with label support and no external dependency
+# - span() timing context manager for hot-path stages (works around awaits)
+# - METRICS_ENABLED=0 turns every update into a no-op
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Tuple
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CYCLE_BUCKETS = (10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+
+_registry = []
+_NOOP = nullcontext()
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[index] += 1
+            data[-1] += value
+
+    def count(self, **labels) -> int:
+        data = self._values.get(self._key(labels))
+        return sum(data[:-1]) if data else 0
+
+    def total(self, **labels) -> float:
+        data = self._values.get(self._key(labels))
+        return data[-1] if data else 0.0
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, data in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(data[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+@contextmanager
+def _timed(histogram: Histogram, labels: dict):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+def timed(histogram: Histogram, **labels):
+    # Time a block into histogram; a shared no-op context when metrics are disabled
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _timed(histogram, labels)
+
+def render_metrics() -> str:
+    # Prometheus text exposition format (version 0.0.4)
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Scanner metrics
+stage_seconds = Histogram('scanner_stage_seconds', 'Latency of scanner pipeline stages', ('stage',))
+symbol_seconds = Histogram('scanner_symbol_seconds', 'End-to-end latency of one symbol scan')
+cycle_seconds = Histogram('scanner_cycle_seconds', 'Duration of a full scan cycle', buckets=CYCLE_BUCKETS)
+exchange_calls = Counter('exchange_calls_total', 'Exchange API calls by endpoint', ('endpoint',))
+exchange_deduplicated = Counter('exchange_deduplicated_total', 'Exchange requests answered by an identical request in flight or just finished',
+                                ('endpoint', 'source'))
+exchange_breaker_state = Gauge('exchange_breaker_state', 'Exchange circuit breaker state by endpoint (0 closed, 1 half-open, 2 open)', ('endpoint',))
+exchange_breaker_trips = Counter('exchange_breaker_trips_total', 'Exchange circuit breaker openings by endpoint and cause', ('endpoint', 'reason'))
+exchange_errors = Counter('exchange_errors_total', 'Failed or rejected exchange requests by endpoint and kind', ('endpoint', 'kind'))
+exchange_retries = Counter('exchange_retries_total', 'Exchange request retries by endpoint and outcome', ('endpoint', 'outcome'))
+cache_requests = Counter('cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+signals_total = Counter('scanner_signals_total', 'Signals generated and dispatched')
+
+def span(stage: str):
+    # Shorthand for timing one scanner stage
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _timed(stage_seconds, {'stage': stage})
@@ -0,0 +1,64 @@
+# Versioned binary snapshots of scanner state for warm restarts
+# Changes:
+# - Added compressed pickle snapshot with magic header and format version
+# - Atomic writes (temp file + fsync + os.replace) so a crash never leaves a torn file
+# - Unknown versions or corrupt files are ignored and the bot falls back to a cold scan
+# - magic/version parameters so other state files (exchange tapes) reuse the same container
+
+import os
+import pickle
+import struct
+import tempfile
+import time
+import zlib
+from typing import Optional
+from utils.logger import logger
+
+SNAPSHOT_MAGIC = b'CSBSNAP'
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct('<7sHd')
+
+def save_snapshot(path: str, state: dict, magic: bytes = SNAPSHOT_MAGIC, version: int = SNAPSHOT_VERSION) -> bool:
+    # Serialize state to path atomically
+    try:
+        payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 3)
+        header = _HEADER.pack(magic, version, time.time())
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Snapshot saved to {path} ({len(payload) / 1024:.1f} KiB)")
+        return True
+    except Exception as e:
+        logger.error(f"Error saving snapshot to {path}: {str(e)}")
+        return False
+
+def load_snapshot(path: str, magic: bytes = SNAPSHOT_MAGIC, version: int = SNAPSHOT_VERSION) -> Optional[dict]:
+    # Load a snapshot written by save_snapshot; None if missing, stale format or corrupt
+    try:
+        if not os.path.exists(path):
+            logger.info(f"No snapshot found at {path}, starting cold")
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        file_magic, file_version, saved_at = _HEADER.unpack_from(data)
+        if file_magic != magic or file_version != version:
+            logger.warning(f"Ignoring snapshot {path}: format {file_magic!r} v{file_version}, expected {magic!r} v{version}")
+            return None
+        state = pickle.loads(zlib.decompress(data[_HEADER.size:]))
+        state['saved_at'] = saved_at
+        logger.info(f"Loaded snapshot from {path}, {time.time() - saved_at:.0f}s old")
+        return state
+    except Exception as e:
+        logger.error(f"Error loading snapshot from {path}: {str(e)}")
+        return None